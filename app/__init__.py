@@ -135,6 +135,9 @@ def create_app():
 
     app = Flask(__name__)
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1)
+    # Uploads multipart vão direto para UPLOAD_FOLDER/_incoming (hash/MIME na recepção)
+    from .utils.upload_stream import IngestRequest
+    app.request_class = IngestRequest
 
     # =================
     # Configurações base
@@ -176,6 +179,36 @@ def create_app():
     from .utils.config_utils import clean_old_uploads
     ttl = int(os.environ.get('UPLOAD_TTL_HOURS', '24'))
     clean_old_uploads(app.config['UPLOAD_FOLDER'], ttl)
+    # Cache de miniaturas (_thumbs) tem poda própria: TTL + orçamento LRU
+    try:
+        from .utils import thumb_cache
+        thumbs_dir = os.path.join(app.config['UPLOAD_FOLDER'], '_thumbs')
+        if os.path.isdir(thumbs_dir):
+            thumb_cache.prune(thumbs_dir, force=True)
+    except Exception as e:
+        logging.getLogger(__name__).warning("Falha ao podar cache de miniaturas: %s", e)
+    # Depósito de documentos (_docs): ids expirados e blobs sem referência
+    try:
+        if os.path.isdir(os.path.join(app.config['UPLOAD_FOLDER'], '_docs')):
+            from .services import doc_store
+            doc_store.purge(force=True, upload_folder=app.config['UPLOAD_FOLDER'])
+    except Exception as e:
+        logging.getLogger(__name__).warning("Falha ao limpar depósito de documentos: %s", e)
+    # Uploads interrompidos (processo morto no meio do corpo)
+    try:
+        from .utils.upload_stream import clean_incoming
+        clean_incoming(app.config['UPLOAD_FOLDER'])
+    except Exception as e:
+        logging.getLogger(__name__).warning("Falha ao limpar uploads interrompidos: %s", e)
+
+    # Registro de capacidades (gs, qpdf, soffice, tesseract...) — sondado uma vez
+    # e compartilhado entre workers via arquivo; serviços consultam o registro.
+    if _bool_env('CAPS_PROBE_ON_START', True):
+        try:
+            from .utils.capabilities import get_capabilities
+            get_capabilities()
+        except Exception as e:
+            logging.getLogger(__name__).warning("Falha ao sondar capacidades: %s", e)
 
     # =========================== 🔒 Cookies de sessão ===========================
     app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -300,13 +333,13 @@ def create_app():
     # ==========================================
     @app.before_request
     def log_request_info():
+        # Não toca em request.form/files: isso leria o corpo inteiro antes da
+        # rota (o upload é consumido em streaming pela própria rota).
         arg_keys = list(request.args.keys())
-        form_keys = list(request.form.keys())
-        files_meta = {k: "<uploaded-file>" for k in request.files.keys()}
         safe_path = _path_for_log(request.path)
         app.logger.debug(
-            "REQ %s %s | args_keys=%s | form_keys=%s | files=%s",
-            request.method, safe_path, arg_keys, form_keys, files_meta
+            "REQ %s %s | args_keys=%s | body=%s (%s bytes)",
+            request.method, safe_path, arg_keys, request.mimetype or "-", request.content_length
         )
 
     # ===========================
@@ -380,7 +413,15 @@ def create_app():
             except Exception:
                 pass
 
-        app.logger.debug("RESP %s | %s %s", response.status, request.method, _path_for_log(request.path))
+        # chaves do formulário só se a rota já fez o parse (sem forçar leitura do corpo)
+        if "form" in request.__dict__:
+            app.logger.debug(
+                "RESP %s | %s %s | form_keys=%s | files=%s",
+                response.status, request.method, _path_for_log(request.path),
+                list(request.form.keys()), {k: "<uploaded-file>" for k in request.files.keys()},
+            )
+        else:
+            app.logger.debug("RESP %s | %s %s", response.status, request.method, _path_for_log(request.path))
         return response
 
     # =====================
@@ -462,7 +503,9 @@ def create_app():
     from .routes.organize import organize_bp
     from .routes.edit import edit_bp
     from .routes.feedback import feedback_bp
+    from .routes.ocr import ocr_bp
     from .routes.admin import admin_bp, admin_api_bp   # Dashboard + APIs
+    from .routes.files import files_bp
 
     app.register_blueprint(merge_bp)
     app.register_blueprint(split_bp)
@@ -472,8 +515,14 @@ def create_app():
     app.register_blueprint(organize_bp)
     app.register_blueprint(edit_bp)
     app.register_blueprint(feedback_bp)
+    app.register_blueprint(ocr_bp)         # /api/ocr (+ jobs assíncronos)
     app.register_blueprint(admin_bp)       # /admin
     app.register_blueprint(admin_api_bp)   # /api/admin/*
+    app.register_blueprint(files_bp)       # /api/files (upload único -> file_id)
+
+    if _bool_env('ENABLE_DIAG', False):
+        from .routes.dev import dev_bp
+        app.register_blueprint(dev_bp)     # /diag/* (binários/capacidades)
 
     # ==================
     # Tratamento de erros
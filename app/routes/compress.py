@@ -26,6 +26,8 @@ from ..services.compress_service import (
     enrich_page_analysis,
 )
 from ..services.sanitize_service import sanitize_pdf_preserving_content
+from ..services.doc_store import request_file
+from ..utils.upload_stream import pdf_uploads_only
 from ..utils.config_utils import ensure_upload_folder_exists, validate_upload
 from ..utils.pdf_utils import (
     cleanup_upload_files,
@@ -267,6 +269,37 @@ def _extract_pdf_metadata(file_path: str) -> dict:
         raise
 
 
+def _placeholder_thumbnail(page_num: int) -> str:
+    svg = (
+        f'<svg width="200" height="280" xmlns="http://www.w3.org/2000/svg">'
+        f'<rect width="200" height="280" fill="#eee"/>'
+        f'<text x="100" y="140" font-family="Arial" font-size="14" '
+        f'fill="#999" text-anchor="middle" dy=".3em">Página {page_num}</text></svg>'
+    )
+    return "data:image/svg+xml;base64," + base64.b64encode(svg.encode()).decode("ascii")
+
+
+def _generate_page_thumbnails(pdf_path: str, total_pages: int) -> list:
+    """
+    Thumbnails JPEG (caixa 240×338) de todas as páginas. Com "analyze" em
+    RENDER_SERVICE_FOR, usa o pool de render (documento aberto uma vez, sem
+    um Ghostscript por página); senão — ou se o pool falhar — cai no caminho
+    por página.
+    """
+    from ..services import render_service
+    if total_pages and render_service.routes("analyze"):
+        try:
+            images = render_service.render_batch(
+                pdf_path, range(1, total_pages + 1), fmt="jpeg", quality=88, fit=(240, 338)
+            )
+            return [
+                "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii") for data in images
+            ]
+        except Exception as e:
+            current_app.logger.warning("[analyze] pool de render falhou (%s); usando Ghostscript", type(e).__name__)
+    return [_generate_page_thumbnail(pdf_path, idx) for idx in range(total_pages)]
+
+
 def _generate_page_thumbnail(pdf_path: str, page_index: int) -> str:
     """
     Gera JPEG de thumbnail a 144 DPI (240×338 px) para nitidez em DPR até 2×.
@@ -295,13 +328,7 @@ def _generate_page_thumbnail(pdf_path: str, page_index: int) -> str:
         return "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes).decode("ascii")
     except Exception as e:
         current_app.logger.warning("Thumbnail página %d falhou: %s — usando placeholder", page_num, type(e).__name__)
-        svg = (
-            f'<svg width="200" height="280" xmlns="http://www.w3.org/2000/svg">'
-            f'<rect width="200" height="280" fill="#eee"/>'
-            f'<text x="100" y="140" font-family="Arial" font-size="14" '
-            f'fill="#999" text-anchor="middle" dy=".3em">Página {page_num}</text></svg>'
-        )
-        return "data:image/svg+xml;base64," + base64.b64encode(svg.encode()).decode("ascii")
+        return _placeholder_thumbnail(page_num)
     finally:
         if temp_png and os.path.exists(temp_png):
             try:
@@ -315,8 +342,9 @@ def _generate_page_thumbnail(pdf_path: str, page_index: int) -> str:
 @compress_bp.route("", methods=["POST"])
 @compress_bp.route("/", methods=["POST"])
 @limiter.limit("5 per minute")
+@pdf_uploads_only
 def compress():
-    f = request.files.get("file")
+    f = request_file("file")
     if not f or not f.filename:
         return _json_error("Nenhum arquivo enviado.", 400)
     profile = _normalize_profile(request.form.get("profile", "equilibrio"))
@@ -369,8 +397,9 @@ def list_profiles():
 
 @compress_bp.post("/analyze")
 @limiter.limit("10 per minute")
+@pdf_uploads_only
 def analyze():
-    f = request.files.get("file")
+    f = request_file("file")
     if not f or not f.filename:
         return _json_error("Nenhum arquivo PDF enviado.", 400)
     if not f.filename.lower().endswith(".pdf"):
@@ -410,11 +439,12 @@ def analyze():
         metadata  = _extract_pdf_metadata(analysis_path)
         has_large = False
         pages_data = []
+        thumbs = _generate_page_thumbnails(analysis_path, len(metadata["pages"]))
 
         for page_meta in metadata["pages"]:
             if page_meta["is_large"]:
                 has_large = True
-            thumb = _generate_page_thumbnail(analysis_path, page_meta["page_number"] - 1)
+            thumb = thumbs[page_meta["page_number"] - 1]
             # Defaults neutros — serão sobrescritos por enrich_page_analysis abaixo
             pages_data.append({
                 "page_number":       page_meta["page_number"],
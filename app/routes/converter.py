@@ -24,10 +24,11 @@ from flask import (
     Blueprint, render_template, session, redirect, url_for,
     request, jsonify, current_app
 )
-from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.exceptions import BadRequest, NotFound, RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 from .. import limiter
+from ..services import doc_store
 from ..utils.config_utils import validate_upload
 from ..utils.security import make_session_output_dir
 from ..utils.stats import record_job_event  # métricas 7.1
@@ -113,14 +114,20 @@ def _files_from_request(allowed_exts: Optional[set[str]] = None) -> List:
     """
     Aceita 'files[]', 'files', ou 'file' (1..N) e valida por extensão (e MIME real quando disponível).
     allowed_exts: conjunto *sem ponto* (ex.: {'pdf','docx'}). Se None, aceita tudo suportado para 'to-pdf'.
+    Objetivos que aceitam PDF também recebem 'file_id'/'file_ids' do depósito (doc_store),
+    depois dos uploads multipart.
     """
+    field = next((k for k in ("files[]", "files", "file") if k in request.files), "files")
+    accepts_pdf = "pdf" in (allowed_exts or ALLOWED_ANY_TO_PDF)
+
     items: Iterable = ()
-    if "files[]" in request.files:
-        items = request.files.getlist("files[]")
-    elif "files" in request.files:
-        items = request.files.getlist("files") or [request.files.get("files")]
-    elif "file" in request.files:
-        items = request.files.getlist("file") or [request.files.get("file")]
+    if accepts_pdf:
+        items = doc_store.request_files(field)
+        if not items:
+            single = doc_store.request_file(field)  # 'file_id' (um documento)
+            items = [single] if single is not None else []
+    elif field in request.files:
+        items = request.files.getlist(field) or [request.files.get(field)]
 
     eff_allowed = _dotset(allowed_exts or ALLOWED_ANY_TO_PDF)
 
@@ -267,6 +274,8 @@ def api_merge_a4_json():
             shutil.rmtree(tmpdir, ignore_errors=True)
     except RequestEntityTooLarge:
         return jsonify({"error": "Arquivo muito grande (MAX_CONTENT_LENGTH)."}), 413
+    except NotFound as e:  # file_id inexistente/expirado
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         return jsonify({"error": e.description}), 422
     except RuntimeError as e:
@@ -318,6 +327,8 @@ def api_to_pdf_many():
         return jsonify({"count": count, "files": files})
     except RequestEntityTooLarge:
         return jsonify({"error": "Arquivo muito grande (MAX_CONTENT_LENGTH)."}), 413
+    except NotFound as e:  # file_id inexistente/expirado
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         return jsonify({"error": e.description}), 422
     except RuntimeError as e:
@@ -343,6 +354,8 @@ def api_to_docx_many():
         return jsonify({"count": count, "files": files})
     except RequestEntityTooLarge:
         return jsonify({"error": "Arquivo muito grande (MAX_CONTENT_LENGTH)."}), 413
+    except NotFound as e:  # file_id inexistente/expirado
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         return jsonify({"error": e.description}), 422
     except RuntimeError as e:
@@ -368,6 +381,8 @@ def api_to_csv_many():
         return jsonify({"count": count, "files": files})
     except RequestEntityTooLarge:
         return jsonify({"error": "Arquivo muito grande (MAX_CONTENT_LENGTH)."}), 413
+    except NotFound as e:  # file_id inexistente/expirado
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         return jsonify({"error": e.description}), 422
     except RuntimeError as e:
@@ -393,6 +408,8 @@ def api_to_xlsx_many():
         return jsonify({"count": count, "files": files})
     except RequestEntityTooLarge:
         return jsonify({"error": "Arquivo muito grande (MAX_CONTENT_LENGTH)."}), 413
+    except NotFound as e:  # file_id inexistente/expirado
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         return jsonify({"error": e.description}), 422
     except RuntimeError as e:
@@ -456,6 +473,8 @@ def api_convert_generic():
         return jsonify({"count": count, "files": files})
     except RequestEntityTooLarge:
         return jsonify({"error": "Arquivo muito grande (MAX_CONTENT_LENGTH)."}), 413
+    except NotFound as e:  # file_id inexistente/expirado
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         return jsonify({"error": e.description}), 422
     except RuntimeError as e:
@@ -1,8 +1,6 @@
 # app/routes/dev.py
 import os
-import shutil
-import subprocess
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request
 
 dev_bp = Blueprint("dev", __name__)
 
@@ -28,42 +26,31 @@ def healthz():
 def _diag_enabled() -> bool:
     return os.getenv("ENABLE_DIAG", "0") == "1"
 
-def _run(cmd, timeout=3):
-    """Executa um binário e retorna rc/out/err sem explodir a app."""
-    try:
-        p = subprocess.run(cmd, check=False, capture_output=True, text=True, timeout=timeout)
-        return {"rc": p.returncode, "out": (p.stdout or "").strip(), "err": (p.stderr or "").strip()}
-    except Exception as e:
-        return {"rc": -1, "out": "", "err": str(e)[:200]}
+def _tool_info(name: str, refresh: bool = False) -> dict:
+    from ..utils import capabilities
+    caps = capabilities.get_capabilities(refresh=refresh)
+    t = caps["tools"].get(name) or {}
+    info = {"bin": t.get("path"), "ok": bool(t.get("ok")), "version": t.get("version")}
+    if t.get("langs") is not None:
+        info["langs"] = t["langs"]
+    return info
 
 @dev_bp.get("/diag/gs")
 def diag_gs():
     if not _diag_enabled():
         return jsonify(error="disabled"), 404
-
-    gs_bin = os.getenv("GHOSTSCRIPT_BIN") or shutil.which("gs") or "gs"
-    res = _run([gs_bin, "-v"])
-    info = {
-        "bin": gs_bin,
-        "ok": res["rc"] == 0,
-        "version": (res["out"] or res["err"]).splitlines()[0] if (res["out"] or res["err"]) else None,
-    }
-    if res["rc"] != 0:
-        info["err_tail"] = (res["err"] or res["out"]).splitlines()[-5:]
-    return jsonify(info)
+    return jsonify(_tool_info("gs", refresh=request.args.get("refresh") == "1"))
 
 @dev_bp.get("/diag/soffice")
 def diag_soffice():
     if not _diag_enabled():
         return jsonify(error="disabled"), 404
+    return jsonify(_tool_info("soffice", refresh=request.args.get("refresh") == "1"))
 
-    soffice_bin = os.getenv("SOFFICE_BIN") or shutil.which("soffice") or "soffice"
-    res = _run([soffice_bin, "--version"])
-    info = {
-        "bin": soffice_bin,
-        "ok": res["rc"] == 0,
-        "version": (res["out"] or res["err"]).splitlines()[0] if (res["out"] or res["err"]) else None,
-    }
-    if res["rc"] != 0:
-        info["err_tail"] = (res["err"] or res["out"]).splitlines()[-5:]
-    return jsonify(info)
\ No newline at end of file
+@dev_bp.get("/diag/capabilities")
+def diag_capabilities():
+    """Snapshot completo do registro; ?refresh=1 sonda de novo e atualiza o cache compartilhado."""
+    if not _diag_enabled():
+        return jsonify(error="disabled"), 404
+    from ..utils import capabilities
+    return jsonify(capabilities.get_capabilities(refresh=request.args.get("refresh") == "1"))
@@ -7,6 +7,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, jsonif
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import BadRequest, NotFound, RequestEntityTooLarge
 from app.utils.security import (
+    get_or_create_output_owner_id,
     is_valid_edit_session_id,
     make_edit_session_dir,
     resolve_owned_edit_session_dir,
@@ -29,6 +30,13 @@ except Exception:
 
 # >>> NOVO: limiter, métricas e limites unificados
 from .. import limiter
+from ..services import (
+    edit_doc_cache, edit_engine, edit_overlays, edit_render_cache, edit_text_index, edit_versions,
+    render_service,
+)
+from ..utils.disk_cache import clone_file
+from ..services.doc_store import request_file
+from ..utils.upload_stream import IngestedUpload, cached_head, pdf_uploads_only
 from ..utils.stats import record_job_event
 from ..utils.limits import (
     get_max_pdf_pages,
@@ -151,14 +159,23 @@ def _is_pdf_header(buf: bytes) -> bool:
     head = bytes(buf[:1024])
     return b"%PDF-" in head
 
-def _ensure_pdf(path: str):
-    with open(path, "rb") as f:
-        head = f.read(1024)
+def _ensure_pdf(path: str, head: bytes | None = None):
+    if head is None:
+        with open(path, "rb") as f:
+            head = f.read(1024)
     if not _is_pdf_header(head):
         raise BadRequest("Arquivo enviado não é um PDF válido.")
 
 def _safe_copy_upload_to_path(up_file_storage, dest_path: str, chunk_size: int = 1024 * 1024) -> int:
     """Copia stream do upload para dest_path de forma segura. Retorna bytes gravados."""
+    if isinstance(up_file_storage, IngestedUpload):
+        # já está em disco (upload em streaming): hardlink, sem copiar os bytes
+        up_file_storage.save(dest_path)
+        try:
+            os.chmod(dest_path, 0o600)
+        except Exception:
+            pass
+        return up_file_storage.size
     try:
         up_file_storage.stream.seek(0)
     except Exception:
@@ -197,6 +214,14 @@ def _overlay_image_path(paths, image_id: str) -> str:
         raise NotFound("Imagem não encontrada.")
     return img_path
 
+def _read_overlay_image(paths, image_id: str):
+    """Bytes da imagem de overlay da sessão (None se o arquivo não existe)."""
+    try:
+        with open(_overlay_image_path(paths, image_id), "rb") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
 # ---------- pikepdf compat ---------- (sanitização)
 def _get_pdf_root(pdf):
     if pdf is None:
@@ -244,12 +269,24 @@ def _sanitize_pdf(src: str, dst: str):
                 pdf.remove_unreferenced_resources()
             except Exception:
                 pass
-            pdf.save(dst, fix_metadata=True, linearize=True)
+            # grava ao lado e troca atomicamente: quem ainda lê a versão
+            # anterior (documentos abertos em cache) segue com o inode antigo
+            tmp_dst = f"{dst}.{uuid.uuid4().hex[:8]}.part"
+            try:
+                pdf.save(tmp_dst, fix_metadata=True, linearize=True)
+                os.replace(tmp_dst, dst)
+            finally:
+                if os.path.exists(tmp_dst):
+                    os.remove(tmp_dst)
     except Exception:
+        # também por troca atômica: dst pode ser hardlink de uma versão do histórico
+        tmp_dst = f"{dst}.{uuid.uuid4().hex[:8]}.part"
         try:
-            shutil.copyfile(src, dst)
-        except Exception:
-            raise
+            shutil.copyfile(src, tmp_dst)
+            os.replace(tmp_dst, dst)
+        finally:
+            if os.path.exists(tmp_dst):
+                os.remove(tmp_dst)
     finally:
         try:
             if os.path.exists(src):
@@ -257,6 +294,35 @@ def _sanitize_pdf(src: str, dst: str):
         except Exception:
             pass
 
+def apply_ocr_job_result(result_path: str, spec: dict) -> None:
+    """
+    Aplicador da fila de OCR (ocr_jobs.APPLIERS["edit"]): leva o resultado do
+    OCR assíncrono ao current.pdf pelo mesmo caminho do modo síncrono
+    (sanitização + diário/versões). Se a sessão foi editada depois do envio
+    (versão do arquivo ou diário diferentes), nada é aplicado: JobConflict.
+    """
+    from app.services.ocr_jobs import JobConflict
+
+    session_dir, cur = spec["dir"], spec["cur"]
+    if not os.path.isdir(session_dir):
+        raise JobConflict("A sessão de edição não existe mais.")
+    with edit_versions.session_lock(session_dir):
+        changed = (
+            not os.path.exists(cur)
+            or edit_render_cache.doc_version(cur) != spec.get("version")
+            or len(edit_engine.read_journal(session_dir)) != spec.get("seq")
+        )
+        if changed:
+            raise JobConflict("O documento foi alterado durante o OCR; o resultado não foi aplicado.")
+        _sanitize_pdf(result_path, cur)
+        edit_engine.record(session_dir, "ocr", "full", cur)
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
 def _clamp_num(v, lo, hi):
     try:
         v = float(v)
@@ -293,14 +359,10 @@ def edit():
 # -------- APIs --------
 @edit_bp.post("/api/edit/upload")
 @limiter.limit("5 per minute")
+@pdf_uploads_only
 def api_edit_upload():
     # Aceita múltiplos aliases do campo
-    up = (
-        request.files.get("file")
-        or request.files.get("pdf")
-        or request.files.get("upload")
-        or request.files.get("document")
-    )
+    up = request_file("file", "pdf", "upload", "document")  # ou 'file_id' do depósito
     if not up or not up.filename:
         current_app.logger.info("Upload falhou: nenhum arquivo recebido (campos=file|pdf|upload|document).")
         raise BadRequest("Nenhum arquivo enviado.")
@@ -329,18 +391,20 @@ def api_edit_upload():
         return jsonify({"error": "Falha ao salvar o arquivo."}), 500
 
     # Valida conteúdo como PDF (tolerante a BOM/bytes anteriores)
-    _ensure_pdf(paths["orig"])
+    _ensure_pdf(paths["orig"], cached_head(up, 1024))
 
     # Valida MIME real como sinal auxiliar (mas não bloqueia se header ok)
     try:
-        sniff = _sniff_mime_file(paths["orig"])
+        sniff = up.sniffed_mime if isinstance(up, IngestedUpload) else None
+        sniff = sniff or _sniff_mime_file(paths["orig"])
         if sniff not in ("application/pdf", "application/x-pdf", "application/acrobat", "application/octet-stream"):
             current_app.logger.info("MIME suspeito no upload: %s (aceito por header PDF)", sniff)
     except Exception:
         pass
 
-    # Define current.pdf
-    shutil.copyfile(paths["orig"], paths["cur"])
+    # Define current.pdf (reflink quando o FS suporta: não duplica o upload)
+    clone_file(paths["orig"], paths["cur"])
+    edit_engine.record(paths["dir"], "upload", "upload", paths["cur"])
 
     # Salva meta (sem dados sensíveis)
     try:
@@ -362,7 +426,7 @@ def api_edit_upload():
         current_app.logger.warning("Não foi possível salvar meta.json da sessão de edição.")
 
     # Confere nº de páginas e limites (usa EDIT_MAX_PAGES se setado, senão limite global)
-    with fitz.open(paths["cur"]) as doc:
+    with edit_doc_cache.borrow(session_id, paths["cur"]) as doc:
         pages = doc.page_count
         try:
             edit_env = int(os.getenv("EDIT_MAX_PAGES", "0") or 0)
@@ -370,6 +434,7 @@ def api_edit_upload():
             edit_env = 0
         limit_pages = edit_env if edit_env > 0 else get_max_pdf_pages()
         if pages > limit_pages:
+            edit_doc_cache.invalidate(session_id)
             try:
                 shutil.rmtree(paths["dir"], ignore_errors=True)
             finally:
@@ -423,7 +488,9 @@ def api_edit_overlay_image_upload():
         except Exception: pass
         raise BadRequest("Arquivo de imagem muito grande.")
 
-    mime = _sniff_mime_file(provisional)
+    mime = img.sniffed_mime if isinstance(img, IngestedUpload) else None
+    if not mime or mime == "application/octet-stream":
+        mime = _sniff_mime_file(provisional)
     # Fallback: aceite o MIME do navegador se plausível
     browser_mime = (getattr(img, "mimetype", "") or "").lower()
     if mime == "application/octet-stream" and browser_mime in {"image/png","image/jpeg"}:
@@ -487,8 +554,7 @@ def api_edit_apply(action):
         order = data.get("order") or []          # lista 1-based das páginas ORIGINAIS na nova ordem
         rotations = data.get("rotations") or {}  # dict { "orig_page_num(1-based)": grau_absoluto }
 
-        tmp_out = _tmp_pdf_path(paths["dir"])
-        with fitz.open(paths["cur"]) as doc:
+        with edit_doc_cache.borrow(session_id, paths["cur"], mutate=True) as doc:
             # Reordena / remove usando select (0-based)
             if order:
                 sel = []
@@ -541,9 +607,8 @@ def api_edit_apply(action):
                         if 0 <= idx0 < doc.page_count:
                             _apply_rotation(doc[idx0], v)
 
-            doc.save(tmp_out, deflate=True, garbage=3, clean=True, incremental=False)
-
-        _sanitize_pdf(tmp_out, paths["cur"])
+            edit_engine.commit(doc, paths, op="organize", sanitize=_sanitize_pdf,
+                               detail={"pages": doc.page_count})
 
         # métricas
         try:
@@ -589,6 +654,34 @@ def api_edit_apply(action):
         timeout = _int_or_none(data.get("timeout"))
         mem_mb  = _int_or_none(data.get("mem_mb"))
 
+        # Modo assíncrono: enfileira e devolve 202. Ao final o job aplica o
+        # resultado via apply_ocr_job_result — só se o documento não mudou.
+        if _HAS_OCR_SERVICE and _b(data.get("async"), False):
+            from app.services import ocr_jobs
+            with edit_versions.session_lock(paths["dir"]):
+                job_id = ocr_jobs.submit_job(
+                    paths["cur"],
+                    owner=get_or_create_output_owner_id(),
+                    apply={
+                        "kind": "edit",
+                        "dir": paths["dir"],
+                        "cur": paths["cur"],
+                        "tmp": _tmp_pdf_path(paths["dir"]),
+                        "version": edit_render_cache.doc_version(paths["cur"]),
+                        "seq": len(edit_engine.read_journal(paths["dir"])),
+                    },
+                    options=dict(lang=lang, force=force, skip_text=skip_text, optimize=optimize,
+                                 deskew=deskew, rotate_pages=rotate_pages, clean=clean,
+                                 jobs=jobs, timeout=timeout, mem_mb=mem_mb),
+                )
+            return jsonify({
+                "ok": True,
+                "job_id": job_id,
+                "status_url": url_for("ocr.ocr_job_status", job_id=job_id),
+                "download_url": url_for("edit_bp.api_edit_download", session_id=session_id),
+                "preview_refresh": url_for("edit_bp.api_edit_file", session_id=session_id)
+            }), 202
+
         tmp_out = _tmp_pdf_path(paths["dir"])
 
         # 1) Tenta usar o service dedicado (preferido)
@@ -654,7 +747,9 @@ def api_edit_apply(action):
                 raise BadRequest(f"OCR falhou (rc={rc}). {err}")
 
         # Sanitiza e aplica ao current.pdf
-        _sanitize_pdf(tmp_out, paths["cur"])
+        with edit_versions.session_lock(paths["dir"]):
+            _sanitize_pdf(tmp_out, paths["cur"])
+            edit_engine.record(paths["dir"], "ocr", "full", paths["cur"])
 
         # métricas
         try:
@@ -670,11 +765,8 @@ def api_edit_apply(action):
         }), 200
 
     # ---------- fallback (mantém comportamento antigo) ----------
-    tmp_out = _tmp_pdf_path(paths["dir"])
-    with fitz.open(paths["cur"]) as doc:
-        doc.save(tmp_out, deflate=True, garbage=3, incremental=False, clean=True)
-
-    _sanitize_pdf(tmp_out, paths["cur"])
+    with edit_doc_cache.borrow(session_id, paths["cur"], mutate=True) as doc:
+        edit_engine.commit(doc, paths, op=action, sanitize=_sanitize_pdf, safe_incremental=False)
 
     # métricas
     try:
@@ -719,9 +811,10 @@ def api_edit_overlay():
 
     deadline = job_deadline_start()  # NOVO: evitar jobs longos
 
-    tmp_out = _tmp_pdf_path(paths["dir"])
-    with fitz.open(paths["cur"]) as doc:
-        any_redact = False
+    with edit_doc_cache.borrow(session_id, paths["cur"], mutate=True) as doc:
+        redact_pages = set()
+        # mesma imagem (assinatura/logo) em várias páginas: embutida uma vez só
+        placer = edit_overlays.ImagePlacer(doc, lambda image_id: _read_overlay_image(paths, image_id))
         for op in ops:
             job_deadline_check(deadline, label="edit/overlay")
             pidx = int(op.get('pageIndex', 0))
@@ -732,6 +825,8 @@ def api_edit_overlay():
             scale_y = page.rect.height / ph
 
             t = (op.get('type') or '').lower()
+            if t != 'image':
+                placer.flush()  # preserva a ordem de empilhamento entre imagens e o resto
             if t == 'whiteout':
                 x,y,w,h = [float(v) for v in op.get('rect', [0,0,0,0])]
                 r = fitz.Rect(x*scale_x, y*scale_y, (x+w)*scale_x, (y+h)*scale_y)
@@ -740,7 +835,7 @@ def api_edit_overlay():
                 x,y,w,h = [float(v) for v in op.get('rect', [0,0,0,0])]
                 r = fitz.Rect(x*scale_x, y*scale_y, (x+w)*scale_x, (y+h)*scale_y)
                 try:
-                    page.add_redact_annot(r, fill=(1,1,1)); any_redact = True
+                    page.add_redact_annot(r, fill=(1,1,1)); redact_pages.add(pidx)
                 except Exception:
                     page.draw_rect(r, color=(1,1,1), fill=(1,1,1))
             elif t == 'text':
@@ -757,23 +852,22 @@ def api_edit_overlay():
                 image_id = (op.get('image_id') or '').strip()
                 ix, iy, iw, ih = [float(v) for v in op.get('rect', [0,0,0,0])]
                 rect = fitz.Rect(ix*scale_x, iy*scale_y, (ix+iw)*scale_x, (iy+ih)*scale_y)
-                img_path = _overlay_image_path(paths, image_id)
-                if not os.path.exists(img_path):
-                    continue
-                with open(img_path, "rb") as fh:
-                    data_bytes = fh.read()
+                _overlay_image_path(paths, image_id)  # id inválido -> 404
                 rotate = int(op.get('rotate', 0) or 0) % 360
-                page.insert_image(rect, stream=data_bytes, keep_proportion=False, rotate=rotate)
+                placer.place(page, image_id, rect, rotate)
+        placer.flush()
 
-        if any_redact:
+        # Document não tem apply_redactions: aplica página a página
+        for pidx in sorted(redact_pages):
             try:
-                doc.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+                doc[pidx].apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
             except Exception:
                 pass
+        any_redact = bool(redact_pages)
 
-        doc.save(tmp_out, deflate=True, garbage=3, clean=True, incremental=False)
-
-    _sanitize_pdf(tmp_out, paths["cur"])
+        # redação precisa de reescrita completa: a revisão anterior ficaria no arquivo
+        edit_engine.commit(doc, paths, op="overlay", sanitize=_sanitize_pdf,
+                           safe_incremental=not any_redact, detail={"ops": len(ops)})
 
     # métricas
     try:
@@ -786,6 +880,7 @@ def api_edit_overlay():
     return jsonify({
         "ok": True,
         "session_id": session_id,
+        "images": placer.stats(),
         "download_url": url_for("edit_bp.api_edit_download", session_id=session_id),
         "preview_refresh": url_for("edit_bp.api_edit_file", session_id=session_id)
     }), 200
@@ -857,14 +952,16 @@ def api_edit_apply_overlays():
 
     deadline = job_deadline_start()  # NOVO
 
-    tmp_out = _tmp_pdf_path(paths["dir"])
-    with fitz.open(paths["cur"]) as doc:
+    with edit_doc_cache.borrow(session_id, paths["cur"], mutate=True) as doc:
         if not (0 <= page_index < doc.page_count):
             raise BadRequest("page_index fora do intervalo.")
         page = doc[page_index]
         W, H = page.rect.width, page.rect.height
 
         any_redact = False
+        # borracha + textos num único Shape: um só stream de conteúdo novo na página
+        shape = page.new_shape()
+        shape_items = 0
 
         # -------- BORRACHA (whiteout achatado) --------
         for r in whiteouts:
@@ -879,10 +976,13 @@ def api_edit_apply_overlays():
                 rect = fitz.Rect(x0 * W, y0 * H, x1 * W, y1 * H)
             except Exception:
                 continue
+            shape.draw_rect(rect)
+            shape_items += 1
+        if shape_items:
             try:
-                page.draw_rect(rect, color=fill_rgb, fill=fill_rgb, fill_opacity=fill_alpha)
+                shape.finish(color=fill_rgb, fill=fill_rgb, fill_opacity=fill_alpha)
             except TypeError:
-                page.draw_rect(rect, color=fill_rgb, fill=fill_rgb)
+                shape.finish(color=fill_rgb, fill=fill_rgb)
 
         # -------- REDAÇÃO --------
         for r in redacts:
@@ -916,15 +1016,19 @@ def api_edit_apply_overlays():
                 size_px = float(t.get("size", 14) or 14)
             size_px = max(6.0, min(96.0, size_px))
             for i, line in enumerate(txt.splitlines() or [""]):
-                page.insert_text(
+                shape.insert_text(
                     fitz.Point(x, y + i * size_px * 1.2),
                     line,
                     fontsize=size_px,
                     color=(0, 0, 0),
                     fontname="helv",
                 )
+                shape_items += 1
+        if shape_items:
+            shape.commit()
 
-        # -------- IMAGENS --------
+        # -------- IMAGENS (cada arquivo lido/embutido uma vez; repetições reusam o XObject) --------
+        placer = edit_overlays.ImagePlacer(doc, lambda image_id: _read_overlay_image(paths, image_id))
         for im in images:
             job_deadline_check(deadline, label="edit/overlays")
             image_id = (im.get("image_id") or "").strip()
@@ -941,30 +1045,26 @@ def api_edit_apply_overlays():
             except Exception:
                 continue
 
-            img_path = _overlay_image_path(paths, image_id)
-            if not os.path.exists(img_path):
-                continue
-
+            _overlay_image_path(paths, image_id)  # id inválido -> 404 (antes de ler)
             try:
-                with open(img_path, "rb") as fh:
-                    data_bytes = fh.read()
                 rotate = int(im.get("rotate", 0) or 0) % 360
-                page.insert_image(rect, stream=data_bytes, keep_proportion=False, rotate=rotate)
+                placer.place(page, image_id, rect, rotate)
             except Exception as exc:
                 current_app.logger.error(
                     "Falha ao inserir imagem na sessao de edicao: %s",
                     type(exc).__name__,
                 )
+        placer.flush()
 
         if any_redact:
             try:
-                doc.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+                page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
             except Exception:
                 pass
 
-        doc.save(tmp_out, deflate=True, garbage=3, clean=True, incremental=False)
-
-    _sanitize_pdf(tmp_out, paths["cur"])
+        # redação precisa de reescrita completa: a revisão anterior ficaria no arquivo
+        edit_engine.commit(doc, paths, op="overlays", sanitize=_sanitize_pdf,
+                           safe_incremental=not any_redact, detail={"page_index": page_index})
 
     # métricas
     try:
@@ -978,6 +1078,7 @@ def api_edit_apply_overlays():
         "ok": True,
         "session_id": session_id,
         "page_index": page_index,
+        "images": placer.stats(),
         "download_url": url_for("edit_bp.api_edit_download", session_id=session_id),
         "preview_refresh": url_for("edit_bp.api_edit_file", session_id=session_id),
     }), 200
@@ -989,8 +1090,10 @@ def api_edit_download(session_id):
     paths = _paths(session_id)
     if not os.path.exists(paths["cur"]):
         raise NotFound("Resultado não encontrado.")
+    # compacta + sanitiza a cauda incremental só aqui (cacheado por versão)
+    final_path = edit_engine.finalize(paths, sanitize=_sanitize_pdf)
     return send_file(
-        paths["cur"],
+        final_path,
         mimetype="application/pdf",
         as_attachment=True,
         download_name="editado.pdf",
@@ -1007,6 +1110,174 @@ def api_edit_file(session_id):
         raise NotFound("Arquivo da sessão não encontrado.")
     return send_file(paths["cur"], mimetype="application/pdf", as_attachment=False, max_age=0, conditional=True)
 
+# ===== busca no texto / redigir ocorrências =====
+def _text_index(session_id: str, paths, deadline=None):
+    version = edit_render_cache.doc_version(paths["cur"])
+    check = (lambda: job_deadline_check(deadline, label="edit/text-index")) if deadline else None
+    index, _ready = edit_text_index.get_index(
+        paths["dir"], version, lambda: edit_doc_cache.borrow(session_id, paths["cur"]), check
+    )
+    return index
+
+def _pages_filter(raw):
+    """Lista/CSV de páginas 1-based -> conjunto 0-based (None = todas)."""
+    if raw in (None, "", []):
+        return None
+    items = raw.split(",") if isinstance(raw, str) else raw
+    try:
+        return {int(p) - 1 for p in items}
+    except (TypeError, ValueError):
+        raise BadRequest("pages inválido.")
+
+@edit_bp.get("/api/edit/search/<session_id>")
+@limiter.limit("60 per minute")
+def api_edit_search(session_id):
+    """?q=texto[&pages=1,2][&whole=1] -> ocorrências com retângulos (pontos PDF, página sem rotação)."""
+    session_id = _safe_session_id(session_id)
+    paths = _paths(session_id)
+    if not os.path.exists(paths["cur"]):
+        raise NotFound("Sessão não encontrada.")
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        raise BadRequest("Consulta vazia.")
+    if len(query) > MAX_TEXT_LEN:
+        raise BadRequest("Consulta muito longa.")
+
+    index = _text_index(session_id, paths, job_deadline_start())
+    hits, truncated = index.search(query, pages=_pages_filter(request.args.get("pages")),
+                                   whole_words=request.args.get("whole") == "1")
+    return jsonify({
+        "ok": True,
+        "query": query,
+        "total": len(hits),
+        "truncated": truncated,
+        "hits": hits,
+    }), 200
+
+@edit_bp.post("/api/edit/redact-matches")
+@limiter.limit("10 per minute")
+def api_edit_redact_matches():
+    """
+    {session_id, query, pages?, whole_words?} -> redige todas as ocorrências num único save.
+    whole_words (default true): só palavras inteiras — os retângulos cobrem a
+    palavra toda, então um trecho no meio dela ("ana" em "Mariana") a apagaria.
+    """
+    data = request.get_json(silent=True) or {}
+    raw_sid = (data.get("session_id") or "").strip()
+    if not raw_sid:
+        raise BadRequest("session_id ausente.")
+    session_id = _safe_session_id(raw_sid)
+    paths = _paths(session_id)
+    if not os.path.exists(paths["cur"]):
+        raise NotFound("Sessão não encontrada.")
+    query = (data.get("query") or "").strip()
+    if not query:
+        raise BadRequest("Consulta vazia.")
+    if len(query) > MAX_TEXT_LEN:
+        raise BadRequest("Consulta muito longa.")
+
+    deadline = job_deadline_start()
+    index = _text_index(session_id, paths, deadline)
+    max_matches = max(1, _env_int("EDIT_REDACT_MAX_MATCHES", 5000))
+    whole_words = data.get("whole_words", True) not in (False, 0, "0", "false")
+    hits, truncated = index.search(query, pages=_pages_filter(data.get("pages")), max_hits=max_matches,
+                                   whole_words=whole_words)
+    if truncated:
+        raise BadRequest(f"Ocorrências demais para redigir de uma vez (máximo {max_matches}).")
+    if not hits:
+        return jsonify({"ok": True, "session_id": session_id, "matches": 0, "pages": []}), 200
+
+    by_page = {}
+    for hit in hits:
+        by_page.setdefault(hit["page_index"], []).extend(hit["rects"])
+
+    with edit_doc_cache.borrow(session_id, paths["cur"], mutate=True) as doc:
+        for pidx in sorted(by_page):
+            job_deadline_check(deadline, label="edit/redact-matches")
+            page = doc[pidx]
+            for r in by_page[pidx]:
+                page.add_redact_annot(fitz.Rect(r), fill=(1, 1, 1))
+            page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+
+        # redação: sempre reescrita completa (a revisão anterior não pode sobrar)
+        edit_engine.commit(doc, paths, op="redact-matches", sanitize=_sanitize_pdf,
+                           safe_incremental=False, detail={"matches": len(hits)})
+
+    try:
+        record_job_event(route="/api/edit/redact-matches", action="edit-redact-matches",
+                         bytes_in=None, bytes_out=os.path.getsize(paths["cur"]), files_out=1)
+    except Exception:
+        pass
+
+    return jsonify({
+        "ok": True,
+        "session_id": session_id,
+        "matches": len(hits),
+        "pages": [p + 1 for p in sorted(by_page)],
+        "download_url": url_for("edit_bp.api_edit_download", session_id=session_id),
+        "preview_refresh": url_for("edit_bp.api_edit_file", session_id=session_id),
+    }), 200
+
+# ===== histórico de versões (desfazer/refazer) =====
+def _versions_payload(session_id: str, paths) -> dict:
+    return {
+        "ok": True,
+        "session_id": session_id,
+        **edit_versions.history(paths["dir"]),
+        "download_url": url_for("edit_bp.api_edit_download", session_id=session_id),
+        "preview_refresh": url_for("edit_bp.api_edit_file", session_id=session_id),
+    }
+
+def _versions_session():
+    data = request.get_json(silent=True) or {}
+    raw_sid = (data.get("session_id") or "").strip()
+    if not raw_sid:
+        raise BadRequest("session_id ausente.")
+    session_id = _safe_session_id(raw_sid)
+    paths = _paths(session_id)
+    if not os.path.exists(paths["cur"]):
+        raise NotFound("Sessão não encontrada.")
+    return session_id, paths, data
+
+@edit_bp.get("/api/edit/versions/<session_id>")
+@limiter.limit("60 per minute")
+def api_edit_versions(session_id):
+    session_id = _safe_session_id(session_id)
+    paths = _paths(session_id)
+    if not os.path.exists(paths["cur"]):
+        raise NotFound("Sessão não encontrada.")
+    return jsonify(_versions_payload(session_id, paths)), 200
+
+@edit_bp.post("/api/edit/undo")
+@limiter.limit("30 per minute")
+def api_edit_undo():
+    session_id, paths, _ = _versions_session()
+    if edit_versions.undo(paths) is None:
+        raise BadRequest("Nada para desfazer.")
+    return jsonify(_versions_payload(session_id, paths)), 200
+
+@edit_bp.post("/api/edit/redo")
+@limiter.limit("30 per minute")
+def api_edit_redo():
+    session_id, paths, _ = _versions_session()
+    if edit_versions.redo(paths) is None:
+        raise BadRequest("Nada para refazer.")
+    return jsonify(_versions_payload(session_id, paths)), 200
+
+@edit_bp.post("/api/edit/versions/jump")
+@limiter.limit("30 per minute")
+def api_edit_versions_jump():
+    session_id, paths, data = _versions_session()
+    try:
+        version = int(data.get("version"))
+    except (TypeError, ValueError):
+        raise BadRequest("version inválida.")
+    try:
+        edit_versions.jump(paths, version)
+    except KeyError:
+        raise NotFound("Versão não encontrada (pode ter saído pela cota do histórico).")
+    return jsonify(_versions_payload(session_id, paths)), 200
+
 # ===== fechar sessão =====
 @edit_bp.post("/api/edit/close")
 @limiter.limit("10 per minute")
@@ -1018,6 +1289,8 @@ def api_edit_close():
     sid = _safe_session_id(raw_sid)
     paths = _paths(sid)
 
+    edit_doc_cache.invalidate(sid)
+    edit_text_index.forget(paths["dir"])
     try:
         shutil.rmtree(paths["dir"], ignore_errors=True)
         current_app.logger.info("Sessão de edição encerrada e limpa.")
@@ -1030,37 +1303,136 @@ def api_edit_close():
     return jsonify({"ok": True, "session_id": sid})
 
 # ===== imagem nítida =====
+_IMAGE_MIMES = {"png": "image/png", "webp": "image/webp", "jpeg": "image/jpeg"}
+
+def _negotiate_image_format() -> str:
+    """
+    ?fmt= explícito > Accept (só tipos listados: 'image/webp', 'image/jpeg')
+    > PNG. Curingas (*/*, image/*) não contam: clientes antigos seguem em PNG.
+    """
+    fmt = (request.args.get("fmt") or "").strip().lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt in _IMAGE_MIMES:
+        return fmt
+    best, best_q = "png", 0.0
+    for mt, q in request.accept_mimetypes:
+        for name in ("webp", "jpeg"):
+            if mt == _IMAGE_MIMES[name] and q > best_q:
+                best, best_q = name, q
+    return best
+
+def _encode_pixmap(pix, fmt: str, quality: int) -> bytes:
+    if fmt == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=quality)
+    if fmt == "webp":
+        from PIL import Image
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        buf = io.BytesIO()
+        img.save(buf, "WEBP", quality=quality, method=4)
+        return buf.getvalue()
+    return pix.tobytes("png")
+
+def _tile_arg(name: str):
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return None
+    try:
+        return int(float(raw))
+    except ValueError:
+        raise BadRequest(f"Parâmetro {name} inválido.")
+
 @edit_bp.get("/api/edit/page-image/<session_id>/<int:page_number>")
-@limiter.limit("60 per minute")
+@limiter.limit("240 per minute")
 def api_edit_page_image(session_id, page_number: int):
+    """
+    Página renderizada para o editor.
+      ?scale=     zoom (pontos PDF -> px). Página inteira: até 4.0 e 4096 px/lado.
+      ?x,y,w,h=   tile em px na escala pedida (até EDIT_TILE_MAX_PX por lado);
+                  com tile a escala vai até 8.0, já que só a área visível é gerada.
+      ?fmt=, ?q=  png|webp|jpeg e qualidade 30..95; sem fmt, negocia via Accept.
+    Tiles na borda voltam recortados à página (w/h menores que o pedido).
+    """
     session_id = _safe_session_id(session_id)
 
     paths = _paths(session_id)
     if not os.path.exists(paths["cur"]):
         raise NotFound("Sessão não encontrada.")
 
+    tile = [_tile_arg(k) for k in ("x", "y", "w", "h")]
+    tiled = any(v is not None for v in tile)
+    if tiled:
+        if any(v is None for v in tile):
+            raise BadRequest("Tile exige x, y, w e h.")
+        max_tile = max(64, _env_int("EDIT_TILE_MAX_PX", 1024))
+        tx, ty, tw, th = tile
+        if tx < 0 or ty < 0 or not (0 < tw <= max_tile) or not (0 < th <= max_tile):
+            raise BadRequest(f"Tile inválido (lado máximo {max_tile} px).")
+
     try:
         scale = float(request.args.get("scale", "2.0") or 2.0)
     except Exception:
         scale = 2.0
-    scale = max(0.5, min(4.0, scale))
-
-    with fitz.open(paths["cur"]) as doc:
-        if page_number < 1 or page_number > doc.page_count:
-            raise NotFound("Página inválida.")
-        page = doc[page_number - 1]
+    scale = max(0.5, min(8.0 if tiled else 4.0, scale))
 
-        W, H = page.rect.width, page.rect.height
-        max_side = 4096.0
-        est_w = W * scale
-        est_h = H * scale
-        if est_w > max_side or est_h > max_side:
-            factor = min(max_side / est_w, max_side / est_h)
-            scale *= factor
-
-        mat = fitz.Matrix(scale, scale)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-
-        buf = io.BytesIO(pix.tobytes("png"))
-        buf.seek(0)
-        return send_file(buf, mimetype="image/png", max_age=0, conditional=True)
+    fmt = _negotiate_image_format()
+    try:
+        quality = int(request.args.get("q") or _env_int("EDIT_IMAGE_QUALITY", 80))
+    except ValueError:
+        raise BadRequest("Parâmetro q inválido.")
+    quality = max(30, min(95, quality))
+    variant = fmt if fmt == "png" else f"{fmt}{quality}"
+    tile_key = f"t{tx}_{ty}_{tw}_{th}" if tiled else "full"
+
+    # Cache por (versão do documento, página, escala, formato/qualidade, tile)
+    # + ETag forte: páginas inalteradas voltam 304 e o render acontece uma vez por versão.
+    version = edit_render_cache.doc_version(paths["cur"])
+    etag = edit_render_cache.etag_for(version, page_number, f"{scale:.2f}", variant, tile_key)
+    if request.if_none_match.contains(etag):
+        return _page_image_response(current_app.response_class(status=304), etag)
+
+    def _render() -> bytes:
+        if render_service.routes("edit"):
+            # pool compartilhado (pdfium): CPU previsível e documento já aberto no processo
+            clip = (tx / scale, ty / scale, (tx + tw) / scale, (ty + th) / scale) if tiled else None
+            return render_service.render(
+                paths["cur"], page_number, scale, fmt, quality=quality,
+                clip=clip, max_side=None if tiled else 4096,
+            )
+        with edit_doc_cache.borrow(session_id, paths["cur"]) as doc:
+            if page_number < 1 or page_number > doc.page_count:
+                raise NotFound("Página inválida.")
+            page = doc[page_number - 1]
+
+            W, H = page.rect.width, page.rect.height
+            eff = scale
+            clip = None
+            if tiled:
+                # clip em coordenadas de page.rect (já rotacionadas), recortado à página
+                clip = fitz.Rect(tx / eff, ty / eff, (tx + tw) / eff, (ty + th) / eff) & page.rect
+                if clip.is_empty:
+                    raise BadRequest("Tile fora da página.")
+            else:
+                max_side = 4096.0
+                est_w = W * eff
+                est_h = H * eff
+                if est_w > max_side or est_h > max_side:
+                    factor = min(max_side / est_w, max_side / est_h)
+                    eff *= factor
+
+            mat = fitz.Matrix(eff, eff)
+            pix = page.get_pixmap(matrix=mat, alpha=False, clip=clip)
+            return _encode_pixmap(pix, fmt, quality)
+
+    data, _hit = edit_render_cache.get_or_render(
+        paths["dir"], version, f"p{page_number}_s{scale:.2f}_{variant}_{tile_key}", fmt, _render
+    )
+    resp = current_app.response_class(data, mimetype=_IMAGE_MIMES[fmt])
+    return _page_image_response(resp, etag)
+
+def _page_image_response(resp, etag: str):
+    resp.set_etag(etag)
+    resp.vary.add("Accept")
+    # sempre revalida (a versão muda a cada edição), mas reaproveita via 304
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
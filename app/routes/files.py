@@ -0,0 +1,49 @@
+# app/routes/files.py
+# -*- coding: utf-8 -*-
+"""
+Depósito de documentos (/api/files): envia o PDF uma vez e usa o file_id
+nas ferramentas (campo 'file_id' no lugar de 'file'). Ver services/doc_store.
+"""
+from __future__ import annotations
+
+from flask import Blueprint, jsonify, request
+
+from .. import limiter
+from ..services import doc_store
+from ..utils.upload_stream import pdf_uploads_only
+
+files_bp = Blueprint("files_bp", __name__, url_prefix="/api/files")
+
+
+@files_bp.teardown_app_request
+def _close_stored_streams(exc=None):
+    doc_store.close_request_streams(exc)
+
+
+@files_bp.post("")
+@limiter.limit("20 per minute")
+@pdf_uploads_only
+def upload_file():
+    """multipart 'file' -> 201 {file_id, filename, pages, size, sha256, expires_in}"""
+    return jsonify(doc_store.put(request.files.get("file"))), 201
+
+
+@files_bp.get("/<file_id>")
+@limiter.limit("60 per minute")
+def file_info(file_id: str):
+    rec = doc_store.get(file_id)
+    return jsonify({
+        "file_id": file_id,
+        "filename": rec["filename"],
+        "pages": rec["pages"],
+        "size": rec["size"],
+        "sha256": rec["sha256"],
+        "expires_in": doc_store.ttl_seconds(),
+    })
+
+
+@files_bp.delete("/<file_id>")
+@limiter.limit("60 per minute")
+def delete_file(file_id: str):
+    doc_store.release_owned(file_id)
+    return "", 204
@@ -12,9 +12,11 @@ from flask import (
     render_template,
     current_app,
 )
-from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.exceptions import BadRequest, NotFound, RequestEntityTooLarge
 
 from .. import limiter
+from ..services.doc_store import request_file, request_files
+from ..utils.upload_stream import pdf_uploads_only
 from ..services.merge_service import merge_selected_pdfs
 from ..utils.preview_utils import preview_pdf
 from ..utils.config_utils import validate_upload  # compat múltiplas assinaturas
@@ -193,6 +195,7 @@ def merge_form():
 @merge_bp.route("", methods=["POST"])
 @merge_bp.route("/", methods=["POST"])
 @limiter.limit("10 per minute")
+@pdf_uploads_only
 def merge_api():
     """
     Recebe 'files' (>=2) NA ORDEM em que o front adicionou no FormData.
@@ -208,7 +211,7 @@ def merge_api():
     tmp_inputs = []
     output_path = None
     try:
-        files = request.files.getlist("files")
+        files = request_files("files")
         if not files or len(files) < 2:
             raise BadRequest("Envie ao menos 2 arquivos PDF.")
 
@@ -366,6 +369,9 @@ def merge_api():
     except RequestEntityTooLarge:
         cleanup_upload_files((*tmp_inputs, output_path), current_app.config["UPLOAD_FOLDER"])
         return jsonify({"error": "Arquivo muito grande (MAX_CONTENT_LENGTH)."}), 413
+    except NotFound as e:  # file_id inexistente/expirado
+        cleanup_upload_files((*tmp_inputs, output_path), current_app.config["UPLOAD_FOLDER"])
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         cleanup_upload_files((*tmp_inputs, output_path), current_app.config["UPLOAD_FOLDER"])
         return jsonify({"error": e.description or "Parâmetros inválidos."}), 422
@@ -377,12 +383,21 @@ def merge_api():
 
 @merge_bp.post("/preview")
 @limiter.limit("10 per minute")
+@pdf_uploads_only
 def preview_merge():
+    tmp_path = None
     try:
-        if "file" not in request.files:
+        up = request_file("file")  # upload ou 'file_id' do depósito
+        if up is None:
             return jsonify({"error": "Nenhum arquivo enviado."}), 400
-        thumbs = preview_pdf(request.files["file"])
-        return jsonify({"thumbnails": thumbs})
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf", dir=current_app.config["UPLOAD_FOLDER"])
+        os.close(fd)
+        up.save(tmp_path)
+        thumb = preview_pdf(tmp_path)
+        thumb_id = thumb["thumb_id"]
+        return jsonify({"thumbnails": {"thumb_id": thumb_id, "thumb_url": f"/api/preview/{thumb_id}.png"}})
+    except NotFound as e:  # file_id inexistente/expirado
+        return jsonify({"error": e.description or "Arquivo não encontrado."}), 404
     except BadRequest as e:
         return jsonify({"error": e.description or "Requisição inválida."}), 422
     except RequestEntityTooLarge:
@@ -390,3 +405,9 @@ def preview_merge():
     except Exception as exc:
         current_app.logger.error("[merge-preview] falha controlada: %s", type(exc).__name__)
         return jsonify({"error": "Falha ao gerar preview."}), 500
+    finally:
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -3,11 +3,17 @@
 from __future__ import annotations
 
 import os
-from flask import Blueprint, request, jsonify, send_file, after_this_request
-from werkzeug.exceptions import BadRequest
+import uuid
+from flask import Blueprint, request, jsonify, send_file, after_this_request, current_app, url_for
+from werkzeug.exceptions import BadRequest, NotFound
 
 from .. import limiter
+from ..services.doc_store import request_file
+from ..utils.upload_stream import pdf_uploads_only
+from ..services import ocr_jobs
 from ..services.ocr_service import ocr_upload_file
+from ..utils.config_utils import validate_upload, ensure_upload_folder_exists
+from ..utils.security import current_output_owner_id, get_or_create_output_owner_id
 
 ocr_bp = Blueprint("ocr", __name__, url_prefix="/api/ocr")
 
@@ -16,25 +22,7 @@ def _b(v, default=False):
         return default
     return str(v).strip().lower() in {"1", "true", "yes", "on"}
 
-@ocr_bp.route("", methods=["POST"])
-@ocr_bp.route("/", methods=["POST"])
-@limiter.limit("5 per minute")
-def ocr_endpoint():
-    """
-    multipart/form-data:
-      - file (PDF)
-      - lang (opcional, ex. "por+eng")
-      - force (bool) — força OCR mesmo se já tiver texto
-      - skip_text (bool) — ignora páginas com texto (padrão: true)
-      - optimize (0..3) — nível de otimização (padrão: 2)
-      - deskew (bool, padrão true), rotate_pages (bool, padrão true), clean (bool, padrão true)
-      - jobs (int opcional), timeout (int segundos opcional), mem_mb (int opcional)
-    Retorna: PDF OCR inline
-    """
-    f = request.files.get("file")
-    if not f or not f.filename:
-        raise BadRequest("Envie um PDF em 'file'.")
-
+def _form_options() -> dict:
     lang   = (request.form.get("lang") or "").strip() or None
     force  = _b(request.form.get("force"), False)
     skip_t = _b(request.form.get("skip_text"), True)
@@ -54,12 +42,34 @@ def ocr_endpoint():
     except Exception:
         raise BadRequest("Parâmetros numéricos inválidos (jobs/timeout/mem_mb).")
 
-    out_path = ocr_upload_file(
-        f, lang=lang, force=force, skip_text=skip_t, optimize=optimize,
+    return dict(
+        lang=lang, force=force, skip_text=skip_t, optimize=optimize,
         deskew=deskew, rotate_pages=rotate, clean=clean,
         jobs=jobs, timeout=timeout, mem_mb=mem_mb,
     )
 
+@ocr_bp.route("", methods=["POST"])
+@ocr_bp.route("/", methods=["POST"])
+@limiter.limit("5 per minute")
+@pdf_uploads_only
+def ocr_endpoint():
+    """
+    multipart/form-data:
+      - file (PDF)
+      - lang (opcional, ex. "por+eng")
+      - force (bool) — força OCR mesmo se já tiver texto
+      - skip_text (bool) — ignora páginas com texto (padrão: true)
+      - optimize (0..3) — nível de otimização (padrão: 2)
+      - deskew (bool, padrão true), rotate_pages (bool, padrão true), clean (bool, padrão true)
+      - jobs (int opcional), timeout (int segundos opcional), mem_mb (int opcional)
+    Retorna: PDF OCR inline
+    """
+    f = request_file("file")
+    if not f or not f.filename:
+        raise BadRequest("Envie um PDF em 'file'.")
+
+    out_path = ocr_upload_file(f, **_form_options())
+
     @after_this_request
     def _cleanup(resp):
         try:
@@ -78,6 +88,91 @@ def ocr_endpoint():
         max_age=0
     )
 
+# ---------- modo assíncrono ----------
+def _job_urls(job_id: str) -> dict:
+    return {
+        "job_id": job_id,
+        "status_url": url_for("ocr.ocr_job_status", job_id=job_id),
+        "result_url": url_for("ocr.ocr_job_result", job_id=job_id),
+    }
+
+@ocr_bp.post("/jobs")
+@limiter.limit("5 per minute")
+@pdf_uploads_only
+def ocr_job_submit():
+    """
+    Mesmo formulário de POST /api/ocr, mas só enfileira e devolve 202 + job_id.
+    Acompanhe em GET /api/ocr/jobs/<id> e baixe em GET /api/ocr/jobs/<id>/result.
+    """
+    f = request_file("file")
+    if not f or not f.filename:
+        raise BadRequest("Envie um PDF em 'file'.")
+    try:
+        validate_upload(f, {"pdf"})
+    except ValueError as e:
+        raise BadRequest(str(e))
+    options = _form_options()
+
+    upload_dir = current_app.config["UPLOAD_FOLDER"]
+    ensure_upload_folder_exists(upload_dir)
+    tmp = os.path.join(upload_dir, f"ocrjob_{uuid.uuid4().hex}.pdf")
+    f.save(tmp)
+    try:
+        job_id = ocr_jobs.submit_job(tmp, options=options, owner=get_or_create_output_owner_id(), move=True)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return jsonify(_job_urls(job_id)), 202
+
+def _owned_status(job_id: str):
+    """Status do job só para a sessão que o criou (senão None -> 404)."""
+    owner = current_output_owner_id()
+    if not owner or not ocr_jobs.is_valid_job_id(job_id):
+        return None
+    return ocr_jobs.get_status(job_id, owner=owner)
+
+@ocr_bp.get("/jobs/<job_id>")
+@limiter.exempt
+def ocr_job_status(job_id):
+    status = _owned_status(job_id)
+    if status is None:
+        raise NotFound("Job não encontrado.")
+    if status["state"] in ("queued", "running"):
+        ocr_jobs.ensure_workers()  # reanima a fila após restart do worker
+    status.update(_job_urls(job_id))
+    resp = jsonify(status)
+    resp.headers["Cache-Control"] = "no-store"
+    if status["state"] in ("queued", "running"):
+        resp.headers["Retry-After"] = "2"
+    return resp
+
+@ocr_bp.get("/jobs/<job_id>/result")
+def ocr_job_result(job_id):
+    status = _owned_status(job_id)
+    if status is None:
+        raise NotFound("Job não encontrado.")
+    if status["state"] == "failed":
+        return jsonify({"error": status["error"] or "OCR falhou.", "state": "failed"}), 422
+    if status["state"] == "conflict":
+        return jsonify({"error": status["error"], "state": "conflict"}), 409
+    path = ocr_jobs.result_path(job_id, owner=current_output_owner_id())
+    if not path and status["state"] == "done":
+        # resultado aplicado direto no destino (ex.: sessão do editor)
+        raise NotFound("Resultado não disponível para download.")
+    if not path:
+        resp = jsonify({"state": status["state"], "progress": status["progress"]})
+        resp.status_code = 409
+        resp.headers["Retry-After"] = "2"
+        return resp
+    return send_file(
+        path,
+        mimetype="application/pdf",
+        as_attachment=False,
+        download_name="ocr.pdf",
+        conditional=True,
+        max_age=0
+    )
+
 @ocr_bp.get("/options")
 def ocr_options():
     """Retorna defaults úteis para o front exibir."""
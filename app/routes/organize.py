@@ -5,6 +5,8 @@ from flask import (
 )
 from werkzeug.exceptions import BadRequest
 from .. import limiter
+from ..services.doc_store import request_file
+from ..utils.upload_stream import pdf_uploads_only
 from ..services.organize_service import organize_pdf_service
 
 organize_bp = Blueprint("organize", __name__)
@@ -18,6 +20,7 @@ def page_organize():
 
 @organize_bp.post("/api/organize")
 @limiter.limit("10 per minute")  # herda default; explícito aqui
+@pdf_uploads_only
 def api_organize():
     """
     Espera multipart/form-data:
@@ -25,10 +28,9 @@ def api_organize():
       - pages: JSON string de lista 1-based (ex.: [3,1,2])
       - rotations: JSON string de dict opcional {"3":90}
     """
-    if "file" not in request.files:
-        raise BadRequest("Envie o arquivo PDF em 'file'.")
-
-    pdf_file = request.files["file"]
+    pdf_file = request_file("file")
+    if pdf_file is None:
+        raise BadRequest("Envie o arquivo PDF em 'file' (ou 'file_id').")
 
     pages_raw = request.form.get("pages")
     rotations_raw = request.form.get("rotations", "{}")
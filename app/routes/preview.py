@@ -8,8 +8,19 @@ from flask import Blueprint, request, jsonify, send_file, current_app, abort
 from werkzeug.exceptions import BadRequest
 
 from .. import limiter
+from ..services.doc_store import request_file
+from ..utils.upload_stream import pdf_uploads_only
 from ..utils.config_utils import validate_upload, sanitize_filename
-from ..utils.preview_utils import preview_pdf, THUMBS_SUBDIR
+from ..utils import thumb_cache
+from ..utils.preview_utils import (
+    preview_pdf,
+    preview_sprites,
+    load_sprite_index,
+    sprite_dir,
+    THUMBS_SUBDIR,
+    SPRITE_FORMATS,
+    SPRITE_ID_RE,
+)
 
 preview_bp = Blueprint("preview", __name__, url_prefix="/api/preview")
 SAFE_NAME_RE = re.compile(r"^[a-f0-9]{16,64}$")
@@ -90,12 +101,13 @@ def _validate_pdf_upload(file_storage):
 @preview_bp.route("", methods=["POST"])
 @preview_bp.route("/", methods=["POST"])
 @limiter.limit("20 per minute")
+@pdf_uploads_only
 def create_preview():
     """
     Recebe um PDF (campo 'file') e retorna:
       { "thumb_url": "/api/preview/<thumb_id>.png", "thumb_id": "<hash>" }
     """
-    file = request.files.get("file")
+    file = request_file("file")
     if not file:
         raise BadRequest("Arquivo não enviado (campo 'file').")
 
@@ -147,4 +159,94 @@ def get_preview(thumb_id: str):
         pass
     resp.headers["X-Content-Type-Options"] = "nosniff"
     resp.headers["Content-Disposition"] = f'inline; filename="{thumb_id}.png"'
-    return resp
\ No newline at end of file
+    return resp
+
+def _sprite_payload(index: dict) -> dict:
+    sprite_id = index["sprite_id"]
+    return {
+        **index,
+        "sheet_urls": [
+            f"/api/preview/sprites/{sprite_id}/{n}.{index['format']}" for n in range(int(index["sheets"]))
+        ],
+    }
+
+
+def _immutable(resp):
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 86400 * 30
+    try:
+        resp.cache_control.immutable = True
+    except Exception:
+        pass
+    resp.headers["X-Content-Type-Options"] = "nosniff"
+    return resp
+
+
+@preview_bp.route("/sprites", methods=["POST"])
+@limiter.limit("20 per minute")
+@pdf_uploads_only
+def create_sprites():
+    """
+    Recebe um PDF (campo 'file'; opcionais 'width' e 'format' webp|jpeg) e
+    retorna o índice das miniaturas de TODAS as páginas em sprite sheets:
+      { sprite_id, pages, width, format, sheets, sheet_urls: [...],
+        index: [{page, sheet, x, y, w, h}, ...] }
+    O resultado é cacheado pelo hash do conteúdo (reenviar o mesmo PDF não
+    renderiza de novo).
+    """
+    file = request_file("file")
+    if not file:
+        raise BadRequest("Arquivo não enviado (campo 'file').")
+
+    _validate_pdf_upload(file)
+
+    tmp_path = os.path.join(_tmp_previews_dir(), f"{uuid.uuid4().hex}.pdf")
+    file.save(tmp_path)
+    try:
+        index = preview_sprites(
+            tmp_path,
+            width=request.form.get("width"),
+            fmt=request.form.get("format"),
+        )
+    except BadRequest:
+        raise
+    except Exception:
+        current_app.logger.exception("[preview] falha ao gerar sprites")
+        raise BadRequest("Falha ao gerar miniaturas.")
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    return jsonify(_sprite_payload(index))
+
+
+@preview_bp.route("/sprites/<sprite_id>.json", methods=["GET"])
+@limiter.limit("60 per minute")
+def get_sprite_index(sprite_id: str):
+    """Índice de um sprite já gerado (imutável: o id é derivado do conteúdo)."""
+    if not SPRITE_ID_RE.match(sprite_id):
+        abort(400)
+    index = load_sprite_index(sprite_id)
+    if index is None:
+        abort(404)
+    return _immutable(jsonify(_sprite_payload(index)))
+
+
+@preview_bp.route("/sprites/<sprite_id>/<int:sheet>.<ext>", methods=["GET"])
+@limiter.limit("120 per minute")
+def get_sprite_sheet(sprite_id: str, sheet: int, ext: str):
+    """Serve uma folha do sprite com cache público e imutável."""
+    match = SPRITE_ID_RE.match(sprite_id)
+    if not match or match.group(1) != ext:
+        abort(400)
+
+    path = os.path.join(sprite_dir(sprite_id), f"{sheet}.{ext}")
+    if not os.path.exists(path):
+        abort(404)
+    thumb_cache.touch(os.path.join(sprite_dir(sprite_id), "index.json"))  # LRU
+
+    resp = send_file(path, mimetype=SPRITE_FORMATS[ext][1], conditional=True, max_age=86400 * 30)
+    resp.headers["Content-Disposition"] = f'inline; filename="{sprite_id}-{sheet}.{ext}"'
+    return _immutable(resp)
@@ -1,22 +1,27 @@
 # app/routes/split.py
 # -*- coding: utf-8 -*-
 import os
-import uuid
 import json
-import zipfile
+import tempfile
 from flask import (
-    Blueprint, request, jsonify, send_file,
-    render_template, current_app
+    Blueprint, Response, request, jsonify, send_file,
+    render_template, current_app, stream_with_context
 )
-from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
-from ..services.split_service import dividir_pdf
+from werkzeug.exceptions import BadRequest, NotFound, RequestEntityTooLarge
+from ..services.split_service import dividir_pdf, dividir_pdf_streaming
 from ..utils.preview_utils import preview_pdf
 from ..utils.pdf_utils import cleanup_upload_files, register_response_file_cleanup
+from ..utils.zip_stream import iter_zip
 from .. import limiter
+from ..services.doc_store import request_file
+from ..utils.upload_stream import pdf_uploads_only
 from ..utils.stats import record_job_event  # (7.1) métricas
 
 split_bp = Blueprint("split", __name__, url_prefix="/api/split")
 
+# entrada extra do ZIP quando alguma parte (modo 'size') ficou acima de max_mb
+EXCEDENTES_ARCNAME = "partes_acima_do_limite.json"
+
 
 # ------------------------ helpers ------------------------
 
@@ -191,14 +196,14 @@ def _parse_mods(raw):
 @split_bp.route("", methods=["POST"])
 @split_bp.route("/", methods=["POST"])
 @limiter.limit("5 per minute")
+@pdf_uploads_only
 def split():
     upload_folder = current_app.config["UPLOAD_FOLDER"]
     pdf_paths = []
-    zip_path = None
     try:
-        if "file" not in request.files:
+        file = request_file("file")
+        if file is None:
             return _json_error("Nenhum arquivo enviado.", 400)
-        file = request.files["file"]
         if not file.filename:
             return _json_error("Nenhum arquivo selecionado.", 400)
 
@@ -209,15 +214,15 @@ def split():
             request.form.get("modificacoes") or request.form.get("modifications")
         )
 
-        pdf_paths = dividir_pdf(
-            file,
-            pages=pages,
-            rotations=rotations,
-            modificacoes=modificacoes,
-        )
-
-        # Com pages -> único PDF; Sem pages -> ZIP contendo 1 PDF por página
+        # Com pages -> único PDF; Sem pages -> ZIP (em streaming) com as partes do
+        # modo pedido: 1 PDF por página (padrão), blocos, faixas, marcadores ou tamanho
         if pages:
+            pdf_paths = dividir_pdf(
+                file,
+                pages=pages,
+                rotations=rotations,
+                modificacoes=modificacoes,
+            )
             output_path = pdf_paths[0]
 
             # ===== (7.1) MÉTRICAS =====
@@ -252,55 +257,91 @@ def split():
             )
             return response
 
-        # ZIP
-        zip_filename = f"{uuid.uuid4().hex}.zip"
-        zip_path = os.path.join(upload_folder, zip_filename)
-        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
-            for path in pdf_paths:
-                zipf.write(path, os.path.basename(path))
-        files_out = len(pdf_paths)
-        cleanup_upload_files(pdf_paths, upload_folder)
-        pdf_paths = []
-
-        # ===== (7.1) MÉTRICAS =====
-        try:
-            bytes_out = os.path.getsize(zip_path) if os.path.exists(zip_path) else None
-        except Exception:
-            bytes_out = None
+        # ZIP em streaming: validação/sanitização acontecem aqui (erros ainda
+        # viram JSON); as páginas são escritas e enviadas uma a uma, entradas
+        # PDF vão STORED e o ZIP completo nunca é gravado em disco.
+        job = dividir_pdf_streaming(
+            file,
+            rotations=rotations,
+            modificacoes=modificacoes,
+            modo=(request.form.get("mode") or "pages").strip().lower(),
+            chunk_size=request.form.get("chunk_size"),
+            ranges=request.form.get("ranges"),
+            max_mb=request.form.get("max_mb"),
+        )
         try:
             bytes_in = int(request.content_length) if request.content_length else None
         except Exception:
             bytes_in = None
-        try:
-            record_job_event(
-                route="/api/split",
-                action="split",
-                bytes_in=bytes_in,
-                bytes_out=bytes_out,
-                files_out=files_out,
-            )
-        except Exception:
-            pass
-        # ===========================
-
-        response = send_file(
-            zip_path,
-            as_attachment=True,
-            download_name="paginas_divididas.zip",
-            mimetype="application/zip",
-        )
-        register_response_file_cleanup(
-            response, (zip_path,), upload_folder
-        )
+
+        def _generate():
+            pending = []
+            sent = 0
+            files_out = 0
+            ok = False
+
+            def _entries():
+                for path in job:
+                    pending.append(path)
+                    yield path, os.path.basename(path)
+                # modo 'size': páginas que sozinhas passam de max_mb são avisadas no próprio ZIP
+                relatorio = job.relatorio_excedentes()
+                if relatorio:
+                    fd, path = tempfile.mkstemp(suffix=".json", dir=upload_folder)
+                    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                        json.dump(relatorio, fh, ensure_ascii=False, indent=2)
+                    pending.append(path)
+                    yield path, EXCEDENTES_ARCNAME
+
+            def _added(path):
+                nonlocal files_out
+                files_out += 1
+                cleanup_upload_files((path,), upload_folder)
+                if path in pending:
+                    pending.remove(path)
+
+            try:
+                for chunk in iter_zip(_entries(), on_added=_added):
+                    sent += len(chunk)
+                    yield chunk
+                ok = True
+            except Exception as exc:
+                # cabeçalhos já foram enviados: só resta encerrar o stream
+                current_app.logger.error(
+                    "[split] falha durante o streaming: %s", type(exc).__name__
+                )
+            finally:
+                job.close()
+                cleanup_upload_files(pending, upload_folder)
+                # ===== (7.1) MÉTRICAS =====
+                try:
+                    record_job_event(
+                        route="/api/split",
+                        action="split",
+                        bytes_in=bytes_in,
+                        bytes_out=sent,
+                        files_out=files_out,
+                        ok=ok,
+                    )
+                except Exception:
+                    pass
+                # ===========================
+
+        response = Response(stream_with_context(_generate()), mimetype="application/zip")
+        response.headers["Content-Disposition"] = 'attachment; filename="paginas_divididas.zip"'
+        response.headers["Cache-Control"] = "no-store"
+        response.headers["X-Accel-Buffering"] = "no"  # proxies (nginx) não devem segurar o stream
         return response
 
     except RequestEntityTooLarge:
         return _json_error("Arquivo muito grande (MAX_CONTENT_LENGTH).", 413)
+    except NotFound as e:  # file_id inexistente/expirado
+        return _json_error(e.description or "Arquivo não encontrado.", 404)
     except BadRequest as e:
         return _json_error(e.description or "Requisição inválida.", 422)
     except Exception as exc:
         current_app.logger.error("[split] falha controlada: %s", type(exc).__name__)
-        cleanup_upload_files((zip_path, *pdf_paths), upload_folder)
+        cleanup_upload_files(pdf_paths, upload_folder)
         return _json_error("Falha ao dividir o PDF.", 500)
 
 
@@ -311,13 +352,16 @@ def split_form():
 
 
 @split_bp.post("/preview")
+@pdf_uploads_only
 def preview_split():
     try:
-        if "file" not in request.files:
+        file = request_file("file")
+        if file is None:
             return _json_error("Nenhum arquivo enviado.", 400)
-        file = request.files["file"]
         thumbs = preview_pdf(file)
         return jsonify({"thumbnails": thumbs})
+    except NotFound as e:
+        return _json_error(e.description or "Arquivo não encontrado.", 404)
     except BadRequest as e:
         return _json_error(e.description or "Requisição inválida.", 422)
     except RequestEntityTooLarge:
@@ -122,22 +122,21 @@ def _get_gs_cmd() -> str:
 
     _gs_log.info('[gs-resolve] binário=ghostscript fonte=%s', source)
 
-    # Loga a versão do GS para diagnóstico de ambiente (sem dados de usuário).
+    # Versão vem do registro de capacidades (sondado no start), sem subprocesso aqui.
     try:
-        ver_result = subprocess.run(
-            [_GS_CMD_CACHE, '--version'],
-            capture_output=True, text=True, timeout=5,
-        )
-        gs_version = ver_result.stdout.strip() or ver_result.stderr.strip() or '?'
-        _gs_log.info('[gs-resolve] versão=%s', gs_version)
-    except Exception as _ver_err:
-        _gs_log.warning('[gs-resolve] não foi possível obter versão do GS: %s', type(_ver_err).__name__)
+        from app.utils import capabilities
+        gs_info = capabilities.tool('gs')
+        if gs_info.get('path') == _GS_CMD_CACHE and gs_info.get('version'):
+            _gs_log.info('[gs-resolve] versão=%s', gs_info['version'])
+    except Exception as _caps_err:
+        _gs_log.debug('[gs-resolve] registro de capacidades indisponível: %s', type(_caps_err).__name__)
 
     return _GS_CMD_CACHE
 
 
 def _get_qpdf_cmd():
-    return shutil.which('qpdf')
+    from app.utils import capabilities
+    return capabilities.tool_path('qpdf')
 
 
 # ── Helpers de diagnóstico de comando ─────────────────────────────────────────
@@ -82,6 +82,7 @@ def _unique_out_path(out_dir: str, base: str, ext: str) -> str:
 #   IMG2PDF_LANDSCAPE_AUTO=1|0 (default 1) → paisagem automática se imagem deitada
 #   IMG2PDF_DPI=300                        → usado no fallback PIL
 #   IMG2PDF_PAGE_SIZE=A4|LETTER            → força tamanho; default A4
+#   IMG2PDF_JPEG_PASSTHROUGH=1|0 (default 1) → JPEG baseline embutido sem recodificar
 # ======================================================================
 def _apply_exif(img: Image.Image) -> Image.Image:
     """Aplica rotação EXIF (se houver) antes de qualquer conversão/resize."""
@@ -90,6 +91,96 @@ def _apply_exif(img: Image.Image) -> Image.Image:
     except Exception:
         return img
 
+def _iter_rgb_frames(im: Image.Image):
+    """Frames (TIFF multipáginas etc.) um por vez, já com EXIF aplicado e em RGB."""
+    n = int(getattr(im, "n_frames", 1) or 1)
+    for i in range(n):
+        try:
+            im.seek(i)
+        except EOFError:
+            break
+        yield _apply_exif(im.copy()).convert("RGB")
+
+def _img2pdf_layout(iw: float, ih: float, base_size: Tuple[float, float], *,
+                    mode: str, margin: float, auto_land: bool):
+    """Página (PW, PH) e caixa (x, y, w, h) da imagem já na orientação de exibição."""
+    PW, PH = base_size
+    if auto_land and iw > ih * 1.05:
+        PW, PH = PH, PW
+    max_w, max_h = PW - 2*margin, PH - 2*margin
+    scale = max(max_w / iw, max_h / ih) if mode == "cover" else min(max_w / iw, max_h / ih)
+    tw, th = iw * scale, ih * scale
+    return (PW, PH), ((PW - tw) / 2.0, (PH - th) / 2.0, tw, th)
+
+# Matriz (a, b, c, d, e, f) que leva o quadrado unitário da imagem gravada no
+# JPEG para a orientação de exibição indicada pela tag EXIF 0x0112.
+_EXIF_ORIENTATION_CM = {
+    1: (1, 0, 0, 1, 0, 0),
+    2: (-1, 0, 0, 1, 1, 0),    # espelho horizontal
+    3: (-1, 0, 0, -1, 1, 1),   # 180°
+    4: (1, 0, 0, -1, 0, 1),    # espelho vertical
+    5: (0, -1, -1, 0, 1, 1),   # transpose
+    6: (0, -1, 1, 0, 0, 1),    # 90° horário
+    7: (0, 1, 1, 0, 0, 0),     # transverse
+    8: (0, 1, -1, 0, 1, 0),    # 90° anti-horário
+}
+
+def _jpeg_passthrough_info(in_path: str) -> Optional[Tuple[int, int, str, int]]:
+    """
+    (largura, altura, espaço de cor, orientação EXIF) quando o arquivo é um JPEG
+    baseline RGB/cinza que pode ir para o PDF como /DCTDecode sem decodificar.
+    Só lê o cabeçalho (Image.open é preguiçoso).
+    """
+    with Image.open(in_path) as im:
+        if im.format != "JPEG" or im.mode not in ("RGB", "L"):
+            return None
+        if im.info.get("progressive") or im.info.get("progression"):
+            return None
+        try:
+            orientation = int(im.getexif().get(0x0112, 1) or 1)
+        except Exception:
+            orientation = 1
+        if orientation not in _EXIF_ORIENTATION_CM:
+            orientation = 1
+        cs = "/DeviceRGB" if im.mode == "RGB" else "/DeviceGray"
+        return im.width, im.height, cs, orientation
+
+def _jpeg_to_pdf_passthrough(in_path: str, out_path: str, base_size: Tuple[float, float], *,
+                             mode: str, margin: float, auto_land: bool) -> bool:
+    """
+    Embute o fluxo DCT original numa página A4/Letter: zero decodificação e zero
+    recompressão. A orientação EXIF vira a matriz de posicionamento (cm).
+    Retorna False se o arquivo não se qualifica.
+    """
+    info = _jpeg_passthrough_info(in_path)
+    if info is None:
+        return False
+    import pikepdf
+
+    iw, ih, cs, orientation = info
+    dw, dh = (ih, iw) if orientation >= 5 else (iw, ih)
+    (PW, PH), (x, y, tw, th) = _img2pdf_layout(dw, dh, base_size, mode=mode,
+                                               margin=margin, auto_land=auto_land)
+    a, b, c, d, e, f = _EXIF_ORIENTATION_CM[orientation]
+    cm = (tw*a, th*b, tw*c, th*d, x + tw*e, y + th*f)
+
+    with open(in_path, "rb") as fh:
+        data = fh.read()
+    with pikepdf.new() as pdf:
+        image = pikepdf.Stream(pdf, b"")
+        image.write(data, filter=pikepdf.Name.DCTDecode)
+        image.Type = pikepdf.Name.XObject
+        image.Subtype = pikepdf.Name.Image
+        image.Width, image.Height = iw, ih
+        image.ColorSpace = pikepdf.Name(cs)
+        image.BitsPerComponent = 8
+        page = pdf.add_blank_page(page_size=(PW, PH))
+        page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+        ops = " ".join(f"{v:.4f}" for v in cm)
+        page.Contents = pdf.make_stream(f"q {ops} cm /Im0 Do Q".encode("ascii"))
+        pdf.save(out_path)
+    return True
+
 def _image_to_pdf(in_path: str, out_path: str) -> None:
     mode = (os.environ.get("IMG2PDF_MODE", "fit") or "fit").lower()
     margin = float(os.environ.get("IMG2PDF_MARGIN_PT", "18"))
@@ -97,42 +188,31 @@ def _image_to_pdf(in_path: str, out_path: str) -> None:
     page_size_name = (os.environ.get("IMG2PDF_PAGE_SIZE", "A4") or "A4").upper()
     base_w_pt, base_h_pt = SIZES_PT.get(page_size_name, SIZES_PT["A4"])
 
+    # Foto de celular (caso comum): JPEG vai direto para o PDF, sem decodificar
+    if os.environ.get("IMG2PDF_JPEG_PASSTHROUGH", "1") == "1":
+        try:
+            if _jpeg_to_pdf_passthrough(in_path, out_path, (base_w_pt, base_h_pt),
+                                        mode=mode, margin=margin, auto_land=auto_land):
+                return
+        except Exception as e:
+            logger.debug("JPEG passthrough falhou (%s); recodificando.", e)
+
     # Tenta ReportLab (precisão A4/Letter garantida)
     try:
         from reportlab.pdfgen import canvas as _rl_canvas
-        from reportlab.lib.pagesizes import A4 as _A4, LETTER as _LETTER, landscape as _landscape
+        from reportlab.lib.pagesizes import A4 as _A4, LETTER as _LETTER
         from reportlab.lib.utils import ImageReader
 
         size_map = {"A4": _A4, "LETTER": _LETTER}
         base_size = size_map.get(page_size_name, _A4)
 
         im = Image.open(in_path)
-        frames: List[Image.Image] = []
-        try:
-            # coleta frames (TIFF multipáginas etc.)
-            i = 0
-            while True:
-                im.seek(i)
-                fr = _apply_exif(im.copy())
-                frames.append(fr.convert("RGB"))
-                i += 1
-        except EOFError:
-            pass
-        if not frames:
-            frames = [_apply_exif(im.copy()).convert("RGB")]
-
         c: Optional[_rl_canvas.Canvas] = None
-        for f in frames:
-            iw, ih = f.size
-            pagesize = base_size
-            if auto_land and iw > ih * 1.05:
-                pagesize = _landscape(base_size)
-            PW, PH = pagesize
-
-            max_w, max_h = PW - 2*margin, PH - 2*margin
-            scale = max(max_w / iw, max_h / ih) if mode == "cover" else min(max_w / iw, max_h / ih)
-            tw, th = iw * scale, ih * scale
-            x, y = (PW - tw) / 2.0, (PH - th) / 2.0
+        # frames (TIFF multipáginas etc.) um por vez: só um decodificado na memória
+        for f in _iter_rgb_frames(im):
+            pagesize, (x, y, tw, th) = _img2pdf_layout(
+                f.width, f.height, base_size, mode=mode, margin=margin, auto_land=auto_land
+            )
 
             # trata transparência para fundo branco
             if f.mode in ("RGBA", "LA", "P"):
@@ -170,20 +250,7 @@ def _image_to_pdf(in_path: str, out_path: str) -> None:
     im = Image.open(in_path)
     pages: List[Image.Image] = []
     try:
-        frames: List[Image.Image] = []
-        try:
-            i = 0
-            while True:
-                im.seek(i)
-                frm = _apply_exif(im.copy()).convert("RGB")
-                frames.append(frm)
-                i += 1
-        except EOFError:
-            pass
-        if not frames:
-            frames = [_apply_exif(im.copy()).convert("RGB")]
-
-        for f in frames:
+        for f in _iter_rgb_frames(im):
             # auto paisagem
             W, H = (base_w_px, base_h_px)
             if auto_land and f.width > f.height * 1.05:
@@ -223,8 +290,15 @@ def _soffice_bin() -> str:
       3. shutil.which("soffice") / shutil.which("soffice.com") / shutil.which("libreoffice")
       4. Caminhos fixos comuns no Windows
     Levanta RuntimeError com mensagem clara se não encontrar.
+    Usa o registro de capacidades (sondado no start); só refaz a busca se ele
+    não encontrou nada.
     """
     import shutil as _sh
+    from ..utils import capabilities
+
+    cached = capabilities.tool_path("soffice")
+    if cached and os.path.isfile(cached):
+        return cached
 
     # 1. Variáveis de ambiente explícitas
     from_env = os.environ.get('SOFFICE_BIN') or os.environ.get('LIBREOFFICE_BIN')
@@ -314,41 +388,122 @@ def _prepare_camelot_env() -> None:
         raise RuntimeError("OpenCV não encontrado (pip install opencv-python-headless).") from e
 
 def _bin_exists(bin_name: str) -> bool:
+    from ..utils import capabilities
+    if capabilities.is_known_tool(bin_name):
+        return capabilities.has(bin_name)
     from shutil import which
     return which(bin_name) is not None
 
 # ---------------- OCR helper ----------------
-def _pdf_has_selectable_text(in_pdf: str) -> bool:
-    try:
-        import pdfplumber
-        with pdfplumber.open(in_pdf) as pdf:
-            for page in pdf.pages:
-                if (page.chars or []) or (page.extract_text() or "").strip():
+_TEXT_SHOW_OPS = "Tj TJ ' \""
+
+def _content_has_text(container, depth: int = 0) -> bool:
+    """True se o content stream (ou um Form XObject usado por ele) mostra texto."""
+    import pikepdf
+    for operands, _op in pikepdf.parse_content_stream(container, _TEXT_SHOW_OPS):
+        for operand in operands:
+            items = operand if isinstance(operand, pikepdf.Array) else [operand]
+            for item in items:
+                if isinstance(item, pikepdf.String) and bytes(item).strip():
                     return True
-    except Exception:
-        pass
+    if depth >= 4:
+        return False
+    resources = container.get("/Resources") if hasattr(container, "get") else None
+    xobjects = resources.get("/XObject") if resources is not None else None
+    if xobjects is None:
+        return False
+    for _name, xobj in xobjects.items():
+        if xobj.get("/Subtype") == "/Form" and _content_has_text(xobj, depth + 1):
+            return True
     return False
 
-def _try_ocr(in_pdf: str) -> str:
-    if os.environ.get("OCR_ON_PDF_TO_XLSX","0") != "1":
-        return in_pdf
-    if not _bin_exists("ocrmypdf"):
+def _page_text_index(in_pdf: str) -> List[bool]:
+    """
+    Índice por página: a página tem camada de texto? Lido direto dos content
+    streams (operadores Tj/TJ/'/"), sem layout do pdfplumber nem rasterização.
+    """
+    import pikepdf
+    index: List[bool] = []
+    with pikepdf.open(in_pdf) as pdf:
+        for page in pdf.pages:
+            try:
+                index.append(_content_has_text(page.obj))
+            except Exception:
+                index.append(True)  # na dúvida, não gasta OCR
+    return index
+
+def _ocr_enabled() -> bool:
+    return os.environ.get("OCR_ON_PDF_TO_XLSX","0") == "1" and _bin_exists("ocrmypdf")
+
+def _try_ocr(in_pdf: str, pages: Optional[List[int]] = None) -> str:
+    """
+    OCR só das páginas indicadas (0-based; None = todas). As páginas sem texto
+    são extraídas para um PDF à parte, passam pelo ocrmypdf e voltam para a
+    mesma posição no documento original.
+    """
+    if not _ocr_enabled():
         return in_pdf
     enforce_pdf_page_limit(in_pdf, label="PDF para OCR")
-    out_pdf = _tmp_out_path("pdf")
+    import pikepdf
+
     ocr_lang = os.environ.get("OCR_LANGS","por+eng")
     ocr_timeout = int(os.environ.get("OCR_TIMEOUT_SEC","300"))
-    cmd = ["ocrmypdf","--skip-text","--force-ocr","--rotate-pages",
-           "--tesseract-timeout","60","-l",ocr_lang,in_pdf,out_pdf]
+    ocr_mem_mb = int(os.environ.get("OCR_MEM_MB","1024"))
+    subset_in, subset_out, out_pdf = _tmp_out_path("pdf"), _tmp_out_path("pdf"), _tmp_out_path("pdf")
     try:
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       check=True, timeout=ocr_timeout)
-        if os.path.exists(out_pdf) and os.path.getsize(out_pdf) > 0:
-            return out_pdf
-    except Exception:
+        with pikepdf.open(in_pdf) as src:
+            targets = list(range(len(src.pages))) if pages is None else sorted(set(pages))
+            if not targets:
+                raise RuntimeError("nenhuma página para OCR")
+            with pikepdf.new() as subset:
+                for i in targets:
+                    subset.pages.append(src.pages[i])
+                subset.save(subset_in)
+
+            cmd = ["ocrmypdf","--skip-text","--rotate-pages",
+                   "--tesseract-timeout","60","-l",ocr_lang,subset_in,subset_out]
+            proc = run_in_sandbox(cmd, timeout=ocr_timeout, cpu_seconds=ocr_timeout, mem_mb=ocr_mem_mb)
+            if proc.returncode != 0 or not os.path.exists(subset_out) or os.path.getsize(subset_out) == 0:
+                raise RuntimeError((proc.stderr or "")[-300:])
+
+            with pikepdf.open(subset_out) as ocred:
+                if len(ocred.pages) != len(targets):
+                    raise RuntimeError("ocrmypdf devolveu número de páginas diferente")
+                for k, i in enumerate(targets):
+                    src.pages[i] = ocred.pages[k]
+                src.save(out_pdf)
+        logger.debug("OCR seletivo: %d página(s) reconhecidas", len(targets))
+        return out_pdf
+    except Exception as e:
+        logger.debug("OCR seletivo falhou: %s", e)
         try: os.remove(out_pdf)
         except Exception: pass
-    return in_pdf
+        return in_pdf
+    finally:
+        for tmp in (subset_in, subset_out):
+            try: os.remove(tmp)
+            except Exception: pass
+
+def _ocr_pages_without_text(in_pdf: str) -> str:
+    """
+    PDF pronto para extração de tabelas: OCR apenas onde falta camada de texto.
+    Se devolver outro caminho, é um temporário — quem chama apaga (_discard_ocr_copy).
+    """
+    if not _ocr_enabled():
+        return in_pdf  # OCR desligado: nem varre as páginas
+    try:
+        index = _page_text_index(in_pdf)
+    except Exception as e:
+        logger.debug("Índice de texto por página falhou: %s", e)
+        return in_pdf
+    missing = [i for i, has_text in enumerate(index) if not has_text]
+    return _try_ocr(in_pdf, missing) if missing else in_pdf
+
+def _discard_ocr_copy(src_pdf: str, in_pdf: str) -> None:
+    """Remove o PDF temporário devolvido por _ocr_pages_without_text (se houver)."""
+    if src_pdf and src_pdf != in_pdf:
+        try: os.remove(src_pdf)
+        except Exception: pass
 
 # ---------------- Excel helpers (mantidos) ----------------
 EXCEL_DANGEROUS_PREFIXES = ("=","+","-","@")
@@ -722,6 +877,120 @@ def _format_openpyxl_sheet(ws, col_meta: Dict[str, Dict[str, Any]]):
         for cell in row:
             cell.border = border
 
+# ---- Escrita XLSX em streaming (openpyxl write-only) ----
+# Mesmo resultado visual de _format_openpyxl_sheet, mas sem materializar o
+# workbook: larguras vêm do DataFrame e cada linha já sai estilizada.
+def _xlsx_stream_enabled() -> bool:
+    return os.environ.get("XLSX_WRITE_MODE", "stream").strip().lower() != "legacy"
+
+def _xlsx_cell_value(v: Any) -> Any:
+    """Normaliza valores do DataFrame para o que o openpyxl grava (NaN/NA → vazio)."""
+    if v is None:
+        return None
+    try:
+        import pandas as pd
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(v, "item") and not isinstance(v, (str, bytes)):
+        try:
+            v = v.item()  # numpy escalar → Python
+        except Exception:
+            pass
+    return v
+
+def _xlsx_display_len(v: Any) -> int:
+    """Comprimento como o pós-processamento legado enxerga ao reler o arquivo."""
+    if isinstance(v, bool):
+        return len(str(v))
+    if isinstance(v, (int, float, Decimal)):
+        try:
+            f = float(v)
+            if f.is_integer() and abs(f) < 1e16:
+                return len(str(int(f)))
+            return len(str(f))
+        except (OverflowError, ValueError):
+            return len(str(v))
+    return len(str(v))
+
+def _xlsx_column_widths(df) -> List[int]:
+    """Larguras calculadas antes da escrita (mesma fórmula do legado)."""
+    widths: List[int] = []
+    for j, col in enumerate(df.columns):
+        max_len = len(str(col) + "   ")
+        for v in df.iloc[:, j]:
+            v = _xlsx_cell_value(v)
+            if v is None:
+                continue
+            max_len = max(max_len, _xlsx_display_len(v))
+        widths.append(max(10, min(60, int(max_len*1.15))))
+    return widths
+
+def _write_streaming_sheet(wb, sheet: str, df, col_meta: Dict[str, Dict[str, Any]]) -> None:
+    """Escreve um DataFrame numa planilha write-only já formatada, em uma passada."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.table import Table, TableStyleInfo
+
+    ws = wb.create_sheet(title=sheet)
+    columns = [str(c) for c in df.columns]
+    max_col, max_row = len(columns), len(df) + 1
+
+    # Configurações de planilha precisam existir antes da primeira linha
+    for j, width in enumerate(_xlsx_column_widths(df), start=1):
+        ws.column_dimensions[get_column_letter(j)].width = width
+    ws.freeze_panes = "A2"
+    if max_col:
+        ws.auto_filter.ref = f"A1:{get_column_letter(max_col)}{max_row}"
+
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    bold = Font(bold=True)
+    header_align = Alignment(vertical="center")
+
+    # (number_format, alignment) por coluna, resolvidos uma única vez
+    col_styles: List[Tuple[Optional[str], Any]] = []
+    for name in columns:
+        kind = col_meta.get(name, {"type": "text"})["type"]
+        if kind == "percent":
+            col_styles.append(("0.00%", Alignment(horizontal="right")))
+        elif kind == "money":
+            col_styles.append(("#,##0.00", Alignment(horizontal="right")))
+        elif kind == "number":
+            col_styles.append(("#,##0.########", Alignment(horizontal="right")))
+        elif "data" in _norm(name):
+            col_styles.append(("dd/mm/yyyy", Alignment(horizontal="center")))
+        else:
+            col_styles.append((None, Alignment(horizontal="left")))
+
+    header_row = []
+    for name in columns:
+        c = WriteOnlyCell(ws, value=name)
+        c.font = bold; c.alignment = header_align; c.border = border
+        header_row.append(c)
+    ws.append(header_row)
+
+    for values in df.itertuples(index=False, name=None):
+        row = []
+        for v, (fmt, align) in zip(values, col_styles):
+            c = WriteOnlyCell(ws, value=_xlsx_cell_value(v))
+            if fmt:
+                c.number_format = fmt
+            c.alignment = align; c.border = border
+            row.append(c)
+        ws.append(row)
+
+    add_table = os.environ.get("XLSX_ADD_TABLE","0") == "1"
+    if add_table and max_row >= 2 and max_col >= 1:
+        import uuid as _uuid
+        table = Table(displayName=f"Tbl_{_uuid.uuid4().hex[:8]}",
+                      ref=f"A1:{get_column_letter(max_col)}{max_row}")
+        table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium2",
+                                             showRowStripes=True, showColumnStripes=False)
+        ws.add_table(table)
+
 def _drop_all_empty_rows(df):
     import pandas as pd
     df2 = df.copy()
@@ -748,13 +1017,16 @@ def _map_columns_to_schema_with_stats(df, target_cols: List[str]):
                 best, best_score = c, score
         return best if best_score >= 0.55 else None
 
-    out = {}
+    out, sources = {}, {}
     for tgt in target_cols:
         match = best_match(tgt)
         out[tgt] = df[match] if match else pd.Series([""] * len(df))
         if match:
             used.add(match); matched += 1
-    return pd.DataFrame(out), matched, len(target_cols)
+            sources[tgt] = match
+    mapped = pd.DataFrame(out)
+    mapped.attrs["source_columns"] = sources  # coluna do schema -> coluna de origem
+    return mapped, matched, len(target_cols)
 
 def _rescue_with_stream(src_pdf: str, pages: str) -> List['pd.DataFrame']:
     import camelot, pandas as pd
@@ -790,16 +1062,167 @@ def _pdfplumber_tables_dfs(src_pdf: str, pages: str) -> List['pd.DataFrame']:
     return dfs
 
 # ---------------- Conversores PDF ----------------
-def _pdf_to_docx(in_pdf: str, out_dir: str) -> str:
+# PDF → DOCX em paralelo (documentos grandes):
+#   PDF2DOCX_PARALLEL_MIN_PAGES=40  → a partir de quantas páginas dividir em blocos
+#   PDF2DOCX_CHUNK_PAGES=20         → páginas por bloco
+#   PDF2DOCX_WORKERS=2              → blocos simultâneos (cada um é um processo sandbox)
+#   PDF2DOCX_TIMEOUT=600            → prazo total da conversão (s)
+#   PDF2DOCX_MEM_MB=1024            → limite de memória por processo
+_PDF2DOCX_CHUNK_SCRIPT = (
+    "import sys\n"
+    "from pdf2docx import Converter\n"
+    "cv = Converter(sys.argv[1])\n"
+    "try:\n"
+    "    cv.convert(sys.argv[2], start=int(sys.argv[3]), end=int(sys.argv[4]))\n"
+    "finally:\n"
+    "    cv.close()\n"
+)
+
+# sinais de que o processo morreu por limite do sandbox (e não por erro do pdf2docx)
+_PDF2DOCX_LIMIT_MARKERS = ("MemoryError", "Cannot allocate memory", "bad_alloc")
+
+class _Pdf2DocxLimitHit(RuntimeError):
+    """pdf2docx morto por limite de CPU/memória do sandbox."""
+
+def _pdf2docx_limits() -> Tuple[int, int]:
+    timeout = max(30, int(os.environ.get("PDF2DOCX_TIMEOUT", "600")))
+    mem_mb = max(256, int(os.environ.get("PDF2DOCX_MEM_MB", "1024")))
+    return timeout, mem_mb
+
+def _pdf_to_docx_sandboxed(in_pdf: str, out_path: str, start: int, end: int, *,
+                           deadline: float, mem_mb: int, cwd: str) -> None:
+    """Converte as páginas [start, end) num processo sandbox, com o prazo que resta até 'deadline'."""
+    import sys
+    remaining = int(deadline - time.monotonic())
+    if remaining <= 0:
+        raise subprocess.TimeoutExpired("pdf2docx", 0)
+    proc = run_in_sandbox(
+        [sys.executable, "-c", _PDF2DOCX_CHUNK_SCRIPT, in_pdf, out_path, str(start), str(end)],
+        cwd=cwd, timeout=remaining, cpu_seconds=remaining, mem_mb=mem_mb,
+    )
+    if proc.returncode != 0 or not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
+        stderr = proc.stderr or ""
+        msg = f"pdf2docx falhou nas páginas {start + 1}-{end}: {stderr[-300:]}"
+        if proc.returncode < 0 or any(m in stderr for m in _PDF2DOCX_LIMIT_MARKERS):
+            raise _Pdf2DocxLimitHit(msg)
+        raise RuntimeError(msg)
+
+def _pdf_to_docx_single(in_pdf: str, out_path: str) -> None:
     from pdf2docx import Converter
-    os.makedirs(out_dir, exist_ok=True)
-    base = os.path.splitext(os.path.basename(in_pdf))[0]
-    out_path = _unique_out_path(out_dir, base, "docx")
     cv = Converter(in_pdf)
     try:
         cv.convert(out_path, start=0, end=None)
     finally:
         cv.close()
+
+def _remap_docx_rels(element, src_part, dst_part, cache: Dict[str, str]) -> None:
+    """Recria no documento de destino as relações (imagens/links) usadas por 'element'."""
+    import io
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    r_ns = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+    for node in element.iter():
+        for attr, rid in list(node.attrib.items()):
+            if not attr.startswith(r_ns):
+                continue
+            if rid not in cache:
+                rel = src_part.rels[rid]
+                if rel.is_external:
+                    cache[rid] = dst_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+                elif rel.reltype == RT.IMAGE:
+                    cache[rid], _ = dst_part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+                else:
+                    raise RuntimeError(f"Relação DOCX não suportada no merge: {rel.reltype}")
+            node.set(attr, cache[rid])
+
+def _merge_docx_bodies(parts: List[str], out_path: str) -> None:
+    """
+    Concatena os corpos dos DOCX (mesmo template do pdf2docx). A seção final de
+    cada bloco vira quebra de seção, preservando tamanho de página e margens.
+    """
+    import copy
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    master = Document(parts[0])
+    body = master.element.body
+    for path in parts[1:]:
+        sub = Document(path)
+        last_sect = body.find(qn("w:sectPr"))
+        if last_sect is not None:
+            p = body.makeelement(qn("w:p"), {})
+            ppr = p.makeelement(qn("w:pPr"), {})
+            ppr.append(last_sect)  # move (lxml) para dentro do parágrafo
+            p.append(ppr)
+            body.append(p)
+        cache: Dict[str, str] = {}
+        for el in sub.element.body:
+            el = copy.deepcopy(el)
+            _remap_docx_rels(el, sub.part, master.part, cache)
+            body.append(el)
+    master.save(out_path)
+
+def _pdf_to_docx_parallel(in_pdf: str, out_path: str, total_pages: int,
+                          deadline: Optional[float] = None) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    chunk = max(1, int(os.environ.get("PDF2DOCX_CHUNK_PAGES", "20")))
+    workers = max(1, int(os.environ.get("PDF2DOCX_WORKERS", "2")))
+    timeout, mem_mb = _pdf2docx_limits()
+    ranges = [(a, min(a + chunk, total_pages)) for a in range(0, total_pages, chunk)]
+    if deadline is None:
+        deadline = time.monotonic() + timeout
+    tmp_dir = tempfile.mkdtemp(prefix="gvpdf_docx_")
+
+    def _convert_range(idx_range):
+        idx, (start, end) = idx_range
+        part = os.path.join(tmp_dir, f"part_{idx:04d}.docx")
+        _pdf_to_docx_sandboxed(in_pdf, part, start, end, deadline=deadline, mem_mb=mem_mb, cwd=tmp_dir)
+        return part
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            # map preserva a ordem dos blocos
+            parts = list(pool.map(_convert_range, enumerate(ranges)))
+        _merge_docx_bodies(parts, out_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _pdf_to_docx(in_pdf: str, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(in_pdf))[0]
+    out_path = _unique_out_path(out_dir, base, "docx")
+    total_pages = enforce_pdf_page_limit(in_pdf, label="PDF de entrada")
+    min_pages = int(os.environ.get("PDF2DOCX_PARALLEL_MIN_PAGES", "40"))
+
+    if min_pages > 0 and total_pages >= min_pages:
+        t0 = time.perf_counter()
+        timeout, mem_mb = _pdf2docx_limits()
+        deadline = time.monotonic() + timeout  # vale também para o fallback
+        try:
+            _pdf_to_docx_parallel(in_pdf, out_path, total_pages, deadline=deadline)
+            logger.info("PDF→DOCX paralelo: %d páginas em %.2fs", total_pages, time.perf_counter() - t0)
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("pdf2docx excedeu o tempo limite da conversão")
+        except _Pdf2DocxLimitHit as e:
+            # um bloco já estourou CPU/memória: o documento inteiro não caberia
+            logger.warning("PDF→DOCX paralelo atingiu limite do sandbox: %s", e)
+            raise RuntimeError("pdf2docx excedeu o limite de CPU/memória da conversão")
+        except Exception as e:
+            logger.warning("PDF→DOCX paralelo falhou (%s); convertendo em um único processo.", e)
+            tmp_dir = tempfile.mkdtemp(prefix="gvpdf_docx_")
+            try:
+                # fallback também no sandbox: mesmos limites e o prazo que sobrou
+                _pdf_to_docx_sandboxed(in_pdf, out_path, 0, total_pages,
+                                       deadline=deadline, mem_mb=mem_mb, cwd=tmp_dir)
+            except subprocess.TimeoutExpired:
+                raise RuntimeError("pdf2docx excedeu o tempo limite da conversão")
+            except _Pdf2DocxLimitHit:
+                raise RuntimeError("pdf2docx excedeu o limite de CPU/memória da conversão")
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        _pdf_to_docx_single(in_pdf, out_path)
+
     if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
         raise RuntimeError("pdf2docx falhou ao gerar DOCX")
     return out_path
@@ -1072,22 +1495,9 @@ def _normalize_coparticipacao_table(df) -> 'pd.DataFrame':
     return result
 
 
-def _pdf_to_xlsx(in_pdf: str, out_dir: str) -> str:
-    """Extrator no estilo 'modelo' ou retrocompat, controlado por env."""
-    model_style = (os.environ.get("PDF_TO_XLSX_MODEL_STYLE", "0") == "1")
-    enforce_pdf_page_limit(in_pdf, label="PDF de entrada")
-    _prepare_camelot_env()
-
+def _extract_xlsx_tables(src_pdf: str) -> List['pd.DataFrame']:
+    """Tabelas do PDF (SMART → lattice → áreas → stream → pdfplumber → texto), na ordem de preferência."""
     import pandas as pd
-    t_start = time.perf_counter()
-    base = os.path.splitext(os.path.basename(in_pdf))[0]
-    out_dir = os.path.abspath(out_dir); os.makedirs(out_dir, exist_ok=True)
-    out_path = _unique_out_path(out_dir, base, "xlsx")
-
-    # OCR se necessário
-    src_pdf = in_pdf if _pdf_has_selectable_text(in_pdf) else _try_ocr(in_pdf)
-
-    # ---- Extração
     dfs: List[pd.DataFrame] = []
 
     # SMART BBOX (lattice + hints)
@@ -1181,23 +1591,56 @@ def _pdf_to_xlsx(in_pdf: str, out_dir: str) -> str:
                         dfs.append(_pd.DataFrame(lines, columns=["Texto"]))  # type: ignore
         except Exception as e:
             logger.debug("PDF→XLSX: fallback texto falhou: %s", e)
+    return dfs
 
-    # ---- Escrita XLSX
+def _pdf_to_xlsx(in_pdf: str, out_dir: str) -> str:
+    """Extrator no estilo 'modelo' ou retrocompat, controlado por env."""
+    model_style = (os.environ.get("PDF_TO_XLSX_MODEL_STYLE", "0") == "1")
+    enforce_pdf_page_limit(in_pdf, label="PDF de entrada")
+    _prepare_camelot_env()
+
+    import pandas as pd
+    t_start = time.perf_counter()
+    base = os.path.splitext(os.path.basename(in_pdf))[0]
+    out_dir = os.path.abspath(out_dir); os.makedirs(out_dir, exist_ok=True)
+    out_path = _unique_out_path(out_dir, base, "xlsx")
+
+    # OCR só nas páginas sem camada de texto (documentos mistos)
+    src_pdf = _ocr_pages_without_text(in_pdf)
     try:
-        import pandas as pd
-        import xlsxwriter
+        dfs = _extract_xlsx_tables(src_pdf)
+    finally:
+        _discard_ocr_copy(src_pdf, in_pdf)
+
+    # ---- Escrita XLSX
+    # stream (padrão): write-only com estilo na emissão; legacy: ExcelWriter + pós-formatação
+    stream_mode = _xlsx_stream_enabled()
+    if stream_mode:
+        from openpyxl import Workbook
+        writer = Workbook(write_only=True)
+    else:
         try:
-            writer = pd.ExcelWriter(out_path, engine="xlsxwriter",
-                                    engine_kwargs={"options": {"strings_to_urls": False}})
-        except TypeError:
-            writer = pd.ExcelWriter(out_path, engine="xlsxwriter")
-    except Exception:
-        import pandas as pd
-        writer = pd.ExcelWriter(out_path, engine="openpyxl")
+            import pandas as pd
+            import xlsxwriter
+            try:
+                writer = pd.ExcelWriter(out_path, engine="xlsxwriter",
+                                        engine_kwargs={"options": {"strings_to_urls": False}})
+            except TypeError:
+                writer = pd.ExcelWriter(out_path, engine="xlsxwriter")
+        except Exception:
+            import pandas as pd
+            writer = pd.ExcelWriter(out_path, engine="openpyxl")
 
     metas: Dict[str, Dict[str, Any]] = {}
     wrote_any = False
 
+    def _emit_sheet(frame, sheet: str, meta: Dict[str, Dict[str, Any]]) -> None:
+        metas[sheet] = meta  # formatos por coluna (a pós-formatação do modo pandas depende disso)
+        if stream_mode:
+            _write_streaming_sheet(writer, sheet, frame, meta)
+        else:
+            frame.to_excel(writer, index=False, header=True, sheet_name=sheet)
+
     # MODEL STYLE: 1 tabela = 1 sheet ("Table N")
     if model_style:
         idx = 1
@@ -1220,8 +1663,7 @@ def _pdf_to_xlsx(in_pdf: str, out_dir: str) -> str:
                         logger.debug("PDF→XLSX model_style: normalização coparticipação aplicada (%s)", sheet)
                 except Exception as _ne:
                     logger.debug("PDF→XLSX: normalização coparticipação falhou, usando df genérico: %s", _ne)
-            df.to_excel(writer, index=False, header=True, sheet_name=sheet)
-            metas[sheet] = meta
+            _emit_sheet(df, sheet, meta)
             idx += 1
             wrote_any = True
 
@@ -1229,46 +1671,47 @@ def _pdf_to_xlsx(in_pdf: str, out_dir: str) -> str:
         # Retrocompatibilidade (com consolidação e/ou schema)
         target_schema = _load_target_schema_from_env()
         if target_schema:
-            cleaned = []
+            cleaned, big_meta = [], {}
             for raw_df in dfs:
                 df, _meta = _clean_and_infer(raw_df)
                 if not df.empty:
                     cleaned.append(df)
+                    for col, m in _meta.items():
+                        big_meta.setdefault(col, m)
             big = pd.concat(cleaned, ignore_index=True, sort=False) if cleaned else None
             if big is not None and not big.empty:
                 mapped, matched, total = _map_columns_to_schema_with_stats(big, target_schema)
                 if matched >= max(4, int(0.4 * max(1,total))):
+                    sources = mapped.attrs.get("source_columns", {})
                     mapped = _drop_all_empty_rows(mapped)
                     if not mapped.empty:
                         sheet = "Dados"
-                        mapped.to_excel(writer, index=False, header=True, sheet_name=sheet)
-                        _, meta_tmp = _clean_and_infer(mapped.copy())
-                        metas[sheet] = meta_tmp
+                        # o frame já está limpo: reaproveita os tipos inferidos por tabela
+                        meta_tmp = {tgt: big_meta.get(src, {"type": "text"}) for tgt, src in sources.items()}
+                        _emit_sheet(mapped, sheet, meta_tmp)
                         wrote_any = True
             if not wrote_any and big is not None and not big.empty:
                 big2 = _drop_all_empty_rows(big)
                 if not big2.empty:
                     sheet = "Dados"
-                    big2.to_excel(writer, index=False, header=True, sheet_name=sheet)
-                    _, meta_tmp = _clean_and_infer(big2.copy())
-                    metas[sheet] = meta_tmp
+                    _emit_sheet(big2, sheet, big_meta)
                     wrote_any = True
         else:
             single = os.environ.get("XLSX_SINGLE_SHEET","0") == "1"
             if single:
-                cleaned = []
+                cleaned, big_meta = [], {}
                 for raw_df in dfs:
-                    df, _ = _clean_and_infer(raw_df)
+                    df, _meta = _clean_and_infer(raw_df)
                     if not df.empty:
                         cleaned.append(df)
+                        for col, m in _meta.items():
+                            big_meta.setdefault(col, m)
                 big = pd.concat(cleaned, ignore_index=True, sort=False) if cleaned else None
                 if big is not None and not big.empty:
                     big2 = _drop_all_empty_rows(big)
                     if not big2.empty:
                         sheet = "Dados"
-                        big2.to_excel(writer, index=False, header=True, sheet_name=sheet)
-                        _, meta_tmp = _clean_and_infer(big2.copy())
-                        metas[sheet] = meta_tmp
+                        _emit_sheet(big2, sheet, big_meta)
                         wrote_any = True
             else:
                 idx = 1
@@ -1295,12 +1738,15 @@ def _pdf_to_xlsx(in_pdf: str, out_dir: str) -> str:
                             logger.debug(
                                 "PDF→XLSX: normalização coparticipação falhou, usando df genérico: %s", _ne
                             )
-                    df.to_excel(writer, index=False, header=True, sheet_name=sheet)
-                    metas[sheet] = meta
+                    _emit_sheet(df, sheet, meta)
                     idx += 1
                     wrote_any = True
 
-    writer.close()
+    if stream_mode:
+        if wrote_any:
+            writer.save(out_path)
+    else:
+        writer.close()
 
     if not wrote_any:
         logger.info(
@@ -1319,14 +1765,15 @@ def _pdf_to_xlsx(in_pdf: str, out_dir: str) -> str:
         )
 
     # Pós-formatação com openpyxl (larguras, filtros, números, Excel Table opcional)
-    try:
-        from openpyxl import load_workbook
-        wb = load_workbook(out_path)
-        for ws in wb.worksheets:
-            _format_openpyxl_sheet(ws, metas.get(ws.title, {}))
-        wb.save(out_path)
-    except Exception as e:
-        logger.debug("Formatação openpyxl falhou: %s", e)
+    if not stream_mode:
+        try:
+            from openpyxl import load_workbook
+            wb = load_workbook(out_path)
+            for ws in wb.worksheets:
+                _format_openpyxl_sheet(ws, metas.get(ws.title, {}))
+            wb.save(out_path)
+        except Exception as e:
+            logger.debug("Formatação openpyxl falhou: %s", e)
 
     logger.info("Tempo PDF→XLSX total: %.2fs", time.perf_counter()-t_start)
     return out_path
@@ -1338,71 +1785,130 @@ CSV_FILTER_OPTS = os.environ.get("CSV_FILTER_OPTS", "59,34,76,1")
 FILTER_XLSM = "Calc MS Excel 2007 VBA XML"
 FILTER_XLSX = "Calc MS Excel 2007 XML"
 
+def _parse_page_spec(spec: Optional[str]) -> Optional[List[int]]:
+    """'1-3,7' → [1, 2, 3, 7]; 'all'/vazio → None (todas)."""
+    if not spec or spec.strip().lower() == "all":
+        return None
+    out: List[int] = []
+    for token in spec.split(","):
+        token = token.strip()
+        try:
+            if "-" in token:
+                a, b = token.split("-", 1)
+                out.extend(range(int(a), int(b) + 1))
+            elif token:
+                out.append(int(token))
+        except ValueError:
+            continue
+    return sorted(set(v for v in out if v >= 1)) or None
+
+def _iter_plumber_pages(in_pdf: str, pages: Optional[List[int]] = None):
+    """
+    Entrega uma página pdfplumber por vez e libera o cache de layout dela
+    (page.close → flush_cache) antes de seguir para a próxima.
+    Não usa `pdf.pages`, que materializa (e retém) todas as páginas de uma vez.
+    """
+    import pdfplumber
+    from pdfplumber.page import Page
+    from pdfminer.pdfpage import PDFPage
+    wanted = set(pages) if pages else None
+    with pdfplumber.open(in_pdf) as pdf:
+        doctop = 0
+        for number, page_obj in enumerate(PDFPage.create_pages(pdf.doc), start=1):
+            if wanted is not None and number > max(wanted):
+                break
+            page = Page(pdf, page_obj, page_number=number, initial_doctop=doctop)
+            doctop += page.height
+            if wanted is not None and number not in wanted:
+                continue
+            try:
+                yield page
+            finally:
+                page.close()
+
+def _iter_camelot_rows(in_pdf: str, flavor: str, pages: List[int], **kwargs):
+    """Linhas das tabelas camelot, uma página por chamada (memória ~ 1 página)."""
+    import camelot
+    for idx in pages:
+        tables = camelot.read_pdf(in_pdf, flavor=flavor, pages=str(idx), **kwargs)
+        for t in getattr(tables, "tables", tables):
+            df = getattr(t, "df", None)
+            if df is None or getattr(df, "empty", True):
+                continue
+            for row in df.itertuples(index=False, name=None):
+                yield [_excel_safe_str(c) for c in row]
+        del tables
+
+def _iter_plumber_table_rows(in_pdf: str, pages: Optional[List[int]] = None):
+    for page in _iter_plumber_pages(in_pdf, pages):
+        for table in (page.extract_tables() or []):
+            for row in table:
+                yield [_excel_safe_str(c) for c in row]
+
+def _iter_plumber_text_rows(in_pdf: str, pages: Optional[List[int]] = None):
+    for page in _iter_plumber_pages(in_pdf, pages):
+        for line in (page.extract_text() or "").splitlines():
+            yield [_excel_safe_str(line)]
+
+def _write_csv_rows(out_path: str, rows) -> int:
+    """Grava linhas de um iterável direto no arquivo; retorna quantas foram escritas."""
+    import csv as _csv
+    n = 0
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = _csv.writer(f)
+        for row in rows:
+            w.writerow(row)
+            n += 1
+    return n
+
 def _pdf_to_csv(in_pdf: str, out_dir: str) -> str:
-    enforce_pdf_page_limit(in_pdf, label="PDF de entrada")
+    """
+    PDF → CSV em streaming: cada estratégia extrai página a página e grava as
+    linhas conforme chegam, sem concatenar DataFrames do documento inteiro.
+    """
+    total_pages = enforce_pdf_page_limit(in_pdf, label="PDF de entrada")
     _prepare_camelot_env()
-    import pandas as pd, csv as _csv
     base = os.path.splitext(os.path.basename(in_pdf))[0]
     out_dir = os.path.abspath(out_dir); os.makedirs(out_dir, exist_ok=True)
     out_path = _unique_out_path(out_dir, base, "csv")
     dpi = int(os.environ.get("PDF_TO_XLSX_DPI","200"))
     line_scale = int(os.environ.get("PDF_TO_XLSX_LINE_SCALE","80"))
     process_bg = os.environ.get("PDF_PROCESS_BACKGROUND","0") == "1"
-    pages_arg = os.environ.get("PDF_PAGE_RANGE") or "all"
-
+    pages = _parse_page_spec(os.environ.get("PDF_PAGE_RANGE"))
+    page_list = [p for p in (pages or range(1, total_pages + 1)) if p <= total_pages]
+    src_pdf = _ocr_pages_without_text(in_pdf)
     try:
-        import camelot
-        tables = camelot.read_pdf(in_pdf, flavor="lattice", pages=pages_arg, line_scale=line_scale,
-                                  strip_text="\n", process_background=process_bg, copy_text=["h","v"],
-                                  shift_text=["l","t"], dpi=dpi)
-        if getattr(tables, 'n', 0) > 0:
-            df = pd.concat([t.df for t in getattr(tables, 'tables', tables)],
-                           ignore_index=True).map(_excel_safe_str)
-            df.to_csv(out_path, index=False, header=False, encoding="utf-8")
-            if os.path.getsize(out_path) > 0:
+        try:
+            rows = _iter_camelot_rows(src_pdf, "lattice", page_list, line_scale=line_scale,
+                                      strip_text="\n", process_background=process_bg,
+                                      copy_text=["h","v"], shift_text=["l","t"], dpi=dpi)
+            if _write_csv_rows(out_path, rows) > 0:
                 return out_path
-    except Exception as e:
-        logger.debug("PDF→CSV: lattice falhou: %s", e)
+        except Exception as e:
+            logger.debug("PDF→CSV: lattice falhou: %s", e)
 
-    try:
-        import camelot
-        tables = camelot.read_pdf(in_pdf, flavor="stream", pages=pages_arg, strip_text="\n", dpi=dpi)
-        if getattr(tables, 'n', 0) > 0:
-            df = pd.concat([t.df for t in getattr(tables, 'tables', tables)],
-                           ignore_index=True).map(_excel_safe_str)
-            df.to_csv(out_path, index=False, header=False, encoding="utf-8")
-            if os.path.getsize(out_path) > 0:
+        try:
+            rows = _iter_camelot_rows(src_pdf, "stream", page_list, strip_text="\n", dpi=dpi)
+            if _write_csv_rows(out_path, rows) > 0:
                 return out_path
-    except Exception as e:
-        logger.debug("PDF→CSV: stream falhou: %s", e)
+        except Exception as e:
+            logger.debug("PDF→CSV: stream falhou: %s", e)
 
-    try:
-        import pdfplumber
-        rows = []
-        with pdfplumber.open(in_pdf) as pdf:
-            for page in pdf.pages:
-                for table in (page.extract_tables() or []):
-                    rows.extend([[ _excel_safe_str(c) for c in row ] for row in table])
-        if rows:
-            with open(out_path, "w", newline="", encoding="utf-8") as f:
-                w = _csv.writer(f); w.writerows(rows)
-            if os.path.getsize(out_path) > 0:
+        try:
+            if _write_csv_rows(out_path, _iter_plumber_table_rows(src_pdf, pages)) > 0:
                 return out_path
-    except Exception as e:
-        logger.debug("PDF→CSV: pdfplumber tables falhou: %s", e)
+        except Exception as e:
+            logger.debug("PDF→CSV: pdfplumber tables falhou: %s", e)
 
-    try:
-        import pdfplumber
-        with pdfplumber.open(in_pdf) as pdf, open(out_path, "w", newline="", encoding="utf-8") as f:
-            w = _csv.writer(f)
-            for page in pdf.pages:
-                for line in (page.extract_text() or "").splitlines():
-                    w.writerow([_excel_safe_str(line)])
-        return out_path
-    except Exception:
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write("Falha ao extrair conteúdo do PDF.\n")
-        return out_path
+        try:
+            _write_csv_rows(out_path, _iter_plumber_text_rows(src_pdf, pages))
+            return out_path
+        except Exception:
+            with open(out_path, "w", encoding="utf-8") as f:
+                f.write("Falha ao extrair conteúdo do PDF.\n")
+            return out_path
+    finally:
+        _discard_ocr_copy(src_pdf, in_pdf)
 
 # ============== Normalização de páginas (ATUALIZADO) ==============
 def _papersize_token(name: str) -> str:
@@ -0,0 +1,430 @@
+# app/services/doc_store.py
+# -*- coding: utf-8 -*-
+"""
+Depósito de documentos "sobe uma vez, usa em várias ferramentas".
+
+• POST /api/files grava o PDF UMA vez: deduplicado pelo SHA-256 do conteúdo,
+  validado, checado contra o limite de páginas e sanitizado UMA vez
+  (sanitize_pdf_preserving_content). O blob fica em _docs/blobs/<sha256>/.
+• Cada envio gera um file_id (32 hex) do dono da sessão
+  (get_or_create_output_owner_id); outro cookie não enxerga o id.
+• As ferramentas aceitam 'file_id' no lugar do multipart: request_file()
+  devolve um FileStorage apontando para o blob. save() vira hardlink/clone
+  (sem cópia) e a sanitização da ferramenta reconhece a cópia já sanitizada
+  (take_presanitized) e só a reaproveita.
+• Limpeza: cada file_id é uma referência ao blob (_docs/blobs/<sha>/refs/<id>);
+  ids expiram por TTL desde o último uso e o blob sai quando não sobra
+  referência. Em POSIX, arquivos já linkados por ferramentas em andamento
+  continuam válidos mesmo após a remoção do blob.
+
+ENV:
+  DOCSTORE_TTL_MIN            -> validade do file_id sem uso, em minutos (default 120)
+  DOCSTORE_MAX_IDS_PER_OWNER  -> ids ativos por sessão (default 50)
+  DOCSTORE_PURGE_INTERVAL_SEC -> intervalo mínimo entre limpezas automáticas (default 60)
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import hmac
+import shutil
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from flask import current_app, g, request
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import BadRequest, NotFound
+
+from ..utils import disk_cache
+from ..utils.config_utils import validate_upload
+from ..utils.limits import enforce_pdf_page_limit
+from ..utils.upload_stream import known_sha256
+from ..utils.security import (
+    current_output_owner_id,
+    generate_output_job_id,
+    get_or_create_output_owner_id,
+    is_valid_output_id,
+)
+
+logger = logging.getLogger(__name__)
+
+DOCS_SUBDIR = "_docs"
+_SHA_LEN = 64
+_BLOB_GRACE_SEC = 60          # blob recém-criado sem ref (put em andamento) não é removido
+
+_lock = threading.Lock()
+_last_purge = 0.0
+# caminhos (absolutos) criados por StoredUpload.save -> (inode, tamanho, mtime_ns)
+_PRESANITIZED: "OrderedDict[str, tuple]" = OrderedDict()
+_PRESANITIZED_MAX = 1024
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except Exception:
+        return default
+
+
+def ttl_seconds() -> int:
+    return max(1, _env_int("DOCSTORE_TTL_MIN", 120)) * 60
+
+
+def _root(upload_folder: Optional[str] = None) -> str:
+    base = upload_folder or current_app.config["UPLOAD_FOLDER"]
+    return os.path.join(os.fspath(base), DOCS_SUBDIR)
+
+
+def _dirs(upload_folder: Optional[str] = None) -> Dict[str, str]:
+    root = _root(upload_folder)
+    out = {"root": root, "blobs": os.path.join(root, "blobs"),
+           "ids": os.path.join(root, "ids"), "tmp": os.path.join(root, "tmp")}
+    for key in ("blobs", "ids", "tmp"):
+        os.makedirs(out[key], mode=0o700, exist_ok=True)
+    return out
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = f"{path}.tmp_{uuid.uuid4().hex}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# ------------------------------------------------------------------
+# Envio
+# ------------------------------------------------------------------
+def _publish_blob(dirs: Dict[str, str], upload_path: str, sha: str, filename: str) -> dict:
+    """Valida/sanitiza o upload e publica o blob (rename atômico do diretório)."""
+    from .sanitize_service import sanitize_pdf_preserving_content
+
+    final = os.path.join(dirs["blobs"], sha)
+    meta = _read_json(os.path.join(final, "meta.json"))
+    if meta is not None:
+        return meta
+
+    pages = enforce_pdf_page_limit(upload_path, label=filename)
+    build = os.path.join(dirs["tmp"], f"blob_{uuid.uuid4().hex}")
+    os.makedirs(os.path.join(build, "refs"))
+    try:
+        doc_path = os.path.join(build, "doc.pdf")
+        try:
+            sanitize_pdf_preserving_content(upload_path, doc_path)
+        except Exception as exc:
+            logger.warning("[docstore] sanitização falhou: %s", type(exc).__name__)
+            raise BadRequest("Não foi possível processar este PDF.")
+        # só leitura: as ferramentas recebem hardlinks deste arquivo
+        os.chmod(doc_path, 0o444)
+        meta = {
+            "sha256": sha,
+            "pages": int(pages),
+            "size": os.path.getsize(upload_path),
+            "created": int(time.time()),
+        }
+        _write_json(os.path.join(build, "meta.json"), meta)
+        try:
+            os.rename(build, final)
+        except OSError:
+            # outro worker publicou o mesmo conteúdo primeiro
+            shutil.rmtree(build, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(build, ignore_errors=True)
+        raise
+    return _read_json(os.path.join(final, "meta.json")) or meta
+
+
+def _owner_ids(dirs: Dict[str, str], owner: str) -> List[str]:
+    out = []
+    try:
+        with os.scandir(dirs["ids"]) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    rec = _read_json(entry.path)
+                    if rec and rec.get("owner") == owner:
+                        out.append(entry.name[:-5])
+    except FileNotFoundError:
+        pass
+    return out
+
+
+def put(file: FileStorage) -> dict:
+    """
+    Recebe o upload e devolve {file_id, filename, pages, size, sha256, expires_in}.
+    Conteúdo já conhecido só ganha uma nova referência (sem nova sanitização).
+    """
+    if file is None or not getattr(file, "filename", ""):
+        raise BadRequest("Nenhum arquivo enviado.")
+    try:
+        filename = validate_upload(file, {"pdf"})
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    dirs = _dirs()
+    owner = get_or_create_output_owner_id()
+    limit = max(1, _env_int("DOCSTORE_MAX_IDS_PER_OWNER", 50))
+    if len(_owner_ids(dirs, owner)) >= limit:
+        purge(force=True)
+        if len(_owner_ids(dirs, owner)) >= limit:
+            raise BadRequest(f"Limite de {limit} arquivos guardados por sessão atingido.")
+
+    file_id = generate_output_job_id()
+    upload_path = os.path.join(dirs["tmp"], f"up_{uuid.uuid4().hex}.pdf")
+    try:
+        file.save(upload_path)
+        # hash calculado durante a recepção do upload, quando disponível
+        sha = known_sha256(file) or disk_cache.sha256_file(upload_path)
+        blob = os.path.join(dirs["blobs"], sha)
+        for _attempt in range(2):
+            meta = _publish_blob(dirs, upload_path, sha, filename)
+            os.makedirs(os.path.join(blob, "refs"), exist_ok=True)
+            open(os.path.join(blob, "refs", file_id), "w").close()
+            # uma limpeza concorrente pode ter levado o blob antes da referência
+            if os.path.exists(os.path.join(blob, "doc.pdf")):
+                break
+            shutil.rmtree(blob, ignore_errors=True)
+        else:
+            raise RuntimeError("Falha ao guardar o documento.")
+    finally:
+        try:
+            os.remove(upload_path)
+        except OSError:
+            pass
+
+    _write_json(os.path.join(dirs["ids"], f"{file_id}.json"),
+                {"owner": owner, "sha256": sha, "filename": filename})
+    purge()
+    return {
+        "file_id": file_id,
+        "filename": filename,
+        "pages": meta["pages"],
+        "size": meta["size"],
+        "sha256": sha,
+        "expires_in": ttl_seconds(),
+    }
+
+
+# ------------------------------------------------------------------
+# Consulta
+# ------------------------------------------------------------------
+def get(file_id: str) -> dict:
+    """Registro do file_id do dono atual (toca o TTL). NotFound se não for dele/expirou."""
+    if not is_valid_output_id(file_id):
+        raise NotFound("Arquivo não encontrado.")
+    dirs = _dirs()
+    id_path = os.path.join(dirs["ids"], f"{file_id}.json")
+    rec = _read_json(id_path)
+    owner = current_output_owner_id()
+    if not rec or not owner or not hmac.compare_digest(str(rec.get("owner", "")), owner):
+        raise NotFound("Arquivo não encontrado.")
+    if time.time() - os.path.getmtime(id_path) > ttl_seconds():
+        release(file_id)
+        raise NotFound("Arquivo expirado. Envie novamente.")
+    blob = os.path.join(dirs["blobs"], str(rec.get("sha256", ""))[:_SHA_LEN])
+    meta = _read_json(os.path.join(blob, "meta.json"))
+    if meta is None:
+        raise NotFound("Arquivo não encontrado.")
+    disk_cache.touch(id_path)
+    return {**meta, "file_id": file_id, "filename": rec.get("filename") or "documento.pdf",
+            "path": os.path.join(blob, "doc.pdf")}
+
+
+def release(file_id: str, upload_folder: Optional[str] = None) -> bool:
+    """Remove o file_id (e a referência ao blob). O blob sai na próxima limpeza."""
+    if not is_valid_output_id(file_id):
+        return False
+    dirs = _dirs(upload_folder)
+    id_path = os.path.join(dirs["ids"], f"{file_id}.json")
+    rec = _read_json(id_path)
+    if rec is None:
+        return False
+    try:
+        os.remove(os.path.join(dirs["blobs"], str(rec.get("sha256", ""))[:_SHA_LEN], "refs", file_id))
+    except OSError:
+        pass
+    try:
+        os.remove(id_path)
+    except OSError:
+        pass
+    return True
+
+
+def release_owned(file_id: str) -> bool:
+    get(file_id)  # NotFound se não for do dono
+    return release(file_id)
+
+
+# ------------------------------------------------------------------
+# Uso pelas ferramentas
+# ------------------------------------------------------------------
+class StoredUpload(FileStorage):
+    """FileStorage sobre o blob já sanitizado; save() não copia bytes."""
+
+    def __init__(self, record: dict):
+        stream = open(record["path"], "rb")
+        super().__init__(stream=stream, filename=record["filename"],
+                         name="file", content_type="application/pdf")
+        self.file_id = record["file_id"]
+        self.doc_path = record["path"]
+        self.pages = record.get("pages")
+        self.sha256 = record.get("sha256")
+        try:
+            g.setdefault("_doc_store_streams", []).append(stream)
+        except RuntimeError:
+            pass
+
+    def save(self, dst, buffer_size: int = 16384) -> None:
+        if not isinstance(dst, (str, os.PathLike)):
+            return super().save(dst, buffer_size)
+        dst = os.fspath(dst)
+        try:
+            os.remove(dst)  # mkstemp cria o destino vazio antes
+        except OSError:
+            pass
+        disk_cache.link_or_clone(self.doc_path, dst)
+        _mark_presanitized(dst)
+
+
+def _mark_presanitized(path: str) -> None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return
+    with _lock:
+        _PRESANITIZED[os.path.abspath(path)] = (st.st_ino, st.st_size, st.st_mtime_ns)
+        while len(_PRESANITIZED) > _PRESANITIZED_MAX:
+            _PRESANITIZED.popitem(last=False)
+
+
+def take_presanitized(path: str) -> bool:
+    """
+    True se 'path' é uma cópia intacta de um blob já sanitizado (criada por
+    StoredUpload.save). Consome a marca: vale uma vez.
+    """
+    key = os.path.abspath(os.fspath(path))
+    with _lock:
+        mark = _PRESANITIZED.pop(key, None)
+    if mark is None:
+        return False
+    try:
+        st = os.stat(key)
+    except OSError:
+        return False
+    return mark == (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def request_file(*fields: str) -> Optional[FileStorage]:
+    """
+    Arquivo da requisição: o primeiro campo multipart presente em 'fields'
+    (default 'file') ou, na falta dele, o documento do campo 'file_id'.
+    """
+    for field in fields or ("file",):
+        up = request.files.get(field)
+        if up is not None and up.filename:
+            return up
+    file_id = (request.form.get("file_id") or "").strip()
+    if not file_id:
+        return None
+    return StoredUpload(get(file_id))
+
+
+def request_files(field: str = "files") -> List[FileStorage]:
+    """Lista para ferramentas multi-arquivo: uploads de 'field' seguidos dos 'file_ids' (na ordem)."""
+    files = [f for f in request.files.getlist(field) if f and f.filename]
+    raw = request.form.getlist("file_ids")
+    ids: List[str] = []
+    for item in raw:
+        item = (item or "").strip()
+        if item.startswith("["):
+            try:
+                ids.extend(str(x) for x in json.loads(item))
+            except ValueError:
+                raise BadRequest("file_ids inválido.")
+        elif item:
+            ids.extend(p.strip() for p in item.split(",") if p.strip())
+    return files + [StoredUpload(get(fid)) for fid in ids]
+
+
+def close_request_streams(_exc=None) -> None:
+    for stream in g.pop("_doc_store_streams", []) or []:
+        try:
+            stream.close()
+        except Exception:
+            pass
+
+
+# ------------------------------------------------------------------
+# Limpeza
+# ------------------------------------------------------------------
+def purge(force: bool = False, upload_folder: Optional[str] = None) -> int:
+    """Expira ids pelo TTL e remove blobs sem referência. Retorna blobs removidos."""
+    global _last_purge
+    now = time.time()
+    with _lock:
+        if not force and now - _last_purge < max(0, _env_int("DOCSTORE_PURGE_INTERVAL_SEC", 60)):
+            return 0
+        _last_purge = now
+
+    dirs = _dirs(upload_folder)
+    ttl = ttl_seconds()
+    try:
+        with os.scandir(dirs["ids"]) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        expired = now - entry.stat().st_mtime > ttl
+                    except OSError:
+                        continue
+                    if expired:
+                        release(entry.name[:-5], upload_folder)
+    except FileNotFoundError:
+        pass
+
+    removed = 0
+    with os.scandir(dirs["blobs"]) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            refs = os.path.join(entry.path, "refs")
+            try:
+                if os.listdir(refs):
+                    continue
+                if now - os.stat(refs).st_mtime < _BLOB_GRACE_SEC:
+                    continue
+            except OSError:
+                pass
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+
+    # restos de envios interrompidos
+    with os.scandir(dirs["tmp"]) as it:
+        for entry in it:
+            try:
+                if now - entry.stat().st_mtime > 3600:
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    else:
+                        os.remove(entry.path)
+            except OSError:
+                pass
+    if removed:
+        logger.debug("[docstore] %d blobs sem referência removidos.", removed)
+    return removed
+
+
+def stats(upload_folder: Optional[str] = None) -> Dict[str, int]:
+    dirs = _dirs(upload_folder)
+    blobs = [e for e in os.listdir(dirs["blobs"])]
+    ids = [e for e in os.listdir(dirs["ids"]) if e.endswith(".json")]
+    return {"blobs": len(blobs), "ids": len(ids)}
@@ -0,0 +1,163 @@
+# app/services/edit_doc_cache.py
+# -*- coding: utf-8 -*-
+"""
+LRU (por worker) de documentos PyMuPDF abertos das sessões do editor.
+
+• Chave = (sessão, inode, mtime_ns, tamanho) do current.pdf: quando o arquivo é
+  substituído a entrada antiga é descartada no próximo acesso.
+• Acesso serializado por documento (lock próprio) — fitz.Document não é
+  thread-safe e o gunicorn roda com gthreads.
+• Empréstimo exclusivo (mutate=True) tira o documento do cache: quem vai
+  alterar a página não contamina leitores; ao final ele é fechado.
+• Limites: nº de documentos e soma dos tamanhos de arquivo (aproximação da
+  memória ocupada); o menos usado sai primeiro, fechando quando ficar livre.
+
+ENV:
+  EDIT_DOC_CACHE_SIZE    -> máximo de documentos abertos por worker (default 8; 0 desliga)
+  EDIT_DOC_CACHE_MAX_MB  -> soma máxima dos arquivos abertos (default 256)
+"""
+from __future__ import annotations
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, int, int, int]
+
+
+class _Entry:
+    __slots__ = ("key", "doc", "nbytes", "lock", "refs", "evicted")
+
+    def __init__(self, key: _Key, doc, nbytes: int):
+        self.key = key
+        self.doc = doc
+        self.nbytes = nbytes
+        self.lock = threading.Lock()
+        self.refs = 0
+        self.evicted = False
+
+
+_ENTRIES: "OrderedDict[str, _Entry]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def _file_key(session_id: str, path: str) -> Tuple[_Key, int]:
+    st = os.stat(path)
+    return (session_id, st.st_ino, st.st_mtime_ns, st.st_size), st.st_size
+
+
+def _close(entry: _Entry) -> None:
+    try:
+        entry.doc.close()
+    except Exception:
+        pass
+
+
+def _retire(entry: _Entry) -> None:
+    """Marca como fora do cache; fecha já se ninguém estiver usando (chamar com _LOCK)."""
+    entry.evicted = True
+    _STATS["evictions"] += 1
+    if entry.refs == 0:
+        _close(entry)
+
+
+def _enforce_limits() -> None:
+    max_docs = max(0, _env_int("EDIT_DOC_CACHE_SIZE", 8))
+    max_bytes = max(0, _env_int("EDIT_DOC_CACHE_MAX_MB", 256)) * 1024 * 1024
+    total = sum(e.nbytes for e in _ENTRIES.values())
+    while _ENTRIES and (len(_ENTRIES) > max_docs or total > max_bytes):
+        _, old = _ENTRIES.popitem(last=False)
+        total -= old.nbytes
+        _retire(old)
+
+
+@contextmanager
+def borrow(session_id: str, path: str, *, mutate: bool = False) -> Iterator["fitz.Document"]:
+    """
+    Empresta o fitz.Document do current.pdf da sessão.
+    Com mutate=True o documento sai do cache e é fechado ao final (o chamador
+    vai salvar outro arquivo no lugar, então a cópia em memória deixa de valer).
+    """
+    key, nbytes = _file_key(session_id, path)
+    cacheable = _env_int("EDIT_DOC_CACHE_SIZE", 8) > 0 and nbytes <= \
+        max(0, _env_int("EDIT_DOC_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+    entry: Optional[_Entry] = None
+    with _LOCK:
+        cur = _ENTRIES.get(session_id)
+        if cur is not None and cur.key != key:
+            del _ENTRIES[session_id]
+            _retire(cur)
+            cur = None
+        if cur is not None:
+            _STATS["hits"] += 1
+            if mutate:
+                del _ENTRIES[session_id]
+                cur.evicted = True
+            else:
+                _ENTRIES.move_to_end(session_id)
+            cur.refs += 1
+            entry = cur
+
+    if entry is None:
+        _STATS["misses"] += 1
+        entry = _Entry(key, fitz.open(path), nbytes)
+        entry.refs = 1
+        if mutate or not cacheable:
+            entry.evicted = True
+        else:
+            with _LOCK:
+                other = _ENTRIES.get(session_id)
+                if other is None:
+                    _ENTRIES[session_id] = entry
+                    _enforce_limits()
+                else:
+                    entry.evicted = True  # outra thread abriu antes; este fica avulso
+
+    try:
+        with entry.lock:
+            yield entry.doc
+    finally:
+        with _LOCK:
+            entry.refs -= 1
+            if entry.evicted and entry.refs == 0:
+                _close(entry)
+
+
+def invalidate(session_id: str) -> None:
+    """Descarta o documento da sessão (ex.: /api/edit/close)."""
+    with _LOCK:
+        entry = _ENTRIES.pop(session_id, None)
+        if entry is not None:
+            _retire(entry)
+
+
+def stats() -> dict:
+    with _LOCK:
+        return {
+            **_STATS,
+            "open": len(_ENTRIES),
+            "bytes": sum(e.nbytes for e in _ENTRIES.values()),
+        }
+
+
+def clear() -> None:
+    with _LOCK:
+        while _ENTRIES:
+            _, entry = _ENTRIES.popitem()
+            _retire(entry)
@@ -0,0 +1,198 @@
+# app/services/edit_engine.py
+# -*- coding: utf-8 -*-
+"""
+Gravação das edições do editor: atualização incremental + diário de operações.
+
+• Cada ação (organize, overlay, overlays...) grava só o que mudou como
+  atualização incremental no fim do current.pdf (doc.saveIncr), então a
+  latência depende do tamanho da edição, não do documento.
+• Reescrita completa (garbage/clean + sanitização) só acontece:
+    - quando a edição não é segura de forma incremental (ex.: redação — a
+      revisão anterior continuaria legível no arquivo);
+    - quando a "cauda" incremental passa do limite (EDIT_INCR_MAX_RATIO /
+      EDIT_INCR_MAX_STEPS);
+    - no download, gerando um PDF final compacto (cacheado por versão).
+• O diário (<sessão>/journal.jsonl) registra op, modo, tamanho e detalhes;
+  cada entrada vira uma versão em edit_versions (desfazer/refazer).
+• Gravação + diário + versão acontecem sob edit_versions.session_lock (flock
+  por sessão), então um save e um desfazer de workers diferentes não se cruzam.
+
+ENV:
+  EDIT_INCREMENTAL       -> "1"/"0" liga/desliga saves incrementais (default 1)
+  EDIT_INCR_MAX_RATIO    -> cauda máxima em relação à base (default 0.5 = +50%)
+  EDIT_INCR_MAX_STEPS    -> nº máximo de incrementos seguidos (default 25)
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from .edit_versions import session_lock
+
+logger = logging.getLogger(__name__)
+
+FINAL_SUBDIR = "_final"
+
+Sanitizer = Callable[[str, str], None]
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    v = os.environ.get(name)
+    if v is None:
+        return default
+    return v.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def journal_path(session_dir: str) -> str:
+    return os.path.join(session_dir, "journal.jsonl")
+
+
+def read_journal(session_dir: str) -> List[Dict[str, Any]]:
+    entries = []
+    try:
+        with open(journal_path(session_dir), "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        pass
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def record(session_dir: str, op: str, mode: str, cur_path: str,
+           detail: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Acrescenta uma entrada ao diário (mode: upload | incremental | full | restore)
+    e, salvo em restore, registra o estado resultante no histórico de versões.
+    """
+    with session_lock(session_dir):
+        entry = {
+            "seq": len(read_journal(session_dir)) + 1,
+            "ts": round(time.time(), 3),
+            "op": op,
+            "mode": mode,
+            "size": os.path.getsize(cur_path) if os.path.exists(cur_path) else None,
+        }
+        if detail:
+            entry["detail"] = detail
+        with open(journal_path(session_dir), "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        if mode != "restore" and os.path.exists(cur_path):
+            try:
+                from . import edit_versions
+                edit_versions.snapshot(session_dir, cur_path, op, tail=_tail_state(session_dir, cur_path))
+            except Exception as e:
+                logger.warning("Falha ao registrar versão da sessão (%s).", type(e).__name__)
+    return entry
+
+
+def _tail_state(session_dir: str, cur_path: str) -> Dict[str, int]:
+    """Tamanho da base (último save completo) e incrementos desde então."""
+    base, steps = 0, 0
+    for e in read_journal(session_dir):
+        if e.get("mode") == "incremental":
+            steps += 1
+        elif e.get("mode") == "restore":  # desfazer/refazer: herda a cauda da versão
+            d = e.get("detail") or {}
+            base, steps = int(d.get("base") or e.get("size") or 0), int(d.get("steps") or 0)
+        else:
+            base, steps = int(e.get("size") or 0), 0
+    size = os.path.getsize(cur_path)
+    if not base or size < base:  # arquivo trocado por fora (ex.: OCR assíncrono)
+        base, steps = size, 0
+    return {"base": base, "steps": steps, "size": size}
+
+
+def _needs_compaction(session_dir: str, cur_path: str, extra: int = 0) -> bool:
+    st = _tail_state(session_dir, cur_path)
+    max_ratio = _env_float("EDIT_INCR_MAX_RATIO", 0.5)
+    max_steps = int(_env_float("EDIT_INCR_MAX_STEPS", 25))
+    tail = st["size"] + extra - st["base"]
+    return st["steps"] >= max_steps or tail > st["base"] * max_ratio
+
+
+def _full_save(doc, paths: Dict[str, str], sanitize: Sanitizer) -> None:
+    tmp_out = os.path.join(paths["dir"], f"tmp_{uuid.uuid4().hex[:10]}.pdf")
+    doc.save(tmp_out, deflate=True, garbage=3, clean=True, incremental=False)
+    sanitize(tmp_out, paths["cur"])
+
+
+def commit(doc, paths: Dict[str, str], *, op: str, sanitize: Sanitizer,
+           safe_incremental: bool = True, detail: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Persiste as alterações de 'doc' (aberto a partir de paths["cur"]).
+    Retorna o modo usado: "incremental" ou "full".
+    """
+    with session_lock(paths["dir"]):
+        incremental = (
+            safe_incremental
+            and _env_bool("EDIT_INCREMENTAL", True)
+            and getattr(doc, "name", None)
+            and os.path.abspath(doc.name) == os.path.abspath(paths["cur"])
+            and doc.can_save_incrementally()
+            and not _needs_compaction(paths["dir"], paths["cur"])
+        )
+        mode = "full"
+        if incremental:
+            try:
+                doc.saveIncr()
+                mode = "incremental"
+                if _needs_compaction(paths["dir"], paths["cur"]):
+                    # a própria edição estourou a cauda: compacta já
+                    _full_save(doc, paths, sanitize)
+                    mode = "full"
+            except Exception as e:
+                logger.warning("Save incremental falhou (%s); reescrevendo completo.", type(e).__name__)
+                _full_save(doc, paths, sanitize)
+        else:
+            _full_save(doc, paths, sanitize)
+
+        record(paths["dir"], op, mode, paths["cur"], detail)
+    return mode
+
+
+def has_pending_tail(session_dir: str, cur_path: str) -> bool:
+    return _tail_state(session_dir, cur_path)["steps"] > 0
+
+
+def finalize(paths: Dict[str, str], *, sanitize: Sanitizer) -> str:
+    """
+    Caminho do PDF para download: o próprio current.pdf se não houver cauda
+    incremental; senão uma cópia compacta e sanitizada (cacheada por versão).
+    """
+    if not has_pending_tail(paths["dir"], paths["cur"]):
+        return paths["cur"]
+
+    from .edit_render_cache import doc_version
+    import fitz
+
+    version = doc_version(paths["cur"])
+    final_dir = os.path.join(paths["dir"], FINAL_SUBDIR)
+    final_path = os.path.join(final_dir, f"{version}.pdf")
+    if os.path.exists(final_path):
+        return final_path
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.makedirs(final_dir, exist_ok=True)
+    tmp_out = os.path.join(final_dir, f"tmp_{uuid.uuid4().hex[:10]}.pdf")
+    with fitz.open(paths["cur"]) as doc:
+        doc.save(tmp_out, deflate=True, garbage=3, clean=True, incremental=False)
+    sanitize(tmp_out, final_path)
+    return final_path
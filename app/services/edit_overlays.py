@@ -0,0 +1,120 @@
+# app/services/edit_overlays.py
+# -*- coding: utf-8 -*-
+"""
+Inserção de imagens de overlay (assinaturas, carimbos, logos) no editor.
+
+• Cada imagem distinta é lida do disco e embutida UMA vez por documento;
+  as demais colocações referenciam o mesmo XObject (xref).
+• Por página: a primeira colocação de cada imagem passa por insert_image
+  (registra o recurso e "embrulha" o conteúdo original em q/Q); as seguintes
+  viram só "q <matriz> cm /<nome> Do Q", acumuladas e gravadas num único
+  stream de conteúdo no flush(). Antes de um novo insert_image na página, as
+  pendentes são gravadas, preservando a ordem de empilhamento.
+• Mesma semântica de insert_image(keep_proportion=False, rotate=0/90/180/270):
+  o retângulo é em coordenadas da página sem rotação.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[str], Optional[bytes]]
+
+
+def _placement_matrix(page, rect, rotate: int) -> Tuple[float, ...]:
+    """Matriz 'cm' que leva o quadrado unitário da imagem até 'rect' (espaço PDF)."""
+    r = fitz.Rect(rect) * ~page.transformation_matrix  # -> espaço PDF (y para cima)
+    x0, y0, x1, y1 = r.x0, r.y0, r.x1, r.y1
+    w, h = x1 - x0, y1 - y0
+    rotate %= 360
+    if rotate == 90:
+        return (0, h, -w, 0, x1, y0)
+    if rotate == 180:
+        return (-w, 0, 0, -h, x1, y1)
+    if rotate == 270:
+        return (0, -h, w, 0, x0, y1)
+    return (w, 0, 0, h, x0, y0)
+
+
+def _append_contents(page, data: bytes) -> int:
+    """Acrescenta 'data' como novo stream em /Contents da página (por cima)."""
+    doc = page.parent
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, data)
+    kind, val = doc.xref_get_key(page.xref, "Contents")
+    if kind == "array":
+        refs = val.strip()[1:-1].strip()
+    elif kind == "xref":
+        refs = val
+    else:
+        refs = ""
+    doc.xref_set_key(page.xref, "Contents", f"[{refs} {xref} 0 R]".replace("[ ", "["))
+    return xref
+
+
+class ImagePlacer:
+    """Coloca imagens de overlay reaproveitando o XObject entre colocações e páginas."""
+
+    def __init__(self, doc, loader: Loader):
+        self.doc = doc
+        self._load = loader
+        self._xrefs: Dict[str, int] = {}                  # image_id -> xref do XObject
+        self._names: Dict[Tuple[int, int], str] = {}      # (page.xref, img xref) -> /Nome
+        self._pending: Dict[int, List[str]] = {}          # page.number -> operadores
+        self._missing = set()
+        self.placed = 0
+
+    def place(self, page, image_id: str, rect, rotate: int = 0) -> bool:
+        """Agenda a colocação; False se a imagem não existe/não pôde ser lida."""
+        rotate = int(rotate or 0) % 360
+        if rotate not in (0, 90, 180, 270):
+            rotate = 0
+        xref = self._xrefs.get(image_id)
+        if xref is None:
+            if image_id in self._missing:
+                return False
+            data = self._load(image_id)
+            if not data:
+                self._missing.add(image_id)
+                return False
+            self._flush_page(page.number)
+            xref = page.insert_image(rect, stream=data, keep_proportion=False, rotate=rotate)
+            self._xrefs[image_id] = xref
+            self._remember_name(page, xref)
+        elif (page.xref, xref) not in self._names:
+            # primeira vez nesta página: registra o recurso (sem reenviar os bytes)
+            self._flush_page(page.number)
+            page.insert_image(rect, xref=xref, keep_proportion=False, rotate=rotate)
+            self._remember_name(page, xref)
+        else:
+            m = _placement_matrix(page, rect, rotate)
+            op = "q {} cm /{} Do Q\n".format(
+                " ".join(f"{v:g}" for v in m), self._names[(page.xref, xref)]
+            )
+            self._pending.setdefault(page.number, []).append(op)
+        self.placed += 1
+        return True
+
+    def _remember_name(self, page, xref: int) -> None:
+        for item in page.get_images(full=True):
+            if item[0] == xref:
+                self._names[(page.xref, xref)] = item[7]
+                return
+
+    def _flush_page(self, pno: int) -> None:
+        ops = self._pending.pop(pno, None)
+        if ops:
+            _append_contents(self.doc[pno], "".join(ops).encode("latin-1"))
+
+    def flush(self) -> None:
+        """Grava as colocações pendentes: um stream de conteúdo por página."""
+        for pno in list(self._pending):
+            self._flush_page(pno)
+
+    def stats(self) -> Dict[str, int]:
+        return {"unique": len(self._xrefs), "placed": self.placed}
@@ -0,0 +1,118 @@
+# app/services/edit_render_cache.py
+# -*- coding: utf-8 -*-
+"""
+Cache de renderização das páginas do editor (/api/edit/page-image).
+
+• Chave = (versão do documento, página, escala efetiva); a versão deriva de
+  inode/mtime/tamanho do current.pdf, então qualquer edição (que substitui o
+  arquivo) invalida tudo sem precisar de hooks em cada rota.
+• Vive dentro da pasta da sessão (<sessão>/_render): some junto no /api/edit/close.
+• Versões antigas são apagadas no primeiro acesso após a troca; cada sessão tem
+  teto de bytes (LRU por mtime).
+
+ENV:
+  EDIT_RENDER_CACHE_MAX_MB -> teto por sessão (default 64; 0 desliga o cache)
+"""
+from __future__ import annotations
+
+import os
+import hashlib
+import logging
+from typing import Callable, Optional, Tuple
+
+from ..utils import disk_cache
+
+logger = logging.getLogger(__name__)
+
+RENDER_SUBDIR = "_render"
+
+
+def _max_bytes() -> int:
+    try:
+        return max(0, int(os.environ.get("EDIT_RENDER_CACHE_MAX_MB", "64") or 64)) * 1024 * 1024
+    except Exception:
+        return 64 * 1024 * 1024
+
+
+def doc_version(path: str) -> str:
+    """Identificador curto da revisão do arquivo (muda a cada os.replace/escrita)."""
+    st = os.stat(path)
+    raw = f"{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+    return hashlib.sha1(raw.encode("ascii")).hexdigest()[:16]
+
+
+def etag_for(version: str, *parts) -> str:
+    """ETag forte (sem aspas) ligada à versão do documento."""
+    suffix = "-".join(str(p) for p in parts)
+    return f"{version}-{suffix}" if suffix else version
+
+
+def _cache_dir(session_dir: str) -> str:
+    return os.path.join(session_dir, RENDER_SUBDIR)
+
+
+def _entry_name(version: str, key: str, ext: str) -> str:
+    return f"{version}_{key}.{ext}"
+
+
+def _drop_stale(cdir: str, version: str) -> None:
+    """Remove renders de versões anteriores do documento."""
+    prefix = f"{version}_"
+    try:
+        with os.scandir(cdir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith(prefix):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+    except FileNotFoundError:
+        pass
+
+
+def get_or_render(session_dir: str, version: str, key: str, ext: str,
+                  render: Callable[[], bytes]) -> Tuple[bytes, bool]:
+    """
+    Devolve (bytes, veio_do_cache). 'key' identifica página/escala (e o que mais
+    mudar o resultado); 'render' só é chamado em caso de falta.
+    """
+    cap = _max_bytes()
+    if cap <= 0:
+        return render(), False
+
+    cdir = _cache_dir(session_dir)
+    path = os.path.join(cdir, _entry_name(version, key, ext))
+    if disk_cache.touch(path):
+        try:
+            with open(path, "rb") as fh:
+                return fh.read(), True
+        except OSError:
+            pass
+
+    data = render()
+    try:
+        os.makedirs(cdir, exist_ok=True)
+        _drop_stale(cdir, version)
+        if len(data) <= cap:
+            tmp = os.path.join(cdir, f".tmp_{os.getpid()}_{os.path.basename(path)}")
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+            disk_cache.enforce_budget(cdir, cap)
+    except OSError as e:
+        logger.debug("Cache de render indisponível: %s", e)
+    return data, False
+
+
+def usage(session_dir: str) -> Tuple[int, int]:
+    return disk_cache.dir_usage(_cache_dir(session_dir))
+
+
+def invalidate(session_dir: str, keep_version: Optional[str] = None) -> None:
+    """Apaga o cache da sessão (ou tudo menos 'keep_version')."""
+    cdir = _cache_dir(session_dir)
+    if keep_version:
+        _drop_stale(cdir, keep_version)
+        return
+    import shutil
+    shutil.rmtree(cdir, ignore_errors=True)
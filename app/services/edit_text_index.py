@@ -0,0 +1,264 @@
+# app/services/edit_text_index.py
+# -*- coding: utf-8 -*-
+"""
+Índice de texto por versão do documento da sessão do editor (busca e
+"redigir todas as ocorrências").
+
+• Construído UMA vez por versão (doc_version: inode/mtime/tamanho do
+  current.pdf): qualquer edição troca a versão e o índice velho é descartado.
+• Compacto: arrays (módulo array) com página, linha e caixa de cada palavra,
+  mais um texto normalizado (minúsculas, sem acentos) com o início de cada
+  palavra — a busca é str.find + bisect, sem reabrir o PDF.
+• Persistido em <sessão>/_text/<versão>.idx (zlib) para ser reaproveitado
+  entre workers; cache em memória dos últimos índices por worker.
+• Coordenadas: as de page.get_text("words") (página sem rotação), as mesmas
+  que add_redact_annot espera.
+
+ENV:
+  EDIT_TEXT_INDEX_CACHE  -> índices mantidos em memória por worker (default 4)
+  EDIT_SEARCH_MAX_HITS   -> teto de ocorrências por busca (default 1000)
+"""
+from __future__ import annotations
+
+import os
+import io
+import json
+import zlib
+import struct
+import logging
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUBDIR = "_text"
+_MAGIC = b"GVTX1\n"
+
+_MEM: "OrderedDict[Tuple[str, str], TextIndex]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados (vale para índice e consulta)."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    plain = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(plain.split())
+
+
+class TextIndex:
+    """Palavras do documento: page_start[p]..page_start[p+1] são as da página p."""
+
+    __slots__ = ("page_start", "line", "boxes", "starts", "text")
+
+    def __init__(self, page_start: array, line: array, boxes: array, starts: array, text: str):
+        self.page_start = page_start  # 'I', n_pages + 1
+        self.line = line              # 'I', id global de linha por palavra
+        self.boxes = boxes            # 'f', 4 por palavra (x0, y0, x1, y1)
+        self.starts = starts          # 'I', offset da palavra em 'text'
+        self.text = text              # palavras normalizadas separadas por espaço
+
+    @property
+    def pages(self) -> int:
+        return len(self.page_start) - 1
+
+    @property
+    def words(self) -> int:
+        return len(self.starts)
+
+    def page_of(self, word: int) -> int:
+        return bisect_right(self.page_start, word) - 1
+
+    # ---------- busca ----------
+    def _at_word_bounds(self, pos: int, end: int) -> bool:
+        """O trecho [pos, end) não começa nem termina no meio de uma palavra."""
+        text = self.text
+        return (pos == 0 or not text[pos - 1].isalnum()) and (end >= len(text) or not text[end].isalnum())
+
+    def search(self, query: str, *, pages: Optional[set] = None,
+               max_hits: Optional[int] = None,
+               whole_words: bool = False) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Ocorrências de 'query' (frase; sem diferenciar maiúsculas/acentos).
+        Cada hit: page_index (0-based), rects (um por linha, cobrindo as palavras
+        inteiras) e trecho encontrado. Retorna (hits, truncado).
+        whole_words=True ignora ocorrências no meio de uma palavra ("ana" não
+        casa com "Mariana") — como os rects cobrem a palavra inteira, é o modo
+        seguro para redigir.
+        """
+        needle = normalize(query)
+        if not needle:
+            return [], False
+        limit = max_hits if max_hits is not None else max(1, _env_int("EDIT_SEARCH_MAX_HITS", 1000))
+
+        hits: List[Dict[str, Any]] = []
+        pos = self.text.find(needle)
+        while pos >= 0:
+            if whole_words and not self._at_word_bounds(pos, pos + len(needle)):
+                pos = self.text.find(needle, pos + 1)
+                continue
+            first = bisect_right(self.starts, pos) - 1
+            last = bisect_right(self.starts, pos + len(needle) - 1) - 1
+            by_page: Dict[int, List[List[float]]] = {}
+            cur_line, rect = None, None
+            for w in range(first, last + 1):
+                b = self.boxes[4 * w: 4 * w + 4]
+                if self.line[w] != cur_line:
+                    rect = [b[0], b[1], b[2], b[3]]
+                    by_page.setdefault(self.page_of(w), []).append(rect)
+                    cur_line = self.line[w]
+                else:
+                    rect[0], rect[1] = min(rect[0], b[0]), min(rect[1], b[1])
+                    rect[2], rect[3] = max(rect[2], b[2]), max(rect[3], b[3])
+            for pno, rects in by_page.items():
+                if pages is not None and pno not in pages:
+                    continue
+                if len(hits) >= limit:
+                    return hits, True
+                hits.append({
+                    "page_index": pno,
+                    "rects": [[round(v, 2) for v in r] for r in rects],
+                    "text": self.text[pos: pos + len(needle)],
+                })
+            pos = self.text.find(needle, pos + 1)
+        return hits, False
+
+    # ---------- serialização ----------
+    def to_bytes(self) -> bytes:
+        header = json.dumps({"pages": self.pages, "words": self.words}).encode("ascii")
+        buf = io.BytesIO()
+        buf.write(struct.pack("<I", len(header)))
+        buf.write(header)
+        for arr in (self.page_start, self.line, self.starts, self.boxes):
+            buf.write(arr.tobytes())
+        buf.write(self.text.encode("utf-8"))
+        return _MAGIC + zlib.compress(buf.getvalue(), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TextIndex":
+        if not data.startswith(_MAGIC):
+            raise ValueError("índice inválido")
+        raw = memoryview(zlib.decompress(data[len(_MAGIC):]))
+        (hlen,) = struct.unpack_from("<I", raw, 0)
+        header = json.loads(bytes(raw[4:4 + hlen]))
+        off = 4 + hlen
+
+        def _take(typecode: str, count: int) -> array:
+            nonlocal off
+            arr = array(typecode)
+            size = arr.itemsize * count
+            arr.frombytes(raw[off: off + size])
+            off += size
+            return arr
+
+        n_pages, n_words = header["pages"], header["words"]
+        page_start = _take("I", n_pages + 1)
+        line = _take("I", n_words)
+        starts = _take("I", n_words)
+        boxes = _take("f", 4 * n_words)
+        return cls(page_start, line, boxes, starts, bytes(raw[off:]).decode("utf-8"))
+
+
+def build(doc, check: Optional[Callable[[], None]] = None) -> TextIndex:
+    """Extrai as palavras de todas as páginas (uma passada só)."""
+    page_start, line, boxes, starts = array("I", [0]), array("I"), array("f"), array("I")
+    parts: List[str] = []
+    offset = 0
+    line_id = 0
+    for page in doc:
+        if check is not None:
+            check()
+        last_key = None
+        for x0, y0, x1, y1, word, block_no, line_no, _wno in page.get_text("words"):
+            norm = normalize(word)
+            if not norm:
+                continue
+            key = (block_no, line_no)
+            if key != last_key:
+                line_id += 1
+                last_key = key
+            line.append(line_id)
+            boxes.extend((x0, y0, x1, y1))
+            starts.append(offset)
+            parts.append(norm)
+            offset += len(norm) + 1
+        page_start.append(len(starts))
+    return TextIndex(page_start, line, boxes, starts, " ".join(parts))
+
+
+def _index_dir(session_dir: str) -> str:
+    return os.path.join(session_dir, INDEX_SUBDIR)
+
+
+def _remember(key: Tuple[str, str], index: TextIndex) -> None:
+    with _LOCK:
+        _MEM[key] = index
+        _MEM.move_to_end(key)
+        # só a versão atual de cada sessão interessa
+        for other in [k for k in _MEM if k[0] == key[0] and k != key]:
+            del _MEM[other]
+        while len(_MEM) > max(0, _env_int("EDIT_TEXT_INDEX_CACHE", 4)):
+            _MEM.popitem(last=False)
+
+
+def get_index(session_dir: str, version: str, open_doc: Callable[[], Any],
+              check: Optional[Callable[[], None]] = None) -> Tuple[TextIndex, bool]:
+    """
+    Índice da versão 'version' (memória > disco > construção). 'open_doc' é um
+    context manager que empresta o documento só se for preciso construir.
+    Retorna (índice, veio_pronto).
+    """
+    key = (session_dir, version)
+    with _LOCK:
+        index = _MEM.get(key)
+        if index is not None:
+            _MEM.move_to_end(key)
+            return index, True
+
+    path = os.path.join(_index_dir(session_dir), f"{version}.idx")
+    try:
+        with open(path, "rb") as fh:
+            index = TextIndex.from_bytes(fh.read())
+        _remember(key, index)
+        return index, True
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug("Índice de texto ilegível (%s); reconstruindo.", type(e).__name__)
+
+    with open_doc() as doc:
+        index = build(doc, check)
+    _remember(key, index)
+    try:
+        idir = _index_dir(session_dir)
+        os.makedirs(idir, exist_ok=True)
+        for name in os.listdir(idir):  # versões antigas não servem mais
+            if name != f"{version}.idx":
+                try:
+                    os.remove(os.path.join(idir, name))
+                except OSError:
+                    pass
+        tmp = os.path.join(idir, f".tmp_{os.getpid()}_{version}.idx")
+        with open(tmp, "wb") as fh:
+            fh.write(index.to_bytes())
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.debug("Não foi possível persistir o índice de texto: %s", e)
+    return index, False
+
+
+def forget(session_dir: str) -> None:
+    """Descarta os índices em memória da sessão (ex.: /api/edit/close)."""
+    with _LOCK:
+        for key in [k for k in _MEM if k[0] == session_dir]:
+            del _MEM[key]
@@ -0,0 +1,290 @@
+# app/services/edit_versions.py
+# -*- coding: utf-8 -*-
+"""
+Histórico de versões das sessões do editor (desfazer/refazer/ir para versão).
+
+• Com saves incrementais (edit_engine) cada versão é um PREFIXO do arquivo:
+  a versão N é (base, nº de bytes). A base é um hardlink do current.pdf em
+  <sessão>/_versions — enquanto as edições só acrescentam bytes, todas as
+  versões apontam para o mesmo inode e não existe cópia alguma.
+• Reescritas completas (redação, compactação, OCR) trocam o inode do
+  current.pdf; aí a base antiga fica só no histórico e um novo hardlink vira
+  a base das próximas versões.
+• Voltar a uma versão recria o current.pdf a partir do prefixo via reflink
+  quando o FS suporta (clone_file), senão cópia; editar depois de desfazer
+  descarta o ramo de refazer.
+• Cota por sessão: as versões mais antigas saem primeiro (a atual nunca).
+• session_lock(): flock em <sessão>/.lock serializa histórico e diário entre
+  threads E processos (gunicorn com vários workers); reentrante na thread.
+
+ENV:
+  EDIT_VERSIONS          -> "1"/"0" liga/desliga o histórico (default 1)
+  EDIT_VERSIONS_MAX      -> nº máximo de versões guardadas (default 50)
+  EDIT_VERSIONS_MAX_MB   -> bytes máximos das bases por sessão (default 200)
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: serializa só dentro do processo
+    fcntl = None
+
+from ..utils.disk_cache import clone_file, link_or_clone
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_SUBDIR = "_versions"
+LOCK_NAME = ".lock"
+_FALLBACK_LOCK = threading.RLock()
+_HELD = threading.local()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+@contextmanager
+def session_lock(session_dir: str) -> Iterator[None]:
+    """
+    Exclusão mútua por sessão (flock). Reentrante: quem já segura o lock na
+    mesma thread (ex.: jump -> edit_engine.record) não bloqueia de novo.
+    """
+    held = getattr(_HELD, "dirs", None)
+    if held is None:
+        held = _HELD.dirs = set()
+    key = os.path.abspath(session_dir)
+    if key in held:
+        yield
+        return
+    if fcntl is None:
+        with _FALLBACK_LOCK:
+            held.add(key)
+            try:
+                yield
+            finally:
+                held.discard(key)
+        return
+    fd = os.open(os.path.join(session_dir, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+    finally:
+        os.close(fd)  # fechar o descritor libera o flock
+
+
+def enabled() -> bool:
+    return os.environ.get("EDIT_VERSIONS", "1").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _vdir(session_dir: str) -> str:
+    return os.path.join(session_dir, VERSIONS_SUBDIR)
+
+
+def _index_path(session_dir: str) -> str:
+    return os.path.join(_vdir(session_dir), "index.json")
+
+
+def _load(session_dir: str) -> Dict[str, Any]:
+    try:
+        with open(_index_path(session_dir), "r", encoding="utf-8") as fh:
+            idx = json.load(fh)
+        if isinstance(idx, dict) and isinstance(idx.get("versions"), list):
+            return idx
+    except (FileNotFoundError, ValueError):
+        pass
+    return {"next": 1, "head": None, "versions": []}
+
+
+def _save(session_dir: str, idx: Dict[str, Any]) -> None:
+    path = _index_path(session_dir)
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.part"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(idx, fh, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _pos(idx: Dict[str, Any], version: Optional[int]) -> int:
+    for i, v in enumerate(idx["versions"]):
+        if v["v"] == version:
+            return i
+    return -1
+
+
+def _same_inode(a: str, b: str) -> bool:
+    try:
+        sa, sb = os.stat(a), os.stat(b)
+    except OSError:
+        return False
+    return (sa.st_dev, sa.st_ino) == (sb.st_dev, sb.st_ino)
+
+
+def _prune_bases(session_dir: str, idx: Dict[str, Any]) -> None:
+    """Apaga bases que nenhuma versão referencia mais."""
+    used = {v["base"] for v in idx["versions"]}
+    try:
+        names = os.listdir(_vdir(session_dir))
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith("b") and name.endswith(".pdf") and name not in used:
+            try:
+                os.remove(os.path.join(_vdir(session_dir), name))
+            except OSError:
+                pass
+
+
+def _bases_bytes(session_dir: str, idx: Dict[str, Any]) -> int:
+    seen, total = set(), 0
+    for v in idx["versions"]:
+        try:
+            st = os.stat(os.path.join(_vdir(session_dir), v["base"]))
+        except OSError:
+            continue
+        if (st.st_dev, st.st_ino) not in seen:
+            seen.add((st.st_dev, st.st_ino))
+            total += st.st_size
+    return total
+
+
+def _enforce_quota(session_dir: str, idx: Dict[str, Any]) -> None:
+    max_versions = max(1, _env_int("EDIT_VERSIONS_MAX", 50))
+    max_bytes = max(0, _env_int("EDIT_VERSIONS_MAX_MB", 200)) * 1024 * 1024
+    versions = idx["versions"]
+    while len(versions) > 1 and versions[0]["v"] != idx["head"]:
+        if len(versions) <= max_versions and _bases_bytes(session_dir, idx) <= max_bytes:
+            break
+        versions.pop(0)
+        _prune_bases(session_dir, idx)
+
+
+def snapshot(session_dir: str, cur_path: str, op: str,
+             tail: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+    """Registra o estado atual do current.pdf como nova versão (após uma edição)."""
+    if not enabled() or not os.path.exists(cur_path):
+        return None
+    with session_lock(session_dir):
+        os.makedirs(_vdir(session_dir), exist_ok=True)
+        idx = _load(session_dir)
+
+        # editar depois de desfazer descarta o ramo de refazer
+        head = _pos(idx, idx["head"])
+        if head < len(idx["versions"]) - 1:
+            del idx["versions"][head + 1:]
+            _prune_bases(session_dir, idx)
+
+        base = None
+        for v in reversed(idx["versions"]):
+            if _same_inode(os.path.join(_vdir(session_dir), v["base"]), cur_path):
+                base = v["base"]
+                break
+        if base is None:
+            base = f"b{idx['next']}.pdf"
+            link_or_clone(cur_path, os.path.join(_vdir(session_dir), base))
+
+        entry = {
+            "v": idx["next"],
+            "op": op,
+            "ts": round(time.time(), 3),
+            "base": base,
+            "length": os.path.getsize(cur_path),
+            "tail": tail or {},
+        }
+        idx["versions"].append(entry)
+        idx["next"] += 1
+        idx["head"] = entry["v"]
+        _enforce_quota(session_dir, idx)
+        _save(session_dir, idx)
+        return entry
+
+
+def history(session_dir: str) -> Dict[str, Any]:
+    idx = _load(session_dir)
+    head = _pos(idx, idx["head"])
+    return {
+        "head": idx["head"],
+        "versions": [
+            {"version": v["v"], "op": v["op"], "ts": v["ts"], "size": v["length"]}
+            for v in idx["versions"]
+        ],
+        "can_undo": head > 0,
+        "can_redo": 0 <= head < len(idx["versions"]) - 1,
+        "bytes": _bases_bytes(session_dir, idx),
+    }
+
+
+def jump(paths: Dict[str, str], version: int) -> Dict[str, Any]:
+    """
+    Torna 'version' a versão atual: recria o current.pdf a partir do prefixo
+    da base. Levanta KeyError se a versão não existe (ou já saiu pela cota).
+    """
+    session_dir, cur_path = paths["dir"], paths["cur"]
+    with session_lock(session_dir):
+        idx = _load(session_dir)
+        pos = _pos(idx, version)
+        if pos < 0:
+            raise KeyError(version)
+        entry = idx["versions"][pos]
+        base_path = os.path.join(_vdir(session_dir), entry["base"])
+
+        unchanged = _same_inode(base_path, cur_path) and os.path.getsize(cur_path) == entry["length"]
+        if not unchanged:
+            tmp = os.path.join(session_dir, f"tmp_{uuid.uuid4().hex[:10]}.pdf")
+            try:
+                method = clone_file(base_path, tmp, entry["length"])
+                os.replace(tmp, cur_path)
+            except Exception:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+            logger.debug("Versão %s restaurada (%s).", version, method)
+
+        idx["head"] = entry["v"]
+        _save(session_dir, idx)
+
+        # o diário precisa saber o tamanho da cauda incremental da versão restaurada
+        from . import edit_engine
+        tail = entry.get("tail") or {}
+        edit_engine.record(session_dir, "restore", "restore", cur_path, {
+            "version": entry["v"],
+            "base": int(tail.get("base") or 0),
+            "steps": int(tail.get("steps") or 0),
+        })
+    return entry
+
+
+def _step(paths: Dict[str, str], delta: int) -> Optional[Dict[str, Any]]:
+    with session_lock(paths["dir"]):
+        idx = _load(paths["dir"])
+        pos = _pos(idx, idx["head"])
+        target = pos + delta
+        if pos < 0 or not (0 <= target < len(idx["versions"])):
+            return None
+        return jump(paths, idx["versions"][target]["v"])
+
+
+def undo(paths: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Volta uma versão; None se não há o que desfazer."""
+    return _step(paths, -1)
+
+
+def redo(paths: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Avança uma versão; None se não há o que refazer."""
+    return _step(paths, +1)
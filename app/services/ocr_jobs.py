@@ -0,0 +1,428 @@
+# app/services/ocr_jobs.py
+# -*- coding: utf-8 -*-
+"""
+Fila persistente de OCR assíncrono (SQLite, sem broker externo).
+
+• submit_job() grava a entrada em <dir>/<id>/in.pdf e enfileira; retorna na hora.
+• Workers locais (threads em cada worker gunicorn ou `python -m app.services.ocr_jobs`)
+  reivindicam jobs com lease: se o processo morrer (restart do gunicorn, OOM),
+  o heartbeat para e o job volta para a fila quando o lease expira.
+• O OCR em si continua rodando em subprocesso sandboxado (ocr_service).
+• Status traz estado, progresso (0..1) e ETA estimado pelo histórico s/página.
+• Cada job guarda o dono (id de saída da sessão); status/resultado só para ele.
+• Jobs com 'apply' (ex.: OCR assíncrono do editor) gravam o resultado num
+  arquivo temporário do destino e, ao final, chamam o aplicador registrado
+  (APPLIERS). Se o destino mudou nesse meio-tempo, o aplicador levanta
+  JobConflict e o job termina como 'conflict' (nada é sobrescrito).
+
+ENV:
+  OCR_JOBS_DIR            -> diretório da fila (default UPLOAD_FOLDER/_ocr_jobs)
+  OCR_JOBS_WORKERS        -> workers (threads) por processo web (default 1; 0 = só worker externo)
+  OCR_JOB_LEASE           -> segundos sem heartbeat até o job ser reassumido (default 60)
+  OCR_JOB_MAX_ATTEMPTS    -> tentativas antes de marcar 'failed' (default 2)
+  OCR_JOB_TTL_HOURS       -> retenção de jobs concluídos/resultados (default 24)
+  OCR_JOB_SEC_PER_PAGE    -> estimativa inicial de segundos por página (default 3)
+"""
+from __future__ import annotations
+
+import os
+import hmac
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+import importlib
+import threading
+from typing import Any, Dict, Optional
+
+from werkzeug.exceptions import BadRequest
+
+from ..utils import disk_cache
+
+logger = logging.getLogger(__name__)
+
+JOBS_SUBDIR = "_ocr_jobs"
+STATES = ("queued", "running", "done", "failed", "conflict")
+_FINISHED = ("done", "failed", "conflict")
+
+# tipo de 'apply' -> "módulo:função(resultado, spec)" (import tardio: também roda no worker avulso)
+APPLIERS = {
+    "edit": "app.routes.edit:apply_ocr_job_result",
+}
+
+
+class JobConflict(RuntimeError):
+    """O destino do resultado mudou enquanto o job rodava; nada foi aplicado."""
+
+# opções repassadas para ocr_pdf_path (o resto é ignorado)
+_OPTION_KEYS = (
+    "lang", "force", "skip_text", "optimize", "deskew", "rotate_pages",
+    "clean", "jobs", "timeout", "mem_mb", "allow_invalidate_sig",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    state       TEXT NOT NULL,
+    created     REAL NOT NULL,
+    started     REAL,
+    finished    REAL,
+    heartbeat   REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    pages       INTEGER NOT NULL DEFAULT 0,
+    pages_done  INTEGER NOT NULL DEFAULT 0,
+    options     TEXT NOT NULL,
+    sha256      TEXT,
+    owner       TEXT,
+    apply       TEXT,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state_created ON jobs(state, created);
+"""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def jobs_dir() -> str:
+    return disk_cache.cache_dir(JOBS_SUBDIR, "OCR_JOBS_DIR")
+
+
+def _connect(base_dir: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(base_dir, "jobs.sqlite3"), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _job_paths(base_dir: str, job_id: str) -> Dict[str, str]:
+    d = os.path.join(base_dir, job_id)
+    return {"dir": d, "in": os.path.join(d, "in.pdf"), "out": os.path.join(d, "out.pdf")}
+
+
+def is_valid_job_id(job_id: str) -> bool:
+    return isinstance(job_id, str) and len(job_id) == 32 and all(c in "0123456789abcdef" for c in job_id)
+
+
+# ---------------- API usada pelas rotas ----------------
+def submit_job(src_path: str, *, options: Optional[Dict[str, Any]] = None,
+               owner: Optional[str] = None, apply: Optional[Dict[str, Any]] = None,
+               move: bool = False, base_dir: Optional[str] = None) -> str:
+    """
+    Enfileira o OCR de 'src_path' para o dono 'owner'. Com 'apply'
+    ({"kind": <APPLIERS>, "tmp": <arquivo de saída>, ...}) o resultado é
+    gravado em apply["tmp"] e entregue ao aplicador ao final.
+    """
+    if apply is not None and (apply.get("kind") not in APPLIERS or not apply.get("tmp")):
+        raise ValueError("apply inválido")
+    from ..utils.limits import enforce_pdf_page_limit
+    from .ocr_service import ocr_cache_dir
+
+    base_dir = base_dir or jobs_dir()
+    pages = enforce_pdf_page_limit(src_path, label=os.path.basename(src_path))
+
+    job_id = uuid.uuid4().hex
+    paths = _job_paths(base_dir, job_id)
+    os.makedirs(paths["dir"], exist_ok=True)
+    if move:
+        shutil.move(src_path, paths["in"])
+    else:
+        shutil.copyfile(src_path, paths["in"])
+
+    opts = {k: v for k, v in (options or {}).items() if k in _OPTION_KEYS and v is not None}
+    # resolvido aqui (com o app ativo): o worker roda sem contexto e cairia no <tmp>
+    opts["cache_dir"] = ocr_cache_dir()
+    conn = _connect(base_dir)
+    try:
+        conn.execute(
+            "INSERT INTO jobs(id, state, created, pages, options, sha256, owner, apply) "
+            "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, time.time(), pages, json.dumps(opts),
+             disk_cache.sha256_file(paths["in"]), owner,
+             json.dumps(apply) if apply else None),
+        )
+    finally:
+        conn.close()
+
+    purge_expired(base_dir)
+    ensure_workers(base_dir)
+    return job_id
+
+
+def _seconds_per_page(conn: sqlite3.Connection) -> float:
+    row = conn.execute(
+        "SELECT SUM(finished - started), SUM(pages) FROM ("
+        " SELECT finished, started, pages FROM jobs WHERE state='done' AND pages > 0"
+        " AND started IS NOT NULL ORDER BY finished DESC LIMIT 20)"
+    ).fetchone()
+    if row and row[0] and row[1]:
+        return max(0.05, float(row[0]) / float(row[1]))
+    return float(_env_int("OCR_JOB_SEC_PER_PAGE", 3))
+
+
+def _owned(row: sqlite3.Row, owner: Optional[str]) -> bool:
+    if owner is None:
+        return True  # chamada interna (sem sessão envolvida)
+    return bool(row["owner"]) and hmac.compare_digest(str(row["owner"]), str(owner))
+
+
+def get_status(job_id: str, *, owner: Optional[str] = None,
+               base_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Status do job; None se não existe ou (com 'owner') pertence a outra sessão."""
+    base_dir = base_dir or jobs_dir()
+    conn = _connect(base_dir)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is None or not _owned(row, owner):
+            return None
+        spp = _seconds_per_page(conn)
+        ahead = 0
+        if row["state"] == "queued":
+            ahead = conn.execute(
+                "SELECT COALESCE(SUM(pages), 0) FROM jobs WHERE state IN ('queued', 'running') AND created < ?",
+                (row["created"],),
+            ).fetchone()[0]
+    finally:
+        conn.close()
+
+    now = time.time()
+    pages = max(1, int(row["pages"] or 1))
+    status: Dict[str, Any] = {
+        "job_id": job_id,
+        "state": row["state"],
+        "pages": row["pages"],
+        "attempts": row["attempts"],
+        "progress": 0.0,
+        "eta_seconds": None,
+        "error": row["error"],
+    }
+    if row["state"] == "done":
+        status["progress"] = 1.0
+        status["eta_seconds"] = 0
+        status["elapsed_seconds"] = round((row["finished"] or now) - (row["started"] or now), 1)
+    elif row["state"] == "running":
+        elapsed = max(0.0, now - (row["started"] or now))
+        estimate = spp * pages
+        by_pages = (row["pages_done"] or 0) / pages
+        by_time = min(0.95, elapsed / estimate) if estimate else 0.0
+        status["progress"] = round(max(by_pages, by_time), 3)
+        status["eta_seconds"] = int(max(1.0, estimate - elapsed))
+        status["elapsed_seconds"] = round(elapsed, 1)
+    elif row["state"] == "queued":
+        status["eta_seconds"] = int(spp * (ahead + pages))
+    return status
+
+
+def result_path(job_id: str, *, owner: Optional[str] = None,
+                base_dir: Optional[str] = None) -> Optional[str]:
+    """Caminho do PDF pronto (None se ainda não terminou, já expirou ou foi aplicado no destino)."""
+    base_dir = base_dir or jobs_dir()
+    status = get_status(job_id, owner=owner, base_dir=base_dir)
+    if not status or status["state"] != "done":
+        return None
+    out = _job_paths(base_dir, job_id)["out"]
+    return out if os.path.isfile(out) else None
+
+
+def purge_expired(base_dir: Optional[str] = None) -> int:
+    """Remove jobs concluídos/falhos além do TTL (linha + arquivos)."""
+    base_dir = base_dir or jobs_dir()
+    cutoff = time.time() - _env_int("OCR_JOB_TTL_HOURS", 24) * 3600
+    conn = _connect(base_dir)
+    try:
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM jobs WHERE state IN ('done', 'failed', 'conflict') AND finished < ?", (cutoff,)
+        )]
+        for job_id in ids:
+            shutil.rmtree(_job_paths(base_dir, job_id)["dir"], ignore_errors=True)
+            conn.execute("DELETE FROM jobs WHERE id=?", (job_id,))
+    finally:
+        conn.close()
+    return len(ids)
+
+
+# ---------------- execução ----------------
+def claim_next(base_dir: str) -> Optional[sqlite3.Row]:
+    """
+    Reivindica o job mais antigo na fila (ou um 'running' com lease vencido).
+    BEGIN IMMEDIATE serializa os workers de todos os processos.
+    """
+    lease = _env_int("OCR_JOB_LEASE", 60)
+    max_attempts = max(1, _env_int("OCR_JOB_MAX_ATTEMPTS", 2))
+    now = time.time()
+    conn = _connect(base_dir)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE jobs SET state='failed', finished=?, error=? "
+            "WHERE state='running' AND heartbeat < ? AND attempts >= ?",
+            (now, "O processamento foi interrompido repetidas vezes.", now - lease, max_attempts),
+        )
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE state='queued' OR (state='running' AND heartbeat < ?) "
+            "ORDER BY created LIMIT 1",
+            (now - lease,),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        if row["state"] == "running":
+            logger.warning("OCR job %s: lease expirado, reassumindo.", row["id"])
+        conn.execute(
+            "UPDATE jobs SET state='running', started=?, heartbeat=?, attempts=attempts+1, pages_done=0 "
+            "WHERE id=?",
+            (now, now, row["id"]),
+        )
+        conn.execute("COMMIT")
+        return row
+    except Exception:
+        try:
+            conn.execute("ROLLBACK")
+        except Exception:
+            pass
+        raise
+    finally:
+        conn.close()
+
+
+def run_job(base_dir: str, row: sqlite3.Row) -> None:
+    """Executa um job reivindicado, mantendo o heartbeat enquanto o OCR roda."""
+    from .ocr_service import ocr_pdf_path
+
+    job_id = row["id"]
+    paths = _job_paths(base_dir, job_id)
+    lease = _env_int("OCR_JOB_LEASE", 60)
+    stop = threading.Event()
+    state = {"pages_done": 0}
+
+    def _beat():
+        while not stop.wait(max(1.0, lease / 3.0)):
+            try:
+                conn = _connect(base_dir)
+                try:
+                    conn.execute("UPDATE jobs SET heartbeat=?, pages_done=? WHERE id=? AND state='running'",
+                                 (time.time(), state["pages_done"], job_id))
+                finally:
+                    conn.close()
+            except Exception as e:
+                logger.debug("OCR job %s: heartbeat falhou: %s", job_id, e)
+
+    def _progress(done: int, total: int) -> None:
+        state["pages_done"] = done
+
+    beat = threading.Thread(target=_beat, name=f"ocr-job-beat-{job_id[:8]}", daemon=True)
+    beat.start()
+    apply = json.loads(row["apply"]) if row["apply"] else None
+    tmp_out = apply["tmp"] if apply else paths["out"] + ".part"
+    final, error = "done", None
+    try:
+        ocr_pdf_path(paths["in"], tmp_out, content_sha256=row["sha256"], progress=_progress,
+                     **json.loads(row["options"] or "{}"))
+        if apply:
+            _applier(apply["kind"])(tmp_out, apply)
+        else:
+            os.replace(tmp_out, paths["out"])
+    except JobConflict as e:
+        final, error = "conflict", str(e) or "O destino mudou; resultado descartado."
+    except BadRequest as e:
+        final, error = "failed", e.description or "OCR falhou."
+    except Exception as e:
+        logger.exception("OCR job %s falhou", job_id)
+        final, error = "failed", f"OCR falhou: {type(e).__name__}"
+    finally:
+        stop.set()
+        beat.join(timeout=5)
+        if os.path.exists(tmp_out):
+            try:
+                os.remove(tmp_out)
+            except OSError:
+                pass
+
+    conn = _connect(base_dir)
+    try:
+        conn.execute(
+            "UPDATE jobs SET state=?, finished=?, heartbeat=?, pages_done=?, error=? WHERE id=?",
+            (final, time.time(), time.time(),
+             row["pages"] if final == "done" else state["pages_done"], error, job_id),
+        )
+    finally:
+        conn.close()
+    try:
+        os.remove(paths["in"])
+    except OSError:
+        pass
+    try:
+        from ..utils.stats import record_job_event
+        done_out = final == "done" and os.path.exists(paths["out"])
+        record_job_event(route="/api/ocr/jobs", action="ocr-job", bytes_in=None,
+                         bytes_out=(os.path.getsize(paths["out"]) if done_out else None),
+                         files_out=(1 if final == "done" else 0), ok=final == "done")
+    except Exception:
+        pass
+
+
+def _applier(kind: str):
+    module, _sep, func = APPLIERS[kind].partition(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def work_once(base_dir: str) -> bool:
+    """Processa um job, se houver. Retorna True se algo foi executado."""
+    row = claim_next(base_dir)
+    if row is None:
+        return False
+    run_job(base_dir, row)
+    return True
+
+
+def worker_loop(base_dir: str, stop: Optional[threading.Event] = None, poll: float = 1.0) -> None:
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            if work_once(base_dir):
+                continue
+        except Exception as e:
+            logger.warning("Worker de OCR: %s", e)
+        stop.wait(poll)
+
+
+# workers em thread por processo (recriados após fork do gunicorn)
+_WORKERS: Dict[str, Any] = {"pid": None, "threads": []}
+_WORKERS_LOCK = threading.Lock()
+
+
+def ensure_workers(base_dir: Optional[str] = None) -> int:
+    """Sobe (uma vez por processo) OCR_JOBS_WORKERS threads consumindo a fila."""
+    n = _env_int("OCR_JOBS_WORKERS", 1)
+    if n <= 0:
+        return 0
+    base_dir = base_dir or jobs_dir()
+    with _WORKERS_LOCK:
+        if _WORKERS["pid"] != os.getpid():
+            _WORKERS["pid"] = os.getpid()
+            _WORKERS["threads"] = []
+        alive = [t for t in _WORKERS["threads"] if t.is_alive()]
+        for i in range(len(alive), n):
+            t = threading.Thread(target=worker_loop, args=(base_dir,),
+                                 name=f"ocr-job-worker-{i}", daemon=True)
+            t.start()
+            alive.append(t)
+        _WORKERS["threads"] = alive
+        return len(alive)
+
+
+if __name__ == "__main__":  # worker avulso: python -m app.services.ocr_jobs <dir>
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        sys.exit("uso: python -m app.services.ocr_jobs <OCR_JOBS_DIR>")
+    os.makedirs(sys.argv[1], exist_ok=True)
+    worker_loop(sys.argv[1])
@@ -20,6 +20,12 @@ ENV:
   OCR_TIMEOUT             -> timeout em segundos (default 300)
   OCR_MEM_MB              -> limite de RAM em MB (default 1024)
   OCR_JOBS                -> paralelismo (default "1")
+  OCR_SHARD_PAGES         -> páginas por bloco no OCR fatiado (default 20; 0 desliga)
+  OCR_SHARD_WORKERS       -> blocos simultâneos por documento (default 2)
+  OCR_SHARD_MAX_WORKERS   -> teto global de ocrmypdf simultâneos no processo (default nº de CPUs)
+  OCR_CACHE               -> "1"/"0" liga/desliga o cache de resultados (default 1)
+  OCR_CACHE_DIR           -> diretório do cache (default UPLOAD_FOLDER/_ocr_cache)
+  OCR_CACHE_MAX_MB        -> orçamento em disco do cache, LRU (default 512)
   OCR_CLEAN               -> "1"/"0" para forçar habilitar/desabilitar --clean
   OCR_ON_SIGNED           -> "block" (padrão) | "ask" | "invalidate"
   TESSERACT_PREFIX / TESSERACT_PATH -> diretório do Tesseract (Windows)
@@ -29,17 +35,23 @@ from __future__ import annotations
 
 import os
 import sys
+import json
 import shlex
+import hashlib
 import shutil
 import tempfile
 import logging
+import threading
 import subprocess
-from typing import Optional, Set, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Set, List
 
 import pikepdf  # <- usado p/ checar assinatura
 from werkzeug.datastructures import FileStorage
 from werkzeug.exceptions import BadRequest
 
+from ..utils import capabilities, disk_cache
 from ..utils.limits import enforce_pdf_page_limit
 from .sanitize_service import sanitize_pdf
 
@@ -142,19 +154,14 @@ def _inject_tesseract_into_env(env: dict) -> dict:
 
 # ---- unpaper detection ----
 def _has_unpaper() -> bool:
-    if shutil.which("unpaper"):
-        return True
-    for p in (
-        r"C:\ProgramData\chocolatey\bin\unpaper.exe",
-        r"C:\Program Files\unpaper\unpaper.exe",
-    ):
-        if os.path.exists(p):
-            return True
-    return False
+    return capabilities.has("unpaper")
 
 # ---- pngquant detection (para --optimize 2/3) ----
 def _has_pngquant(env_path: str) -> bool:
-    return shutil.which("pngquant", path=env_path or os.environ.get("PATH", "")) is not None
+    if capabilities.has("pngquant"):
+        return True
+    # No Windows o PATH do OCR inclui pastas extras (Chocolatey etc.)
+    return os.name == "nt" and shutil.which("pngquant", path=env_path or "") is not None
 
 # ---- assinatura digital ----
 def _pdf_has_digital_signature(path: str) -> bool:
@@ -184,6 +191,11 @@ def _pdf_has_digital_signature(path: str) -> bool:
 
 # ---- idiomas do Tesseract ----
 def _available_tesseract_langs(env: dict) -> Set[str]:
+    langs = capabilities.tesseract_langs()
+    if langs:
+        return set(langs)
+    if os.name != "nt":
+        return set()  # registro já sondou e não achou Tesseract/idiomas
     try:
         res = subprocess.run(
             ["tesseract", "--list-langs"],
@@ -240,6 +252,125 @@ def _run_ocr(args: List[str], *, timeout: int, mem_mb: int):
         return run_in_sandbox(args, timeout=timeout, cpu_seconds=timeout, mem_mb=mem_mb)
 
 
+# ---- OCR fatiado (shards de páginas em paralelo) ----
+_SHARD_SLOTS: Optional[threading.BoundedSemaphore] = None
+_SHARD_SLOTS_LOCK = threading.Lock()
+
+def _shard_slots() -> threading.BoundedSemaphore:
+    """Teto global (por processo) de ocrmypdf simultâneos, somando todas as requisições."""
+    global _SHARD_SLOTS
+    with _SHARD_SLOTS_LOCK:
+        if _SHARD_SLOTS is None:
+            cap = _env_int("OCR_SHARD_MAX_WORKERS", max(1, os.cpu_count() or 1))
+            _SHARD_SLOTS = threading.BoundedSemaphore(max(1, cap))
+        return _SHARD_SLOTS
+
+_PAGE_SWAP_KEYS = ("/Contents", "/Resources", "/MediaBox", "/CropBox", "/Rotate", "/UserUnit")
+
+def _ocr_sharded(safe_in: str, out_path: str, run_ocr_to: Callable[[str, str], None], *,
+                 n_pages: int, shard_pages: int, workers: int,
+                 progress: Optional[Callable[[int, int], None]] = None) -> None:
+    """
+    Divide o PDF em blocos de 'shard_pages' páginas, roda um ocrmypdf por bloco
+    (cada um com seu próprio limite de memória no sandbox) e costura o resultado
+    no documento original: o objeto de cada página é mantido e só conteúdo,
+    recursos e caixas são trocados, preservando ordem, metadados, outline e links.
+    """
+    ranges = [(a, min(a + shard_pages, n_pages)) for a in range(0, n_pages, shard_pages)]
+    tmp_dir = tempfile.mkdtemp(prefix="gvpdf_ocr_")
+    slots = _shard_slots()
+    try:
+        with pikepdf.open(safe_in) as src:
+            for k, (a, b) in enumerate(ranges):
+                with pikepdf.new() as part:
+                    for i in range(a, b):
+                        part.pages.append(src.pages[i])
+                    part.save(os.path.join(tmp_dir, f"in_{k:04d}.pdf"))
+
+        done, done_lock = [0], threading.Lock()
+
+        def _run_shard(k: int) -> str:
+            src_k = os.path.join(tmp_dir, f"in_{k:04d}.pdf")
+            dst_k = os.path.join(tmp_dir, f"out_{k:04d}.pdf")
+            with slots:
+                run_ocr_to(src_k, dst_k)
+            if progress is not None:
+                a, b = ranges[k]
+                with done_lock:
+                    done[0] += b - a
+                    pages_done = done[0]
+                try:
+                    progress(pages_done, n_pages)
+                except Exception:
+                    pass
+            return dst_k
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ranges)))) as pool:
+            outputs = list(pool.map(_run_shard, range(len(ranges))))  # ordem preservada
+        logger.info("OCR fatiado: %d páginas em %d blocos (%.1fs)",
+                    n_pages, len(ranges), time.perf_counter() - t0)
+
+        with pikepdf.open(safe_in) as base:
+            for (a, b), dst_k in zip(ranges, outputs):
+                with pikepdf.open(dst_k) as done:
+                    if len(done.pages) != b - a:
+                        raise BadRequest("OCR devolveu um número de páginas inesperado.")
+                    for offset, ocr_page in enumerate(done.pages):
+                        foreign = base.copy_foreign(ocr_page.obj)
+                        target = base.pages[a + offset].obj
+                        for key in _PAGE_SWAP_KEYS:
+                            if key in foreign:
+                                target[key] = foreign[key]
+                            elif key in target:
+                                del target[key]
+            base.save(out_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# ---- cache de resultados (endereçado por conteúdo + opções + versões) ----
+OCR_CACHE_SUBDIR = "_ocr_cache"
+
+def _tool_version(name: str) -> str:
+    """Versão registrada no start (registro de capacidades); vazio se indisponível."""
+    return capabilities.tool(name).get("version") or ""
+
+def _ocr_cache_key(content_sha256: str, **options) -> str:
+    payload = dict(options)
+    payload["input"] = content_sha256
+    payload["ocrmypdf"] = _tool_version("ocrmypdf")
+    payload["tesseract"] = _tool_version("tesseract")
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def ocr_cache_dir() -> str:
+    """Diretório do cache de OCR; resolva com o app ativo (workers sem contexto recebem pronto)."""
+    return disk_cache.cache_dir(OCR_CACHE_SUBDIR, "OCR_CACHE_DIR")
+
+def _ocr_cache_path(key: str, cache_dir: Optional[str] = None) -> str:
+    return os.path.join(cache_dir or ocr_cache_dir(), f"{key}.pdf")
+
+def _ocr_cache_fetch(key: str, out_path: str, cache_dir: Optional[str] = None) -> bool:
+    path = _ocr_cache_path(key, cache_dir)
+    if not disk_cache.touch(path):
+        return False
+    try:
+        shutil.copyfile(path, out_path)
+        return True
+    except OSError:
+        return False
+
+def _ocr_cache_store(key: str, produced_path: str, cache_dir: Optional[str] = None) -> None:
+    try:
+        path = _ocr_cache_path(key, cache_dir)
+        disk_cache.publish_atomic(produced_path, path)
+        budget = max(0, _env_int("OCR_CACHE_MAX_MB", 512)) * 1024 * 1024
+        disk_cache.enforce_budget(os.path.dirname(path), budget, suffix=".pdf")
+    except Exception as e:
+        logger.warning("Falha ao gravar no cache de OCR: %s", e)
+
+
 # ---------------- núcleo ----------------
 def ocr_pdf_path(
     in_path: str,
@@ -256,10 +387,23 @@ def ocr_pdf_path(
     timeout: Optional[int] = None,
     mem_mb: Optional[int] = None,
     allow_invalidate_sig: Optional[bool] = None,  # <- novo
+    content_sha256: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cache_dir: Optional[str] = None,
 ) -> str:
     """
     Executa OCR no PDF informado. Sanitiza entrada/saída.
 
+    • progress(páginas_prontas, total) é chamado a cada bloco concluído (OCR fatiado)
+      e ao final; usado pelos jobs assíncronos para status/ETA.
+
+    • cache_dir: diretório do cache já resolvido (jobs rodam fora do contexto do
+      app, onde UPLOAD_FOLDER não é visível); None = resolve agora.
+
+    • Resultado em cache por SHA-256 da entrada + opções efetivas + versões de
+      ocrmypdf/Tesseract. O cache é consultado antes de sanitizar a entrada (só
+      uma falta paga a sanitização); acertos também passam pela de saída.
+
     • Se o PDF tiver assinatura digital:
         - OCR_ON_SIGNED=block (padrão): recusa e explica.
         - OCR_ON_SIGNED=ask: recusa com mensagem própria p/ confirmação no front.
@@ -272,21 +416,12 @@ def ocr_pdf_path(
         raise BadRequest("out_path deve ser diferente do in_path.")
 
     _ensure_parent_dir(out_path)
-    enforce_pdf_page_limit(in_path, label=os.path.basename(in_path))
 
     # Estratégia para PDFs assinados
     on_signed = _env_str("OCR_ON_SIGNED", "block").lower()
     if allow_invalidate_sig is None:
         allow_invalidate_sig = on_signed in {"invalidate", "force", "true", "1", "yes"}
 
-    # Sanitiza entrada (remove JS etc) — não remove assinatura
-    safe_in = _unique_tmp(".pdf")
-    try:
-        sanitize_pdf(in_path, safe_in)
-        logger.info("Sanitização pikepdf OK (entrada).")
-    except Exception:
-        shutil.copyfile(in_path, safe_in)
-
     # Se o arquivo (original) tem assinatura e a política não permite invalidar,
     # já interrompe com mensagem clara.
     if _pdf_has_digital_signature(in_path) and not allow_invalidate_sig:
@@ -332,7 +467,7 @@ def ocr_pdf_path(
         logger.warning("pngquant não encontrado no PATH. Usando --optimize 1.")
         opt = 1
 
-    def build_args(opt_level: int, invalidate_sig: bool) -> List[str]:
+    def build_args(opt_level: int, invalidate_sig: bool, src: str, dst: str) -> List[str]:
         a = cmd + [
             "--output-type", "pdf",
             "--optimize", str(opt_level),
@@ -350,32 +485,26 @@ def ocr_pdf_path(
             a.append("--force-ocr")
         elif skip_text:
             a.append("--skip-text")
-        a.extend([safe_in, out_path])
+        a.extend([src, dst])
         return a
 
-    args = build_args(opt, allow_invalidate_sig)
-    logger.info("OCR cmd: %r", args)
-
-    try:
-        proc = _run_ocr(args, timeout=to, mem_mb=mem)
-    except subprocess.TimeoutExpired:
-        try: os.remove(safe_in)
-        except Exception: pass
-        raise BadRequest("OCR excedeu o tempo limite (timeout).")
-    except FileNotFoundError as e:
-        try: os.remove(safe_in)
-        except Exception: pass
-        raise BadRequest(f"Falha ao iniciar OCR: {e}")
-    except Exception as e:
-        try: os.remove(safe_in)
-        except Exception: pass
-        raise BadRequest(f"OCR falhou ao iniciar: {e}")
+    def run_ocr_to(src: str, dst: str) -> None:
+        """Um processo ocrmypdf (src → dst), com diagnóstico e fallback de pngquant."""
+        args = build_args(opt, allow_invalidate_sig, src, dst)
+        logger.info("OCR cmd: %r", args)
+        try:
+            proc = _run_ocr(args, timeout=to, mem_mb=mem)
+        except subprocess.TimeoutExpired:
+            raise BadRequest("OCR excedeu o tempo limite (timeout).")
+        except FileNotFoundError as e:
+            raise BadRequest(f"Falha ao iniciar OCR: {e}")
+        except Exception as e:
+            raise BadRequest(f"OCR falhou ao iniciar: {e}")
 
-    try:
         rc = getattr(proc, "returncode", 1)
         out = (getattr(proc, "stdout", "") or "")
         err = (getattr(proc, "stderr", "") or "")
-        if rc != 0 or not os.path.exists(out_path):
+        if rc != 0 or not os.path.exists(dst):
             msg = (err.strip() or out.strip())[:1500]
             low = msg.lower()
 
@@ -391,12 +520,12 @@ def ocr_pdf_path(
             need_pngquant = ("pngquant" in low) or rc == 3
             if opt >= 2 and need_pngquant:
                 logger.warning("Falha possivelmente por pngquant. Tentando novamente com --optimize 1.")
-                args2 = build_args(1, allow_invalidate_sig)
+                args2 = build_args(1, allow_invalidate_sig, src, dst)
                 proc2 = _run_ocr(args2, timeout=to, mem_mb=mem)
                 rc2 = getattr(proc2, "returncode", 1)
                 out2 = (getattr(proc2, "stdout", "") or "")
                 err2 = (getattr(proc2, "stderr", "") or "")
-                if rc2 == 0 and os.path.exists(out_path) and os.path.getsize(out_path) > 0:
+                if rc2 == 0 and os.path.exists(dst) and os.path.getsize(dst) > 0:
                     logger.info("OCR concluído (fallback optimize=1).")
                 else:
                     msg2 = (err2.strip() or out2.strip())[:1500]
@@ -420,14 +549,55 @@ def ocr_pdf_path(
             else:
                 raise BadRequest(f"OCR falhou (rc={rc}). {msg}")
 
-    finally:
+    cache_key = None
+    if _env_bool("OCR_CACHE", True):
         try:
-            os.remove(safe_in)
-        except Exception:
-            pass
+            cache_key = _ocr_cache_key(
+                content_sha256 or disk_cache.sha256_file(in_path),
+                langs=langs, force=bool(force), skip_text=bool(skip_text), deskew=bool(deskew),
+                rotate_pages=bool(rotate_pages), clean=bool(clean), optimize=opt,
+                invalidate_sig=bool(allow_invalidate_sig),
+            )
+        except Exception as e:
+            logger.debug("Chave do cache de OCR indisponível: %s", e)
+
+    n_pages = 0
+    if cache_key and _ocr_cache_fetch(cache_key, out_path, cache_dir):
+        # acerto: a entrada nem é sanitizada (a saída passa pelas checagens abaixo)
+        logger.info("OCR: resultado reaproveitado do cache (%s).", cache_key[:12])
+    else:
+        n_pages = enforce_pdf_page_limit(in_path, label=os.path.basename(in_path))
+
+        # Sanitiza entrada (remove JS etc) — não remove assinatura
+        safe_in = _unique_tmp(".pdf")
+        try:
+            try:
+                sanitize_pdf(in_path, safe_in)
+                logger.info("Sanitização pikepdf OK (entrada).")
+            except Exception:
+                shutil.copyfile(in_path, safe_in)
+
+            shard_pages = _env_int("OCR_SHARD_PAGES", 20)
+            shard_workers = _env_int("OCR_SHARD_WORKERS", 2)
+            sharded = (
+                shard_pages > 0 and shard_workers > 1 and n_pages > shard_pages
+                and not _pdf_has_digital_signature(safe_in)
+            )
+            if sharded:
+                _ocr_sharded(safe_in, out_path, run_ocr_to, n_pages=n_pages,
+                             shard_pages=shard_pages, workers=shard_workers, progress=progress)
+            else:
+                run_ocr_to(safe_in, out_path)
+            if cache_key:
+                _ocr_cache_store(cache_key, out_path, cache_dir)
+        finally:
+            try:
+                os.remove(safe_in)
+            except Exception:
+                pass
 
     # Sanitiza saída
-    enforce_pdf_page_limit(out_path, label="PDF pós-OCR")
+    n_pages = enforce_pdf_page_limit(out_path, label="PDF pós-OCR") or n_pages
     try:
         safe_out = _unique_tmp(".pdf")
         sanitize_pdf(out_path, safe_out)
@@ -435,6 +605,11 @@ def ocr_pdf_path(
     except Exception:
         pass
 
+    if progress is not None:
+        try:
+            progress(n_pages, n_pages)
+        except Exception:
+            pass
     return out_path
 
 
@@ -454,17 +629,26 @@ def ocr_upload_file(
     allow_invalidate_sig: Optional[bool] = None,  # <- novo
 ) -> str:
     """Recebe um upload, executa OCR e retorna o caminho absoluto do PDF output."""
+    import uuid
+    from flask import current_app
     from ..utils.config_utils import validate_upload, ensure_upload_folder_exists, secure_filename
 
     try:
-        validate_upload(upload, allowed_exts={"pdf"}, allowed_mimetypes={"application/pdf"})
-    except TypeError:
-        validate_upload(upload, {"pdf"}, {"application/pdf"})
-
-    upload_dir = ensure_upload_folder_exists()
-    in_name = secure_filename(upload.filename or "arquivo.pdf")
-    in_tmp = os.path.join(upload_dir, f"up_{in_name}")
-    upload.save(in_tmp)
+        in_name = secure_filename(validate_upload(upload, {"pdf"}))
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    upload_dir = current_app.config.get("UPLOAD_FOLDER", os.path.join(os.getcwd(), "uploads"))
+    ensure_upload_folder_exists(upload_dir)
+    in_tmp = os.path.join(upload_dir, f"up_{uuid.uuid4().hex}_{in_name}")
+
+    # grava e já calcula o SHA-256 (chave do cache) numa única passada
+    digest = hashlib.sha256()
+    upload.stream.seek(0)
+    with open(in_tmp, "wb") as fh:
+        for chunk in iter(lambda: upload.stream.read(1024 * 1024), b""):
+            digest.update(chunk)
+            fh.write(chunk)
 
     base_out = os.path.join(upload_dir, f"ocr_{os.path.splitext(in_name)[0]}")
     out_tmp = base_out + ".pdf"
@@ -480,6 +664,7 @@ def ocr_upload_file(
             deskew=deskew, rotate_pages=rotate_pages, clean=clean,
             jobs=jobs, timeout=timeout, mem_mb=mem_mb,
             allow_invalidate_sig=allow_invalidate_sig,
+            content_sha256=digest.hexdigest(),
         )
     finally:
         try:
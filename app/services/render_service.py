@@ -0,0 +1,308 @@
+# app/services/render_service.py
+# -*- coding: utf-8 -*-
+"""
+Serviço único de renderização de páginas (pypdfium2) com pool de processos.
+
+• N processos fixos (um executor de 1 processo por "slot"); cada documento vai
+  sempre para o mesmo slot (hash do caminho), que mantém os documentos usados
+  recentemente ABERTOS — renders seguidos do mesmo PDF não reabrem/reparseiam.
+• pdfium não é thread-safe: dentro de cada processo há uma só thread de render;
+  no modo sem pool (RENDER_WORKERS=0) tudo passa por um lock global.
+• Documentos abertos são revalidados por (inode, mtime, tamanho): arquivo
+  substituído -> reabre.
+• Timeout por chamada: o processo travado é morto e o slot recriado. Teto de
+  memória por processo via RLIMIT_AS e teto de pixels por imagem.
+
+API (páginas 1-based):
+  render(path, page, scale=1.0, fmt="png", ...)        -> bytes
+  render_batch(path, pages, scale=1.0, fmt="png", ...) -> [bytes, ...] (mesmo processo, documento aberto uma vez)
+  page_count(path)                                     -> int
+  routes(name)                                         -> endpoint usa o serviço?
+
+ENV:
+  RENDER_WORKERS            -> processos do pool (default min(4, CPUs); 0 = render no próprio processo)
+  RENDER_DOCS_PER_WORKER    -> documentos mantidos abertos por processo (default 8)
+  RENDER_TIMEOUT_SEC        -> timeout por chamada (default 30)
+  RENDER_BATCH_PAGES        -> páginas por tarefa em render_batch (default 16; o timeout vale por tarefa)
+  RENDER_WORKER_MEM_MB      -> RLIMIT_AS de cada processo (default 1536; 0 = sem teto)
+  RENDER_MAX_PIXELS         -> pixels máximos por imagem; a escala é reduzida (default 40000000)
+  RENDER_SERVICE_FOR        -> endpoints roteados pelo serviço (default "preview,analyze";
+                               opções: preview, analyze, edit)
+  RENDER_MP_START           -> método de início (default "forkserver" no POSIX, "spawn" no Windows)
+"""
+from __future__ import annotations
+
+import io
+import os
+import zlib
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from werkzeug.exceptions import BadRequest, NotFound
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("png", "jpeg", "webp", "ppm")
+
+_SLOTS: Dict[int, ProcessPoolExecutor] = {}
+_SLOTS_LOCK = threading.Lock()
+_LOCAL_LOCK = threading.Lock()
+
+
+class RenderTimeout(RuntimeError):
+    """Render passou de RENDER_TIMEOUT_SEC (o processo foi reciclado)."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except Exception:
+        return default
+
+
+def workers() -> int:
+    return max(0, _env_int("RENDER_WORKERS", min(4, max(1, os.cpu_count() or 1))))
+
+
+def routes(name: str) -> bool:
+    raw = os.environ.get("RENDER_SERVICE_FOR", "preview,analyze")
+    return name in {p.strip().lower() for p in raw.split(",") if p.strip()}
+
+
+# ------------------------------------------------------------------
+# Lado do processo de render
+# ------------------------------------------------------------------
+_DOCS: "OrderedDict[str, Tuple[Tuple[int, int, int], object]]" = OrderedDict()
+
+
+def _init_worker(mem_mb: int) -> None:
+    if mem_mb > 0:
+        try:
+            import resource
+            limit = mem_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except Exception:
+            pass
+
+
+def _open(path: str):
+    """Documento aberto (cache LRU por processo, revalidado por inode/mtime/tamanho)."""
+    import pypdfium2 as pdfium
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise NotFound("Arquivo PDF não encontrado.")
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _DOCS.get(path)
+    if cached is not None and cached[0] == key:
+        _DOCS.move_to_end(path)
+        return cached[1]
+    if cached is not None:
+        _close(_DOCS.pop(path)[1])
+    # arquivos já apagados não seguram descritor (nem espaço em disco)
+    for stale in [p for p in _DOCS if not os.path.exists(p)]:
+        _close(_DOCS.pop(stale)[1])
+
+    doc = pdfium.PdfDocument(path)
+    _DOCS[path] = (key, doc)
+    limit = max(1, _env_int("RENDER_DOCS_PER_WORKER", 8))
+    while len(_DOCS) > limit:
+        _close(_DOCS.popitem(last=False)[1][1])
+    return doc
+
+
+def _close(doc) -> None:
+    try:
+        doc.close()
+    except Exception:
+        pass
+
+
+def _encode(pil, fmt: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "png":
+        pil.save(buf, format="PNG", compress_level=6)
+    elif fmt == "jpeg":
+        pil.convert("RGB").save(buf, format="JPEG", quality=quality, optimize=True)
+    elif fmt == "webp":
+        pil.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        pil.convert("RGB").save(buf, format="PPM")
+    return buf.getvalue()
+
+
+def _render_one(doc, page: int, opts: dict) -> bytes:
+    from PIL import Image
+
+    if page < 1 or page > len(doc):
+        raise NotFound("Página inválida.")
+    pg = doc[page - 1]
+    try:
+        w, h = pg.get_size()  # pdfium já devolve o tamanho de exibição (/Rotate aplicado)
+        scale = float(opts.get("scale") or 1.0)
+        if opts.get("width"):
+            scale = float(opts["width"]) / max(1.0, w)
+        box = opts.get("fit")
+        if box:
+            scale = min(float(box[0]) / max(1.0, w), float(box[1]) / max(1.0, h))
+
+        crop = (0, 0, 0, 0)
+        clip = opts.get("clip")  # (x0, y0, x1, y1) em pontos, origem no topo (como fitz.page.rect)
+        if clip:
+            x0, y0 = max(0.0, clip[0]), max(0.0, clip[1])
+            x1, y1 = min(w, clip[2]), min(h, clip[3])
+            if x1 <= x0 or y1 <= y0:
+                raise BadRequest("Tile fora da página.")
+            crop = (x0, h - y1, w - x1, y0)
+            w, h = x1 - x0, y1 - y0
+
+        max_pixels = max(1, _env_int("RENDER_MAX_PIXELS", 40_000_000))
+        if (w * scale) * (h * scale) > max_pixels:
+            scale = (max_pixels / (w * h)) ** 0.5
+        max_side = opts.get("max_side")
+        if max_side and max(w, h) * scale > max_side:
+            scale = float(max_side) / max(w, h)
+
+        pil = pg.render(scale=scale, crop=crop, may_draw_forms=True).to_pil()
+        if pil.mode not in ("RGB", "L"):
+            pil = pil.convert("RGB")
+        width = opts.get("width")
+        if width and not clip and pil.width != int(width):
+            pil = pil.resize((int(width), max(1, round(pil.height * int(width) / pil.width))), Image.LANCZOS)
+        return _encode(pil, opts.get("fmt", "png"), int(opts.get("quality") or 80))
+    finally:
+        pg.close()
+
+
+def _task(path: str, pages: Sequence[int], opts: dict) -> List[bytes]:
+    doc = _open(path)
+    return [_render_one(doc, int(p), opts) for p in pages]
+
+
+def _task_page_count(path: str) -> int:
+    return len(_open(path))
+
+
+# ------------------------------------------------------------------
+# Lado do servidor
+# ------------------------------------------------------------------
+def _slot_for(path: str, n: int) -> int:
+    return zlib.crc32(os.path.abspath(path).encode("utf-8", "surrogateescape")) % n
+
+
+def _get_slot(index: int) -> ProcessPoolExecutor:
+    with _SLOTS_LOCK:
+        ex = _SLOTS.get(index)
+        if ex is None:
+            method = (os.environ.get("RENDER_MP_START") or "").strip()
+            if not method:
+                method = "forkserver" if os.name == "posix" else "spawn"
+            ex = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_init_worker,
+                initargs=(max(0, _env_int("RENDER_WORKER_MEM_MB", 1536)),),
+            )
+            _SLOTS[index] = ex
+        return ex
+
+
+def _discard_slot(index: int, kill: bool = False) -> None:
+    with _SLOTS_LOCK:
+        ex = _SLOTS.pop(index, None)
+    if ex is None:
+        return
+    if kill:
+        for proc in list(getattr(ex, "_processes", {}).values()):
+            try:
+                proc.kill()
+            except Exception:
+                pass
+    ex.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown() -> None:
+    """Encerra todos os processos do pool (testes / desligamento do processo)."""
+    for index in list(_SLOTS):
+        _discard_slot(index)
+    with _LOCAL_LOCK:
+        while _DOCS:
+            _close(_DOCS.popitem()[1][1])
+
+
+def _call(path: str, fn, *args):
+    n = workers()
+    if n <= 0:
+        with _LOCAL_LOCK:
+            return fn(path, *args)
+
+    timeout = max(1, _env_int("RENDER_TIMEOUT_SEC", 30))
+    index = _slot_for(path, n)
+    try:
+        future = _get_slot(index).submit(fn, path, *args)
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        logger.warning("[render] timeout de %ss; reciclando processo %d", timeout, index)
+        _discard_slot(index, kill=True)
+        raise RenderTimeout("Renderização excedeu o tempo limite.")
+    except BrokenProcessPool:
+        # tipicamente MemoryError/SIGKILL no filho (RLIMIT_AS): recria na próxima chamada
+        logger.error("[render] processo %d caiu; será recriado.", index)
+        _discard_slot(index)
+        raise RuntimeError("Falha no processo de renderização.")
+
+
+def _options(scale, fmt, quality, width, fit, clip, max_side) -> dict:
+    fmt = (fmt or "png").lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    if fmt not in FORMATS:
+        raise BadRequest(f"Formato de imagem inválido: {fmt}")
+    return {
+        "scale": float(scale or 1.0),
+        "fmt": fmt,
+        "quality": max(30, min(95, int(quality or 80))),
+        "width": int(width) if width else None,
+        "fit": tuple(fit) if fit else None,
+        "clip": tuple(float(v) for v in clip) if clip else None,
+        "max_side": float(max_side) if max_side else None,
+    }
+
+
+def render(path: str, page: int, scale: float = 1.0, fmt: str = "png", *,
+           quality: int = 80, width: Optional[int] = None, fit: Optional[Tuple[int, int]] = None,
+           clip: Optional[Tuple[float, float, float, float]] = None,
+           max_side: Optional[float] = None) -> bytes:
+    """
+    Renderiza a página 'page' (1-based) já com a rotação /Rotate aplicada.
+      scale    -> px por ponto PDF; 'width' (largura fixa) ou 'fit' (caixa w×h) têm precedência
+      clip     -> recorte (x0, y0, x1, y1) em pontos, origem no topo da página exibida
+      max_side -> reduz a escala para o maior lado não passar disso
+    """
+    return render_batch(path, [page], scale, fmt, quality=quality, width=width,
+                        fit=fit, clip=clip, max_side=max_side)[0]
+
+
+def render_batch(path: str, pages: Sequence[int], scale: float = 1.0, fmt: str = "png", *,
+                 quality: int = 80, width: Optional[int] = None, fit: Optional[Tuple[int, int]] = None,
+                 clip: Optional[Tuple[float, float, float, float]] = None,
+                 max_side: Optional[float] = None) -> List[bytes]:
+    """Várias páginas do mesmo documento no mesmo processo (documento aberto uma vez, tarefas de RENDER_BATCH_PAGES)."""
+    pages = [int(p) for p in pages]
+    if not pages:
+        return []
+    opts = _options(scale, fmt, quality, width, fit, clip, max_side)
+    size = max(1, _env_int("RENDER_BATCH_PAGES", 16))
+    out: List[bytes] = []
+    for i in range(0, len(pages), size):
+        out.extend(_call(path, _task, pages[i:i + size], opts))
+    return out
+
+
+def page_count(path: str) -> int:
+    return int(_call(path, _task_page_count))
@@ -97,7 +97,15 @@ def sanitize_pdf_preserving_content(input_path: str, output_path: str) -> None:
 
     Remove acoes e arquivos incorporados. Nao preserva a validade criptografica
     de assinaturas digitais reais; apenas mantem a estrutura e aparencia.
+
+    Entrada vinda do depósito de documentos (file_id) ja foi sanitizada do
+    mesmo jeito no envio: so e reaproveitada (hardlink/clone).
     """
+    from .doc_store import take_presanitized
+    if take_presanitized(input_path):
+        from ..utils.disk_cache import link_or_clone
+        link_or_clone(input_path, output_path)
+        return
     sanitize_pdf(
         input_path,
         output_path,
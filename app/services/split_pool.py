@@ -0,0 +1,159 @@
+# app/services/split_pool.py
+# -*- coding: utf-8 -*-
+"""
+Escrita paralela das partes de uma divisão grande (centenas de PDFs).
+
+• Um ProcessPoolExecutor por processo (gunicorn worker), criado sob demanda:
+  o tamanho dele é o teto GLOBAL de processos de escrita, somando todas as
+  requisições.
+• Cada requisição reparte as partes em lotes contíguos; cada tarefa abre a
+  origem sanitizada UMA vez e escreve o seu lote (mesmo caminho de
+  write_preserving_pdf_subset: AcroForm reconstruído por parte).
+• No máximo SPLIT_WORKERS_PER_REQUEST lotes de uma mesma requisição ficam em
+  voo; os resultados saem NA ORDEM das partes, assim o ZIP em streaming
+  começa assim que o 1º lote termina.
+• Divisões pequenas continuam em série (subir processos não compensa).
+
+ENV:
+  SPLIT_PARALLEL              -> "1"/"0" liga/desliga (default 1)
+  SPLIT_PARALLEL_MIN_PARTS    -> mínimo de partes para usar o pool (default 64)
+  SPLIT_WORKERS_PER_REQUEST   -> lotes simultâneos por requisição (default min(4, CPUs))
+  SPLIT_MAX_PROCS             -> processos do pool por worker do servidor (default nº de CPUs)
+  SPLIT_BATCH_PARTS           -> partes por lote (default 16)
+  SPLIT_MP_START              -> método de início (default "forkserver" no POSIX, "spawn" no Windows)
+"""
+from __future__ import annotations
+
+import os
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except Exception:
+        return default
+
+
+def _cpus() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def workers_per_request() -> int:
+    return max(1, _env_int("SPLIT_WORKERS_PER_REQUEST", min(4, _cpus())))
+
+
+def should_parallelize(n_parts: int) -> bool:
+    if (os.environ.get("SPLIT_PARALLEL", "1") or "1").strip().lower() in ("0", "false", "no", "off"):
+        return False
+    if _env_int("SPLIT_MAX_PROCS", _cpus()) < 1:
+        return False
+    return n_parts >= max(2, _env_int("SPLIT_PARALLEL_MIN_PARTS", 64))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            method = (os.environ.get("SPLIT_MP_START") or "").strip()
+            if not method:
+                method = "forkserver" if os.name == "posix" else "spawn"
+            _POOL = ProcessPoolExecutor(
+                max_workers=max(1, _env_int("SPLIT_MAX_PROCS", _cpus())),
+                mp_context=multiprocessing.get_context(method),
+            )
+        return _POOL
+
+
+def _discard_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown() -> None:
+    """Encerra o pool (testes / desligamento do processo)."""
+    _discard_pool()
+
+
+def _write_batch(src: str, batch: List[Tuple[List[int], str]], ajustes) -> List[Dict]:
+    """Roda no processo filho: abre a origem uma vez e escreve o lote inteiro."""
+    from ..utils.pdf_utils import iter_preserving_pdf_parts
+    from .split_service import _transform_for
+
+    paths = [path for _pages, path in batch]
+    return list(
+        iter_preserving_pdf_parts(
+            src,
+            [pages for pages, _path in batch],
+            lambda i, _pages: paths[i],
+            page_transform=_transform_for(ajustes),
+        )
+    )
+
+
+def _remove(paths) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def iter_parts_parallel(src: str, parts: List[List[int]], paths: List[str], ajustes) -> Iterator[Dict]:
+    """
+    Escreve 'parts' em 'paths' (mesma ordem) usando o pool e devolve os
+    resultados na ordem. Se o consumidor parar no meio (close/erro), os
+    arquivos de lotes já escritos e não entregues são apagados.
+    """
+    size = max(1, _env_int("SPLIT_BATCH_PARTS", 16))
+    batches = [
+        list(zip(parts[i:i + size], paths[i:i + size])) for i in range(0, len(parts), size)
+    ]
+    window = workers_per_request()
+    pool = _get_pool()
+    pending_batches = deque(batches)
+    in_flight = deque()
+
+    def _submit() -> None:
+        while pending_batches and len(in_flight) < window:
+            batch = pending_batches.popleft()
+            in_flight.append((pool.submit(_write_batch, src, batch, ajustes), batch))
+
+    current = deque()
+    try:
+        _submit()
+        while in_flight:
+            future, _batch = in_flight[0]
+            current = deque(future.result())
+            in_flight.popleft()
+            _submit()
+            while current:
+                yield current.popleft()
+    except BrokenProcessPool:
+        logger.error("[split] pool de escrita quebrou; será recriado na próxima divisão.")
+        _discard_pool()
+        raise
+    finally:
+        _remove(result["output_path"] for result in current)
+        # lotes que não chegaram ao consumidor: cancela ou espera e apaga o que escreveram
+        for future, batch in in_flight:
+            if not future.cancel():
+                try:
+                    future.result()
+                except Exception:
+                    pass
+            _remove(path for _pages, path in batch)
@@ -10,10 +10,24 @@ from werkzeug.exceptions import BadRequest
 
 from ..utils.config_utils import ensure_upload_folder_exists, validate_upload
 from ..utils.limits import enforce_pdf_page_limit, enforce_total_pages
-from ..utils.pdf_utils import cleanup_upload_files, write_preserving_pdf_subset
+from ..utils.pdf_utils import (
+    cleanup_upload_files,
+    iter_preserving_pdf_parts,
+    outline_top_level_pages,
+    pack_pages_by_size,
+    write_preserving_pdf_subset,
+)
+from . import split_pool
 from .sanitize_service import sanitize_pdf_preserving_content
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
 def _page_count(path: str) -> int:
     with open(path, "rb") as f:
         return len(PdfReader(f).pages)
@@ -61,14 +75,11 @@ def _apply_crop(page: pikepdf.Page, crop_norm: Dict[str, float]):
     page.MediaBox = pikepdf.Array([left, bottom, right, top])
 
 
-def dividir_pdf(file, pages: Optional[List[int]] = None,
-                rotations: Optional[Dict[int, int]] = None,
-                modificacoes: Optional[Dict[int, Dict]] = None) -> List[str]:
+def _preparar_divisao(file, pages, rotations, modificacoes):
     """
-    Divide/seleciona páginas de um PDF.
-    - Se 'pages' vier: retorna [<PDF único com as selecionadas na ordem dada>]
-    - Se 'pages' não vier: retorna [<PDF pág 1>, <PDF pág 2>, ...]
-    Retorna caminhos absolutos no UPLOAD_FOLDER.
+    Etapas comuns (validação, limites, sanitização e parâmetros).
+    Retorna (in_path, safe_path, pages_to_emit, ajustes). Em caso de erro,
+    limpa os temporários antes de propagar.
     """
     upload_folder = current_app.config["UPLOAD_FOLDER"]
     ensure_upload_folder_exists(upload_folder)
@@ -107,41 +118,96 @@ def dividir_pdf(file, pages: Optional[List[int]] = None,
             pages_to_emit = list(range(1, total + 1))
 
         enforce_total_pages(len(pages_to_emit))
+    except BaseException:
+        cleanup_upload_files((in_path, safe_path), upload_folder)
+        raise
 
-        rot_map: Dict[int, int] = {}
-        if isinstance(rotations, dict):
-            for k, v in rotations.items():
-                try:
-                    kk = int(k)
-                    vv = int(v) % 360
-                    if vv not in (0, 90, 180, 270):
-                        vv = (round(vv / 90) * 90) % 360
-                    if vv != 0:
-                        rot_map[kk] = vv
-                except Exception:
-                    continue
-
-        mods_map: Dict[int, Dict] = {}
-        if isinstance(modificacoes, dict):
-            for k, v in modificacoes.items():
-                try:
-                    kk = int(k)
-                    if isinstance(v, dict):
-                        mods_map[kk] = v
-                except Exception:
-                    continue
+    rot_map: Dict[int, int] = {}
+    if isinstance(rotations, dict):
+        for k, v in rotations.items():
+            try:
+                kk = int(k)
+                vv = int(v) % 360
+                if vv not in (0, 90, 180, 270):
+                    vv = (round(vv / 90) * 90) % 360
+                if vv != 0:
+                    rot_map[kk] = vv
+            except Exception:
+                continue
+
+    mods_map: Dict[int, Dict] = {}
+    if isinstance(modificacoes, dict):
+        for k, v in modificacoes.items():
+            try:
+                kk = int(k)
+                if isinstance(v, dict):
+                    mods_map[kk] = v
+            except Exception:
+                continue
+
+    return in_path, safe_path, pages_to_emit, (rot_map, mods_map)
 
-        outputs: List[str] = []
 
-        def _transform_page(dst_page: pikepdf.Page, page_number: int) -> None:
-            if page_number in rot_map:
-                _rotate_page(dst_page, rot_map[page_number])
+def _transform_for(ajustes):
+    """Rotação extra + recorte por página (ajustes = (rot_map, mods_map), ambos picklable)."""
+    rot_map, mods_map = ajustes
 
-            m = mods_map.get(page_number)
-            if m and isinstance(m, dict):
-                crop = m.get("crop")
-                if crop:
-                    _apply_crop(dst_page, crop)
+    def _transform_page(dst_page: pikepdf.Page, page_number: int) -> None:
+        if page_number in rot_map:
+            _rotate_page(dst_page, rot_map[page_number])
+
+        m = mods_map.get(page_number)
+        if m and isinstance(m, dict):
+            crop = m.get("crop")
+            if crop:
+                _apply_crop(dst_page, crop)
+
+    return _transform_page
+
+
+def _iter_partes(src: str, parts: List[List[int]], naming, ajustes,
+                 max_bytes: Optional[int] = None, pdf: Optional[pikepdf.Pdf] = None):
+    """
+    Escreve as partes na ordem, em série ou — para divisões grandes — num pool
+    de processos (ver split_pool). O modo por tamanho fica em série: a
+    verificação pós-escrita pode redividir partes e renumerar as seguintes.
+    """
+    if max_bytes is None and split_pool.should_parallelize(len(parts)):
+        paths = [naming(i, part) for i, part in enumerate(parts)]
+        yield from split_pool.iter_parts_parallel(src, parts, paths, ajustes)
+        return
+    yield from iter_preserving_pdf_parts(
+        src,
+        parts,
+        naming,
+        page_transform=_transform_for(ajustes),
+        max_bytes=max_bytes,
+        pdf_src=pdf,
+    )
+
+
+def _caminho_pagina(upload_folder: str):
+    return lambda _i, part: os.path.join(
+        upload_folder, f"pagina_{part[0]}_{uuid.uuid4().hex}.pdf"
+    )
+
+
+def dividir_pdf(file, pages: Optional[List[int]] = None,
+                rotations: Optional[Dict[int, int]] = None,
+                modificacoes: Optional[Dict[int, Dict]] = None) -> List[str]:
+    """
+    Divide/seleciona páginas de um PDF.
+    - Se 'pages' vier: retorna [<PDF único com as selecionadas na ordem dada>]
+    - Se 'pages' não vier: retorna [<PDF pág 1>, <PDF pág 2>, ...]
+    Retorna caminhos absolutos no UPLOAD_FOLDER.
+    """
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    in_path, src, pages_to_emit, ajustes = _preparar_divisao(
+        file, pages, rotations, modificacoes
+    )
+
+    try:
+        outputs: List[str] = []
 
         # 5A) Caso "selecionadas" → único PDF
         if pages:
@@ -150,24 +216,214 @@ def dividir_pdf(file, pages: Optional[List[int]] = None,
                 src,
                 out_path,
                 pages=pages_to_emit,
-                page_transform=_transform_page,
+                page_transform=_transform_for(ajustes),
             )
             outputs.append(out_path)
             return outputs
 
-        # 5B) Caso "split total" → um PDF por página
-        for p1 in pages_to_emit:
-            out_path = os.path.join(upload_folder, f"pagina_{p1}_{uuid.uuid4().hex}.pdf")
-            write_preserving_pdf_subset(
-                src,
-                out_path,
-                pages=[p1],
-                page_transform=_transform_page,
-            )
-            outputs.append(out_path)
+        # 5B) Caso "split total" → um PDF por página, a partir de UMA abertura
+        #     da origem (mapa página→campos calculado uma vez só); divisões
+        #     grandes são repartidas entre processos
+        for result in _iter_partes(
+            src, [[p1] for p1 in pages_to_emit], _caminho_pagina(upload_folder), ajustes
+        ):
+            outputs.append(result["output_path"])
 
         return outputs
 
     finally:
         # limpeza best-effort
-        cleanup_upload_files((in_path, safe_path), upload_folder)
+        cleanup_upload_files((in_path, src), upload_folder)
+
+
+MODOS_DIVISAO = ("pages", "chunks", "ranges", "bookmarks", "size")
+
+
+def _parse_faixas(spec, total: int) -> List[List[int]]:
+    """'1-3, 5, 8-10' -> [[1,2,3],[5],[8,9,10]] (cada item vira uma parte)."""
+    if isinstance(spec, (list, tuple)):
+        items = [str(x) for x in spec]
+    else:
+        items = str(spec or "").replace(";", ",").split(",")
+    parts: List[List[int]] = []
+    for item in items:
+        item = item.replace(" ", "")
+        if not item:
+            continue
+        try:
+            if "-" in item:
+                a, b = (int(x) for x in item.split("-", 1))
+            else:
+                a = b = int(item)
+        except ValueError:
+            raise BadRequest("Formato de faixas inválido.")
+        if a < 1 or b < a:
+            raise BadRequest("Faixa de páginas inválida.")
+        if b > total:
+            raise BadRequest(f"Faixa {item} passa do fim do documento ({total} páginas).")
+        parts.append(list(range(a, b + 1)))
+    if not parts:
+        raise BadRequest("Informe ao menos uma faixa de páginas.")
+    return parts
+
+
+def _plano_marcadores(pdf: pikepdf.Pdf, total: int) -> List[List[int]]:
+    """Uma parte por marcador de 1º nível; páginas antes do 1º marcador viram a parte inicial."""
+    starts = sorted({pn for _title, pn in outline_top_level_pages(pdf) if 1 <= pn <= total})
+    if not starts:
+        raise BadRequest("O PDF não possui marcadores (sumário) para dividir.")
+    if starts[0] != 1:
+        starts.insert(0, 1)
+    bounds = starts + [total + 1]
+    return [list(range(bounds[i], bounds[i + 1])) for i in range(len(starts))]
+
+
+def _planejar_partes(pdf: pikepdf.Pdf, modo: str, pages_to_emit: List[int],
+                     chunk_size=None, ranges=None, max_mb=None):
+    """Retorna (partes, max_bytes) para o modo pedido, usando o PDF já aberto."""
+    total = len(pdf.pages)
+    if modo == "pages":
+        return [[p1] for p1 in pages_to_emit], None
+    if modo == "chunks":
+        try:
+            n = int(chunk_size)
+        except (TypeError, ValueError):
+            raise BadRequest("Informe quantas páginas por parte (chunk_size).")
+        if n < 1:
+            raise BadRequest("chunk_size deve ser maior que zero.")
+        return [pages_to_emit[i:i + n] for i in range(0, len(pages_to_emit), n)], None
+    if modo == "ranges":
+        return _parse_faixas(ranges, total), None
+    if modo == "bookmarks":
+        return _plano_marcadores(pdf, total), None
+    if modo == "size":
+        try:
+            mb = float(max_mb)
+        except (TypeError, ValueError):
+            raise BadRequest("Informe o tamanho máximo por parte em MB (max_mb).")
+        min_mb = _env_float("SPLIT_MIN_PART_MB", 0.05)
+        if not (min_mb <= mb <= 1024 * 1024):
+            raise BadRequest(f"max_mb deve ser pelo menos {min_mb:g}.")
+        max_bytes = int(mb * 1024 * 1024)
+        return pack_pages_by_size(pdf, pages_to_emit, max_bytes), max_bytes
+    raise BadRequest("Modo de divisão inválido.")
+
+
+def _caminho_parte(upload_folder: str):
+    return lambda i, part: os.path.join(
+        upload_folder,
+        f"parte_{i + 1:03d}_paginas_{part[0]}-{part[-1]}_{uuid.uuid4().hex}.pdf",
+    )
+
+
+class DivisaoEmStreaming:
+    """
+    Divisão preguiçosa: a validação/sanitização e o planejamento das partes já
+    aconteceram (erros saem antes da resposta começar); cada iteração escreve a
+    próxima parte a partir do MESMO PDF aberto e devolve o caminho do arquivo.
+    Os temporários de entrada são apagados ao fim da iteração ou em close()
+    (ex.: cliente desistiu do download).
+    """
+
+    def __init__(self, upload_folder: str, in_path: str, src: str, pdf: pikepdf.Pdf,
+                 parts: List[List[int]], ajustes, modo: str = "pages",
+                 max_bytes: Optional[int] = None):
+        self.upload_folder = upload_folder
+        self.total = len(parts)
+        self.modo = modo
+        self.results: List[Dict] = []
+        self._in_path = in_path
+        self._src = src
+        self._pdf = pdf
+        self._parts = parts
+        self._ajustes = ajustes
+        self._max_bytes = max_bytes
+        self._closed = False
+
+    def __iter__(self):
+        naming = _caminho_pagina if self.modo == "pages" else _caminho_parte
+        try:
+            for result in _iter_partes(
+                self._src,
+                self._parts,
+                naming(self.upload_folder),
+                self._ajustes,
+                max_bytes=self._max_bytes,
+                pdf=self._pdf,
+            ):
+                self.results.append(result)
+                yield result["output_path"]
+        finally:
+            self.close()
+
+    def relatorio_excedentes(self) -> Optional[Dict]:
+        """
+        Partes (de uma página só, não há como dividir mais) que ficaram acima de
+        max_mb; None se todas couberam. Só faz sentido após a iteração.
+        """
+        excedentes = [r for r in self.results if r.get("oversize")]
+        if not excedentes:
+            return None
+        return {
+            "max_mb": round(self._max_bytes / (1024 * 1024), 4),
+            "partes": [
+                {
+                    "arquivo": os.path.basename(r["output_path"]),
+                    "paginas": r["pages"],
+                    "bytes": r["bytes"],
+                }
+                for r in excedentes
+            ],
+        }
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._pdf.close()
+        except Exception:
+            pass
+        cleanup_upload_files((self._in_path, self._src), self.upload_folder)
+
+
+def dividir_pdf_streaming(file, rotations: Optional[Dict[int, int]] = None,
+                          modificacoes: Optional[Dict[int, Dict]] = None,
+                          modo: str = "pages", chunk_size=None, ranges=None,
+                          max_mb=None) -> DivisaoEmStreaming:
+    """
+    Divide o PDF em várias partes, produzidas uma por vez (ver DivisaoEmStreaming).
+
+    Modos:
+      pages      -> um PDF por página (padrão)
+      chunks     -> blocos de 'chunk_size' páginas
+      ranges     -> faixas explícitas ('1-3,5,8-10'; cada faixa é uma parte)
+      bookmarks  -> uma parte por marcador de 1º nível do sumário
+      size       -> partes de até 'max_mb' MB (empacotamento guloso pelos bytes
+                    de cada página, recursos compartilhados contados uma vez;
+                    o tamanho real é conferido após a escrita; páginas que
+                    sozinhas passam do limite saem em relatorio_excedentes())
+
+    ENV:
+      SPLIT_MIN_PART_MB -> menor max_mb aceito (default 0.05)
+    """
+    if modo not in MODOS_DIVISAO:
+        raise BadRequest("Modo de divisão inválido.")
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    in_path, src, pages_to_emit, ajustes = _preparar_divisao(
+        file, None, rotations, modificacoes
+    )
+    pdf = None
+    try:
+        pdf = pikepdf.open(src, suppress_warnings=True)
+        parts, max_bytes = _planejar_partes(
+            pdf, modo, pages_to_emit, chunk_size=chunk_size, ranges=ranges, max_mb=max_mb
+        )
+        enforce_total_pages(sum(len(part) for part in parts))
+    except BaseException:
+        if pdf is not None:
+            pdf.close()
+        cleanup_upload_files((in_path, src), upload_folder)
+        raise
+    return DivisaoEmStreaming(upload_folder, in_path, src, pdf, parts, ajustes,
+                              modo=modo, max_bytes=max_bytes)
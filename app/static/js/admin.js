@@ -792,6 +792,11 @@
         makeCard('Sucesso (2xx)', s2);
         makeCard('Erros do cliente (4xx)', s4);
         makeCard('Erros do servidor (5xx)', s5);
+        const thumbs = data.thumbs_cache || {};
+        if (thumbs.bytes != null) {
+          makeCard('Cache de miniaturas (MB)', Math.round(thumbs.bytes / (1024 * 1024)));
+          makeCard('Acertos do cache (%)', thumbs.hit_rate == null ? 0 : Math.round(thumbs.hit_rate * 100));
+        }
       }
       renderTools(data.tools || {});
       renderSparkline(data.timeseries?.requests_per_min || data.timeseries || []);
@@ -311,9 +311,12 @@ import * as PageEditorMod from './page-editor.js';
 
       try{
         const baseScale = Math.min(2.5, (window.devicePixelRatio || 1.25) * 1.25);
-        const imgBlob = await fetch(`/api/edit/page-image/${sessionId}/${pageIndex}?scale=${baseScale}`, {
+        // prévia leve (WebP/JPEG quando o navegador aceita); nitidez vem depois, por tiles
+        const imgHeaders = { 'Accept': 'image/webp,image/jpeg;q=0.9,image/png;q=0.8' };
+        const imgBlob = await fetch(`/api/edit/page-image/${sessionId}/${pageIndex}?scale=${baseScale}&q=70`, {
           credentials: 'include',
-          cache: 'no-store'
+          cache: 'no-cache',
+          headers: imgHeaders
         }).then(r=>r.blob());
 
         openPageEditor({
@@ -325,8 +328,15 @@ import * as PageEditorMod from './page-editor.js';
           getBitmap: (needScale) =>
             fetch(`/api/edit/page-image/${sessionId}/${pageIndex}?scale=${Math.min(3.5, needScale).toFixed(2)}`, {
               credentials: 'include',
-              cache: 'no-store'
-            }).then(r=>r.blob())
+              cache: 'no-cache'
+            }).then(r=>r.blob()),
+          renderScale: baseScale,
+          getTile: (scale, x, y, w, h) =>
+            fetch(`/api/edit/page-image/${sessionId}/${pageIndex}?scale=${scale.toFixed(2)}&x=${x}&y=${y}&w=${w}&h=${h}&q=85`, {
+              credentials: 'include',
+              cache: 'no-cache',
+              headers: imgHeaders
+            }).then(r => (r.ok ? r.blob() : null))
         });
 
         const ensureTop = () => {
@@ -257,6 +257,14 @@ function drawScene(st) {
   if ('close' in bmp && typeof bmp.close === 'function') ctx.drawImage(bmp, 0, 0, st.w, st.h);
   else ctx.drawImage(bmp._img, 0, 0, st.w, st.h);
 
+  // tiles nítidos do zoom atual por cima da prévia
+  if (st._tiles && st._tiles.level) {
+    st._tiles.map.forEach((t) => {
+      if ('close' in t.bmp && typeof t.bmp.close === 'function') ctx.drawImage(t.bmp, t.vx, t.vy, t.vw, t.vh);
+      else ctx.drawImage(t.bmp._img, t.vx, t.vy, t.vw, t.vh);
+    });
+  }
+
   // 1) whiteout
   st.rects.forEach((r, i) => {
     const [x0, y0, x1, y1] = r.viewPx;
@@ -362,6 +370,72 @@ function drawScene(st) {
   }
   if (st.pointer.mode === 'pan') cursor = 'grabbing';
   st.canvas.style.cursor = cursor;
+
+  scheduleTiles(st);
+}
+
+/* ================================================================
+   Tiles: prévia leve primeiro; com zoom, só a área visível em alta
+================================================================ */
+const TILE_PX = 512;
+const TILE_MAX_LEVEL = 8;   // escala máxima aceita pelo backend em tiles
+const TILE_MAX_KEEP = 96;
+
+const closeBmp = (b) => { try { if (b && 'close' in b && typeof b.close === 'function') b.close(); } catch {} };
+
+function scheduleTiles(st) {
+  const t = st._tiles;
+  if (!t) return;
+  clearTimeout(t.timer);
+  t.timer = setTimeout(() => requestVisibleTiles(st), 150);
+}
+
+function requestVisibleTiles(st) {
+  const t = st._tiles;
+  if (!t || !st._getTile) return;
+
+  // escala (pt -> px) para 1 px de render por px físico na tela
+  const need = st.zoom * dpr() * (st.w / t.pageW);
+  const level = need <= t.baseScale * 1.05 ? 0 : Math.min(TILE_MAX_LEVEL, 2 ** Math.ceil(Math.log2(need)));
+  if (level !== t.level) {
+    t.map.forEach((tile) => closeBmp(tile.bmp));
+    t.map.clear();
+    t.level = level;
+  }
+  if (!level) return;
+
+  // área visível em coordenadas de view -> px de render
+  const k = level * t.pageW / st.w;
+  const vx0 = Math.max(0, -st.panX / st.zoom);
+  const vy0 = Math.max(0, -st.panY / st.zoom);
+  const vx1 = Math.min(st.w, (st.canvas.clientWidth - st.panX) / st.zoom);
+  const vy1 = Math.min(st.h, (st.canvas.clientHeight - st.panY) / st.zoom);
+  if (vx1 <= vx0 || vy1 <= vy0) return;
+
+  const c0 = Math.floor(vx0 * k / TILE_PX), c1 = Math.floor((vx1 * k - 1) / TILE_PX);
+  const r0 = Math.floor(vy0 * k / TILE_PX), r1 = Math.floor((vy1 * k - 1) / TILE_PX);
+  for (let r = r0; r <= r1; r++) {
+    for (let c = c0; c <= c1; c++) {
+      const key = `${level}:${c}:${r}`;
+      if (t.map.has(key) || t.pending.has(key)) continue;
+      t.pending.add(key);
+      st._getTile(level, c * TILE_PX, r * TILE_PX, TILE_PX, TILE_PX)
+        .then((blob) => (blob ? loadBitmapCSPSafe(blob) : null))
+        .then((b) => {
+          t.pending.delete(key);
+          if (!b) return;
+          if (t.level !== level || t.closed) { closeBmp(b); return; }
+          t.map.set(key, { bmp: b, vx: c * TILE_PX / k, vy: r * TILE_PX / k, vw: b.width / k, vh: b.height / k });
+          while (t.map.size > TILE_MAX_KEEP) {
+            const oldest = t.map.keys().next().value;
+            closeBmp(t.map.get(oldest).bmp);
+            t.map.delete(oldest);
+          }
+          drawScene(st);
+        })
+        .catch(() => { t.pending.delete(key); });
+    }
+  }
 }
 
 function hitImageAABB(st, vx, vy) {
@@ -588,7 +662,8 @@ export async function openPageEditor(opts) {
 
   const {
     bitmap, sessionId, pageIndex,
-    pdfPageSize = null, getBitmap = null, viewRotation = 0
+    pdfPageSize = null, getBitmap = null, viewRotation = 0,
+    getTile = null, renderScale = 0
   } = opts || {};
 
   // Parâmetros mínimos (sem alert para não poluir /compress etc.)
@@ -676,6 +751,11 @@ export async function openPageEditor(opts) {
   st.w = viewW; st.h = viewH;
   st._buttons = { btnErs, btnTxt, btnPan, btnImg, btnZOut, btnZFit, btnZIn, btnUndo, btnRedo, btnClear, btnCancel, btnSave, btnRotateL, btnRotateR };
   st._imageInput = imageInput;
+  if (typeof getTile === 'function' && renderScale > 0) {
+    st._getTile = getTile;
+    st._tiles = { level: 0, map: new Map(), pending: new Set(), timer: 0, closed: false,
+                  baseScale: renderScale, pageW: baseW / renderScale };
+  }
 
   // ---------- helpers ----------
   const addL = (target, type, fn, opts) => { target.addEventListener(type, fn, opts); st._listeners.push([target, type, fn, opts]); };
@@ -684,6 +764,12 @@ export async function openPageEditor(opts) {
     st._listeners.forEach(([t, ty, fn, op]) => t.removeEventListener(ty, fn, op));
     st._listeners.length = 0;
     try { if ('close' in bmp && typeof bmp.close === 'function') bmp.close(); } catch {}
+    if (st._tiles) {
+      clearTimeout(st._tiles.timer);
+      st._tiles.closed = true;
+      st._tiles.map.forEach((tile) => closeBmp(tile.bmp));
+      st._tiles.map.clear();
+    }
     document.body.classList.remove('gv-modal-open');
     overlay.remove();
   };
@@ -59,11 +59,11 @@ async function postJSON(url, body) {
 /* ==================================================================
    [STATE] Estado por container usando WeakMap
 ================================================================== */
-const STATE = new WeakMap(); // containerEl -> { doc, gen, tasks, sessionId, lastUrl, __resizeHandler }
+const STATE = new WeakMap(); // containerEl -> { doc, gen, tasks, sessionId, lastUrl, sprites, __resizeHandler }
 function getState(containerEl){
   let st = STATE.get(containerEl);
   if (!st) {
-    st = { doc: null, gen: 0, tasks: new Map(), sessionId: null, lastUrl: null, __resizeHandler: null };
+    st = { doc: null, gen: 0, tasks: new Map(), sessionId: null, lastUrl: null, sprites: null, __resizeHandler: null };
     STATE.set(containerEl, st);
   }
   return st;
@@ -87,6 +87,7 @@ function cancelAll(state) {
   }
   if (state.doc) { try { state.doc.destroy(); } catch {} }
   state.doc = null;
+  state.sprites = null;
 }
 
 /* ------------------------------------------------------------------
@@ -132,6 +133,72 @@ export async function previewThumb(file, imgEl, { silentNonPdf = true } = {}) {
 const DEFAULT_THUMB_W = 160;
 const INITIAL_BATCH    = 2;
 
+/* ===== Sprite sheets (miniaturas de todas as páginas geradas no servidor) =====
+   Em PDFs grandes, pedir ao servidor UMA imagem com várias páginas custa bem
+   menos que rasterizar cada miniatura com pdf.js. Enquanto o sprite não chega
+   (ou se falhar), as páginas seguem no render normal do pdf.js. */
+const SPRITE_MIN_PAGES = 24;
+
+function spriteWidthFor(containerEl) {
+  const dpr = window.devicePixelRatio || 1;
+  // múltiplos de 40px: evita um cache diferente para cada largura de tela
+  const w = Math.ceil((cssThumbWidth(containerEl) * dpr) / 40) * 40;
+  return Math.max(80, Math.min(400, w));
+}
+
+function requestSprites(state, blob, containerEl, genToken) {
+  const form = new FormData();
+  form.append('file', blob, blob.name || 'documento.pdf');
+  form.append('width', String(spriteWidthFor(containerEl)));
+  const headers = { 'X-CSRFToken': getCSRFToken() };
+
+  const sprites = { data: null, byPage: new Map(), sheets: new Map() };
+  state.sprites = sprites;
+  xhrRequest('/api/preview/sprites', { method: 'POST', body: form, headers })
+    .then(resp => {
+      if (genToken !== state.gen || !resp || !Array.isArray(resp.index)) return;
+      resp.index.forEach(r => sprites.byPage.set(Number(r.page), r));
+      sprites.data = resp;
+    })
+    .catch(err => console.warn('[preview] sprites indisponíveis; usando pdf.js', err));
+}
+
+function loadSpriteSheet(sprites, n) {
+  let p = sprites.sheets.get(n);
+  if (!p) {
+    p = new Promise((resolve, reject) => {
+      const img = new Image();
+      img.decoding = 'async';
+      img.onload = () => resolve(img);
+      img.onerror = reject;
+      img.src = sprites.data.sheet_urls[n];
+    });
+    p.catch(() => sprites.sheets.delete(n));
+    sprites.sheets.set(n, p);
+  }
+  return p;
+}
+
+/* desenha a miniatura a partir do sprite; false => seguir com pdf.js */
+async function drawFromSprite(state, pageNumber, canvas, targetW, viewport) {
+  const sprites = state.sprites;
+  const rect = sprites?.data ? sprites.byPage.get(pageNumber) : null;
+  if (!rect) return false;
+  // página cortada no sprite (muito comprida) ou proporção divergente: pdf.js
+  if (Math.abs(rect.h / rect.w - viewport.height / viewport.width) > 0.03) return false;
+  let img;
+  try { img = await loadSpriteSheet(sprites, rect.sheet); }
+  catch { return false; }
+  canvas.width  = rect.w;
+  canvas.height = rect.h;
+  canvas.style.width = Math.round(targetW) + 'px';
+  canvas.style.height = 'auto';
+  const ctx = canvas.getContext('2d', { alpha: false });
+  ctx.drawImage(img, rect.x, rect.y, rect.w, rect.h, 0, 0, rect.w, rect.h);
+  canvas.dataset.source = 'sprite';
+  return true;
+}
+
 /* ===== Sessão: utilidades ===== */
 function extractSessionIdFromUrl(url) {
   if (typeof url !== 'string') return null;
@@ -459,6 +526,13 @@ async function renderPage(state, pdf, pageNumber, containerEl, rotation = 0, gen
   };
 
   try {
+    if (!cropData && extra === 0 && state.sprites?.data) {
+      const ok = await drawFromSprite(state, pageNumber, canvas, targetW, baseViewport);
+      if (ok || genToken !== state.gen) {
+        try { page.cleanup(); } catch {}
+        return;
+      }
+    }
     if (!cropData) {
       canvas.width  = Math.floor(vp.width);
       canvas.height = Math.floor(vp.height);
@@ -653,6 +727,11 @@ export async function previewPDF(fileOrUrl, container, spinnerSel, btnSel) {
     if (myGen !== state.gen) { try { pdf.destroy(); } catch {} return; }
     state.doc = pdf;
 
+    // arquivo local com muitas páginas: miniaturas via sprite do servidor
+    if (typeof fileOrUrl !== 'string' && fileOrUrl instanceof Blob && pdf.numPages >= SPRITE_MIN_PAGES) {
+      requestSprites(state, fileOrUrl, containerEl, myGen);
+    }
+
     if (isResult) addResultToolbar(containerEl, setBtnDisabled);
 
     for (let i = 1; i <= pdf.numPages; i++) {
@@ -282,6 +282,14 @@ async function postSplitAll(file) {
   const modifications = collectModificationsMap();
   if (modifications) formData.append('modificacoes', JSON.stringify(modifications));
 
+  const mode = modeSelect()?.value || 'pages';
+  if (mode !== 'pages') {
+    formData.append('mode', mode);
+    const param = SPLIT_MODE_PARAMS[mode];
+    const value = (modeValueInput()?.value || '').trim();
+    if (param) formData.append(param.name, value);
+  }
+
   const headers = new Headers();
   const csrf = getCSRFToken();
   if (csrf) {
@@ -339,6 +347,40 @@ function bindSplitAllButton() {
   button.dataset.splitAllBound = '1';
 }
 
+// Parâmetro extra de cada modo de divisão (nome do campo e dica no input)
+const SPLIT_MODE_PARAMS = {
+  chunks: { name: 'chunk_size', placeholder: 'Páginas por parte (ex.: 10)', inputmode: 'numeric' },
+  ranges: { name: 'ranges', placeholder: 'Faixas (ex.: 1-3, 4-10, 11)', inputmode: 'text' },
+  size: { name: 'max_mb', placeholder: 'MB por parte (ex.: 5)', inputmode: 'decimal' },
+};
+
+function modeSelect() {
+  return document.getElementById('split-mode');
+}
+
+function modeValueInput() {
+  return document.getElementById('split-mode-value');
+}
+
+function syncModeInput() {
+  const input = modeValueInput();
+  if (!input) return;
+  const param = SPLIT_MODE_PARAMS[modeSelect()?.value || 'pages'];
+  input.classList.toggle('hidden', !param);
+  if (param) {
+    input.placeholder = param.placeholder;
+    input.inputMode = param.inputmode;
+  }
+}
+
+function bindModeSelect() {
+  const select = modeSelect();
+  if (!select || select.dataset.splitModeBound === '1') return;
+  select.addEventListener('change', syncModeInput);
+  select.dataset.splitModeBound = '1';
+  syncModeInput();
+}
+
 function bindSyncTriggers() {
   const input = inputEl();
   const dropzone = $(DROPZONE_SELECTOR);
@@ -367,6 +409,7 @@ function initSplitPage() {
   initialized = true;
 
   bindSplitAllButton();
+  bindModeSelect();
   bindSyncTriggers();
   scheduleSync();
 }
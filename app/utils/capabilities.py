@@ -0,0 +1,320 @@
+# app/utils/capabilities.py
+# -*- coding: utf-8 -*-
+"""
+Registro de capacidades do ambiente (binários externos, versões, idiomas do OCR).
+
+• Calculado uma vez no start da app (create_app) e reaproveitado por todos os
+  serviços — nada de `gs --version` ou `tesseract --list-langs` por requisição.
+• Compartilhado entre workers do gunicorn por um arquivo JSON pequeno; o cache é
+  invalidado quando PATH/variáveis de binários mudam ou após CAPS_TTL_SECONDS.
+• O arquivo fica num diretório da app (UPLOAD_FOLDER/_caps, 0700), é gravado 0600
+  e só é aceito se for nosso e não gravável por outros. Mesmo assim, cada
+  caminho/comando lido dele é conferido com a resolução atual (which/ENV): se
+  divergir, o snapshot é descartado e a sondagem refeita.
+• /diag/capabilities (ENABLE_DIAG=1) mostra o snapshot e aceita ?refresh=1.
+
+ENV:
+  CAPS_CACHE_FILE   -> arquivo do cache (default <UPLOAD_FOLDER>/_caps/capabilities.json)
+  CAPS_TTL_SECONDS  -> validade do snapshot em segundos (default 3600)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# variáveis que mudam a resolução dos binários (entram na impressão digital)
+_ENV_KEYS = (
+    "PATH", "GS_BIN", "GHOSTSCRIPT_BIN", "GS_PATH", "SOFFICE_BIN", "LIBREOFFICE_BIN",
+    "OCR_BIN", "TESSDATA_PREFIX", "TESSERACT_PREFIX", "TESSERACT_PATH",
+)
+
+_LO_WIN_PATHS = (
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+    r"C:\Program Files\LibreOffice 7\program\soffice.exe",
+    r"C:\Program Files\LibreOffice 6\program\soffice.exe",
+)
+_UNPAPER_WIN_PATHS = (
+    r"C:\ProgramData\chocolatey\bin\unpaper.exe",
+    r"C:\Program Files\unpaper\unpaper.exe",
+)
+
+_CAPS: Optional[Dict[str, Any]] = None
+_CAPS_LOCK = threading.Lock()
+
+
+CACHE_SUBDIR = "_caps"
+
+
+def _cache_file() -> str:
+    explicit = (os.environ.get("CAPS_CACHE_FILE") or "").strip()
+    if explicit:
+        return explicit
+    folder = None
+    try:
+        from flask import current_app
+        folder = current_app.config.get("UPLOAD_FOLDER")
+    except Exception:
+        folder = None
+    # mesmo fallback do create_app (UPLOAD_FOLDER → ./uploads)
+    folder = folder or os.environ.get("UPLOAD_FOLDER") or os.path.join(os.getcwd(), "uploads")
+    return os.path.join(os.fspath(folder), CACHE_SUBDIR, "capabilities.json")
+
+
+def _ttl() -> int:
+    try:
+        return int(os.environ.get("CAPS_TTL_SECONDS", "3600") or 3600)
+    except Exception:
+        return 3600
+
+
+def _fingerprint() -> str:
+    env = {k: os.environ.get(k, "") for k in _ENV_KEYS}
+    env["python"] = sys.executable
+    raw = json.dumps(env, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# ---------------- resolução (mesma ordem usada pelos serviços) ----------------
+def _resolve_gs() -> Optional[List[str]]:
+    for env_var in ("GS_BIN", "GHOSTSCRIPT_BIN", "GS_PATH"):
+        val = os.environ.get(env_var, "").strip()
+        if val and shutil.which(val):
+            return [shutil.which(val)]
+    for candidate in ("gswin64c", "gswin32c", "gs"):
+        found = shutil.which(candidate)
+        if found:
+            return [found]
+    return None
+
+
+def _resolve_soffice() -> Optional[List[str]]:
+    from_env = os.environ.get("SOFFICE_BIN") or os.environ.get("LIBREOFFICE_BIN")
+    if from_env and os.path.isfile(from_env):
+        return [from_env]
+    for candidate in ("soffice", "soffice.com", "libreoffice"):
+        found = shutil.which(candidate)
+        if found:
+            return [found]
+    if os.name == "nt":
+        for path in _LO_WIN_PATHS:
+            if os.path.isfile(path):
+                return [path]
+    return None
+
+
+def _resolve_ocrmypdf() -> Optional[List[str]]:
+    env_bin = (os.environ.get("OCR_BIN") or "").strip().strip('"').strip("'")
+    if env_bin:
+        cmd = shlex.split(env_bin)
+        if cmd and (shutil.which(cmd[0]) or os.path.isfile(cmd[0])):
+            return cmd
+        return None
+    if os.name == "nt":
+        return [sys.executable, "-m", "ocrmypdf"]
+    found = shutil.which("ocrmypdf")
+    return [found] if found else None
+
+
+def _resolve_tesseract() -> Optional[List[str]]:
+    found = shutil.which("tesseract")
+    if found:
+        return [found]
+    for var in ("TESSERACT_PREFIX", "TESSERACT_PATH"):
+        base = (os.environ.get(var) or "").strip()
+        for name in ("tesseract.exe", "tesseract"):
+            cand = os.path.join(base, name) if base else ""
+            if cand and os.path.isfile(cand):
+                return [cand]
+    return None
+
+
+def _resolve_simple(name: str, win_paths=()) -> Optional[List[str]]:
+    found = shutil.which(name)
+    if found:
+        return [found]
+    if os.name == "nt":
+        for path in win_paths:
+            if os.path.isfile(path):
+                return [path]
+    return None
+
+
+_RESOLVERS = {
+    "gs": (_resolve_gs, "--version"),
+    "qpdf": (lambda: _resolve_simple("qpdf"), "--version"),
+    "soffice": (_resolve_soffice, "--version"),
+    "ocrmypdf": (_resolve_ocrmypdf, "--version"),
+    "tesseract": (_resolve_tesseract, "--version"),
+    "unpaper": (lambda: _resolve_simple("unpaper", _UNPAPER_WIN_PATHS), "--version"),
+    "pngquant": (lambda: _resolve_simple("pngquant"), "--version"),
+}
+
+
+def _first_line(cmd: List[str], timeout: int = 20) -> str:
+    try:
+        res = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=False)
+        text = (res.stdout or res.stderr or "").strip()
+        return text.splitlines()[0].strip() if text else ""
+    except Exception:
+        return ""
+
+
+def _tesseract_langs(cmd: List[str]) -> List[str]:
+    try:
+        res = subprocess.run(cmd + ["--list-langs"], capture_output=True, text=True,
+                             timeout=20, check=False)
+    except Exception:
+        return []
+    langs = []
+    for line in (res.stdout or res.stderr or "").splitlines():
+        line = line.strip()
+        if line and not line.startswith("List of available languages") and len(line) <= 16:
+            langs.append(line)
+    return sorted(set(langs))
+
+
+def _probe_tool(name: str) -> Dict[str, Any]:
+    resolver, version_flag = _RESOLVERS[name]
+    try:
+        cmd = resolver()
+    except Exception:
+        cmd = None
+    info: Dict[str, Any] = {"ok": bool(cmd), "cmd": cmd, "path": cmd[0] if cmd else None, "version": None}
+    if cmd:
+        info["version"] = _first_line(cmd + [version_flag]) or None
+        if name == "tesseract":
+            info["langs"] = _tesseract_langs(cmd)
+    return info
+
+
+def probe() -> Dict[str, Any]:
+    """Sonda todos os binários (em paralelo) e devolve um snapshot serializável."""
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(_RESOLVERS)) as pool:
+        tools = dict(zip(_RESOLVERS, pool.map(_probe_tool, _RESOLVERS)))
+    caps = {
+        "fingerprint": _fingerprint(),
+        "generated": time.time(),
+        "tools": tools,
+        "features": {
+            "compress_gs": tools["gs"]["ok"],
+            "qpdf": tools["qpdf"]["ok"],
+            "office_convert": tools["soffice"]["ok"],
+            "ocr": tools["ocrmypdf"]["ok"] and tools["tesseract"]["ok"],
+            "ocr_clean": tools["unpaper"]["ok"],
+            "ocr_optimize_lossy": tools["pngquant"]["ok"],
+        },
+    }
+    logger.info("Capacidades sondadas em %.2fs: %s", time.perf_counter() - t0,
+                ", ".join(f"{k}={'ok' if v['ok'] else '-'}" for k, v in tools.items()))
+    return caps
+
+
+def _trusted(st: os.stat_result) -> bool:
+    """Arquivo do cache só vale se for nosso e ninguém mais puder gravá-lo."""
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        return False
+    return not (st.st_mode & 0o022)
+
+
+def _resolution_matches(caps: Dict[str, Any]) -> bool:
+    """Cada cmd/path do snapshot precisa bater com o que which/ENV resolvem agora."""
+    tools = caps.get("tools")
+    if not isinstance(tools, dict):
+        return False
+    for name, (resolver, _flag) in _RESOLVERS.items():
+        info = tools.get(name) or {}
+        try:
+            current = resolver()
+        except Exception:
+            current = None
+        if (info.get("cmd") or None) != (current or None):
+            return False
+        if info.get("path") != (current[0] if current else None):
+            return False
+    return True
+
+
+def _load_file() -> Optional[Dict[str, Any]]:
+    try:
+        with open(_cache_file(), "r", encoding="utf-8") as fh:
+            if not _trusted(os.fstat(fh.fileno())):
+                logger.warning("Cache de capacidades ignorado (dono/permissões): %s", _cache_file())
+                return None
+            caps = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(caps, dict) or caps.get("fingerprint") != _fingerprint():
+        return None
+    if time.time() - float(caps.get("generated") or 0) > _ttl():
+        return None
+    if not _resolution_matches(caps):
+        return None
+    return caps
+
+
+def _save_file(caps: Dict[str, Any]) -> None:
+    path = _cache_file()
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+        # mkstemp já cria 0600; o replace mantém o modo
+        fd, tmp = tempfile.mkstemp(prefix=".tmp_caps_", dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(caps, fh)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.debug("Não foi possível gravar o cache de capacidades: %s", e)
+
+
+def get_capabilities(refresh: bool = False) -> Dict[str, Any]:
+    """
+    Snapshot atual: memória do processo → arquivo compartilhado → nova sondagem.
+    refresh=True força a sondagem (e regrava o arquivo para os demais workers).
+    """
+    global _CAPS
+    with _CAPS_LOCK:
+        fp = _fingerprint()
+        if not refresh and _CAPS is not None and _CAPS.get("fingerprint") == fp \
+                and time.time() - _CAPS["generated"] <= _ttl():
+            return _CAPS
+        caps = None if refresh else _load_file()
+        if caps is None:
+            caps = probe()
+            _save_file(caps)
+        _CAPS = caps
+        return caps
+
+
+def tool(name: str) -> Dict[str, Any]:
+    return get_capabilities()["tools"].get(name) or {"ok": False, "cmd": None, "path": None, "version": None}
+
+
+def tool_path(name: str) -> Optional[str]:
+    return tool(name).get("path")
+
+
+def has(name: str) -> bool:
+    return bool(tool(name).get("ok"))
+
+
+def is_known_tool(name: str) -> bool:
+    """True se 'name' é um binário sondado pelo registro (has()/tool() valem para ele)."""
+    return name in _RESOLVERS
+
+
+def tesseract_langs() -> List[str]:
+    return list(tool("tesseract").get("langs") or [])
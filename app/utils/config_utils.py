@@ -14,6 +14,7 @@ from .security import (
     is_allowed_mime,
 )
 from .mime import OOXML_EXTS
+from .upload_stream import cached_head
 
 log = logging.getLogger(__name__)
 
@@ -55,6 +56,10 @@ def _filename_from_obj(file) -> str:
 
 
 def _read_head(file, nbytes=8192) -> bytes:
+    # upload recebido em streaming: o cabeçalho já foi capturado (sem reler o stream)
+    head = cached_head(file, nbytes)
+    if head is not None:
+        return head
     stream = getattr(file, 'stream', None)
     if not stream or not hasattr(stream, 'read'):
         return b''
@@ -0,0 +1,184 @@
+# app/utils/disk_cache.py
+# -*- coding: utf-8 -*-
+"""
+Blocos básicos para caches em disco endereçados por conteúdo.
+
+• Publicação atômica: grava num temporário do MESMO diretório e faz os.replace,
+  então leitores nunca enxergam arquivo pela metade (vale entre workers).
+• LRU por mtime: cada acerto "toca" o arquivo; a poda remove os mais antigos
+  até caber no orçamento de bytes.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import logging
+from typing import Optional, Tuple
+
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+def cache_dir(subdir: str, env_name: Optional[str] = None) -> str:
+    """
+    Resolve (e cria) o diretório do cache:
+      1. env 'env_name', se definida
+      2. UPLOAD_FOLDER/<subdir> (com app Flask ativo)
+      3. <tmp>/gvpdf<subdir>
+    """
+    path = (os.environ.get(env_name) or "").strip() if env_name else ""
+    if not path:
+        if has_app_context():
+            base = current_app.config.get("UPLOAD_FOLDER", os.path.join(os.getcwd(), "uploads"))
+            path = os.path.join(base, subdir)
+        else:
+            path = os.path.join(tempfile.gettempdir(), f"gvpdf{subdir}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def touch(path: str) -> bool:
+    """Marca uso recente (LRU). False se o arquivo não existe mais."""
+    try:
+        os.utime(path, None)
+        return True
+    except OSError:
+        return False
+
+
+def publish_atomic(src: str, dest: str) -> None:
+    """Copia 'src' para 'dest' de forma atômica (tmp no mesmo diretório + replace)."""
+    directory = os.path.dirname(os.path.abspath(dest))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=directory)
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def dir_usage(directory: str, suffix: str = "") -> Tuple[int, int]:
+    """(arquivos, bytes) publicados no diretório (ignora temporários)."""
+    count = total = 0
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.startswith(".tmp_"):
+                    continue
+                if suffix and not entry.name.endswith(suffix):
+                    continue
+                try:
+                    total += entry.stat().st_size
+                    count += 1
+                except OSError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return count, total
+
+
+def enforce_budget(directory: str, max_bytes: int, suffix: str = "") -> int:
+    """Remove os arquivos menos usados até caber em 'max_bytes'. Retorna bytes liberados."""
+    entries = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.startswith(".tmp_"):
+                    continue
+                if suffix and not entry.name.endswith(suffix):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            freed += size
+        except OSError:
+            pass
+    if freed:
+        logger.debug("Cache %s: %d bytes liberados (LRU).", directory, freed)
+    return freed
+
+
+_FICLONE = 0x40049409  # ioctl Linux (btrfs/xfs/overlay com reflink)
+
+
+def clone_file(src: str, dest: str, length: Optional[int] = None) -> str:
+    """
+    Copia 'src' (ou só os primeiros 'length' bytes) para 'dest' tentando, nesta
+    ordem: reflink (FICLONE), os.copy_file_range (cópia no kernel, que alguns
+    FS transformam em reflink) e cópia comum. Retorna o método usado.
+    """
+    size = os.path.getsize(src) if length is None else int(length)
+    with open(src, "rb") as fi, open(dest, "wb") as fo:
+        try:
+            import fcntl
+            fcntl.ioctl(fo.fileno(), _FICLONE, fi.fileno())
+            fo.truncate(size)
+            return "reflink"
+        except Exception:
+            fo.seek(0)
+            fo.truncate(0)
+
+        copy_range = getattr(os, "copy_file_range", None)
+        if copy_range is not None:
+            try:
+                done = 0
+                while done < size:
+                    n = copy_range(fi.fileno(), fo.fileno(), size - done, done, done)
+                    if n <= 0:
+                        break
+                    done += n
+                if done == size:
+                    return "copy_range"
+            except OSError:
+                pass
+            fo.seek(0)
+            fo.truncate(0)
+
+        fi.seek(0)
+        left = size
+        while left > 0:
+            chunk = fi.read(min(left, 1024 * 1024))
+            if not chunk:
+                break
+            fo.write(chunk)
+            left -= len(chunk)
+        return "copy"
+
+
+def link_or_clone(src: str, dest: str) -> str:
+    """Hardlink de 'src' em 'dest'; se o FS não suportar, cai para clone_file."""
+    try:
+        os.link(src, dest)
+        return "link"
+    except OSError:
+        return clone_file(src, dest)
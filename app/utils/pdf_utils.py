@@ -415,20 +415,7 @@ def pdf_preservation_warnings(requirements: dict, resize_to_a4: bool = False) ->
     return warnings
 
 
-def write_preserving_pdf_subset(
-    input_path: str,
-    output_path: str,
-    pages: Optional[List[int]] = None,
-    rotations: Optional[Dict[int, int]] = None,
-    page_transform: Optional[Callable[[pikepdf.Page, int], None]] = None,
-) -> dict:
-    """
-    Losslessly writes selected pages while rebuilding page-scoped AcroForm data.
-
-    The helper preserves page order, duplicate page selections, widgets,
-    annotations, /AP appearances, /Parent, /Kids, /P and a filtered /CO.
-    It also strips dangerous catalog/form action keys inherited from the source.
-    """
+def _normalize_rotations(rotations: Optional[Dict[int, int]]) -> Dict[int, int]:
     rot_map: Dict[int, int] = {}
     for key, value in (rotations or {}).items():
         try:
@@ -440,47 +427,358 @@ def write_preserving_pdf_subset(
             deg = (round(deg / 90) * 90) % 360
         if deg:
             rot_map[pn] = deg
+    return rot_map
 
-    with pikepdf.open(input_path, suppress_warnings=True) as pdf_src, pikepdf.Pdf.new() as pdf_dst:
-        total = len(pdf_src.pages)
-        if pages is None:
-            pages_to_emit = list(range(1, total + 1))
-        else:
-            pages_to_emit = []
-            for value in pages:
+
+def _detach_source_form_tree(pdf_src: pikepdf.Pdf) -> Dict[int, list]:
+    """
+    Precomputes, once per source, which field chain each widget belongs to and
+    cuts the /Parent, /Kids and /P links in the (in-memory, never saved) source.
+
+    Without the cut, copying one page drags the whole form graph along
+    (widget -> /Parent -> /Kids -> other widgets -> /P -> other pages), so a
+    per-page split costs O(pages x form size). Returns
+    {page_index: [(annot_index, [widget, parent, ..., root_field]), ...]}.
+    """
+    chains_by_page: Dict[int, list] = {}
+    detached = []
+    for page_index, page in enumerate(pdf_src.pages):
+        annots = page.get("/Annots")
+        if annots is None:
+            continue
+        for annot_index, annot in enumerate(list(annots)):
+            if not hasattr(annot, "keys") or str(annot.get("/Subtype", "")) != "/Widget":
+                continue
+            chain = _field_chain_for_widget(annot)
+            chains_by_page.setdefault(page_index, []).append((annot_index, chain))
+            detached.extend(chain)
+
+    for obj in detached:
+        for key in ("/Parent", "/Kids", "/P"):
+            if key in obj:
                 try:
-                    page_number = int(value)
-                except (TypeError, ValueError):
-                    continue
-                if 1 <= page_number <= total:
-                    pages_to_emit.append(page_number)
+                    del obj[key]
+                except Exception:
+                    pass
+    return chains_by_page
+
+
+def _reattach_field_chains(pdf_dst: pikepdf.Pdf, dst_page: pikepdf.Page, chains: list) -> None:
+    """Relinks copied widgets to their (copied once per output) ancestor fields."""
+    annots = dst_page.get("/Annots")
+    if annots is None:
+        return
+    for annot_index, chain in chains:
+        if annot_index >= len(annots) or len(chain) < 2:
+            continue
+        child = annots[annot_index]
+        for parent in chain[1:]:
+            dst_parent = pdf_dst.copy_foreign(parent)
+            child["/Parent"] = dst_parent
+            child = dst_parent
+
+
+def iter_preserving_pdf_parts(
+    input_path: str,
+    parts: List[Optional[List[int]]],
+    output_path_for: Callable[[int, List[int]], str],
+    rotations: Optional[Dict[int, int]] = None,
+    page_transform: Optional[Callable[[pikepdf.Page, int], None]] = None,
+    max_bytes: Optional[int] = None,
+    pdf_src: Optional[pikepdf.Pdf] = None,
+):
+    """
+    Writes several outputs (one per entry of 'parts'; None = every page) from a
+    single parse of 'input_path', with the same AcroForm rebuilding as
+    write_preserving_pdf_subset.
+
+    The source is opened once and the widget -> field chain mapping is computed
+    once; each output only copies its own pages plus the ancestor fields of its
+    widgets. Yields one dict per part as soon as the file is on disk, so callers
+    can stream results while the next part is being written.
+
+    'pdf_src' lets the caller pass an already open (and otherwise unused) handle
+    of 'input_path', e.g. after planning the parts with it. With 'max_bytes',
+    every written part is checked: a multi-page part above the limit is
+    discarded and rewritten as two halves; a single page above it is yielded
+    with "oversize": True.
+    """
+    if pdf_src is None:
+        with pikepdf.open(input_path, suppress_warnings=True) as opened:
+            yield from _iter_parts_from(
+                opened, input_path, parts, output_path_for, rotations, page_transform, max_bytes
+            )
+    else:
+        yield from _iter_parts_from(
+            pdf_src, input_path, parts, output_path_for, rotations, page_transform, max_bytes
+        )
+
+
+def _iter_parts_from(pdf_src, input_path, parts, output_path_for, rotations, page_transform, max_bytes):
+    rot_map = _normalize_rotations(rotations)
+    total = len(pdf_src.pages)
+    queue: List[List[int]] = []
+    for part in parts:
+        if part is None:
+            part = range(1, total + 1)
+        pages_to_emit = []
+        for value in part:
+            try:
+                page_number = int(value)
+            except (TypeError, ValueError):
+                continue
+            if 1 <= page_number <= total:
+                pages_to_emit.append(page_number)
         if not pages_to_emit:
             raise ValueError("Nenhuma pagina valida para preservar.")
+        queue.append(pages_to_emit)
+
+    chains_by_page = _detach_source_form_tree(pdf_src)
+
+    part_index = 0
+    while queue:
+        pages_to_emit = queue.pop(0)
+        output_path = output_path_for(part_index, pages_to_emit)
+        with pikepdf.Pdf.new() as pdf_dst:
+            seen_pages: Dict[int, int] = {}
+            for page_number in pages_to_emit:
+                seen_pages[page_number] = seen_pages.get(page_number, 0) + 1
+                occurrence = seen_pages[page_number]
+                dst_page = _append_source_page(
+                    input_path,
+                    pdf_src,
+                    pdf_dst,
+                    page_number,
+                    occurrence,
+                )
+                if occurrence == 1:
+                    _reattach_field_chains(
+                        pdf_dst, dst_page, chains_by_page.get(page_number - 1, ())
+                    )
+                if page_number in rot_map:
+                    _rotate_pikepdf_page(dst_page, rot_map[page_number])
+                if page_transform is not None:
+                    page_transform(dst_page, page_number)
+
+            _rebuild_acroform_for_output(pdf_src, pdf_dst)
+            out_dir = os.path.dirname(output_path)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+            pdf_dst.save(output_path)
+
+        size = os.path.getsize(output_path)
+        if max_bytes and size > max_bytes and len(pages_to_emit) > 1:
+            # estimativa otimista demais: refaz a parte em duas metades
+            try:
+                os.remove(output_path)
+            except OSError:
+                pass
+            half = len(pages_to_emit) // 2
+            queue[0:0] = [pages_to_emit[:half], pages_to_emit[half:]]
+            continue
+
+        yield {
+            "pages_in": total,
+            "pages_out": len(pages_to_emit),
+            "pages": pages_to_emit,
+            "output_path": output_path,
+            "bytes": size,
+            "oversize": bool(max_bytes and size > max_bytes),
+        }
+        part_index += 1
 
-        seen_pages: Dict[int, int] = {}
-        for page_number in pages_to_emit:
-            seen_pages[page_number] = seen_pages.get(page_number, 0) + 1
-            dst_page = _append_source_page(
-                input_path,
-                pdf_src,
-                pdf_dst,
-                page_number,
-                seen_pages[page_number],
-            )
-            if page_number in rot_map:
-                _rotate_pikepdf_page(dst_page, rot_map[page_number])
-            if page_transform is not None:
-                page_transform(dst_page, page_number)
 
-        _rebuild_acroform_for_output(pdf_src, pdf_dst)
-        out_dir = os.path.dirname(output_path)
-        if out_dir:
-            os.makedirs(out_dir, exist_ok=True)
-        pdf_dst.save(output_path)
+# Overhead aproximado de cada objeto indireto no arquivo ("N 0 obj ... endobj" + xref)
+_OBJ_OVERHEAD = 40
+# Catálogo, árvore de páginas, trailer e xref de um PDF mínimo
+_PART_BASE_BYTES = 1024
+# Chaves que apontam "para fora" da página (árvore de páginas, campos pai,
+# destinos em outras páginas) e não entram na conta de bytes da página
+_COST_SKIP_KEYS = frozenset(("/Parent", "/P", "/Kids", "/Dest", "/B"))
+
+
+def page_object_costs(pdf_src: pikepdf.Pdf):
+    """
+    Atribuição de bytes por página: para cada página, os objetos indiretos que
+    ela alcança (conteúdo, recursos, fontes, imagens, anotações) com o tamanho
+    aproximado de cada um. Objetos compartilhados (ex.: uma fonte usada em
+    todas as páginas) aparecem em várias páginas com a MESMA chave, de modo que
+    um empacotador conta cada um só uma vez por parte.
 
+    Retorna (objs_por_pagina: List[set], custo_por_objeto: Dict[objgen, int]).
+    """
+    costs: Dict[tuple, int] = {}
+    per_page: List[set] = []
+
+    def _cost(obj) -> int:
+        try:
+            if isinstance(obj, pikepdf.Stream):
+                return len(obj.read_raw_bytes()) + len(obj.stream_dict.unparse()) + _OBJ_OVERHEAD
+            return len(obj.unparse(resolved=True)) + _OBJ_OVERHEAD
+        except Exception:
+            return _OBJ_OVERHEAD
+
+    for page in pdf_src.pages:
+        reached: set = set()
+        start = page.obj
+        stack = [start]
+        while stack:
+            obj = stack.pop()
+            if getattr(obj, "is_indirect", False):
+                key = obj.objgen
+                if key in reached:
+                    continue
+                if (
+                    key != start.objgen
+                    and isinstance(obj, pikepdf.Dictionary)
+                    and obj.get("/Type") == "/Page"
+                ):
+                    continue
+                reached.add(key)
+                if key not in costs:
+                    costs[key] = _cost(obj)
+            if isinstance(obj, pikepdf.Stream):
+                items = obj.stream_dict.items()
+            elif isinstance(obj, pikepdf.Dictionary):
+                items = obj.items()
+            elif isinstance(obj, pikepdf.Array):
+                items = ((None, v) for v in obj)
+            else:
+                continue
+            for k, v in items:
+                if k in _COST_SKIP_KEYS:
+                    continue
+                if isinstance(v, (pikepdf.Dictionary, pikepdf.Array, pikepdf.Stream)):
+                    stack.append(v)
+        per_page.append(reached)
+    return per_page, costs
+
+
+def pack_pages_by_size(pdf_src: pikepdf.Pdf, pages: List[int], max_bytes: int) -> List[List[int]]:
+    """
+    Empacota 'pages' (1-based, na ordem) gulosamente em partes de até
+    'max_bytes', somando só os objetos que a página acrescenta à parte
+    (recursos compartilhados contam uma vez). É uma estimativa: o tamanho real
+    é conferido depois da escrita (ver iter_preserving_pdf_parts).
+    """
+    per_page, costs = page_object_costs(pdf_src)
+    parts: List[List[int]] = []
+    current: List[int] = []
+    current_objs: set = set()
+    current_size = _PART_BASE_BYTES
+    for page_number in pages:
+        objs = per_page[page_number - 1]
+        added = sum(costs[k] for k in objs if k not in current_objs)
+        if current and current_size + added > max_bytes:
+            parts.append(current)
+            current, current_objs, current_size = [], set(), _PART_BASE_BYTES
+            added = sum(costs[k] for k in objs)
+        current.append(page_number)
+        current_objs |= objs
+        current_size += added
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _resolve_outline_dest(pdf_src: pikepdf.Pdf, dest):
+    """Destino (array, nome ou dicionário /D) -> objeto da página, ou None."""
+    for _ in range(4):
+        if dest is None:
+            return None
+        if isinstance(dest, (pikepdf.Name, pikepdf.String)):
+            key = str(dest).lstrip("/") if isinstance(dest, pikepdf.Name) else str(dest)
+            found = None
+            try:
+                dests = pdf_src.Root.get("/Dests")
+                if dests is not None and ("/" + key) in dests:
+                    found = dests["/" + key]
+                names = pdf_src.Root.get("/Names")
+                if found is None and names is not None and "/Dests" in names:
+                    found = pikepdf.NameTree(names["/Dests"]).get(key)
+            except Exception:
+                found = None
+            dest = found
+            continue
+        if isinstance(dest, pikepdf.Dictionary):
+            dest = dest.get("/D")
+            continue
+        if isinstance(dest, pikepdf.Array) and len(dest) > 0:
+            return dest[0]
+        return None
+    return None
+
+
+def outline_top_level_pages(pdf_src: pikepdf.Pdf) -> List[tuple]:
+    """Marcadores de 1º nível: [(título, página 1-based), ...] na ordem do sumário."""
+    out: List[tuple] = []
+    try:
+        with pdf_src.open_outline() as outline:
+            for item in outline.root:
+                dest = item.destination
+                if dest is None and item.action is not None:
+                    dest = item.action.get("/D")
+                target = _resolve_outline_dest(pdf_src, dest)
+                if target is None:
+                    continue
+                try:
+                    if isinstance(target, int):
+                        page_number = int(target) + 1
+                    else:
+                        page_number = pdf_src.pages.index(pikepdf.Page(target)) + 1
+                except Exception:
+                    continue
+                out.append((str(item.title or ""), page_number))
+    except Exception:
+        return []
+    return out
+
+
+def write_preserving_pdf_parts(
+    input_path: str,
+    parts: List[Optional[List[int]]],
+    output_path_for: Callable[[int, List[int]], str],
+    rotations: Optional[Dict[int, int]] = None,
+    page_transform: Optional[Callable[[pikepdf.Page, int], None]] = None,
+    max_bytes: Optional[int] = None,
+) -> List[dict]:
+    """List version of iter_preserving_pdf_parts (all parts written before returning)."""
+    return list(
+        iter_preserving_pdf_parts(
+            input_path,
+            parts,
+            output_path_for,
+            rotations=rotations,
+            page_transform=page_transform,
+            max_bytes=max_bytes,
+        )
+    )
+
+
+def write_preserving_pdf_subset(
+    input_path: str,
+    output_path: str,
+    pages: Optional[List[int]] = None,
+    rotations: Optional[Dict[int, int]] = None,
+    page_transform: Optional[Callable[[pikepdf.Page, int], None]] = None,
+) -> dict:
+    """
+    Losslessly writes selected pages while rebuilding page-scoped AcroForm data.
+
+    The helper preserves page order, duplicate page selections, widgets,
+    annotations, /AP appearances, /Parent, /Kids, /P and a filtered /CO.
+    It also strips dangerous catalog/form action keys inherited from the source.
+    """
+    (result,) = write_preserving_pdf_parts(
+        input_path,
+        [pages],
+        lambda _index, _pages: output_path,
+        rotations=rotations,
+        page_transform=page_transform,
+    )
     return {
-        "pages_in": total,
-        "pages_out": len(pages_to_emit),
+        "pages_in": result["pages_in"],
+        "pages_out": result["pages_out"],
         "output_path": output_path,
     }
 
@@ -1,15 +1,32 @@
+import io
 import os
 import re
+import json
+import uuid
+import shutil
 import hashlib
-from PIL import Image
+from PIL import Image, features
 import pypdfium2 as pdfium
 from flask import current_app
+from werkzeug.exceptions import BadRequest
+
+from . import thumb_cache
+from .limits import get_max_pdf_pages
 
 # ===== Config =====
 THUMB_MAX_WIDTH = 512        # largura máxima da miniatura (mantém proporção)
 THUMBS_SUBDIR   = "_thumbs"  # subpasta de cache dentro de UPLOAD_FOLDER
 SAFE_NAME_RE    = re.compile(r"^[a-f0-9]{16,64}$")  # nomes seguros (hash hex)
 
+# Sprite sheets (miniaturas de TODAS as páginas em poucas imagens)
+#   SPRITE_THUMB_WIDTH   -> largura de cada miniatura em px (default 200; 64..512)
+#   SPRITE_COLUMNS       -> miniaturas por linha da folha (default 10)
+#   SPRITE_MAX_SHEET_PX  -> altura máxima de cada folha em px (default 4096)
+#   SPRITE_QUALITY       -> qualidade WebP/JPEG (default 75)
+SPRITES_SUBDIR  = "sprites"
+SPRITE_FORMATS  = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+SPRITE_ID_RE    = re.compile(r"^[a-f0-9]{40}-\d{2,3}-(webp|jpeg)$")
+
 def _sha256_file(path: str) -> str:
     h = hashlib.sha256()
     with open(path, "rb") as f:
@@ -23,11 +40,34 @@ def _thumbs_dir() -> str:
     os.makedirs(thumbs, exist_ok=True)
     return thumbs
 
+def _write_png_atomic(src_pdf_path: str, out_png_path: str) -> None:
+    tmp = os.path.join(os.path.dirname(out_png_path), f".tmp_{uuid.uuid4().hex}.png")
+    try:
+        _render_first_page_to_png(src_pdf_path, tmp)
+        os.replace(tmp, out_png_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
 def _render_first_page_to_png(src_pdf_path: str, out_png_path: str, dpi: int = 144) -> None:
     """
     Renderiza SOMENTE a primeira página do PDF em PNG (com pypdfium2),
     redimensionando para THUMB_MAX_WIDTH (mantendo proporção).
+    Com RENDER_SERVICE_FOR contendo "preview", o render vai para o pool.
     """
+    from ..services import render_service
+    if render_service.routes("preview"):
+        data = render_service.render(src_pdf_path, 1, dpi / 72.0, "ppm", max_side=4096)
+        with Image.open(io.BytesIO(data)) as pil:
+            if pil.width > THUMB_MAX_WIDTH:
+                new_h = int(pil.height * (THUMB_MAX_WIDTH / pil.width))
+                pil = pil.resize((THUMB_MAX_WIDTH, new_h), Image.LANCZOS)
+            pil.save(out_png_path, format="PNG", optimize=True)
+        return
+
     pdf = pdfium.PdfDocument(src_pdf_path)
     if len(pdf) < 1:
         raise ValueError("PDF sem páginas.")
@@ -48,6 +88,9 @@ def _render_first_page_to_png(src_pdf_path: str, out_png_path: str, dpi: int = 1
 def preview_pdf(abs_pdf_path: str) -> dict:
     """
     Gera (ou reutiliza do cache) a miniatura PNG da 1ª página do PDF.
+    A chave vem de thumb_cache.resolve_key (tamanho + pontas do arquivo,
+    confirmada pelo SHA-256 completo em arquivos grandes; numa falta, o hash
+    é calculado em paralelo com o render e gravado junto da entrada).
 
     Retorna:
     {
@@ -59,21 +102,223 @@ def preview_pdf(abs_pdf_path: str) -> dict:
     if not os.path.exists(abs_pdf_path):
         raise FileNotFoundError("Arquivo PDF não encontrado.")
 
-    full_hash = _sha256_file(abs_pdf_path)
-    thumb_id = full_hash[:40]  # id curto e seguro
+    thumbs_dir = _thumbs_dir()
+
+    def _confirmed(key: str):
+        if not os.path.exists(os.path.join(thumbs_dir, f"{key}.png")):
+            return None
+        return thumb_cache.read_sidecar(os.path.join(thumbs_dir, f"{key}.sha")) or ""
+
+    thumb_id, full_hash = thumb_cache.resolve_key(abs_pdf_path, _confirmed)  # id curto e seguro
 
     if not SAFE_NAME_RE.match(thumb_id):
         raise ValueError("Identificador de miniatura inválido.")
 
-    thumbs_dir = _thumbs_dir()
     thumb_filename = f"{thumb_id}.png"
     thumb_path = os.path.join(thumbs_dir, thumb_filename)
 
-    if not os.path.exists(thumb_path):
-        _render_first_page_to_png(abs_pdf_path, thumb_path)
+    hit = thumb_cache.touch(thumb_path)
+    thumb_cache.record(hit)
+    if not hit:
+        pending = None
+        if full_hash is None and thumb_cache.needs_full_hash(abs_pdf_path):
+            pending = thumb_cache.hash_async(abs_pdf_path)
+        _write_png_atomic(abs_pdf_path, thumb_path)
+        if pending is not None:
+            full_hash = pending.result()
+        if full_hash:
+            with open(os.path.join(thumbs_dir, f"{thumb_id}.sha"), "w", encoding="ascii") as fh:
+                fh.write(full_hash)
+        thumb_cache.prune(thumbs_dir)
 
     return {
         "thumb_id": thumb_id,
         "thumb_path": thumb_path,
         "filename": thumb_filename,
-    }
\ No newline at end of file
+    }
+
+
+# ===== Sprite sheets =====
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+def sprite_width(requested=None) -> int:
+    try:
+        width = int(requested) if requested not in (None, "") else _env_int("SPRITE_THUMB_WIDTH", 200)
+    except (TypeError, ValueError):
+        raise BadRequest("Largura de miniatura inválida.")
+    return max(64, min(512, width))
+
+def sprite_format(requested=None) -> str:
+    fmt = (requested or "webp").strip().lower()
+    if fmt in ("jpg", "jpeg"):
+        return "jpeg"
+    if fmt != "webp":
+        raise BadRequest("Formato de miniatura inválido (use webp ou jpeg).")
+    return "webp" if features.check("webp") else "jpeg"
+
+def _sprites_dir() -> str:
+    path = os.path.join(_thumbs_dir(), SPRITES_SUBDIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def sprite_dir(sprite_id: str) -> str:
+    if not SPRITE_ID_RE.match(sprite_id or ""):
+        raise BadRequest("Identificador de sprite inválido.")
+    return os.path.join(_sprites_dir(), sprite_id)
+
+def load_sprite_index(sprite_id: str, touch: bool = True):
+    """Índice já gerado (ou None se ainda não existe no cache). Marca uso (LRU)."""
+    path = os.path.join(sprite_dir(sprite_id), "index.json")
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            index = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+    if touch:
+        thumb_cache.touch(path)
+    return index
+
+def _check_page_total(total: int) -> None:
+    if total < 1:
+        raise BadRequest("PDF sem páginas.")
+    if total > get_max_pdf_pages():
+        raise BadRequest(f"PDF excede o limite de páginas ({total} > {get_max_pdf_pages()}).")
+
+def _render_thumbs(src_pdf_path: str, width: int):
+    """Gera (página, PIL.Image) de todas as páginas, na largura 'width' (rotação da página aplicada)."""
+    from ..services import render_service
+    if render_service.routes("preview"):
+        total = render_service.page_count(src_pdf_path)
+        _check_page_total(total)
+        step = 64  # lotes: o pool mantém o documento aberto entre eles
+        for start in range(1, total + 1, step):
+            pages = list(range(start, min(total, start + step - 1) + 1))
+            for pn, data in zip(pages, render_service.render_batch(src_pdf_path, pages, fmt="ppm", width=width)):
+                pil = Image.open(io.BytesIO(data)).convert("RGB")
+                yield pn, (pil.crop((0, 0, width, width * 4)) if pil.height > width * 4 else pil)
+        return
+
+    pdf = pdfium.PdfDocument(src_pdf_path)
+    try:
+        total = len(pdf)
+        _check_page_total(total)
+        for index in range(total):
+            page = pdf.get_page(index)
+            try:
+                pw, _ph = page.get_size()  # tamanho de exibição (/Rotate aplicado)
+                scale = width / max(1.0, pw)
+                pil = page.render(scale=scale).to_pil().convert("RGB")
+            finally:
+                page.close()
+            if pil.width != width:
+                pil = pil.resize((width, max(1, round(pil.height * width / pil.width))), Image.LANCZOS)
+            if pil.height > width * 4:  # páginas "tira" muito compridas
+                pil = pil.crop((0, 0, width, width * 4))
+            yield index + 1, pil
+    finally:
+        pdf.close()
+
+def _write_sheets(thumbs, out_dir: str, width: int, fmt: str) -> dict:
+    """Empacota as miniaturas em folhas (linhas de SPRITE_COLUMNS) e grava index.json."""
+    columns = max(1, _env_int("SPRITE_COLUMNS", 10))
+    max_h = max(width * 4, _env_int("SPRITE_MAX_SHEET_PX", 4096))
+    quality = max(30, min(95, _env_int("SPRITE_QUALITY", 75)))
+    pil_format, _mime = SPRITE_FORMATS[fmt]
+
+    index, sheets = [], 0
+    rows, row, sheet_h = [], [], 0
+
+    def _flush_sheet():
+        nonlocal rows, sheet_h, sheets
+        if not rows:
+            return
+        sheet = Image.new("RGB", (columns * width, sheet_h), "white")
+        y = 0
+        for cells in rows:
+            row_h = max(im.height for _pn, im in cells)
+            for col, (pn, im) in enumerate(cells):
+                sheet.paste(im, (col * width, y))
+                index.append({"page": pn, "sheet": sheets, "x": col * width, "y": y,
+                              "w": im.width, "h": im.height})
+            y += row_h
+        sheet.save(os.path.join(out_dir, f"{sheets}.{fmt}"), format=pil_format, quality=quality)
+        sheets += 1
+        rows, sheet_h = [], 0
+
+    def _flush_row():
+        nonlocal row, sheet_h
+        if not row:
+            return
+        row_h = max(im.height for _pn, im in row)
+        if rows and sheet_h + row_h > max_h:
+            _flush_sheet()
+        rows.append(row)
+        sheet_h += row_h
+        row = []
+
+    for pn, im in thumbs:
+        row.append((pn, im))
+        if len(row) == columns:
+            _flush_row()
+    _flush_row()
+    _flush_sheet()
+
+    return {"pages": len(index), "width": width, "format": fmt, "sheets": sheets,
+            "columns": columns, "index": index}
+
+def preview_sprites(abs_pdf_path: str, width=None, fmt=None) -> dict:
+    """
+    Miniaturas de TODAS as páginas em poucas "folhas" (sprite sheets) +
+    índice JSON com o retângulo de cada página. Cache por conteúdo em
+    _thumbs/sprites/<chave>-<largura>-<formato>/ (gerado uma vez só;
+    publicação atômica por rename do diretório; chave como em preview_pdf).
+
+    Retorna o índice: {sprite_id, pages, width, format, sheets, columns,
+    index: [{page, sheet, x, y, w, h}, ...]}.
+    """
+    if not os.path.exists(abs_pdf_path):
+        raise FileNotFoundError("Arquivo PDF não encontrado.")
+    width = sprite_width(width)
+    fmt = sprite_format(fmt)
+
+    def _confirmed(key: str):
+        index = load_sprite_index(f"{key}-{width}-{fmt}", touch=False)
+        return None if index is None else (index.get("sha256") or "")
+
+    key, full_hash = thumb_cache.resolve_key(abs_pdf_path, _confirmed)
+    sprite_id = f"{key}-{width}-{fmt}"
+
+    cached = load_sprite_index(sprite_id)
+    thumb_cache.record(cached is not None)
+    if cached is not None:
+        return cached
+
+    final_dir = sprite_dir(sprite_id)
+    tmp_dir = os.path.join(_sprites_dir(), f".tmp_{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+    pending = None
+    if full_hash is None and thumb_cache.needs_full_hash(abs_pdf_path):
+        pending = thumb_cache.hash_async(abs_pdf_path)  # roda junto com o render
+    try:
+        result = _write_sheets(_render_thumbs(abs_pdf_path, width), tmp_dir, width, fmt)
+        result["sprite_id"] = sprite_id
+        if pending is not None:
+            full_hash = pending.result()
+        if full_hash:
+            result["sha256"] = full_hash
+        with open(os.path.join(tmp_dir, "index.json"), "w", encoding="utf-8") as fh:
+            json.dump(result, fh, separators=(",", ":"))
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            # outro worker publicou primeiro: o dele vale
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    thumb_cache.prune(_thumbs_dir())
+    return load_sprite_index(sprite_id) or result
@@ -10,6 +10,7 @@ Exposto:
       B) record_job_event(route="...", action="...", bytes_in=..., bytes_out=..., files_out=..., ok=True)
 
 - aggregate_stats(app=None, range_spec="15m")     -> snapshot p/ /api/admin/stats
+      (inclui "thumbs_cache": tamanho e taxa de acerto do cache de miniaturas)
 
 Chaves em tools:
   "<tool>_ok" e "<tool>_err", ex.: "merge_ok", "split_err".
@@ -318,6 +319,11 @@ def aggregate_stats(app=None, range_spec: str | None = "15m") -> Dict:
         uploads = app.config.get("UPLOAD_FOLDER") or uploads
     uploads = uploads or (os.path.join(os.getcwd(), "uploads"))
     files, bytes_ = _folder_usage(uploads)
+    try:
+        from .thumb_cache import stats as _thumb_stats
+        thumbs = _thumb_stats(os.path.join(uploads, "_thumbs"))
+    except Exception:
+        thumbs = {}
 
     # Info do app (versão/ambiente/build) – útil para badges no topo.
     app_info = {
@@ -400,6 +406,7 @@ def aggregate_stats(app=None, range_spec: str | None = "15m") -> Dict:
             "files": files,
             "bytes": bytes_,
         },
+        "thumbs_cache": thumbs,     # {"bytes", "entries", "hit_rate", ...}
         "timeseries": {
             "requests_per_min": _build_timeseries(events, minutes, now)
         },
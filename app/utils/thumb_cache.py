@@ -0,0 +1,254 @@
+# app/utils/thumb_cache.py
+# -*- coding: utf-8 -*-
+"""
+Manutenção do cache de miniaturas (UPLOAD_FOLDER/_thumbs).
+
+• Entradas: "<id>.png" (+ "<id>.sha", quando existe) e os diretórios de
+  sprites "sprites/<id>-<largura>-<formato>/". Cada entrada conta como uma
+  unidade para LRU/TTL.
+• LRU por mtime: todo acerto "toca" a entrada; a poda remove as mais antigas
+  até caber no orçamento e, antes disso, tudo que passou do TTL.
+• Chave rápida: tamanho + SHA-256 do 1º e do último MB. Arquivos de até 2 MB
+  ficam cobertos por inteiro (a chave já é exata). Nos maiores, a busca só
+  calcula o SHA-256 completo para CONFIRMAR um acerto; numa falta ela devolve
+  a chave rápida sem ler o arquivo todo, e quem gera a entrada calcula o hash
+  em paralelo com a renderização (hash_async) para gravá-lo junto.
+• Contadores de acerto/falta ficam em memória (por processo) para o /admin.
+
+ENV:
+  THUMBS_CACHE_MAX_MB         -> orçamento do cache (default 256; 0 = sem teto)
+  THUMBS_CACHE_TTL_HOURS      -> idade máxima sem acesso (default 168 = 7 dias; 0 = sem TTL)
+  THUMBS_PRUNE_INTERVAL_SEC   -> intervalo mínimo entre podas automáticas (default 60)
+"""
+from __future__ import annotations
+
+import os
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import disk_cache
+
+logger = logging.getLogger(__name__)
+
+SPRITES_SUBDIR = "sprites"
+_EDGE_BYTES = 1024 * 1024
+_STALE_TMP_SEC = 3600
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {"hits": 0, "misses": 0, "evicted": 0}
+_last_prune = 0.0
+_hash_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def max_bytes() -> int:
+    return max(0, _env_int("THUMBS_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+
+def ttl_seconds() -> int:
+    return max(0, _env_int("THUMBS_CACHE_TTL_HOURS", 168)) * 3600
+
+
+# ------------------------------------------------------------------
+# Chaves
+# ------------------------------------------------------------------
+def quick_key(path: str) -> Tuple[str, bool]:
+    """
+    (id de 40 hex, exato?). O id deriva do tamanho + 1º/último MB; 'exato'
+    quando isso cobre o arquivo inteiro (tamanho <= 2 MB).
+    """
+    size = os.path.getsize(path)
+    h = hashlib.sha256(f"{size}:".encode("ascii"))
+    with open(path, "rb") as fh:
+        h.update(fh.read(_EDGE_BYTES))
+        if size > _EDGE_BYTES:
+            fh.seek(max(_EDGE_BYTES, size - _EDGE_BYTES))
+            h.update(fh.read(_EDGE_BYTES))
+    return h.hexdigest()[:40], size <= 2 * _EDGE_BYTES
+
+
+def needs_full_hash(path: str) -> bool:
+    """Entrada nova para 'path' precisa gravar o SHA-256 completo (chave rápida não é exata)?"""
+    return os.path.getsize(path) > 2 * _EDGE_BYTES
+
+
+def hash_async(path: str) -> "Future[str]":
+    """SHA-256 completo numa thread (hashlib solta o GIL): roda junto com o render da falta."""
+    global _hash_pool
+    with _lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumb-hash")
+    return _hash_pool.submit(disk_cache.sha256_file, path)
+
+
+def resolve_key(path: str, confirmed_hash: Callable[[str], Optional[str]]) -> Tuple[str, Optional[str]]:
+    """
+    Escolhe o id da entrada para 'path'. 'confirmed_hash(id)' devolve o SHA-256
+    completo gravado na entrada existente (None se a entrada não existe).
+
+    Retorna (id, sha256_completo_ou_None). Numa falta da chave rápida nada é
+    hasheado: volta (chave, None) e, se needs_full_hash(path), quem gera a
+    entrada grava o hash (ver hash_async). O hash só é calculado aqui para
+    confirmar uma entrada existente; volta preenchido apenas quando a chave
+    rápida colidiu e a entrada nova usa o próprio hash como id.
+    """
+    key, exact = quick_key(path)
+    if exact:
+        return key, None
+    stored = confirmed_hash(key)
+    if stored is None:
+        return key, None
+    full = disk_cache.sha256_file(path)
+    if stored == full:
+        return key, None
+    # colisão da chave rápida (mesmas pontas, miolo diferente): usa o hash completo
+    return full[:40], full
+
+
+def read_sidecar(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="ascii") as fh:
+            return fh.read().strip() or None
+    except (OSError, ValueError):
+        return None
+
+
+# ------------------------------------------------------------------
+# Métricas
+# ------------------------------------------------------------------
+def record(hit: bool) -> None:
+    with _lock:
+        _counters["hits" if hit else "misses"] += 1
+
+
+def touch(path: str) -> bool:
+    return disk_cache.touch(path)
+
+
+def _entries(thumbs_dir: str) -> List[Tuple[float, int, List[str]]]:
+    """[(último_uso, bytes, [caminhos])] de cada entrada publicada."""
+    groups: Dict[str, List] = {}
+    try:
+        with os.scandir(thumbs_dir) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.startswith(".tmp_"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                stem = entry.name.split(".", 1)[0]
+                group = groups.setdefault(stem, [0.0, 0, []])
+                group[0] = max(group[0], st.st_mtime)
+                group[1] += st.st_size
+                group[2].append(entry.path)
+    except FileNotFoundError:
+        return []
+    out = [(mtime, size, paths) for mtime, size, paths in groups.values()]
+
+    sprites = os.path.join(thumbs_dir, SPRITES_SUBDIR)
+    now = time.time()
+    try:
+        with os.scandir(sprites) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                if entry.name.startswith(".tmp_"):
+                    # build abandonado (processo morto no meio): some depois de 1h
+                    try:
+                        if now - entry.stat().st_mtime > _STALE_TMP_SEC:
+                            shutil.rmtree(entry.path, ignore_errors=True)
+                    except OSError:
+                        pass
+                    continue
+                size, mtime = 0, 0.0
+                try:
+                    with os.scandir(entry.path) as files:
+                        for f in files:
+                            st = f.stat()
+                            size += st.st_size
+                            if f.name == "index.json":
+                                mtime = st.st_mtime
+                except OSError:
+                    continue
+                out.append((mtime, size, [entry.path]))
+    except FileNotFoundError:
+        pass
+    return out
+
+
+def _remove(paths: List[str]) -> None:
+    for path in paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def prune(thumbs_dir: str, force: bool = False) -> int:
+    """
+    Aplica TTL e orçamento (LRU). Sem 'force', roda no máximo uma vez a cada
+    THUMBS_PRUNE_INTERVAL_SEC por processo. Retorna quantas entradas saíram.
+    """
+    global _last_prune
+    now = time.time()
+    with _lock:
+        if not force and now - _last_prune < max(0, _env_int("THUMBS_PRUNE_INTERVAL_SEC", 60)):
+            return 0
+        _last_prune = now
+
+    entries = sorted(_entries(thumbs_dir))
+    ttl, cap = ttl_seconds(), max_bytes()
+    total = sum(size for _m, size, _p in entries)
+    removed = 0
+    for mtime, size, paths in entries:
+        expired = ttl and now - mtime > ttl
+        if not expired and (not cap or total <= cap):
+            break  # ordenado por uso: o resto é mais recente e cabe
+        _remove(paths)
+        total -= size
+        removed += 1
+    if removed:
+        with _lock:
+            _counters["evicted"] += removed
+        logger.debug("Cache de miniaturas: %d entradas removidas (TTL/LRU).", removed)
+    return removed
+
+
+def stats(thumbs_dir: str) -> Dict:
+    """Snapshot para o dashboard: tamanho em disco e taxa de acerto (deste processo)."""
+    entries = _entries(thumbs_dir) if os.path.isdir(thumbs_dir) else []
+    with _lock:
+        hits, misses, evicted = _counters["hits"], _counters["misses"], _counters["evicted"]
+    lookups = hits + misses
+    return {
+        "entries": len(entries),
+        "bytes": sum(size for _m, size, _p in entries),
+        "max_bytes": max_bytes(),
+        "hits": hits,
+        "misses": misses,
+        "evicted": evicted,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def reset_counters() -> None:
+    global _last_prune
+    with _lock:
+        for key in _counters:
+            _counters[key] = 0
+        _last_prune = 0.0
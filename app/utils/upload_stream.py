@@ -0,0 +1,267 @@
+# app/utils/upload_stream.py
+# -*- coding: utf-8 -*-
+"""
+Ingestão de uploads em streaming.
+
+• O corpo multipart é gravado, à medida que chega, direto em
+  UPLOAD_FOLDER/_incoming (no lugar do SpooledTemporaryFile do Werkzeug).
+• Durante a escrita: SHA-256 e tamanho incrementais; MIME real e cabeçalho
+  PDF detectados nos primeiros bytes (HEAD_BYTES). Tipo fora da allowlist,
+  não-PDF em endpoint marcado com @pdf_uploads_only ou arquivo acima do teto
+  interrompem a leitura do corpo na hora (o resto nem é lido).
+• file.save(destino) vira hardlink do arquivo recebido (mesmo FS): uma única
+  escrita em disco por upload. Cabeçalho, MIME e hash ficam no objeto e são
+  reaproveitados por validate_upload (_read_head), doc_store e edição.
+• Os arquivos de _incoming somem no fim da requisição (request.close()); o
+  destino do save() continua existindo (é outro nome para o mesmo inode).
+
+ENV:
+  UPLOAD_STREAMING     -> "1"/"0" liga/desliga (default 1)
+  UPLOAD_MAX_FILE_MB   -> teto por arquivo, além de MAX_CONTENT_LENGTH (default 0 = sem teto próprio)
+"""
+from __future__ import annotations
+
+import os
+import time
+import uuid
+import hashlib
+import logging
+from typing import List, Optional
+
+from flask import Request, current_app, request
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import BadRequest, HTTPException, RequestEntityTooLarge
+
+from . import disk_cache
+from .mime import PDF_SIG, detect_mime_from_buffer, is_allowed_mime
+
+logger = logging.getLogger(__name__)
+
+INCOMING_SUBDIR = "_incoming"
+HEAD_BYTES = 8192           # mesmo tamanho lido por config_utils._read_head
+_PDF_HEADER_WINDOW = 1024   # '%PDF-' tolerado após BOM/ruído (como em edit._is_pdf_header)
+_STALE_SEC = 3600
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def enabled() -> bool:
+    return (os.environ.get("UPLOAD_STREAMING", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def pdf_uploads_only(view):
+    """Marca o endpoint: arquivo que não começa como PDF é recusado durante o upload."""
+    view._pdf_uploads_only = True
+    return view
+
+
+def _endpoint_wants_pdf() -> bool:
+    try:
+        view = current_app.view_functions.get(request.endpoint or "")
+    except Exception:
+        return False
+    return bool(getattr(view, "_pdf_uploads_only", False))
+
+
+class IngestStream:
+    """Destino de um arquivo do multipart: grava em disco e inspeciona no caminho."""
+
+    def __init__(self, path: str, max_bytes: int = 0, pdf_only: bool = False):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        self._fh = os.fdopen(fd, "w+b")
+        self.path = path
+        self.size = 0
+        self.head = b""
+        self.mime: Optional[str] = None
+        self.is_pdf: Optional[bool] = None
+        self.sha256: Optional[str] = None
+        self._hash = hashlib.sha256()
+        self._max_bytes = max_bytes
+        self._pdf_only = pdf_only
+        self._sealed = False
+
+    # ---- escrita (chamada pelo parser do Werkzeug) ----
+    def write(self, data: bytes) -> int:
+        if self._sealed:
+            self.sha256 = None  # conteúdo alterado depois do upload: hash não vale mais
+            return self._fh.write(data)
+        self.size += len(data)
+        if self._max_bytes and self.size > self._max_bytes:
+            raise RequestEntityTooLarge("Arquivo acima do limite por arquivo (UPLOAD_MAX_FILE_MB).")
+        self._hash.update(data)
+        if len(self.head) < HEAD_BYTES:
+            self.head += data[:HEAD_BYTES - len(self.head)]
+            if len(self.head) >= HEAD_BYTES:
+                self._inspect()
+        return self._fh.write(data)
+
+    def _inspect(self) -> None:
+        head = self.head
+        self.is_pdf = PDF_SIG in head[:_PDF_HEADER_WINDOW]
+        self.mime = (detect_mime_from_buffer(head) or "application/octet-stream").lower()
+        if self._pdf_only and not self.is_pdf:
+            raise BadRequest("Arquivo enviado não é um PDF válido.")
+        if self.mime != "application/octet-stream" and not is_allowed_mime(self.mime) and not self.is_pdf:
+            raise BadRequest(f"Tipo MIME não permitido: {self.mime}")
+
+    def _seal(self) -> None:
+        # o parser faz seek(0) ao terminar cada arquivo
+        self._sealed = True
+        self._fh.flush()
+        if self.size and self.mime is None:
+            self._inspect()
+        self.sha256 = self._hash.hexdigest()
+
+    # ---- leitura (interface de arquivo para FileStorage) ----
+    def seek(self, pos: int, whence: int = os.SEEK_SET) -> int:
+        if not self._sealed:
+            self._seal()
+        return self._fh.seek(pos, whence)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._fh.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._fh.readline(size)
+
+    def __iter__(self):
+        return iter(self._fh)
+
+    def __getattr__(self, name):
+        return getattr(self._fh, name)
+
+    def close(self) -> None:
+        try:
+            self._fh.close()
+        finally:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class IngestedUpload(FileStorage):
+    """FileStorage cujo save() publica o arquivo já recebido (hardlink/clone)."""
+
+    @property
+    def ingest_head(self) -> bytes:
+        return self.stream.head
+
+    @property
+    def sniffed_mime(self) -> Optional[str]:
+        return self.stream.mime
+
+    @property
+    def sha256(self) -> Optional[str]:
+        return self.stream.sha256
+
+    @property
+    def size(self) -> int:
+        return self.stream.size
+
+    def save(self, dst, buffer_size: int = 16384) -> None:
+        stream = self.stream
+        if not isinstance(dst, (str, os.PathLike)) or not stream._sealed or stream.closed:
+            return super().save(dst, buffer_size)
+        stream.flush()
+        try:
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+        disk_cache.link_or_clone(stream.path, os.fspath(dst))
+
+
+class IngestRequest(Request):
+    """Request do app: uploads multipart passam por IngestStream."""
+
+    _ingest_error: Optional[HTTPException] = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        folder = current_app.config.get("UPLOAD_FOLDER") if current_app else None
+        if not folder or not enabled():
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        incoming = os.path.join(os.fspath(folder), INCOMING_SUBDIR)
+        os.makedirs(incoming, mode=0o700, exist_ok=True)
+        stream = IngestStream(
+            os.path.join(incoming, uuid.uuid4().hex),
+            max_bytes=max(0, _env_int("UPLOAD_MAX_FILE_MB", 0)) * 1024 * 1024,
+            pdf_only=_endpoint_wants_pdf(),
+        )
+        self.__dict__.setdefault("_ingest_streams", []).append(stream)
+        return stream
+
+    def _load_form_data(self) -> None:
+        if self._ingest_error is not None:
+            raise self._ingest_error
+        try:
+            super()._load_form_data()
+        except HTTPException as exc:
+            # o corpo já foi (parcialmente) consumido: acessos seguintes repetem o erro
+            self._ingest_error = exc
+            self._close_streams()
+            raise
+        files = self.__dict__.get("files")
+        if files and any(isinstance(fs.stream, IngestStream) for _k, fs in files.items(multi=True)):
+            self.__dict__["files"] = self.parameter_storage_class([
+                (key, IngestedUpload(fs.stream, fs.filename, fs.name, headers=fs.headers)
+                 if isinstance(fs.stream, IngestStream) else fs)
+                for key, fs in files.items(multi=True)
+            ])
+
+    def _close_streams(self) -> None:
+        streams: List[IngestStream] = self.__dict__.pop("_ingest_streams", [])
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._close_streams()
+
+
+# ------------------------------------------------------------------
+# Consumidores
+# ------------------------------------------------------------------
+def cached_head(file, nbytes: int = HEAD_BYTES) -> Optional[bytes]:
+    """Primeiros 'nbytes' do upload, se já capturados na recepção (None = ler do stream)."""
+    if not isinstance(file, IngestedUpload) or not file.stream._sealed:
+        return None
+    head = file.ingest_head
+    if len(head) >= nbytes or len(head) >= file.size:
+        return head[:nbytes]
+    return None
+
+
+def known_sha256(file) -> Optional[str]:
+    """SHA-256 calculado durante a recepção (None se o upload não passou pelo streaming)."""
+    if isinstance(file, IngestedUpload):
+        return file.sha256
+    return None
+
+
+def clean_incoming(upload_folder: str) -> int:
+    """Remove sobras de _incoming (processo morto no meio de um upload)."""
+    incoming = os.path.join(os.fspath(upload_folder), INCOMING_SUBDIR)
+    removed = 0
+    now = time.time()
+    try:
+        with os.scandir(incoming) as it:
+            for entry in it:
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime > _STALE_SEC:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return removed
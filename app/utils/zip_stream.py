@@ -0,0 +1,86 @@
+# app/utils/zip_stream.py
+# -*- coding: utf-8 -*-
+"""
+ZIP gerado sob demanda para respostas HTTP em streaming.
+
+• Nada do arquivo final vai para o disco: o zipfile escreve num "ralo" em
+  memória que é esvaziado (yield) a cada bloco de CHUNK_SIZE lido da origem —
+  o 1º byte sai assim que o 1º arquivo fica pronto e a memória fica limitada
+  a um bloco, qualquer que seja o tamanho da entrada.
+• PDFs já são comprimidos internamente: entradas .pdf vão STORED (sem custo
+  de CPU); as demais usam DEFLATE.
+• Como a saída não é "seekable", o zipfile usa data descriptors e o diretório
+  central no final — formato padrão lido por qualquer descompactador.
+"""
+from __future__ import annotations
+
+import zipfile
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+_STORED_EXTS = (".pdf", ".zip", ".png", ".jpg", ".jpeg", ".webp")
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Sink:
+    """Arquivo só-escrita e não-seekable que acumula os bytes até o próximo drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._written = 0
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile usa tell() para os offsets do diretório central
+        return self._written
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def compression_for(name: str) -> int:
+    return zipfile.ZIP_STORED if name.lower().endswith(_STORED_EXTS) else zipfile.ZIP_DEFLATED
+
+
+def iter_zip(
+    entries: Iterable[Tuple[str, str]],
+    on_added: Optional[Callable[[str], None]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Gera o ZIP em pedaços. 'entries' produz (caminho_no_disco, nome_no_zip) e
+    pode ser preguiçoso (cada arquivo é lido quando chega). 'on_added' é
+    chamado após cada entrada (ex.: apagar o arquivo de origem).
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for path, arcname in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = compression_for(arcname)
+            # file_size já vem do stat: o zipfile decide sozinho se precisa de ZIP64
+            with open(path, "rb") as src, zf.open(info, "w") as dst:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dst.write(block)
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            if on_added is not None:
+                on_added(path)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    tail = sink.drain()
+    if tail:
+        yield tail
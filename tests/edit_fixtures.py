@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+from PyPDF2 import PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.services import edit_doc_cache
+from app.utils.security import OUTPUT_OWNER_SESSION_KEY
+
+
+@pytest.fixture
+def client(tmp_path):
+    edit_doc_cache.clear()
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    yield app.test_client()
+    edit_doc_cache.clear()
+
+
+def blank_pdf_bytes(pages: int = 2, size: int = 200) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=size, height=size)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def lined_pdf_bytes(pages: int, first: str, lines: int = 30) -> bytes:
+    """A4 com 'first' no topo da 1ª página, "Pagina N" nas demais e 'lines' linhas de texto."""
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.drawString(72, 760, first if n == 1 else f"Pagina {n}")
+        for k in range(lines):
+            doc.drawString(72, 700 - k * 15, f"linha {k} " * 8)
+        doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+def upload(client, data: bytes, name: str = "entrada.pdf") -> str:
+    resp = client.post(
+        "/api/edit/upload",
+        data={"file": (io.BytesIO(data), name)},
+        content_type="multipart/form-data",
+        headers={"Accept": "application/json"},
+    )
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    return resp.get_json()["session_id"]
+
+
+def session_dir(client, tmp_path, sid: str) -> Path:
+    with client.session_transaction() as sess:
+        owner = sess[OUTPUT_OWNER_SESSION_KEY]
+    return Path(tmp_path, "edit_sessions", owner, sid)
+
+
+def upload_session(client, tmp_path, data: bytes, name: str = "entrada.pdf") -> Tuple[str, Path]:
+    sid = upload(client, data, name)
+    return sid, session_dir(client, tmp_path, sid)
@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from app import create_app
+from app.services import converter_service, ocr_service
+from app.utils import capabilities
+
+
+def _snapshot(**tools):
+    base = {name: {"ok": False, "cmd": None, "path": None, "version": None}
+            for name in capabilities._RESOLVERS}
+    base.update(tools)
+    return {"fingerprint": capabilities._fingerprint(), "generated": 0, "tools": base, "features": {}}
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setenv("CAPS_CACHE_FILE", str(tmp_path / "caps.json"))
+    monkeypatch.setattr(capabilities, "_CAPS", None)
+    probes = []
+
+    def _fake_probe():
+        probes.append(1)
+        snap = _snapshot(
+            tesseract={"ok": True, "cmd": ["/opt/tesseract"], "path": "/opt/tesseract",
+                       "version": "tesseract 5.3.0", "langs": ["eng", "osd", "por"]},
+            unpaper={"ok": True, "cmd": ["/opt/unpaper"], "path": "/opt/unpaper", "version": "7.0"},
+        )
+        snap["generated"] = __import__("time").time()
+        return snap
+
+    monkeypatch.setattr(capabilities, "probe", _fake_probe)
+    # resolução "atual" coerente com o snapshot falso
+    cmds = {"tesseract": ["/opt/tesseract"], "unpaper": ["/opt/unpaper"]}
+    monkeypatch.setattr(capabilities, "_RESOLVERS", {
+        name: ((lambda cmd=cmds.get(name): cmd), flag)
+        for name, (_resolver, flag) in capabilities._RESOLVERS.items()
+    })
+    return probes
+
+
+def test_probe_runs_once_and_is_shared_through_cache_file(registry, monkeypatch, tmp_path):
+    first = capabilities.get_capabilities()
+    capabilities.get_capabilities()
+    assert len(registry) == 1
+
+    # outro worker (memória vazia) reaproveita o arquivo
+    monkeypatch.setattr(capabilities, "_CAPS", None)
+    assert capabilities.get_capabilities() == first
+    assert len(registry) == 1
+    assert json.loads((tmp_path / "caps.json").read_text())["tools"]["unpaper"]["ok"] is True
+
+    # refresh explícito ou mudança de PATH forçam nova sondagem
+    capabilities.get_capabilities(refresh=True)
+    assert len(registry) == 2
+    monkeypatch.setenv("PATH", "/novo/bin")
+    capabilities.get_capabilities()
+    assert len(registry) == 3
+
+
+def test_services_consult_registry_instead_of_probing(registry, monkeypatch):
+    def _no_subprocess(*args, **kwargs):
+        raise AssertionError("não deveria sondar binários por requisição")
+
+    monkeypatch.setattr(subprocess, "run", _no_subprocess)
+    monkeypatch.setattr(capabilities.shutil, "which", lambda *a, **k: None)
+    capabilities.get_capabilities()
+
+    assert ocr_service._available_tesseract_langs({}) == {"eng", "osd", "por"}
+    assert ocr_service._select_installed_langs("por+deu", {}) == "por"
+    assert ocr_service._has_unpaper() is True
+    assert ocr_service._has_pngquant("") is False
+    assert converter_service._bin_exists("tesseract") is True
+    assert converter_service._bin_exists("qpdf") is False
+    with pytest.raises(RuntimeError):
+        converter_service._soffice_bin()
+
+
+def test_diag_capabilities_endpoint(registry, monkeypatch, tmp_path):
+    monkeypatch.setenv("ENABLE_DIAG", "1")
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    client = app.test_client()
+
+    resp = client.get("/diag/capabilities", base_url="https://localhost")
+    assert resp.status_code == 200
+    assert resp.get_json()["tools"]["tesseract"]["langs"] == ["eng", "osd", "por"]
+    assert len(registry) == 1  # sondado no create_app, não de novo
+
+    client.get("/diag/capabilities?refresh=1", base_url="https://localhost")
+    assert len(registry) == 2
+    gs = client.get("/diag/gs", base_url="https://localhost").get_json()
+    assert gs == {"bin": None, "ok": False, "version": None}
+
+
+def test_cache_file_is_private_and_defaults_to_app_dir(registry, monkeypatch, tmp_path):
+    monkeypatch.delenv("CAPS_CACHE_FILE")
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "up"))
+    capabilities.get_capabilities()
+
+    path = tmp_path / "up" / capabilities.CACHE_SUBDIR / "capabilities.json"
+    assert capabilities._cache_file() == str(path)
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert path.parent.stat().st_mode & 0o777 == 0o700
+
+
+def test_cached_paths_must_match_current_resolution(registry, monkeypatch, tmp_path):
+    capabilities.get_capabilities()
+    assert len(registry) == 1
+
+    # arquivo adulterado: aponta o tesseract para outro binário
+    cache = tmp_path / "caps.json"
+    caps = json.loads(cache.read_text())
+    caps["tools"]["tesseract"]["cmd"] = ["/tmp/evil"]
+    caps["tools"]["tesseract"]["path"] = "/tmp/evil"
+    cache.write_text(json.dumps(caps))
+    monkeypatch.setattr(capabilities, "_CAPS", None)
+
+    assert capabilities.tool_path("tesseract") == "/opt/tesseract"
+    assert len(registry) == 2
+
+
+def test_cache_file_writable_by_others_is_ignored(registry, monkeypatch, tmp_path):
+    capabilities.get_capabilities()
+    os.chmod(tmp_path / "caps.json", 0o666)
+    monkeypatch.setattr(capabilities, "_CAPS", None)
+
+    capabilities.get_capabilities()
+    assert len(registry) == 2
@@ -0,0 +1,156 @@
+import io
+import os
+import time
+import zipfile
+
+import pytest
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.services import doc_store, sanitize_service
+
+
+def _pdf_bytes(pages=3, label="Pagina"):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.drawString(72, 780, f"{label} {n}")
+        doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return app
+
+
+@pytest.fixture
+def sanitize_calls(monkeypatch):
+    calls = []
+    real = sanitize_service.sanitize_pdf
+    monkeypatch.setattr(sanitize_service, "sanitize_pdf", lambda *a, **k: calls.append(a) or real(*a, **k))
+    return calls
+
+
+def _upload(client, data, name="doc.pdf"):
+    resp = client.post("/api/files", data={"file": (io.BytesIO(data), name)},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 201, resp.get_data(as_text=True)
+    return resp.get_json()
+
+
+def _blobs(tmp_path):
+    return os.listdir(tmp_path / "_docs" / "blobs")
+
+
+def test_upload_once_and_reuse_across_tools(app, tmp_path, sanitize_calls):
+    client = app.test_client()
+    data = _pdf_bytes()
+    first = _upload(client, data)
+    again = _upload(client, data, name="copia.pdf")
+    assert first["pages"] == 3 and first["sha256"] == again["sha256"]
+    assert first["file_id"] != again["file_id"]
+    assert len(_blobs(tmp_path)) == 1
+    assert len(sanitize_calls) == 1  # conteúdo repetido não é sanitizado de novo
+
+    split = client.post("/api/split", data={"file_id": first["file_id"]},
+                        content_type="multipart/form-data")
+    assert split.status_code == 200, split.get_data(as_text=True)
+    with zipfile.ZipFile(io.BytesIO(split.data)) as zf:
+        assert len(zf.namelist()) == 3
+
+    analyze = client.post("/api/compress/analyze", data={"file_id": first["file_id"]},
+                          content_type="multipart/form-data")
+    assert analyze.status_code == 200, analyze.get_data(as_text=True)
+    # split e analyze reaproveitaram a sanitização feita no envio
+    assert len(sanitize_calls) == 1
+    info = client.get(f"/api/files/{first['file_id']}").get_json()
+    assert info["filename"] == "doc.pdf" and info["pages"] == 3
+
+
+def test_merge_accepts_file_ids(app):
+    client = app.test_client()
+    a = _upload(client, _pdf_bytes(2, "A"))["file_id"]
+    b = _upload(client, _pdf_bytes(1, "B"))["file_id"]
+    resp = client.post("/api/merge", data={"file_ids": f"[\"{b}\", \"{a}\"]"},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    reader = PdfReader(io.BytesIO(resp.data))
+    assert len(reader.pages) == 3
+    assert "B 1" in reader.pages[0].extract_text()
+
+
+def test_converter_and_merge_preview_accept_file_ids(app, monkeypatch):
+    client = app.test_client()
+    file_id = _upload(client, _pdf_bytes(2, "Doc"))["file_id"]
+    seen = []
+
+    def _fake_convert(up, target, out_dir):
+        seen.append((up.filename, target))
+        out = os.path.join(out_dir, "doc.docx")
+        with open(out, "wb") as fh:
+            fh.write(b"docx")
+        return out
+
+    monkeypatch.setattr("app.routes.converter.convert_upload_to_target", _fake_convert)
+    resp = client.post("/api/convert/to-docx", data={"file_id": file_id},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    assert resp.get_json()["count"] == 1 and seen == [("doc.pdf", "docx")]
+    resp = client.post("/api/convert/to-csv", data={"file_ids": file_id},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 200 and seen[-1] == ("doc.pdf", "csv")
+    assert client.post("/api/convert/to-xlsx", data={"file_id": "0" * 32},
+                       content_type="multipart/form-data").status_code == 404
+
+    preview = client.post("/api/merge/preview", data={"file_id": file_id},
+                          content_type="multipart/form-data")
+    assert preview.status_code == 200, preview.get_data(as_text=True)
+    assert preview.get_json()["thumbnails"]["thumb_url"].endswith(".png")
+
+
+def test_file_ids_belong_to_the_session(app):
+    owner = app.test_client()
+    file_id = _upload(owner, _pdf_bytes())["file_id"]
+    stranger = app.test_client()
+    assert stranger.get(f"/api/files/{file_id}").status_code == 404
+    resp = stranger.post("/api/split", data={"file_id": file_id}, content_type="multipart/form-data")
+    assert resp.status_code == 404
+    assert stranger.delete(f"/api/files/{file_id}").status_code == 404
+    assert owner.get("/api/files/nao-e-um-id").status_code == 404
+
+
+def test_refcount_and_ttl_drive_cleanup(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(doc_store, "_BLOB_GRACE_SEC", 0)
+    client = app.test_client()
+    data = _pdf_bytes()
+    one = _upload(client, data)["file_id"]
+    two = _upload(client, data)["file_id"]
+
+    assert client.delete(f"/api/files/{one}").status_code == 204
+    with app.app_context():
+        assert doc_store.purge(force=True) == 0  # 'two' ainda referencia o blob
+    assert len(_blobs(tmp_path)) == 1
+
+    # 'two' expira sem uso
+    old = time.time() - doc_store.ttl_seconds() - 10
+    os.utime(tmp_path / "_docs" / "ids" / f"{two}.json", (old, old))
+    with app.app_context():
+        assert doc_store.purge(force=True) == 1
+    assert _blobs(tmp_path) == []
+    assert client.get(f"/api/files/{two}").status_code == 404
+
+
+def test_invalid_upload_is_rejected(app, tmp_path):
+    resp = app.test_client().post("/api/files", data={"file": (io.BytesIO(b"nao sou pdf"), "x.pdf")},
+                                  content_type="multipart/form-data")
+    assert resp.status_code in (400, 415, 422)
+    assert not (tmp_path / "_docs" / "blobs").exists() or _blobs(tmp_path) == []
@@ -0,0 +1,102 @@
+import threading
+
+import fitz
+import pytest
+
+from app.services import edit_doc_cache
+from tests.edit_fixtures import blank_pdf_bytes, client, upload  # noqa: F401
+
+
+@pytest.fixture(autouse=True)
+def _no_render_cache(monkeypatch):
+    monkeypatch.setenv("EDIT_RENDER_CACHE_MAX_MB", "0")  # força render (sem cache de PNG)
+
+
+@pytest.fixture
+def opens(monkeypatch):
+    calls = []
+    real = fitz.open
+
+    def _spy(*args, **kwargs):
+        doc = real(*args, **kwargs)
+        calls.append(doc)
+        return doc
+
+    monkeypatch.setattr(fitz, "open", _spy)
+    return calls
+
+
+def _upload(client):
+    return upload(client, blank_pdf_bytes(pages=3))
+
+
+def test_renders_reuse_the_open_document(client, opens):
+    sid = _upload(client)
+    assert len(opens) == 1  # contagem de páginas no upload já deixa o documento aberto
+
+    for page in (1, 2, 3, 1):
+        assert client.get(f"/api/edit/page-image/{sid}/{page}?scale=1").status_code == 200
+    assert len(opens) == 1
+    assert edit_doc_cache.stats()["open"] == 1
+
+
+def test_edit_replaces_document_and_invalidates_handle(client, opens):
+    sid = _upload(client)
+    before = client.get(f"/api/edit/page-image/{sid}/1?scale=1").data
+
+    resp = client.post("/api/edit/overlay", json={
+        "session_id": sid, "page_width": 200, "page_height": 200,
+        "ops": [{"type": "text", "pageIndex": 0, "x": 20, "y": 40, "text": "Novo texto", "size": 24}],
+    })
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    assert opens[0].is_closed  # a cópia alterada em memória não volta para o cache
+
+    after = client.get(f"/api/edit/page-image/{sid}/1?scale=1").data
+    assert after != before
+    assert len(opens) == 2
+
+
+def test_lru_bounds_and_close(client, opens, monkeypatch):
+    monkeypatch.setenv("EDIT_DOC_CACHE_SIZE", "1")
+    first = _upload(client)
+    _upload(client)  # ocupa a única vaga e fecha o documento da primeira sessão
+
+    assert edit_doc_cache.stats()["open"] == 1
+    assert opens[0].is_closed and not opens[1].is_closed
+
+    client.get(f"/api/edit/page-image/{first}/1?scale=1")
+    assert opens[1].is_closed and len(opens) == 3
+
+    client.post("/api/edit/close", json={"session_id": first})
+    assert opens[2].is_closed
+    assert edit_doc_cache.stats()["open"] == 0
+
+
+def test_concurrent_borrowers_are_serialized(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(blank_pdf_bytes(pages=4))
+    errors, active, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def _worker(n):
+        try:
+            with edit_doc_cache.borrow("s" * 32, str(path)) as doc:
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                doc[n % 4].get_pixmap(matrix=fitz.Matrix(0.5, 0.5))
+                with lock:
+                    active[0] -= 1
+        except Exception as e:  # pragma: no cover - só para reportar
+            errors.append(e)
+
+    threads = [threading.Thread(target=_worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert peak[0] == 1
+    assert edit_doc_cache.stats()["open"] == 1
+    edit_doc_cache.clear()
@@ -0,0 +1,129 @@
+import io
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from app.services.edit_overlays import ImagePlacer
+from tests.edit_fixtures import blank_pdf_bytes, client, upload_session  # noqa: F401
+
+
+def _pdf_bytes():
+    return blank_pdf_bytes(pages=20, size=300)
+
+
+def _png(w=120, h=60):
+    rng = np.random.default_rng(7)
+    arr = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    arr[: h // 2, : w // 2] = (255, 0, 0)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _solid_png(color, w=8, h=8):
+    buf = io.BytesIO()
+    Image.new("RGB", (w, h), color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _session(client, tmp_path):
+    sid, sdir = upload_session(client, tmp_path, _pdf_bytes())
+    resp = client.post(
+        "/api/edit/overlay-image/upload",
+        data={"session_id": sid, "image": (io.BytesIO(_png()), "assinatura.png")},
+        content_type="multipart/form-data",
+        headers={"Accept": "application/json"},
+    )
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    return sid, resp.get_json()["image_id"], sdir
+
+
+def test_same_stamp_on_every_page_is_embedded_once(client, tmp_path):
+    sid, image_id, sdir = _session(client, tmp_path)
+    ops = [
+        {"type": "image", "pageIndex": p, "image_id": image_id, "rect": [20 + k * 50, 200, 40, 20]}
+        for p in range(20) for k in range(3)
+    ]
+    resp = client.post("/api/edit/overlay", json={
+        "session_id": sid, "page_width": 300, "page_height": 300, "ops": ops,
+    })
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    assert resp.get_json()["images"] == {"unique": 1, "placed": 60}
+
+    # 60 colocações, uma cópia só dos bytes da imagem
+    assert (sdir / "current.pdf").stat().st_size < len(_pdf_bytes()) + 2 * len(_png())
+    with fitz.open(sdir / "current.pdf") as doc:
+        xrefs = {img[0] for page in doc for img in page.get_images(full=True)}
+        assert len(xrefs) == 1
+        pix = doc[5].get_pixmap(clip=fitz.Rect(120, 200, 160, 220))
+        assert pix.pixel(2, 2) == (255, 0, 0)
+
+
+def test_apply_overlays_batches_page_and_reports_counts(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("EDIT_INCR_MAX_RATIO", "100")  # sem compactação: streams como gravados
+    sid, image_id, sdir = _session(client, tmp_path)
+    operations = {
+        "whiteouts": [{"x0": 0.0, "y0": 0.0, "x1": 0.1, "y1": 0.1}, {"x0": 0.2, "y0": 0.2, "x1": 0.3, "y1": 0.3}],
+        "texts": [{"text": "Aprovado\nem 2025", "x": 0.1, "y": 0.5, "size": 12}],
+        "images": [
+            {"image_id": image_id, "x0": 0.1 * k, "y0": 0.7, "x1": 0.1 * k + 0.08, "y1": 0.8}
+            for k in range(8)
+        ] + [{"image_id": "img_000000000000.png", "x0": 0, "y0": 0, "x1": 0.1, "y1": 0.1}],
+    }
+    resp = client.post("/api/edit/apply/overlays", json={
+        "session_id": sid, "page_number": 1, "operations": operations,
+    })
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    assert resp.get_json()["images"] == {"unique": 1, "placed": 8}
+
+    with fitz.open(sdir / "current.pdf") as doc:
+        page = doc[0]
+        # borracha+textos (1 stream) + 1ª imagem + colocações restantes
+        assert len(page.get_contents()) == 3
+        assert "Aprovado" in page.get_text()
+        assert len(page.get_images(full=True)) == 1
+
+
+def test_placer_matches_insert_image_on_rotated_pages():
+    data = _png(40, 20)
+    rects = [fitz.Rect(10, 20, 110, 70), fitz.Rect(150, 100, 200, 280)]
+    for rotation in (0, 90):
+        for rotate in (0, 90, 180, 270):
+            renders = []
+            for use_placer in (False, True):
+                doc = fitz.open()
+                page = doc.new_page(width=320, height=400)
+                page.set_mediabox(fitz.Rect(10, 20, 310, 380))
+                page.set_rotation(rotation)
+                if use_placer:
+                    placer = ImagePlacer(doc, lambda _id: data)
+                    for r in rects:
+                        placer.place(page, "img", r, rotate)
+                    placer.flush()
+                else:
+                    for r in rects:
+                        page.insert_image(r, stream=data, keep_proportion=False, rotate=rotate)
+                reloaded = fitz.open(stream=doc.tobytes(), filetype="pdf")
+                renders.append(reloaded[0].get_pixmap(alpha=False).samples)
+            assert renders[0] == renders[1], (rotation, rotate)
+
+
+def test_placer_keeps_stacking_order_across_images():
+    red, blue = _solid_png((255, 0, 0)), _solid_png((0, 0, 255))
+    spot = fitz.Rect(100, 100, 140, 140)
+    for use_placer in (False, True):
+        doc = fitz.open()
+        page = doc.new_page(width=300, height=300)
+        seq = [("a", fitz.Rect(10, 10, 50, 50), red), ("a", spot, red), ("b", spot, blue)]
+        if use_placer:
+            placer = ImagePlacer(doc, {"a": red, "b": blue}.get)
+            for image_id, rect, _data in seq:
+                placer.place(page, image_id, rect)
+            placer.flush()
+        else:
+            for _id, rect, data in seq:
+                page.insert_image(rect, stream=data, keep_proportion=False)
+        reloaded = fitz.open(stream=doc.tobytes(), filetype="pdf")
+        # B foi colocada por último: fica por cima da segunda A
+        assert reloaded[0].get_pixmap(clip=spot).pixel(20, 20) == (0, 0, 255), use_placer
@@ -0,0 +1,86 @@
+import os
+
+import fitz
+import pytest
+
+from tests.edit_fixtures import blank_pdf_bytes, client, upload_session  # noqa: F401
+
+
+@pytest.fixture
+def opens(monkeypatch):
+    calls = []
+    real = fitz.open
+
+    def _spy(*args, **kwargs):
+        calls.append(args)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(fitz, "open", _spy)
+    return calls
+
+
+def test_unchanged_page_is_served_from_cache_and_revalidates(client, tmp_path, opens):
+    sid, sdir = upload_session(client, tmp_path, blank_pdf_bytes())
+    url = f"/api/edit/page-image/{sid}/1?scale=1.5"
+
+    first = client.get(url)
+    assert first.status_code == 200 and first.mimetype == "image/png"
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    etag = first.headers["ETag"]
+    opens.clear()
+
+    again = client.get(url)
+    assert again.data == first.data
+    assert again.headers["ETag"] == etag
+    assert opens == []  # servido do cache, sem reabrir o PDF
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+
+    other_page = client.get(f"/api/edit/page-image/{sid}/2?scale=1.5")
+    assert other_page.headers["ETag"] != etag
+
+
+def test_new_document_version_invalidates_cache(client, tmp_path):
+    sid, sdir = upload_session(client, tmp_path, blank_pdf_bytes())
+    url = f"/api/edit/page-image/{sid}/1?scale=1"
+    before = client.get(url)
+    old_files = set(os.listdir(sdir / "_render"))
+
+    # uma edição substitui o current.pdf
+    tmp = sdir / "novo.pdf"
+    tmp.write_bytes(blank_pdf_bytes(pages=1, size=300))
+    os.replace(tmp, sdir / "current.pdf")
+
+    stale = client.get(url, headers={"If-None-Match": before.headers["ETag"]})
+    assert stale.status_code == 200
+    assert stale.headers["ETag"] != before.headers["ETag"]
+    assert stale.data != before.data
+    assert not old_files & set(os.listdir(sdir / "_render"))
+
+    assert client.get(f"/api/edit/page-image/{sid}/2?scale=1").status_code == 404
+
+
+def test_per_session_byte_cap(client, tmp_path, monkeypatch):
+    sid, sdir = upload_session(client, tmp_path, blank_pdf_bytes())
+    one = client.get(f"/api/edit/page-image/{sid}/1?scale=1")
+    monkeypatch.setenv("EDIT_RENDER_CACHE_MAX_MB", "0")
+    client.get(f"/api/edit/page-image/{sid}/2?scale=1")
+    assert len(os.listdir(sdir / "_render")) == 1
+
+    # teto menor que dois renders: só o mais recente fica
+    monkeypatch.setattr("app.services.edit_render_cache._max_bytes", lambda: len(one.data) + 10)
+    client.get(f"/api/edit/page-image/{sid}/2?scale=1")
+    client.get(f"/api/edit/page-image/{sid}/2?scale=2")
+    total = sum(p.stat().st_size for p in (sdir / "_render").iterdir())
+    assert total <= len(one.data) + 10
+
+
+def test_close_removes_render_cache(client, tmp_path):
+    sid, sdir = upload_session(client, tmp_path, blank_pdf_bytes())
+    client.get(f"/api/edit/page-image/{sid}/1")
+    assert (sdir / "_render").is_dir()
+
+    assert client.post("/api/edit/close", json={"session_id": sid}).status_code == 200
+    assert not sdir.exists()
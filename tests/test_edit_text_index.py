@@ -0,0 +1,136 @@
+import io
+
+import fitz
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.services import edit_text_index
+from tests.edit_fixtures import client, upload_session  # noqa: F401
+
+
+def _pdf_bytes(pages=40):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.drawString(72, 780, f"Pagina {n}")
+        doc.drawString(72, 760, "Contrato firmado por João da Silva")
+        if n % 10 == 0:
+            doc.drawString(72, 740, "CPF 123.456.789-00 de JOAO DA SILVA")
+        doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def session(client, tmp_path):
+    return upload_session(client, tmp_path, _pdf_bytes(), "contrato.pdf")
+
+
+@pytest.fixture
+def get_text_calls(monkeypatch):
+    calls = []
+    real = fitz.Page.get_text
+
+    def _spy(self, *args, **kwargs):
+        calls.append(self.number)
+        return real(self, *args, **kwargs)
+
+    monkeypatch.setattr(fitz.Page, "get_text", _spy)
+    return calls
+
+
+def test_search_is_accent_and_case_insensitive(client, session):
+    sid, _ = session
+    resp = client.get(f"/api/edit/search/{sid}?q=joao da silva")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["total"] == 44  # 40 no corpo + 4 em caixa alta com CPF
+    hit = body["hits"][0]
+    assert hit["page_index"] == 0 and hit["text"] == "joao da silva"
+    (x0, y0, x1, y1), = hit["rects"]
+    assert 72 < x0 < x1 and 60 < y0 < y1 < 90
+
+    only_p10 = client.get(f"/api/edit/search/{sid}?q=123.456.789-00&pages=10").get_json()
+    assert [h["page_index"] for h in only_p10["hits"]] == [9]
+    assert client.get(f"/api/edit/search/{sid}?q=").status_code == 422
+
+
+def test_index_is_built_once_per_version(client, session, get_text_calls):
+    sid, sdir = session
+    client.get(f"/api/edit/search/{sid}?q=contrato")
+    assert len(get_text_calls) == 40
+    client.get(f"/api/edit/search/{sid}?q=silva")
+    client.get(f"/api/edit/search/{sid}?q=pagina 7")
+    assert len(get_text_calls) == 40
+    assert len(list((sdir / "_text").iterdir())) == 1
+
+    # outro worker (sem memória) reaproveita o índice em disco
+    edit_text_index._MEM.clear()
+    assert client.get(f"/api/edit/search/{sid}?q=silva").get_json()["total"] == 44
+    assert len(get_text_calls) == 40
+
+    # edição -> nova versão -> índice reconstruído (e o antigo apagado)
+    resp = client.post("/api/edit/overlay", json={
+        "session_id": sid, "page_width": 595, "page_height": 842,
+        "ops": [{"type": "text", "pageIndex": 3, "x": 72, "y": 400, "text": "aditivo assinado"}],
+    })
+    assert resp.status_code == 200
+    hits = client.get(f"/api/edit/search/{sid}?q=aditivo").get_json()["hits"]
+    assert [h["page_index"] for h in hits] == [3]
+    assert len(get_text_calls) == 80
+    assert len(list((sdir / "_text").iterdir())) == 1
+
+
+def test_redact_all_matches_in_one_batch(client, session):
+    sid, sdir = session
+    resp = client.post("/api/edit/redact-matches", json={"session_id": sid, "query": "123.456.789-00"})
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    body = resp.get_json()
+    assert body["matches"] == 4 and body["pages"] == [10, 20, 30, 40]
+
+    from app.services import edit_engine
+    journal = edit_engine.read_journal(str(sdir))
+    assert [e["op"] for e in journal].count("redact-matches") == 1
+    assert journal[-1]["mode"] == "full"
+
+    with fitz.open(sdir / "current.pdf") as doc:
+        assert "123.456.789-00" not in "".join(page.get_text() for page in doc)
+        assert "Contrato firmado" in doc[9].get_text()
+    assert client.get(f"/api/edit/search/{sid}?q=123.456").get_json()["total"] == 0
+
+
+def test_redact_refuses_too_many_matches(client, session, monkeypatch):
+    sid, _ = session
+    monkeypatch.setenv("EDIT_REDACT_MAX_MATCHES", "10")
+    resp = client.post("/api/edit/redact-matches", json={"session_id": sid, "query": "contrato"})
+    assert resp.status_code == 422
+
+
+def test_index_roundtrip():
+    doc = fitz.open(stream=_pdf_bytes(pages=3), filetype="pdf")
+    index = edit_text_index.build(doc)
+    again = edit_text_index.TextIndex.from_bytes(index.to_bytes())
+    assert (again.pages, again.words, again.text) == (index.pages, index.words, index.text)
+    assert again.search("firmado por")[0] == index.search("firmado por")[0]
+
+
+def test_redact_matches_only_whole_words_by_default(client, tmp_path):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    doc.drawString(72, 780, "Testemunha: Mariana Souza")
+    doc.drawString(72, 760, "Assinado por Ana, CPF 111")
+    doc.save()
+    sid, sdir = upload_session(client, tmp_path, buf.getvalue(), "ata.pdf")
+
+    # a busca continua achando trechos; whole=1 restringe a palavras inteiras
+    assert client.get(f"/api/edit/search/{sid}?q=ana").get_json()["total"] == 2
+    assert client.get(f"/api/edit/search/{sid}?q=ana&whole=1").get_json()["total"] == 1
+
+    resp = client.post("/api/edit/redact-matches", json={"session_id": sid, "query": "ana"})
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    assert resp.get_json()["matches"] == 1
+    with fitz.open(sdir / "current.pdf") as pdf:
+        text = pdf[0].get_text()
+    assert "Mariana Souza" in text
+    assert "Ana," not in text and "CPF 111" in text
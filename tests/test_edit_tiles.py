@@ -0,0 +1,82 @@
+import io
+
+import pytest
+from PIL import Image, ImageChops
+from reportlab.lib.pagesizes import A3
+from reportlab.pdfgen import canvas
+
+from tests.edit_fixtures import client, upload  # noqa: F401
+
+
+def _pdf_bytes():
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A3)
+    for k in range(60):
+        doc.drawString(40, 1150 - k * 18, f"linha {k} " * 12)
+    doc.rect(300, 300, 200, 200, fill=1)
+    doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def sid(client):
+    return upload(client, _pdf_bytes(), "a3.pdf")
+
+
+def _img(resp):
+    return Image.open(io.BytesIO(resp.data)).convert("RGB")
+
+
+def test_tile_matches_region_of_full_render(client, sid):
+    full = _img(client.get(f"/api/edit/page-image/{sid}/1?scale=2"))
+    resp = client.get(f"/api/edit/page-image/{sid}/1?scale=2&x=512&y=1024&w=512&h=512")
+    assert resp.status_code == 200 and resp.mimetype == "image/png"
+    tile = _img(resp)
+
+    assert tile.size == (512, 512)
+    diff = ImageChops.difference(tile, full.crop((512, 1024, 1024, 1536)))
+    assert max(diff.getextrema()[i][1] for i in range(3)) <= 8
+
+
+def test_edge_tile_is_clipped_and_deep_zoom_only_for_tiles(client, sid):
+    # A3 = 842 x 1191 pt; na escala 8 a página inteira teria ~6736 px de largura
+    resp = client.get(f"/api/edit/page-image/{sid}/1?scale=8&x=6400&y=0&w=512&h=256")
+    assert resp.status_code == 200
+    assert _img(resp).size == (6736 - 6400, 256)
+
+    full = _img(client.get(f"/api/edit/page-image/{sid}/1?scale=8"))
+    assert max(full.size) <= 4096
+
+    outside = client.get(f"/api/edit/page-image/{sid}/1?scale=1&x=5000&y=0&w=256&h=256")
+    assert outside.status_code == 422
+
+
+def test_invalid_tiles_are_rejected(client, sid, monkeypatch):
+    base = f"/api/edit/page-image/{sid}/1?scale=1"
+    assert client.get(f"{base}&x=0&y=0&w=256").status_code == 422
+    assert client.get(f"{base}&x=-1&y=0&w=256&h=256").status_code == 422
+    monkeypatch.setenv("EDIT_TILE_MAX_PX", "256")
+    assert client.get(f"{base}&x=0&y=0&w=512&h=256").status_code == 422
+
+
+def test_format_negotiation_and_quality(client, sid):
+    url = f"/api/edit/page-image/{sid}/1?scale=1"
+
+    assert client.get(url, headers={"Accept": "*/*"}).mimetype == "image/png"
+
+    webp = client.get(url, headers={"Accept": "image/webp,image/jpeg;q=0.9,*/*;q=0.5"})
+    assert webp.mimetype == "image/webp"
+    assert "Accept" in webp.headers["Vary"]
+    assert _img(webp).size == _img(client.get(url)).size
+
+    jpeg = client.get(url, headers={"Accept": "image/jpeg"})
+    assert jpeg.mimetype == "image/jpeg"
+
+    low = client.get(url + "&fmt=jpeg&q=30")
+    high = client.get(url + "&fmt=jpeg&q=95")
+    assert low.mimetype == high.mimetype == "image/jpeg"
+    assert len(low.data) < len(high.data)
+    assert low.headers["ETag"] != high.headers["ETag"] != jpeg.headers["ETag"]
+
+    assert client.get(url, headers={"If-None-Match": webp.headers["ETag"]}).status_code == 200
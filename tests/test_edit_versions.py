@@ -0,0 +1,156 @@
+import os
+
+import fitz
+from reportlab.lib.pagesizes import A4
+
+from app.services import edit_versions
+from tests.edit_fixtures import client, lined_pdf_bytes, upload_session  # noqa: F401
+
+
+def _upload(client, tmp_path):
+    return upload_session(client, tmp_path, lined_pdf_bytes(30, "SEGREDO"))
+
+
+def _note(client, sid, text, page=1):
+    w, h = A4
+    resp = client.post("/api/edit/overlay", json={
+        "session_id": sid, "page_width": w, "page_height": h,
+        "ops": [{"type": "text", "pageIndex": page, "x": 100, "y": 300, "text": text}],
+    })
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+
+
+def _page_text(sdir, page=1):
+    with fitz.open(sdir / "current.pdf") as doc:
+        return doc[page].get_text()
+
+
+def test_incremental_versions_share_one_base(client, tmp_path):
+    sid, sdir = _upload(client, tmp_path)
+    _note(client, sid, "primeira")
+    _note(client, sid, "segunda")
+
+    info = client.get(f"/api/edit/versions/{sid}").get_json()
+    assert [v["op"] for v in info["versions"]] == ["upload", "overlay", "overlay"]
+    assert info["head"] == 3 and info["can_undo"] and not info["can_redo"]
+    # três versões, nenhum byte extra: a base é hardlink do próprio current.pdf
+    assert os.listdir(sdir / "_versions") == ["index.json", "b1.pdf"] or \
+        sorted(os.listdir(sdir / "_versions")) == ["b1.pdf", "index.json"]
+    assert os.path.samefile(sdir / "_versions" / "b1.pdf", sdir / "current.pdf")
+    assert info["bytes"] == os.path.getsize(sdir / "current.pdf")
+
+
+def test_undo_redo_and_jump(client, tmp_path):
+    sid, sdir = _upload(client, tmp_path)
+    _note(client, sid, "primeira")
+    _note(client, sid, "segunda")
+
+    resp = client.post("/api/edit/undo", json={"session_id": sid})
+    assert resp.status_code == 200 and resp.get_json()["head"] == 2
+    text = _page_text(sdir)
+    assert "primeira" in text and "segunda" not in text
+
+    client.post("/api/edit/undo", json={"session_id": sid})
+    assert "primeira" not in _page_text(sdir)
+    assert client.post("/api/edit/undo", json={"session_id": sid}).status_code == 422
+
+    resp = client.post("/api/edit/redo", json={"session_id": sid})
+    assert resp.get_json()["head"] == 2 and resp.get_json()["can_redo"]
+
+    resp = client.post("/api/edit/versions/jump", json={"session_id": sid, "version": 3})
+    assert resp.get_json()["head"] == 3
+    assert "segunda" in _page_text(sdir)
+    assert client.post("/api/edit/versions/jump", json={"session_id": sid, "version": 99}).status_code == 404
+
+
+def test_edit_after_undo_drops_redo_branch(client, tmp_path):
+    sid, sdir = _upload(client, tmp_path)
+    _note(client, sid, "primeira")
+    _note(client, sid, "segunda")
+    client.post("/api/edit/undo", json={"session_id": sid})
+    _note(client, sid, "outra")
+
+    info = client.get(f"/api/edit/versions/{sid}").get_json()
+    assert [v["version"] for v in info["versions"]] == [1, 2, 4]
+    assert not info["can_redo"]
+    text = _page_text(sdir)
+    assert "primeira" in text and "outra" in text and "segunda" not in text
+
+
+def test_restored_tail_is_still_compacted_on_download(client, tmp_path):
+    sid, sdir = _upload(client, tmp_path)
+    _note(client, sid, "primeira")
+    _note(client, sid, "segunda")
+    client.post("/api/edit/undo", json={"session_id": sid})
+
+    resp = client.get(f"/api/edit/download/{sid}")
+    final = resp.data
+    resp.close()
+    assert final != (sdir / "current.pdf").read_bytes()
+    assert (sdir / "_final").is_dir()
+
+
+def test_quota_drops_oldest_versions(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("EDIT_VERSIONS_MAX", "2")
+    sid, sdir = _upload(client, tmp_path)
+    for n in range(3):
+        _note(client, sid, f"nota {n}")
+
+    info = client.get(f"/api/edit/versions/{sid}").get_json()
+    assert [v["version"] for v in info["versions"]] == [3, 4]
+
+    # redação troca o inode: base nova; a antiga só fica enquanto houver versão dela
+    monkeypatch.setenv("EDIT_VERSIONS_MAX", "1")
+    w, h = A4
+    resp = client.post("/api/edit/overlay", json={
+        "session_id": sid, "page_width": w, "page_height": h,
+        "ops": [{"type": "redact", "pageIndex": 0, "rect": [60, 60, 300, 40]}],
+    })
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    bases = [n for n in os.listdir(sdir / "_versions") if n.endswith(".pdf")]
+    assert bases == ["b5.pdf"]
+    assert edit_versions.history(str(sdir))["head"] == 5
+
+
+def test_versions_disabled(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("EDIT_VERSIONS", "0")
+    sid, sdir = _upload(client, tmp_path)
+    _note(client, sid, "primeira")
+    assert not (sdir / "_versions").exists()
+    assert client.post("/api/edit/undo", json={"session_id": sid}).status_code == 422
+
+
+def _record_many(session_dir, cur, n):
+    from app.services import edit_engine
+    for _ in range(n):
+        edit_engine.record(session_dir, "overlay", "full", cur)
+
+
+def test_journal_and_versions_are_serialized_across_processes(tmp_path):
+    import multiprocessing
+    from app.services import edit_engine
+
+    session_dir = tmp_path / "sessao"
+    session_dir.mkdir()
+    cur = session_dir / "current.pdf"
+    cur.write_bytes(lined_pdf_bytes(1, "SEGREDO"))
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_record_many, args=(str(session_dir), str(cur), 40)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    seqs = [e["seq"] for e in edit_engine.read_journal(str(session_dir))]
+    assert seqs == list(range(1, 161))  # sem número repetido nem linha perdida
+    hist = edit_versions.history(str(session_dir))
+    numbers = [v["version"] for v in hist["versions"]]
+    assert len(numbers) == len(set(numbers)) and hist["head"] == numbers[-1]
+
+
+def test_session_lock_is_reentrant(tmp_path):
+    with edit_versions.session_lock(str(tmp_path)):
+        with edit_versions.session_lock(str(tmp_path)):
+            pass
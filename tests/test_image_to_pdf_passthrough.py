@@ -0,0 +1,105 @@
+import pikepdf
+import pypdfium2 as pdfium
+import pytest
+from PIL import Image, ImageOps
+
+from app.services import converter_service as cs
+
+QUADRANTS = {
+    "tl": (220, 30, 30),
+    "tr": (30, 200, 30),
+    "bl": (30, 30, 220),
+    "br": (240, 240, 240),
+}
+
+
+def _quadrant_image(w=120, h=80):
+    img = Image.new("RGB", (w, h))
+    img.paste(QUADRANTS["tl"], (0, 0, w // 2, h // 2))
+    img.paste(QUADRANTS["tr"], (w // 2, 0, w, h // 2))
+    img.paste(QUADRANTS["bl"], (0, h // 2, w // 2, h))
+    img.paste(QUADRANTS["br"], (w // 2, h // 2, w, h))
+    return img
+
+
+def _save_jpeg(path, orientation=1, **kwargs):
+    img = _quadrant_image()
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    img.save(path, "JPEG", quality=95, exif=exif.tobytes(), **kwargs)
+    return path
+
+
+def _render(pdf_path):
+    doc = pdfium.PdfDocument(str(pdf_path))
+    try:
+        return doc[0].render(scale=1).to_pil().convert("RGB")
+    finally:
+        doc.close()
+
+
+def _close(a, b, tol=60):
+    return all(abs(x - y) <= tol for x, y in zip(a, b))
+
+
+def test_baseline_jpeg_is_embedded_without_reencoding(tmp_path):
+    src = _save_jpeg(tmp_path / "foto.jpg")
+    out = tmp_path / "foto.pdf"
+
+    cs._image_to_pdf(str(src), str(out))
+
+    with pikepdf.open(out) as pdf:
+        assert len(pdf.pages) == 1
+        (image,) = list(pdf.pages[0].images.values())
+        assert image.Filter == pikepdf.Name.DCTDecode
+        assert image.read_raw_bytes() == src.read_bytes()
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_exif_orientation_becomes_placement_matrix(tmp_path, orientation):
+    src = _save_jpeg(tmp_path / "foto.jpg", orientation=orientation)
+    out = tmp_path / "foto.pdf"
+    cs._image_to_pdf(str(src), str(out))
+
+    with Image.open(src) as im:
+        expected = ImageOps.exif_transpose(im).convert("RGB")
+    page = _render(out)
+
+    # Caixa da imagem na página (mesmo cálculo do conversor)
+    (pw, ph), (x, y, tw, th) = cs._img2pdf_layout(
+        expected.width, expected.height, cs.SIZES_PT["A4"],
+        mode="fit", margin=18.0, auto_land=True,
+    )
+    assert abs(page.width - pw) <= 1 and abs(page.height - ph) <= 1
+    top = ph - y - th
+    for fx, fy in [(0.25, 0.25), (0.75, 0.25), (0.25, 0.75), (0.75, 0.75)]:
+        want = expected.getpixel((int(fx * expected.width), int(fy * expected.height)))
+        got = page.getpixel((int(x + fx * tw), int(top + fy * th)))
+        assert _close(got, want), (orientation, fx, fy, got, want)
+
+
+def test_progressive_jpeg_falls_back_to_reencode(tmp_path):
+    src = _save_jpeg(tmp_path / "foto.jpg", progressive=True)
+    out = tmp_path / "foto.pdf"
+
+    cs._image_to_pdf(str(src), str(out))
+
+    with pikepdf.open(out) as pdf:
+        (image,) = list(pdf.pages[0].images.values())
+        assert image.read_raw_bytes() != src.read_bytes()
+
+
+def test_multiframe_tiff_streams_one_page_per_frame(tmp_path):
+    frames = [_quadrant_image(), _quadrant_image(80, 120), _quadrant_image()]
+    src = tmp_path / "scan.tiff"
+    frames[0].save(src, save_all=True, append_images=frames[1:])
+    out = tmp_path / "scan.pdf"
+
+    cs._image_to_pdf(str(src), str(out))
+
+    with pikepdf.open(out) as pdf:
+        boxes = [tuple(float(v) for v in p.mediabox) for p in pdf.pages]
+    assert len(boxes) == 3
+    # quadro 1 deitado → paisagem; quadro 2 em pé → retrato
+    assert boxes[0][2] > boxes[0][3]
+    assert boxes[1][2] < boxes[1][3]
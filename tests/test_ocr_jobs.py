@@ -0,0 +1,201 @@
+import os
+import re
+import shutil
+import time
+from io import BytesIO
+
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.services import ocr_jobs, ocr_service
+
+
+def _make_pdf(path, pages=3):
+    doc = canvas.Canvas(str(path), pagesize=A4)
+    for n in range(pages):
+        doc.drawString(72, 760, f"Pagina {n + 1}")
+        doc.showPage()
+    doc.save()
+    return path
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    """Fila isolada, sem threads automáticas, com OCR falso."""
+    monkeypatch.setenv("OCR_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("OCR_JOBS_WORKERS", "0")
+    monkeypatch.delenv("OCR_CACHE_DIR", raising=False)
+    calls, cache_dirs = [], []
+
+    def _fake_ocr(in_path, out_path, *, progress=None, content_sha256=None, cache_dir=None, **options):
+        calls.append(options)
+        cache_dirs.append(cache_dir)
+        shutil.copyfile(in_path, out_path)
+        if progress:
+            progress(3, 3)
+        return out_path
+
+    monkeypatch.setattr(ocr_service, "ocr_pdf_path", _fake_ocr)
+    return {"dir": ocr_jobs.jobs_dir(), "calls": calls, "cache_dirs": cache_dirs}
+
+
+def test_submit_returns_immediately_and_worker_completes(tmp_path, queue):
+    src = _make_pdf(tmp_path / "scan.pdf")
+
+    job_id = ocr_jobs.submit_job(str(src), options={"lang": "por", "force": True, "bogus": 1})
+    status = ocr_jobs.get_status(job_id)
+    assert status["state"] == "queued" and status["pages"] == 3
+    assert status["eta_seconds"] > 0
+    assert ocr_jobs.result_path(job_id) is None
+
+    assert ocr_jobs.work_once(queue["dir"]) is True
+    assert ocr_jobs.work_once(queue["dir"]) is False
+
+    status = ocr_jobs.get_status(job_id)
+    assert status["state"] == "done" and status["progress"] == 1.0
+    assert queue["calls"] == [{"lang": "por", "force": True}]
+    assert open(ocr_jobs.result_path(job_id), "rb").read() == src.read_bytes()
+
+
+def test_job_survives_worker_crash(tmp_path, queue, monkeypatch):
+    src = _make_pdf(tmp_path / "scan.pdf")
+    job_id = ocr_jobs.submit_job(str(src))
+
+    # worker reivindica e "morre" sem heartbeat
+    assert ocr_jobs.claim_next(queue["dir"])["id"] == job_id
+    assert ocr_jobs.get_status(job_id)["state"] == "running"
+    assert ocr_jobs.claim_next(queue["dir"]) is None  # lease ainda válido
+
+    monkeypatch.setenv("OCR_JOB_LEASE", "0")
+    time.sleep(0.01)
+    assert ocr_jobs.work_once(queue["dir"]) is True
+
+    status = ocr_jobs.get_status(job_id)
+    assert status["state"] == "done" and status["attempts"] == 2
+
+
+def test_job_fails_after_max_attempts(tmp_path, queue, monkeypatch):
+    job_id = ocr_jobs.submit_job(str(_make_pdf(tmp_path / "scan.pdf")))
+    monkeypatch.setenv("OCR_JOB_LEASE", "0")
+    monkeypatch.setenv("OCR_JOB_MAX_ATTEMPTS", "1")
+
+    ocr_jobs.claim_next(queue["dir"])
+    time.sleep(0.01)
+    assert ocr_jobs.claim_next(queue["dir"]) is None
+
+    status = ocr_jobs.get_status(job_id)
+    assert status["state"] == "failed" and status["error"]
+
+
+def test_async_api_roundtrip(tmp_path, queue):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    client = app.test_client()
+    page = client.get("/merge", base_url="https://localhost")
+    token = re.search(r'name="csrf-token" content="([^"]+)"', page.get_data(as_text=True)).group(1)
+
+    src = _make_pdf(tmp_path / "scan.pdf")
+    resp = client.post(
+        "/api/ocr/jobs",
+        data={"file": (BytesIO(src.read_bytes()), "scan.pdf"), "lang": "por"},
+        content_type="multipart/form-data",
+        headers={"X-CSRFToken": token, "Referer": "https://localhost/merge"},
+        base_url="https://localhost",
+    )
+    assert resp.status_code == 202
+    body = resp.get_json()
+
+    pending = client.get(body["result_url"], base_url="https://localhost")
+    assert pending.status_code == 409
+
+    ocr_jobs.work_once(queue["dir"])
+
+    status = client.get(body["status_url"], base_url="https://localhost").get_json()
+    assert status["state"] == "done"
+    # o worker roda sem app: o cache de OCR resolvido no submit segue no UPLOAD_FOLDER
+    assert queue["cache_dirs"] == [str(tmp_path / "_ocr_cache")]
+    result = client.get(body["result_url"], base_url="https://localhost")
+    assert result.status_code == 200
+    assert result.mimetype == "application/pdf"
+    assert result.data == src.read_bytes()
+
+    missing = client.get("/api/ocr/jobs/" + "0" * 32, base_url="https://localhost")
+    assert missing.status_code == 404
+
+
+@pytest.fixture
+def edit_client(tmp_path, queue):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    return app.test_client()
+
+
+def _edit_session(client, tmp_path):
+    from app.utils.security import OUTPUT_OWNER_SESSION_KEY
+
+    src = _make_pdf(tmp_path / "doc.pdf")
+    resp = client.post("/api/edit/upload", data={"file": (BytesIO(src.read_bytes()), "doc.pdf")},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    sid = resp.get_json()["session_id"]
+    with client.session_transaction() as sess:
+        owner = sess[OUTPUT_OWNER_SESSION_KEY]
+    return sid, tmp_path / "edit_sessions" / owner / sid
+
+
+def _ops(client, sid):
+    return [v["op"] for v in client.get(f"/api/edit/versions/{sid}").get_json()["versions"]]
+
+
+def test_editor_async_ocr_goes_through_journal_and_versions(edit_client, tmp_path, queue):
+    sid, sdir = _edit_session(edit_client, tmp_path)
+    resp = edit_client.post("/api/edit/apply/ocr", json={"session_id": sid, "async": True})
+    assert resp.status_code == 202, resp.get_data(as_text=True)
+    job_id = resp.get_json()["job_id"]
+    before = os.stat(sdir / "current.pdf").st_ino
+
+    assert ocr_jobs.work_once(queue["dir"]) is True
+    assert edit_client.get(f"/api/ocr/jobs/{job_id}").get_json()["state"] == "done"
+    assert os.stat(sdir / "current.pdf").st_ino != before  # aplicado via sanitização
+    assert _ops(edit_client, sid) == ["upload", "ocr"]
+    assert not [n for n in os.listdir(sdir) if n.startswith("tmp_")]
+
+
+def test_editor_async_ocr_does_not_clobber_newer_edits(edit_client, tmp_path, queue):
+    sid, sdir = _edit_session(edit_client, tmp_path)
+    job_id = edit_client.post("/api/edit/apply/ocr", json={"session_id": sid, "async": True}).get_json()["job_id"]
+
+    w, h = A4
+    resp = edit_client.post("/api/edit/overlay", json={
+        "session_id": sid, "page_width": w, "page_height": h,
+        "ops": [{"type": "text", "pageIndex": 0, "x": 100, "y": 300, "text": "nova edicao"}],
+    })
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    edited = (sdir / "current.pdf").read_bytes()
+
+    ocr_jobs.work_once(queue["dir"])
+    status = edit_client.get(f"/api/ocr/jobs/{job_id}").get_json()
+    assert status["state"] == "conflict" and status["error"]
+    assert (sdir / "current.pdf").read_bytes() == edited
+    assert _ops(edit_client, sid) == ["upload", "overlay"]
+    assert edit_client.get(f"/api/ocr/jobs/{job_id}/result").status_code == 409
+
+
+def test_jobs_are_visible_only_to_their_owner(edit_client, tmp_path, queue):
+    src = _make_pdf(tmp_path / "scan.pdf")
+    resp = edit_client.post("/api/ocr/jobs", data={"file": (BytesIO(src.read_bytes()), "scan.pdf")},
+                            content_type="multipart/form-data")
+    assert resp.status_code == 202
+    body = resp.get_json()
+    ocr_jobs.work_once(queue["dir"])
+    assert edit_client.get(body["result_url"]).status_code == 200
+
+    stranger = edit_client.application.test_client()
+    assert stranger.get(body["status_url"]).status_code == 404
+    assert stranger.get(body["result_url"]).status_code == 404
@@ -0,0 +1,114 @@
+import subprocess
+import threading
+import time
+
+import pikepdf
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.services import ocr_service
+from tests.pdf_fixture_factory import extract_text
+
+SECONDS_PER_PAGE = 0.04
+
+
+def _make_scan(path, pages=10):
+    doc = canvas.Canvas(str(path), pagesize=A4)
+    doc.setTitle("Digitalizacao de teste")
+    for n in range(1, pages + 1):
+        doc.drawString(72, 760, f"Pagina {n}")
+        doc.bookmarkPage(f"p{n}")
+        doc.addOutlineEntry(f"Pagina {n}", f"p{n}", level=0)
+        doc.showPage()
+    doc.save()
+    return path
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """ocrmypdf falso: custo proporcional às páginas e marca cada página processada."""
+    state = {"calls": [], "active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def _run(args, *, timeout, mem_mb):
+        src, dst = args[-2], args[-1]
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        try:
+            with pikepdf.open(src) as pdf:
+                n = len(pdf.pages)
+                state["calls"].append((n, mem_mb))
+                time.sleep(SECONDS_PER_PAGE * n)
+                for page in pdf.pages:
+                    page.contents_add(pdf.make_stream(b"% camada-ocr\n"))
+                pdf.save(dst)
+        finally:
+            with lock:
+                state["active"] -= 1
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    monkeypatch.setattr(ocr_service, "_run_ocr", _run)
+    monkeypatch.setattr(ocr_service, "_select_installed_langs", lambda req, env: req)
+    monkeypatch.setattr(ocr_service, "_has_unpaper", lambda: False)
+    monkeypatch.setattr(ocr_service, "_has_pngquant", lambda path: True)
+    monkeypatch.setattr(ocr_service, "_SHARD_SLOTS", None)
+    monkeypatch.setenv("OCR_SHARD_MAX_WORKERS", "8")
+    monkeypatch.setenv("OCR_CACHE", "0")
+    return state
+
+
+def _run(tmp_path, name):
+    src = _make_scan(tmp_path / f"{name}_in.pdf")
+    out = tmp_path / f"{name}_out.pdf"
+    t0 = time.perf_counter()
+    ocr_service.ocr_pdf_path(str(src), str(out))
+    return out, time.perf_counter() - t0
+
+
+def test_sharded_ocr_preserves_order_and_metadata(tmp_path, monkeypatch, fake_ocr):
+    monkeypatch.setenv("OCR_SHARD_PAGES", "3")
+    monkeypatch.setenv("OCR_SHARD_WORKERS", "4")
+    monkeypatch.setenv("OCR_MEM_MB", "768")
+
+    out, _ = _run(tmp_path, "sharded")
+
+    assert sorted(n for n, _ in fake_ocr["calls"]) == [1, 3, 3, 3]
+    assert all(mem == 768 for _, mem in fake_ocr["calls"])
+    text = extract_text(out)
+    positions = [text.index(f"Pagina {n}\n") for n in range(1, 11)]
+    assert positions == sorted(positions)
+    with pikepdf.open(out) as pdf:
+        assert len(pdf.pages) == 10
+        assert str(pdf.docinfo.get("/Title")) == "Digitalizacao de teste"
+        for page in pdf.pages:
+            contents = page.obj.Contents
+            streams = contents if isinstance(contents, pikepdf.Array) else [contents]
+            assert any(b"camada-ocr" in s.read_bytes() for s in streams)
+        with pdf.open_outline() as outline:
+            assert [item.title for item in outline.root] == [f"Pagina {n}" for n in range(1, 11)]
+
+
+def test_sharded_ocr_speeds_up_large_documents(tmp_path, monkeypatch, fake_ocr):
+    monkeypatch.setenv("OCR_SHARD_PAGES", "0")
+    _, serial = _run(tmp_path, "serial")
+    assert [n for n, _ in fake_ocr["calls"]] == [10]
+
+    monkeypatch.setenv("OCR_SHARD_PAGES", "3")
+    monkeypatch.setenv("OCR_SHARD_WORKERS", "4")
+    _, parallel = _run(tmp_path, "parallel")
+
+    assert fake_ocr["peak"] >= 2
+    assert parallel < serial * 0.6
+
+
+def test_global_worker_cap_limits_concurrent_shards(tmp_path, monkeypatch, fake_ocr):
+    monkeypatch.setenv("OCR_SHARD_PAGES", "2")
+    monkeypatch.setenv("OCR_SHARD_WORKERS", "4")
+    monkeypatch.setenv("OCR_SHARD_MAX_WORKERS", "1")
+
+    _run(tmp_path, "capped")
+
+    assert len(fake_ocr["calls"]) == 5
+    assert fake_ocr["peak"] == 1
@@ -0,0 +1,102 @@
+import csv
+import tracemalloc
+
+import pytest
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app.services import converter_service as cs
+
+
+def _make_table_pdf(path, pages: int):
+    """Uma tabela 2x2 com bordas por página (suficiente para o pdfplumber)."""
+    doc = canvas.Canvas(str(path), pagesize=letter)
+    for p in range(pages):
+        for r in range(3):
+            doc.line(72, 700 - r * 20, 272, 700 - r * 20)
+        for k in range(3):
+            doc.line(72 + k * 100, 700, 72 + k * 100, 660)
+        for r in range(2):
+            for k in range(2):
+                doc.drawString(77 + k * 100, 686 - r * 20, f"p{p + 1}-{r}{k}")
+        doc.showPage()
+    doc.save()
+    return path
+
+
+@pytest.fixture
+def no_camelot(monkeypatch):
+    def _boom(*args, **kwargs):
+        raise RuntimeError("camelot indisponível")
+
+    monkeypatch.setattr(cs, "_prepare_camelot_env", lambda: None)
+    monkeypatch.setattr(cs, "_iter_camelot_rows", _boom)
+
+
+def test_pdf_to_csv_streams_pdfplumber_rows(tmp_path, no_camelot):
+    src = _make_table_pdf(tmp_path / "tabela.pdf", pages=3)
+
+    out = cs._pdf_to_csv(str(src), str(tmp_path / "out"))
+
+    with open(out, newline="", encoding="utf-8") as fh:
+        rows = list(csv.reader(fh))
+    assert rows[0] == ["p1-00", "p1-01"]
+    assert rows[-1] == ["p3-10", "p3-11"]
+    assert len(rows) == 6
+
+
+def test_pdf_to_csv_honours_page_range(tmp_path, no_camelot, monkeypatch):
+    monkeypatch.setenv("PDF_PAGE_RANGE", "2")
+    src = _make_table_pdf(tmp_path / "tabela.pdf", pages=3)
+
+    out = cs._pdf_to_csv(str(src), str(tmp_path / "out"))
+
+    with open(out, newline="", encoding="utf-8") as fh:
+        rows = list(csv.reader(fh))
+    assert rows == [["p2-00", "p2-01"], ["p2-10", "p2-11"]]
+
+
+def test_parse_page_spec():
+    assert cs._parse_page_spec("all") is None
+    assert cs._parse_page_spec("") is None
+    assert cs._parse_page_spec("3,1-2, x, 3") == [1, 2, 3]
+
+
+def _open_peak(path):
+    """Custo fixo de abrir o documento (xref, árvore de páginas)."""
+    import pdfplumber
+
+    tracemalloc.start()
+    try:
+        with pdfplumber.open(str(path)):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _extract_peak(path, out):
+    tracemalloc.start()
+    try:
+        written = cs._write_csv_rows(str(out), cs._iter_plumber_table_rows(str(path)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return written, peak
+
+
+def test_pdf_to_csv_peak_memory_is_bounded_by_page(tmp_path):
+    """Benchmark: além do custo de abrir o PDF, 800 páginas custam o mesmo que 40."""
+    small = _make_table_pdf(tmp_path / "small.pdf", pages=40)
+    big = _make_table_pdf(tmp_path / "big.pdf", pages=800)
+    _extract_peak(small, tmp_path / "warmup.csv")  # imports tardios fora da medição
+
+    rows_small, peak_small = _extract_peak(small, tmp_path / "small.csv")
+    rows_big, peak_big = _extract_peak(big, tmp_path / "big.csv")
+    extra_small = max(0, peak_small - _open_peak(small))
+    extra_big = max(0, peak_big - _open_peak(big))
+
+    assert rows_small == 80
+    assert rows_big == 1600
+    assert extra_big < 2 * extra_small + 512 * 1024
@@ -0,0 +1,109 @@
+import subprocess
+import zipfile
+
+import pytest
+from docx import Document
+from PIL import Image
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from app.services import converter_service as cs
+
+
+def _make_pdf(path, pages=6):
+    img = Image.new("RGB", (64, 48), (200, 40, 40))
+    doc = canvas.Canvas(str(path), pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.setPageSize(landscape(A4) if n == 4 else A4)
+        doc.setFont("Helvetica", 14)
+        doc.drawString(72, 720 if n != 4 else 500, f"Pagina numero {n} do relatorio")
+        if n in (2, 5):
+            doc.drawImage(ImageReader(img), 72, 400, width=128, height=96)
+        doc.showPage()
+    doc.save()
+    return path
+
+
+def _texts(path):
+    return [p.text for p in Document(str(path)).paragraphs if p.text.strip()]
+
+
+def _media(path):
+    with zipfile.ZipFile(path) as zf:
+        return [n for n in zf.namelist() if n.startswith("word/media/")]
+
+
+def test_parallel_docx_matches_single_process_output(tmp_path, monkeypatch):
+    src = _make_pdf(tmp_path / "relatorio.pdf")
+
+    monkeypatch.setenv("PDF2DOCX_PARALLEL_MIN_PAGES", "0")
+    single = cs._pdf_to_docx(str(src), str(tmp_path / "single"))
+
+    monkeypatch.setenv("PDF2DOCX_PARALLEL_MIN_PAGES", "2")
+    monkeypatch.setenv("PDF2DOCX_CHUNK_PAGES", "2")
+    monkeypatch.setenv("PDF2DOCX_WORKERS", "2")
+    calls = []
+    real = cs.run_in_sandbox
+
+    def _spy(cmd, **kwargs):
+        calls.append((cmd[-2:], kwargs))
+        return real(cmd, **kwargs)
+
+    monkeypatch.setattr(cs, "run_in_sandbox", _spy)
+    parallel = cs._pdf_to_docx(str(src), str(tmp_path / "parallel"))
+
+    assert sorted(c[0] for c in calls) == [["0", "2"], ["2", "4"], ["4", "6"]]
+    assert all(c[1]["mem_mb"] == 1024 for c in calls)
+    texts = _texts(parallel)
+    assert texts == _texts(single)
+    assert [t for t in texts if "Pagina numero" in t] == [
+        f"Pagina numero {n} do relatorio" for n in range(1, 7)
+    ]
+    assert len(_media(parallel)) == 1  # mesma imagem: deduplicada no merge
+
+    sections = Document(str(parallel)).sections
+    assert any(s.page_width > s.page_height for s in sections)
+
+
+def test_parallel_docx_falls_back_when_a_chunk_fails(tmp_path, monkeypatch):
+    src = _make_pdf(tmp_path / "relatorio.pdf", pages=4)
+    monkeypatch.setenv("PDF2DOCX_PARALLEL_MIN_PAGES", "2")
+    monkeypatch.setenv("PDF2DOCX_CHUNK_PAGES", "2")
+    monkeypatch.setenv("PDF2DOCX_MEM_MB", "900")
+    calls = []
+    real = cs.run_in_sandbox
+
+    def _chunks_fail(cmd, **kwargs):
+        calls.append((cmd[-2:], kwargs))
+        if cmd[-2:] != ["0", "4"]:
+            return subprocess.CompletedProcess(cmd, 1, "", "erro no bloco")
+        return real(cmd, **kwargs)
+
+    monkeypatch.setattr(cs, "run_in_sandbox", _chunks_fail)
+    monkeypatch.setattr(cs, "_pdf_to_docx_single", lambda *_a: pytest.fail("fallback fora do sandbox"))
+    out = cs._pdf_to_docx(str(src), str(tmp_path / "out"))
+
+    assert [t for t in _texts(out) if "Pagina numero" in t] == [
+        f"Pagina numero {n} do relatorio" for n in range(1, 5)
+    ]
+    # o fallback (documento inteiro) roda no sandbox, com os mesmos limites
+    fallback = [kw for args, kw in calls if args == ["0", "4"]]
+    assert len(fallback) == 1 and fallback[0]["mem_mb"] == 900
+    assert fallback[0]["timeout"] <= 600
+
+
+def test_parallel_docx_does_not_retry_after_a_limit_kill(tmp_path, monkeypatch):
+    src = _make_pdf(tmp_path / "relatorio.pdf", pages=4)
+    monkeypatch.setenv("PDF2DOCX_PARALLEL_MIN_PAGES", "2")
+    monkeypatch.setenv("PDF2DOCX_CHUNK_PAGES", "2")
+    calls = []
+
+    def _killed(cmd, **kwargs):
+        calls.append(cmd[-2:])
+        return subprocess.CompletedProcess(cmd, -9, "", "")  # SIGKILL (RLIMIT)
+
+    monkeypatch.setattr(cs, "run_in_sandbox", _killed)
+    with pytest.raises(RuntimeError, match="limite"):
+        cs._pdf_to_docx(str(src), str(tmp_path / "out"))
+    assert ["0", "4"] not in calls
@@ -0,0 +1,95 @@
+import io
+
+import pytest
+from PIL import Image
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.utils import preview_utils
+
+
+def _pdf_bytes(pages=25):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.setPageSize(landscape(A4) if n == 3 else A4)
+        # página inteira preta nas pares: dá para conferir o retângulo no sprite
+        if n % 2 == 0:
+            w, h = doc._pagesize
+            doc.rect(0, 0, w, h, fill=1)
+        doc.drawString(72, 72, f"Pagina {n}")
+        doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPRITE_COLUMNS", "4")
+    monkeypatch.setenv("SPRITE_MAX_SHEET_PX", "600")
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return app
+
+
+def _post(client, data, **form):
+    return client.post(
+        "/api/preview/sprites",
+        data={"file": (io.BytesIO(data), "doc.pdf"), **form},
+        content_type="multipart/form-data",
+    )
+
+
+def test_sprites_cover_every_page_and_are_cached(app, tmp_path, monkeypatch):
+    client = app.test_client()
+    data = _pdf_bytes()
+    resp = _post(client, data, width="100", format="jpeg")
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    body = resp.get_json()
+
+    assert body["pages"] == 25 and body["width"] == 100 and body["format"] == "jpeg"
+    assert [r["page"] for r in body["index"]] == list(range(1, 26))
+    assert body["sheets"] > 1 and len(body["sheet_urls"]) == body["sheets"]
+
+    sheets = {}
+    for n, url in enumerate(body["sheet_urls"]):
+        got = client.get(url)
+        assert got.status_code == 200
+        assert got.mimetype == "image/jpeg"
+        assert "immutable" in got.headers["Cache-Control"]
+        sheets[n] = Image.open(io.BytesIO(got.data)).convert("L")
+
+    for rect in body["index"]:
+        sheet = sheets[rect["sheet"]]
+        assert rect["x"] + rect["w"] <= sheet.width and rect["y"] + rect["h"] <= sheet.height
+        cx, cy = rect["x"] + rect["w"] // 2, rect["y"] + rect["h"] // 2
+        value = sheet.getpixel((cx, cy))
+        assert (value < 60) if rect["page"] % 2 == 0 else (value > 200)
+    landscape_rect = body["index"][2]
+    assert landscape_rect["w"] == 100 and landscape_rect["h"] < 100
+
+    # mesmo conteúdo: não renderiza de novo
+    monkeypatch.setattr(preview_utils, "_render_thumbs", lambda *_a: pytest.fail("renderizou de novo"))
+    again = _post(client, data, width="100", format="jpeg").get_json()
+    assert again["sprite_id"] == body["sprite_id"]
+    assert client.get(f"/api/preview/sprites/{body['sprite_id']}.json").get_json()["pages"] == 25
+
+    # só o cache fica no disco (nada de tmp_previews / diretórios temporários)
+    leftovers = [p for p in tmp_path.rglob("*") if p.is_file() and "sprites" not in p.parts]
+    assert leftovers == []
+
+
+def test_sprite_lookup_rejects_bad_ids(app):
+    client = app.test_client()
+    assert client.get("/api/preview/sprites/..%2Fx.json").status_code in (400, 404)
+    assert client.get("/api/preview/sprites/abc.json").status_code == 400
+    missing = "a" * 40 + "-200-webp"
+    assert client.get(f"/api/preview/sprites/{missing}.json").status_code == 404
+    assert client.get(f"/api/preview/sprites/{missing}/0.jpeg").status_code == 400
+    assert client.get(f"/api/preview/sprites/{missing}/0.webp").status_code == 404
+    assert _post(client, b"nao sou pdf").status_code in (400, 415, 422)
+    assert _post(client, _pdf_bytes(2), format="gif").status_code in (400, 422)
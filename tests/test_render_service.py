@@ -0,0 +1,155 @@
+import io
+import os
+import time
+
+import pikepdf
+import pypdfium2 as pdfium
+import pytest
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.services import render_service
+
+
+def _pdf(path, pages=3, rotate_second=True):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=(200, 100))
+    for n in range(1, pages + 1):
+        doc.rect(0, 0, 50, 100, fill=1)  # faixa preta à esquerda
+        doc.drawString(80, 50, f"Pagina {n}")
+        doc.showPage()
+    doc.save()
+    with pikepdf.open(io.BytesIO(buf.getvalue())) as pdf:
+        if rotate_second:
+            pdf.pages[1].Rotate = 90
+        pdf.save(path)
+    return str(path)
+
+
+def _slow(_path, seconds):
+    time.sleep(seconds)
+    return "ok"
+
+
+@pytest.fixture(autouse=True)
+def _pool():
+    render_service.shutdown()
+    yield
+    render_service.shutdown()
+
+
+def _image(data):
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+
+def test_pool_renders_pages_with_rotation_and_formats(tmp_path, monkeypatch):
+    monkeypatch.setenv("RENDER_WORKERS", "2")
+    src = _pdf(tmp_path / "a.pdf")
+
+    first = _image(render_service.render(src, 1, 2.0, "png"))
+    assert first.size == (400, 200)
+    assert first.getpixel((10, 100)) == (0, 0, 0)
+
+    batch = render_service.render_batch(src, [1, 2, 3], fmt="jpeg", width=100)
+    assert [_image(b).size for b in batch] == [(100, 50), (100, 200), (100, 50)]
+    assert batch[0][:2] == b"\xff\xd8"
+    assert render_service.page_count(src) == 3
+
+    with pytest.raises(Exception) as exc:
+        render_service.render(src, 9)
+    assert getattr(exc.value, "code", None) == 404
+
+
+def test_clip_matches_region_of_full_render(tmp_path, monkeypatch):
+    monkeypatch.setenv("RENDER_WORKERS", "0")
+    src = _pdf(tmp_path / "a.pdf")
+    full = _image(render_service.render(src, 2, 2.0))  # página girada: 100x200 pt
+    tile = _image(render_service.render(src, 2, 2.0, clip=(0, 0, 100, 50)))
+    assert tile.size == (200, 100)
+    assert list(tile.getdata()) == list(full.crop((0, 0, 200, 100)).getdata())
+
+
+def test_open_documents_are_reused_and_revalidated(tmp_path, monkeypatch):
+    monkeypatch.setenv("RENDER_WORKERS", "0")
+    src = _pdf(tmp_path / "a.pdf")
+    opened = []
+    real = pdfium.PdfDocument
+    monkeypatch.setattr(pdfium, "PdfDocument", lambda *a, **k: opened.append(a) or real(*a, **k))
+
+    render_service.render(src, 1)
+    render_service.render_batch(src, [2, 3])
+    assert len(opened) == 1
+
+    # arquivo substituído (outro inode/mtime): reabre
+    _pdf(tmp_path / "b.pdf", pages=1, rotate_second=False)
+    os.replace(tmp_path / "b.pdf", src)
+    assert render_service.page_count(src) == 1
+    assert len(opened) == 2
+
+
+def test_timeout_recycles_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv("RENDER_WORKERS", "1")
+    monkeypatch.setenv("RENDER_TIMEOUT_SEC", "1")
+    src = _pdf(tmp_path / "a.pdf")
+    assert render_service.page_count(src) == 3
+    with pytest.raises(render_service.RenderTimeout):
+        render_service._call(src, _slow, 5)
+    # slot recriado: volta a responder
+    assert render_service.page_count(src) == 3
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return app
+
+
+def test_analyze_thumbnails_come_from_the_service(app, tmp_path, monkeypatch):
+    monkeypatch.setenv("RENDER_WORKERS", "0")
+    calls = []
+    real = render_service.render_batch
+    monkeypatch.setattr(render_service, "render_batch", lambda *a, **k: calls.append(a) or real(*a, **k))
+    data = open(_pdf(tmp_path / "src.pdf"), "rb").read()
+    os.remove(tmp_path / "src.pdf")
+
+    resp = app.test_client().post(
+        "/api/compress/analyze",
+        data={"file": (io.BytesIO(data), "doc.pdf")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    pages = resp.get_json()["pages"]
+    assert len(calls) == 1
+    assert all(p["thumbnail"].startswith("data:image/jpeg;base64,") for p in pages)
+
+
+def test_editor_page_image_can_use_the_service(app, tmp_path, monkeypatch):
+    monkeypatch.setenv("RENDER_WORKERS", "0")
+    monkeypatch.setenv("RENDER_SERVICE_FOR", "edit")
+    monkeypatch.setenv("EDIT_RENDER_CACHE_MAX_MB", "0")
+    calls = []
+    real = render_service.render
+    monkeypatch.setattr(render_service, "render", lambda *a, **k: calls.append((a, k)) or real(*a, **k))
+    client = app.test_client()
+    data = open(_pdf(tmp_path / "src.pdf"), "rb").read()
+    sid = client.post(
+        "/api/edit/upload",
+        data={"file": (io.BytesIO(data), "doc.pdf")},
+        content_type="multipart/form-data",
+        headers={"Accept": "application/json"},
+    ).get_json()["session_id"]
+
+    full = client.get(f"/api/edit/page-image/{sid}/1?scale=1&fmt=png")
+    assert full.status_code == 200 and full.mimetype == "image/png"
+    assert _image(full.data).size == (200, 100)
+
+    tile = client.get(f"/api/edit/page-image/{sid}/1?scale=2&fmt=png&x=0&y=0&w=64&h=64")
+    assert tile.status_code == 200
+    assert _image(tile.data).size == (64, 64)
+    assert _image(tile.data).getpixel((10, 10)) == (0, 0, 0)
+    assert len(calls) == 2 and calls[1][1]["clip"] == (0.0, 0.0, 32.0, 32.0)
@@ -0,0 +1,123 @@
+import subprocess
+
+import pikepdf
+import pytest
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from app.services import converter_service as cs
+from tests.pdf_fixture_factory import extract_text
+
+
+def _make_mixed_pdf(path):
+    """Capa digitada, anexo escaneado (só imagem) e página com texto em Form XObject."""
+    doc = canvas.Canvas(str(path), pagesize=A4)
+    doc.drawString(72, 760, "Capa digitada")
+    doc.showPage()
+    doc.drawImage(ImageReader(Image.new("RGB", (80, 60), (120, 120, 120))), 72, 500, 240, 180)
+    doc.showPage()
+    doc.beginForm("rodape")
+    doc.drawString(72, 40, "Texto dentro de um formulario")
+    doc.endForm()
+    doc.doForm("rodape")
+    doc.showPage()
+    doc.drawImage(ImageReader(Image.new("RGB", (80, 60), (90, 90, 90))), 72, 500, 240, 180)
+    doc.showPage()
+    doc.save()
+    return path
+
+
+def test_page_text_index_reads_content_streams(tmp_path):
+    src = _make_mixed_pdf(tmp_path / "misto.pdf")
+
+    assert cs._page_text_index(str(src)) == [True, False, True, False]
+
+
+def test_only_pages_without_text_are_ocred_and_spliced_back(tmp_path, monkeypatch):
+    src = _make_mixed_pdf(tmp_path / "misto.pdf")
+    monkeypatch.setenv("OCR_ON_PDF_TO_XLSX", "1")
+    monkeypatch.setattr(cs, "_bin_exists", lambda name: True)
+    seen = {}
+
+    def fake_ocrmypdf(cmd, **kwargs):
+        subset_in, subset_out = cmd[-2], cmd[-1]
+        with pikepdf.open(subset_in) as pdf:
+            seen["pages"] = len(pdf.pages)
+        # "reconhece" cada página trocando-a por uma com camada de texto
+        doc = canvas.Canvas(subset_out, pagesize=A4)
+        for n in range(seen["pages"]):
+            doc.drawString(72, 760, f"OCR {n + 1}")
+            doc.showPage()
+        doc.save()
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(cs, "run_in_sandbox", fake_ocrmypdf)
+
+    out = cs._ocr_pages_without_text(str(src))
+
+    assert out != str(src)
+    assert seen["pages"] == 2
+    assert cs._page_text_index(out) == [True, True, True, True]
+    text = extract_text(out)
+    assert text.index("Capa digitada") < text.index("OCR 1")
+    assert text.index("OCR 1") < text.index("Texto dentro de um formulario")
+    assert text.index("Texto dentro de um formulario") < text.index("OCR 2")
+
+
+def test_fully_textual_pdf_skips_ocr(tmp_path, monkeypatch):
+    src = tmp_path / "texto.pdf"
+    doc = canvas.Canvas(str(src), pagesize=A4)
+    doc.drawString(72, 760, "Somente texto")
+    doc.showPage()
+    doc.save()
+    monkeypatch.setenv("OCR_ON_PDF_TO_XLSX", "1")
+    monkeypatch.setattr(cs, "_bin_exists", lambda name: True)
+
+    def _unexpected(*args, **kwargs):
+        raise AssertionError("OCR não deveria rodar")
+
+    monkeypatch.setattr(cs, "run_in_sandbox", _unexpected)
+
+    assert cs._ocr_pages_without_text(str(src)) == str(src)
+
+
+def test_ocr_failure_keeps_original_document(tmp_path, monkeypatch):
+    src = _make_mixed_pdf(tmp_path / "misto.pdf")
+    monkeypatch.setenv("OCR_ON_PDF_TO_XLSX", "1")
+    monkeypatch.setattr(cs, "_bin_exists", lambda name: True)
+    monkeypatch.setattr(
+        cs, "run_in_sandbox",
+        lambda cmd, **kw: subprocess.CompletedProcess(cmd, 2, "", "tesseract ausente"),
+    )
+
+    assert cs._ocr_pages_without_text(str(src)) == str(src)
+
+
+def test_ocr_disabled_skips_page_scan(tmp_path, monkeypatch):
+    src = _make_mixed_pdf(tmp_path / "misto.pdf")
+    monkeypatch.delenv("OCR_ON_PDF_TO_XLSX", raising=False)
+    monkeypatch.setattr(cs, "_page_text_index", lambda *_a: pytest.fail("varreu as páginas"))
+
+    assert cs._ocr_pages_without_text(str(src)) == str(src)
+
+
+def test_csv_removes_ocr_temp_pdf(tmp_path, monkeypatch):
+    src = _make_mixed_pdf(tmp_path / "misto.pdf")
+    ocr_copy = tmp_path / "ocr_tmp.pdf"
+    ocr_copy.write_bytes(src.read_bytes())
+    seen = []
+    monkeypatch.setattr(cs, "_prepare_camelot_env", lambda: None)
+    monkeypatch.setattr(cs, "_ocr_pages_without_text", lambda p: str(ocr_copy))
+
+    def _rows(pdf, *args, **kwargs):
+        seen.append(pdf)
+        return iter([["a", "b"]])
+
+    monkeypatch.setattr(cs, "_iter_camelot_rows", _rows)
+    out = cs._pdf_to_csv(str(src), str(tmp_path / "out"))
+
+    assert seen == [str(ocr_copy)]
+    assert open(out, encoding="utf-8").read().strip()
+    assert not ocr_copy.exists() and src.exists()
@@ -0,0 +1,172 @@
+import io
+import json
+import os
+import zipfile
+
+import pikepdf
+import pytest
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.routes import split as split_routes
+from app.services import split_service
+from app.utils import pdf_utils
+
+PAGES = 12
+
+
+def _text_pdf(pages=PAGES, bookmarks=()):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.drawString(72, 780, f"Pagina {n}")
+        doc.showPage()
+    doc.save()
+    if not bookmarks:
+        return buf.getvalue()
+    with pikepdf.open(io.BytesIO(buf.getvalue())) as pdf:
+        with pdf.open_outline() as outline:
+            for title, page_number in bookmarks:
+                item = pikepdf.OutlineItem(title, page_number - 1)
+                item.children.append(pikepdf.OutlineItem(f"{title}.1", page_number - 1))
+                outline.root.append(item)
+        out = io.BytesIO()
+        pdf.save(out)
+        return out.getvalue()
+
+
+def _image_pdf(pages, kb_per_page, shared_kb=0):
+    """Cada página com uma imagem própria (incompressível) e, opcionalmente, uma compartilhada."""
+    pdf = pikepdf.Pdf.new()
+
+    def _image(kb):
+        side = int((kb * 1024 / 3) ** 0.5)
+        img = pikepdf.Stream(pdf, os.urandom(side * side * 3))
+        img.Type, img.Subtype = pikepdf.Name.XObject, pikepdf.Name.Image
+        img.Width = img.Height = side
+        img.ColorSpace, img.BitsPerComponent = pikepdf.Name.DeviceRGB, 8
+        return pdf.make_indirect(img)
+
+    shared = _image(shared_kb) if shared_kb else None
+    for _ in range(pages):
+        pdf.add_blank_page(page_size=(200, 200))
+        page = pdf.pages[-1]
+        xobjects = pikepdf.Dictionary({"/Im0": _image(kb_per_page)})
+        ops = b"q 100 0 0 100 0 0 cm /Im0 Do Q"
+        if shared is not None:
+            xobjects["/Im1"] = shared
+            ops += b" q 100 0 0 100 100 100 cm /Im1 Do Q"
+        page.Resources = pikepdf.Dictionary({"/XObject": xobjects})
+        page.Contents = pdf.make_stream(ops)
+    out = io.BytesIO()
+    pdf.save(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return app
+
+
+def _split(app, data, **form):
+    return app.test_client().post(
+        "/api/split",
+        data={"file": (io.BytesIO(data), "entrada.pdf"), **form},
+        content_type="multipart/form-data",
+    )
+
+
+def _parts(resp):
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    out = []
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        for info in zf.infolist():
+            data = zf.read(info)
+            reader = PdfReader(io.BytesIO(data))
+            first = reader.pages[0].extract_text() or ""
+            out.append((info.filename, len(reader.pages), first, len(data)))
+    return out
+
+
+def test_chunks_and_ranges(app, tmp_path):
+    chunks = _parts(_split(app, _text_pdf(), mode="chunks", chunk_size="5"))
+    assert [n for _name, n, _t, _s in chunks] == [5, 5, 2]
+    assert chunks[0][0].startswith("parte_001_paginas_1-5_")
+    assert "Pagina 11" in chunks[2][2]
+
+    ranges = _parts(_split(app, _text_pdf(), mode="ranges", ranges="1-3, 7, 10-12"))
+    assert [n for _name, n, _t, _s in ranges] == [3, 1, 3]
+    assert "Pagina 7" in ranges[1][2]
+
+    assert _split(app, _text_pdf(), mode="ranges", ranges="10-20").status_code == 422
+    assert _split(app, _text_pdf(), mode="chunks", chunk_size="0").status_code == 422
+    assert _split(app, _text_pdf(), mode="nope").status_code == 422
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+def test_top_level_bookmarks(app):
+    data = _text_pdf(bookmarks=[("Capitulo 1", 3), ("Capitulo 2", 7)])
+    parts = _parts(_split(app, data, mode="bookmarks"))
+    # páginas antes do 1º marcador viram a parte inicial; subníveis não dividem
+    assert [n for _name, n, _t, _s in parts] == [2, 4, 6]
+    assert "Pagina 3" in parts[1][2] and "Pagina 7" in parts[2][2]
+
+    assert _split(app, _text_pdf(), mode="bookmarks").status_code == 422
+
+
+def test_size_mode_packs_pages_under_limit(app):
+    data = _image_pdf(pages=10, kb_per_page=150)
+    parts = _parts(_split(app, data, mode="size", max_mb="0.5"))
+    assert sum(n for _name, n, _t, _s in parts) == 10
+    assert all(size <= 512 * 1024 for *_rest, size in parts)
+    # ~150 KB por página: cabem 3 por parte de 0,5 MB
+    assert len(parts) <= 4
+
+    assert _split(app, data, mode="size", max_mb="abc").status_code == 422
+
+
+def test_shared_resources_are_counted_once():
+    data = _image_pdf(pages=8, kb_per_page=10, shared_kb=400)
+    with pikepdf.open(io.BytesIO(data)) as pdf:
+        per_page, costs = pdf_utils.page_object_costs(pdf)
+        shared = set.intersection(*per_page)
+        assert sum(costs[k] for k in shared) > 390 * 1024
+        # soma ingênua por página estouraria 1 MB; com o recurso contado uma vez, cabe tudo
+        assert pdf_utils.pack_pages_by_size(pdf, list(range(1, 9)), 1024 * 1024) == [list(range(1, 9))]
+        assert len(pdf_utils.pack_pages_by_size(pdf, list(range(1, 9)), 440 * 1024)) > 1
+
+
+def test_oversized_parts_are_rewritten_after_verification(app, monkeypatch):
+    # estimativa "errada": tudo numa parte só -> a verificação pós-escrita divide
+    monkeypatch.setattr(split_service, "pack_pages_by_size", lambda _pdf, pages, _max: [pages])
+    parts = _parts(_split(app, _image_pdf(pages=6, kb_per_page=150), mode="size", max_mb="0.4"))
+    assert sum(n for _name, n, _t, _s in parts) == 6
+    assert len(parts) >= 3
+    assert all(size <= 0.4 * 1024 * 1024 for *_rest, size in parts)
+
+
+def test_single_page_above_limit_is_reported_in_the_zip(app, tmp_path):
+    resp = _split(app, _image_pdf(pages=3, kb_per_page=150), mode="size", max_mb="0.05")
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        names = zf.namelist()
+        assert names[-1] == split_routes.EXCEDENTES_ARCNAME
+        relatorio = json.loads(zf.read(names[-1]))
+    assert relatorio["max_mb"] == 0.05
+    assert [p["paginas"] for p in relatorio["partes"]] == [[1], [2], [3]]
+    assert [p["arquivo"] for p in relatorio["partes"]] == names[:-1]
+    assert all(p["bytes"] > 0.05 * 1024 * 1024 for p in relatorio["partes"])
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+def test_invalid_min_part_env_falls_back_to_default(app, monkeypatch):
+    monkeypatch.setenv("SPLIT_MIN_PART_MB", "abc")
+    assert _split(app, _text_pdf(), mode="size", max_mb="0.01").status_code == 422
+    assert _split(app, _text_pdf(), mode="size", max_mb="1").status_code == 200
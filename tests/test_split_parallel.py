@@ -0,0 +1,92 @@
+import io
+from pathlib import Path
+
+import pikepdf
+import pytest
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.services import split_pool, split_service
+from tests.pdf_fixture_factory import FIELD_PARENT_KIDS, make_parent_kids_pdf
+
+
+def _pdf_bytes(pages):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.drawString(72, 780, f"Pagina {n}")
+        doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("SPLIT_PARALLEL_MIN_PARTS", "2")
+    monkeypatch.setenv("SPLIT_BATCH_PARTS", "3")
+    monkeypatch.setenv("SPLIT_WORKERS_PER_REQUEST", "2")
+    monkeypatch.setenv("SPLIT_MAX_PROCS", "2")
+    split_pool.shutdown()
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    yield app
+    split_pool.shutdown()
+
+
+def _split(app, data, **kwargs):
+    with app.app_context():
+        return split_service.dividir_pdf(FileStorage(stream=io.BytesIO(data), filename="e.pdf"), **kwargs)
+
+
+def _describe(path):
+    reader = PdfReader(path)
+    page = reader.pages[0]
+    return len(reader.pages), page.extract_text(), int(page.get("/Rotate", 0))
+
+
+def test_parallel_outputs_match_serial_and_keep_order(app, monkeypatch):
+    data = _pdf_bytes(pages=10)
+    rotations = {2: 90, 9: 270}
+    parallel = _split(app, data, rotations=rotations)
+    assert split_pool._POOL is not None  # passou pelo pool
+
+    monkeypatch.setenv("SPLIT_PARALLEL", "0")
+    serial = _split(app, data, rotations=rotations)
+
+    assert len(parallel) == len(serial) == 10
+    for n, (a, b) in enumerate(zip(parallel, serial), start=1):
+        assert Path(a).name.startswith(f"pagina_{n}_")
+        assert _describe(a) == _describe(b)
+        assert f"Pagina {n}" in _describe(a)[1]
+    assert _describe(parallel[1])[2] == 90
+
+
+def test_parallel_keeps_page_scoped_form_fields(app, tmp_path):
+    source = make_parent_kids_pdf(tmp_path / "src" / "parent_kids.pdf")
+    outputs = _split(app, source.read_bytes())
+    assert len(outputs) == 2
+    for out in outputs:
+        with pikepdf.open(out) as pdf:
+            (parent,) = pdf.Root["/AcroForm"]["/Fields"]
+            assert str(parent["/T"]) == FIELD_PARENT_KIDS
+            assert len(parent["/Kids"]) == 1
+            assert parent["/Kids"][0]["/P"] == pdf.pages[0].obj
+
+
+def test_stopping_early_removes_written_parts(app, tmp_path):
+    with app.test_request_context():
+        job = split_service.dividir_pdf_streaming(
+            FileStorage(stream=io.BytesIO(_pdf_bytes(pages=12)), filename="e.pdf")
+        )
+        it = iter(job)
+        first = next(it)
+        assert Path(first).exists()
+        Path(first).unlink()
+        it.close()
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
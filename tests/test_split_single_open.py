@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pikepdf
+import pytest
+from pikepdf import Array, Dictionary, Name, String
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.services import split_service
+from app.utils import pdf_utils
+from tests.pdf_fixture_factory import _make_text_widget
+
+FIELD = "cliente.nome"
+VALUE = "Maria Souza"
+PAGES = 30
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return app
+
+
+def _make_form_pdf(path: Path) -> Path:
+    """Um campo pai com um widget-filho em cada página (e conteúdo pesado por página)."""
+    base = path.with_name(f"{path.stem}.base.pdf")
+    doc = canvas.Canvas(str(base), pagesize=letter, pageCompression=0)
+    for n in range(1, PAGES + 1):
+        for k in range(120):
+            doc.drawString(40, 740 - k * 6, f"pagina {n} linha {k} " * 4)
+        doc.showPage()
+    doc.save()
+
+    with pikepdf.open(base) as pdf:
+        parent = pdf.make_indirect(
+            Dictionary({"/FT": Name("/Tx"), "/T": String(FIELD), "/V": String(VALUE), "/Kids": Array()})
+        )
+        kids = Array()
+        for index, page in enumerate(pdf.pages, start=1):
+            widget = _make_text_widget(pdf, page, parent, f"{VALUE}-{index}", [72, 20, 260, 46])
+            kids.append(widget)
+            page["/Annots"] = Array([widget])
+        parent["/Kids"] = kids
+        pdf.Root["/AcroForm"] = Dictionary({"/Fields": Array([parent]), "/DA": String("/Helv 0 Tf 0 g")})
+        pdf.save(path)
+    return path
+
+
+def test_split_total_opens_source_once_and_keeps_page_scoped_fields(app, tmp_path, monkeypatch):
+    source = _make_form_pdf(tmp_path / "formulario.pdf")
+    opened = []
+    real_open = pikepdf.open
+
+    def _spy(path, *args, **kwargs):
+        opened.append(Path(str(path)).name)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(pdf_utils.pikepdf, "open", _spy)
+
+    with app.app_context():
+        outputs = split_service.dividir_pdf(
+            FileStorage(stream=io.BytesIO(source.read_bytes()), filename="formulario.pdf")
+        )
+
+    assert len(outputs) == PAGES
+    assert sum(1 for name in opened if name.startswith("safe_")) == 1
+
+    total_size = source.stat().st_size
+    for n, out in enumerate(outputs, start=1):
+        assert Path(out).name.startswith(f"pagina_{n}_")
+        # só a própria página: o grafo do formulário não arrasta as demais
+        assert Path(out).stat().st_size < total_size / 5
+        with pikepdf.open(out) as pdf:
+            assert len(pdf.pages) == 1
+            fields = pdf.Root["/AcroForm"]["/Fields"]
+            assert len(fields) == 1
+            parent = fields[0]
+            assert str(parent["/T"]) == FIELD and str(parent["/V"]) == VALUE
+            assert len(parent["/Kids"]) == 1
+            kid = parent["/Kids"][0]
+            assert kid["/Parent"].objgen == parent.objgen
+            assert kid["/P"] == pdf.pages[0].obj
+            assert f"pagina {n} linha 0" in pdf.pages[0].Contents.read_bytes().decode("latin-1")
+
+
+def test_parts_match_subset_writer(tmp_path):
+    source = _make_form_pdf(tmp_path / "formulario.pdf")
+    parts = [[1, 2, 3], [7], [30, 4]]
+    results = pdf_utils.write_preserving_pdf_parts(
+        str(source), parts, lambda i, _pages: str(tmp_path / f"parte_{i}.pdf"),
+        rotations={7: 90},
+    )
+    assert [r["pages"] for r in results] == parts
+
+    for i, pages in enumerate(parts):
+        single = tmp_path / f"subset_{i}.pdf"
+        pdf_utils.write_preserving_pdf_subset(str(source), str(single), pages=pages, rotations={7: 90})
+        with pikepdf.open(results[i]["output_path"]) as a, pikepdf.open(single) as b:
+            assert len(a.pages) == len(b.pages) == len(pages)
+            assert [p.get("/Rotate") for p in a.pages] == [p.get("/Rotate") for p in b.pages]
+            kids_a = a.Root["/AcroForm"]["/Fields"][0]["/Kids"]
+            kids_b = b.Root["/AcroForm"]["/Fields"][0]["/Kids"]
+            assert len(kids_a) == len(kids_b) == len(pages)
+
+    with pytest.raises(ValueError):
+        pdf_utils.write_preserving_pdf_parts(str(source), [[99]], lambda i, _p: str(tmp_path / "x.pdf"))
@@ -0,0 +1,118 @@
+import io
+import zipfile
+
+import pytest
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.utils import pdf_utils
+from app.utils.zip_stream import iter_zip
+
+PAGES = 12
+
+
+def _pdf_bytes(pages=PAGES):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.drawString(72, 780, f"Pagina {n}")
+        doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return app
+
+
+def _post(client, **kwargs):
+    return client.post(
+        "/api/split",
+        data={"file": (io.BytesIO(_pdf_bytes()), "entrada.pdf")},
+        content_type="multipart/form-data",
+        **kwargs,
+    )
+
+
+def test_zip_is_streamed_with_stored_pdf_entries(app, tmp_path):
+    resp = _post(app.test_client())
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/zip"
+    assert "paginas_divididas.zip" in resp.headers["Content-Disposition"]
+    assert "Content-Length" not in resp.headers
+
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert zf.testzip() is None
+        infos = zf.infolist()
+        assert len(infos) == PAGES
+        assert {i.compress_type for i in infos} == {zipfile.ZIP_STORED}
+        for n, info in enumerate(infos, start=1):
+            assert info.filename.startswith(f"pagina_{n}_")
+            reader = PdfReader(io.BytesIO(zf.read(info)))
+            assert len(reader.pages) == 1
+            assert f"Pagina {n}" in reader.pages[0].extract_text()
+
+    # nada sobra no disco: nem o ZIP, nem as páginas, nem a origem sanitizada
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+def test_first_chunk_arrives_after_first_page(app, monkeypatch):
+    written = []
+    real = pdf_utils._rebuild_acroform_for_output
+
+    def _spy(pdf_src, pdf_dst):
+        written.append(len(pdf_dst.pages))
+        return real(pdf_src, pdf_dst)
+
+    monkeypatch.setattr(pdf_utils, "_rebuild_acroform_for_output", _spy)
+
+    resp = _post(app.test_client(), buffered=False)
+    assert resp.status_code == 200
+    body = iter(resp.response)
+    first = next(body)
+    assert first.startswith(b"PK\x03\x04")
+    assert len(written) == 1
+
+    rest = b"".join(body)
+    resp.close()
+    assert len(written) == PAGES
+    with zipfile.ZipFile(io.BytesIO(first + rest)) as zf:
+        assert len(zf.namelist()) == PAGES
+
+
+def test_abandoned_download_cleans_up(app, tmp_path):
+    resp = _post(app.test_client(), buffered=False)
+    next(iter(resp.response))
+    resp.close()
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+def test_invalid_upload_still_returns_json_error(app):
+    resp = app.test_client().post(
+        "/api/split",
+        data={"file": (io.BytesIO(b"nao sou pdf"), "entrada.pdf")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code in (400, 415, 422)
+    assert "error" in resp.get_json()
+
+
+def test_large_entry_is_streamed_in_bounded_chunks(tmp_path):
+    big = tmp_path / "grande.pdf"
+    payload = bytes(range(256)) * (3 * 1024 * 4)  # 3 MiB
+    big.write_bytes(payload)
+
+    chunks = list(iter_zip([(str(big), "grande.pdf")], chunk_size=256 * 1024))
+    assert len(chunks) > 10
+    assert max(len(c) for c in chunks) < 300 * 1024
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.testzip() is None
+        assert zf.read("grande.pdf") == payload
@@ -0,0 +1,138 @@
+import io
+import os
+import time
+
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.utils import disk_cache, preview_utils, thumb_cache
+
+
+def _pdf_bytes(label="a"):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    doc.drawString(72, 780, f"Documento {label}")
+    doc.showPage()
+    doc.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("THUMBS_PRUNE_INTERVAL_SEC", "0")
+    thumb_cache.reset_counters()
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    yield app
+    thumb_cache.reset_counters()
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_small_files_hit_without_full_hash(app, tmp_path, monkeypatch):
+    src = _write(tmp_path, "a.pdf", _pdf_bytes("a"))
+    with app.app_context():
+        first = preview_utils.preview_pdf(src)
+        monkeypatch.setattr(disk_cache, "sha256_file", lambda *_a: pytest.fail("hash completo"))
+        monkeypatch.setattr(preview_utils, "_render_first_page_to_png", lambda *_a: pytest.fail("render"))
+        again = preview_utils.preview_pdf(src)
+    assert again["thumb_id"] == first["thumb_id"]
+    stats = thumb_cache.stats(str(tmp_path / "_thumbs"))
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_large_files_confirm_quick_key_with_full_hash(app, tmp_path):
+    # comentários após o %%EOF: o miolo muda sem mexer no 1º/último MB
+    head = _pdf_bytes("grande") + b"%" + b"h" * (1024 * 1024 + 10) + b"\n"
+    middle_a = b"%" + b"a" * (1024 * 1024) + b"\n"
+    middle_b = b"%" + b"b" * (1024 * 1024) + b"\n"
+    tail = b"%" + b"z" * (1024 * 1024 + 10) + b"\n"
+    a = _write(tmp_path, "a.pdf", head + middle_a + tail)
+    b = _write(tmp_path, "b.pdf", head + middle_b + tail)
+    assert thumb_cache.quick_key(a) == thumb_cache.quick_key(b)
+
+    with app.app_context():
+        ta = preview_utils.preview_pdf(a)["thumb_id"]
+        tb = preview_utils.preview_pdf(b)["thumb_id"]
+        assert preview_utils.preview_pdf(a)["thumb_id"] == ta
+    # mesmas pontas e tamanho, miolo diferente: entradas distintas
+    assert ta != tb
+    assert tb == disk_cache.sha256_file(b)[:40]
+    assert thumb_cache.stats(str(tmp_path / "_thumbs"))["hits"] == 1
+
+
+def test_large_file_miss_does_not_hash_during_lookup(app, tmp_path, monkeypatch):
+    big = _pdf_bytes("grande") + b"%" + b"x" * (3 * 1024 * 1024) + b"\n"
+    src = _write(tmp_path, "big.pdf", big)
+    calls = []
+    real = disk_cache.sha256_file
+
+    def _counting(path, *args, **kwargs):
+        calls.append(path)
+        return real(path, *args, **kwargs)
+
+    monkeypatch.setattr(disk_cache, "sha256_file", _counting)
+    key, full = thumb_cache.resolve_key(src, lambda _key: None)
+    assert full is None and calls == []
+
+    # a falta grava o hash (calculado junto com o render) para confirmar o próximo acerto
+    with app.app_context():
+        thumb_id = preview_utils.preview_pdf(src)["thumb_id"]
+    assert thumb_id == key and len(calls) == 1
+    assert thumb_cache.read_sidecar(str(tmp_path / "_thumbs" / f"{key}.sha")) == real(src)
+
+
+def test_budget_evicts_least_recently_used(app, tmp_path, monkeypatch):
+    thumbs = tmp_path / "_thumbs"
+    with app.app_context():
+        ids = []
+        for n in range(3):
+            ids.append(preview_utils.preview_pdf(_write(tmp_path, f"{n}.pdf", _pdf_bytes(str(n))))["thumb_id"])
+    pngs = {i: thumbs / f"{i}.png" for i in ids}
+    size = max(p.stat().st_size for p in pngs.values())
+    now = time.time()
+    for age, i in zip((300, 200, 100), ids):
+        os.utime(pngs[i], (now - age, now - age))
+    thumb_cache.touch(str(pngs[ids[0]]))  # o mais antigo volta a ser o mais recente
+
+    monkeypatch.setattr(thumb_cache, "max_bytes", lambda: 2 * size + 1)
+    assert thumb_cache.prune(str(thumbs), force=True) == 1
+    assert not pngs[ids[1]].exists()
+    assert pngs[ids[0]].exists() and pngs[ids[2]].exists()
+
+
+def test_ttl_expires_entries_and_sprites(app, tmp_path, monkeypatch):
+    monkeypatch.setenv("THUMBS_CACHE_TTL_HOURS", "1")
+    src = _write(tmp_path, "a.pdf", _pdf_bytes("a"))
+    with app.app_context():
+        thumb = preview_utils.preview_pdf(src)["thumb_path"]
+        sprite_id = preview_utils.preview_sprites(src, width=80, fmt="jpeg")["sprite_id"]
+        sprite = preview_utils.sprite_dir(sprite_id)
+    old = time.time() - 2 * 3600
+    os.utime(thumb, (old, old))
+    os.utime(os.path.join(sprite, "index.json"), (old, old))
+
+    assert thumb_cache.prune(str(tmp_path / "_thumbs"), force=True) == 2
+    assert not os.path.exists(thumb) and not os.path.exists(sprite)
+
+
+def test_admin_stats_report_cache(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "ADMIN_TOKEN", "segredo")
+    src = _write(tmp_path, "a.pdf", _pdf_bytes("a"))
+    with app.app_context():
+        preview_utils.preview_pdf(src)
+        preview_utils.preview_pdf(src)
+    data = app.test_client().get("/api/admin/stats", headers={"X-Admin-Token": "segredo"}).get_json()
+    cache = data["thumbs_cache"]
+    assert cache["entries"] == 1 and cache["bytes"] > 0
+    assert cache["hit_rate"] == 0.5
@@ -0,0 +1,108 @@
+import hashlib
+import io
+import os
+
+import pytest
+from flask import request
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app import create_app
+from app.utils import disk_cache, upload_stream
+from app.utils.upload_stream import IngestedUpload, IngestStream
+
+
+def _pdf_bytes(pages=2, padding=0):
+    buf = io.BytesIO()
+    doc = canvas.Canvas(buf, pagesize=A4)
+    for n in range(1, pages + 1):
+        doc.drawString(72, 780, f"Pagina {n}")
+        doc.showPage()
+    doc.save()
+    # comentário no fim: aumenta o arquivo sem mudar o PDF
+    return buf.getvalue() + b"%" + b"x" * padding + b"\n"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATELIMIT_ENABLED"] = False
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return app
+
+
+def _incoming(tmp_path):
+    folder = tmp_path / upload_stream.INCOMING_SUBDIR
+    return sorted(os.listdir(folder)) if folder.exists() else []
+
+
+def test_upload_is_written_once_and_saved_as_link(app, tmp_path):
+    data = _pdf_bytes(padding=200_000)
+    dest = tmp_path / "destino.pdf"
+    with app.test_request_context("/api/files", method="POST",
+                                  data={"file": (io.BytesIO(data), "doc.pdf")}):
+        up = request.files["file"]
+        assert isinstance(up, IngestedUpload)
+        assert up.size == len(data)
+        assert up.sha256 == hashlib.sha256(data).hexdigest()
+        assert up.sniffed_mime == "application/pdf"
+        assert up.ingest_head == data[:upload_stream.HEAD_BYTES]
+        up.save(dest)
+        assert os.stat(dest).st_nlink == 2  # mesmo inode do arquivo recebido
+        assert len(_incoming(tmp_path)) == 1
+    assert _incoming(tmp_path) == []
+    assert dest.read_bytes() == data
+
+
+def test_hash_from_ingestion_is_reused(app, tmp_path, monkeypatch):
+    def _no_rehash(_path):
+        raise AssertionError("upload relido para calcular hash")
+
+    monkeypatch.setattr(disk_cache, "sha256_file", _no_rehash)
+    data = _pdf_bytes()
+    resp = app.test_client().post("/api/files", data={"file": (io.BytesIO(data), "doc.pdf")},
+                                  content_type="multipart/form-data")
+    assert resp.status_code == 201, resp.get_data(as_text=True)
+    assert resp.get_json()["sha256"] == hashlib.sha256(data).hexdigest()
+    assert _incoming(tmp_path) == []
+
+
+def test_non_pdf_aborts_before_reading_the_body(app, tmp_path, monkeypatch):
+    written = []
+    real_write = IngestStream.write
+    monkeypatch.setattr(IngestStream, "write", lambda self, d: written.append(len(d)) or real_write(self, d))
+
+    body = b"MZ" + os.urandom(4 * 1024 * 1024)
+    resp = app.test_client().post("/api/split", data={"file": (io.BytesIO(body), "doc.pdf")},
+                                  content_type="multipart/form-data")
+    assert resp.status_code == 422
+    assert "PDF" in resp.get_json()["error"]
+    assert sum(written) < 256 * 1024  # parou logo no começo do arquivo
+    assert _incoming(tmp_path) == []
+
+
+def test_per_file_limit_returns_413(app, tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_MAX_FILE_MB", "1")
+    data = _pdf_bytes(padding=2 * 1024 * 1024)
+    resp = app.test_client().post("/api/split", data={"file": (io.BytesIO(data), "doc.pdf")},
+                                  content_type="multipart/form-data")
+    assert resp.status_code == 413
+    assert _incoming(tmp_path) == []
+
+
+def test_request_log_does_not_parse_the_body(app):
+    with app.test_request_context("/api/split", method="POST",
+                                  data={"file": (io.BytesIO(_pdf_bytes()), "doc.pdf")}):
+        app.preprocess_request()
+        assert "form" not in request.__dict__
+
+
+def test_streaming_can_be_disabled(app, monkeypatch):
+    monkeypatch.setenv("UPLOAD_STREAMING", "0")
+    with app.test_request_context("/api/files", method="POST",
+                                  data={"file": (io.BytesIO(_pdf_bytes()), "doc.pdf")}):
+        up = request.files["file"]
+        assert not isinstance(up, IngestedUpload)
+        assert upload_stream.known_sha256(up) is None
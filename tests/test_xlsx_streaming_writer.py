@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from app.services import converter_service as cs
+
+
+def _sample_df():
+    raw = pd.DataFrame(
+        [
+            ["Data de Atendimento", "Beneficiário", "Valor", "Copart", "Qtd"],
+            ["01/02/2024", "Fulano de Tal", "R$ 1.234,50", "10%", "3"],
+            ["15/03/2024", "=cmd()", "R$ 99,90", "12,5%", "1.250"],
+            ["20/04/2024", "", "R$ 0,10", "0%", "7"],
+        ]
+    )
+    return cs._clean_and_infer(raw)
+
+
+def _write_legacy(path, df, meta):
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, header=True, sheet_name="Tabela 1")
+    wb = load_workbook(path)
+    cs._format_openpyxl_sheet(wb["Tabela 1"], meta)
+    wb.save(path)
+
+
+def _write_stream(path, df, meta):
+    wb = Workbook(write_only=True)
+    cs._write_streaming_sheet(wb, "Tabela 1", df, meta)
+    wb.save(path)
+
+
+def _snapshot(path):
+    ws = load_workbook(path)["Tabela 1"]
+    cells = []
+    for row in ws.iter_rows():
+        for c in row:
+            cells.append((
+                c.coordinate,
+                c.number_format,
+                c.alignment.horizontal,
+                c.alignment.vertical,
+                bool(c.font.bold),
+                c.border.left.style,
+                c.border.bottom.style,
+            ))
+    widths = {k: round(v.width, 2) for k, v in ws.column_dimensions.items() if v.width}
+    return ws.freeze_panes, ws.auto_filter.ref, widths, cells
+
+
+def test_streaming_writer_matches_legacy_formatting(tmp_path):
+    df, meta = _sample_df()
+    assert {m["type"] for m in meta.values()} >= {"money", "percent", "number"}
+
+    legacy = tmp_path / "legacy.xlsx"
+    stream = tmp_path / "stream.xlsx"
+    _write_legacy(legacy, df, meta)
+    _write_stream(stream, df, meta)
+
+    assert _snapshot(stream) == _snapshot(legacy)
+
+
+def test_streaming_writer_formats_by_column_type(tmp_path):
+    df, meta = _sample_df()
+    out = tmp_path / "stream.xlsx"
+    _write_stream(out, df, meta)
+
+    ws = load_workbook(out)["Tabela 1"]
+    header = [c.value for c in ws[1]]
+    fmt = {name: ws.cell(row=2, column=j).number_format for j, name in enumerate(header, start=1)}
+    assert fmt["Valor"] == "#,##0.00"
+    assert fmt["Copart"] == "0.00%"
+    assert fmt["Qtd"] == "#,##0.########"
+    assert fmt["Data de Atendimento"] == "dd/mm/yyyy"
+    assert ws.cell(row=3, column=header.index("Beneficiário") + 1).value == "'=cmd()"
+    # Valores numéricos saem como número (não texto), para os formatos valerem
+    assert ws.cell(row=2, column=header.index("Valor") + 1).value == 1234.5
+    assert ws.cell(row=3, column=header.index("Copart") + 1).value == 0.125
+
+
+@pytest.mark.parametrize("single, schema", [
+    ("0", None),
+    ("1", None),
+    ("0", ["Data de Atendimento", "Beneficiário", "Valor", "Copart", "Qtd"]),
+])
+def test_legacy_mode_keeps_column_formats(tmp_path, monkeypatch, single, schema):
+    raw = pd.DataFrame(
+        [
+            ["Data de Atendimento", "Beneficiário", "Valor", "Copart", "Qtd"],
+            ["01/02/2024", "Fulano de Tal", "R$ 1.234,50", "10%", "3"],
+            ["15/03/2024", "Ciclano", "R$ 99,90", "12,5%", "1.250"],
+        ]
+    )
+    src = tmp_path / "in.pdf"
+    src.write_bytes(b"%PDF-1.4\n")
+    monkeypatch.setenv("XLSX_WRITE_MODE", "legacy")
+    monkeypatch.setenv("PDF_TO_XLSX_ALWAYS_AREAS", "0")
+    monkeypatch.setenv("XLSX_SINGLE_SHEET", single)
+    monkeypatch.setattr(cs, "_load_target_schema_from_env", lambda: schema)
+    monkeypatch.setattr(cs, "enforce_pdf_page_limit", lambda *a, **k: None)
+    monkeypatch.setattr(cs, "_prepare_camelot_env", lambda: None)
+    monkeypatch.setattr(cs, "_ocr_pages_without_text", lambda p: p)
+    monkeypatch.setattr(cs, "_extract_tables_smart", lambda p: [raw])
+
+    out = cs._pdf_to_xlsx(str(src), str(tmp_path / "out"))
+
+    ws = load_workbook(out).worksheets[0]
+    header = [c.value for c in ws[1]]
+    fmt = {name: ws.cell(row=2, column=j).number_format for j, name in enumerate(header, start=1)}
+    assert fmt["Valor"] == "#,##0.00"
+    assert fmt["Copart"] == "0.00%"
+    assert fmt["Qtd"] == "#,##0.########"
+    assert fmt["Data de Atendimento"] == "dd/mm/yyyy"